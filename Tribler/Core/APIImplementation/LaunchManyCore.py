@@ -13,11 +13,12 @@ from threading import Event, enumerate as enumerate_threads
 from traceback import print_exc
 
 from twisted.internet import reactor
-from twisted.internet.defer import Deferred, inlineCallbacks, DeferredList
+from twisted.internet.defer import Deferred, inlineCallbacks, DeferredList, succeed
 from twisted.internet.task import LoopingCall
 from twisted.internet.threads import deferToThread
 from twisted.python.threadable import isInIOThread
 
+from Tribler.Core.APIImplementation.startup_orchestrator import StartupOrchestrator
 from Tribler.Core.CacheDB.sqlitecachedb import forceDBThread
 from Tribler.Core.DownloadConfig import DownloadStartupConfig, DefaultDownloadStartupConfig
 from Tribler.Core.Modules.search_manager import SearchManager
@@ -33,13 +34,8 @@ from Tribler.Core.exceptions import DuplicateDownloadException
 from Tribler.Core.simpledefs import (NTFY_DISPERSY, NTFY_STARTED, NTFY_TORRENTS, NTFY_UPDATE, NTFY_TRIBLER,
                                      NTFY_FINISHED, DLSTATUS_DOWNLOADING, DLSTATUS_STOPPED_ON_ERROR, NTFY_ERROR,
                                      DLSTATUS_SEEDING, NTFY_TORRENT, NTFY_MARKET_IOM_INPUT_REQUIRED)
-from Tribler.community.market.wallet.btc_wallet import BitcoinWallet
-from Tribler.community.market.wallet.dummy_wallet import DummyWallet1, DummyWallet2
-from Tribler.community.market.wallet.tc_wallet import TrustchainWallet
-from Tribler.community.tradechain.community import TradeChainCommunity
-from Tribler.community.tunnel.tunnel_community import TunnelSettings
 from Tribler.dispersy.taskmanager import TaskManager
-from Tribler.dispersy.util import blockingCallFromThread, blocking_call_on_reactor_thread
+from Tribler.dispersy.util import blocking_call_on_reactor_thread
 
 
 class TriblerLaunchMany(TaskManager):
@@ -75,6 +71,7 @@ class TriblerLaunchMany(TaskManager):
         self.api_manager = None
         self.watch_folder = None
         self.version_check_manager = None
+        self.reactor_lag_monitor = None
 
         self.category = None
         self.peer_db = None
@@ -93,11 +90,14 @@ class TriblerLaunchMany(TaskManager):
         self.tracker_manager = None
         self.torrent_checker = None
         self.tunnel_community = None
+        self.triblerchain_community = None
 
         self.startup_deferred = Deferred()
+        self.startup_orchestrator = None
 
         self.boosting_manager = None
         self.market_community = None
+        self.wallets = {}
 
     def register(self, session, session_lock):
         assert isInIOThread()
@@ -112,6 +112,13 @@ class TriblerLaunchMany(TaskManager):
             if sys.platform == 'darwin':
                 os.environ['SSL_CERT_FILE'] = os.path.join(get_lib_path(), 'root_certs_mac.pem')
 
+            # Start the reactor lag monitor first, so it also catches the callbacks blocking during startup
+            if self.session.config.get_reactor_lag_monitor_enabled():
+                from Tribler.Core.Utilities.instrumentation import ReactorLagMonitor
+                self.reactor_lag_monitor = ReactorLagMonitor(
+                    threshold=self.session.config.get_reactor_lag_monitor_threshold())
+                self.reactor_lag_monitor.start()
+
             if self.session.config.get_torrent_store_enabled():
                 from Tribler.Core.leveldbstore import LevelDbStore
                 self.torrent_store = LevelDbStore(self.session.config.get_torrent_store_dir())
@@ -179,11 +186,13 @@ class TriblerLaunchMany(TaskManager):
                 self.search_manager = SearchManager(self.session)
                 self.search_manager.initialize()
 
-        if not self.initComplete:
-            self.init()
+        init_deferred = self.init() if not self.initComplete else succeed(None)
+
+        def on_init_complete(_):
+            self.session.add_observer(self.on_tribler_started, NTFY_TRIBLER, [NTFY_STARTED])
+            self.session.notifier.notify(NTFY_TRIBLER, NTFY_STARTED, None)
 
-        self.session.add_observer(self.on_tribler_started, NTFY_TRIBLER, [NTFY_STARTED])
-        self.session.notifier.notify(NTFY_TRIBLER, NTFY_STARTED, None)
+        init_deferred.addCallbacks(on_init_complete, self.startup_deferred.errback)
         return self.startup_deferred
 
     def on_tribler_started(self, subject, changetype, objectID, *args):
@@ -220,8 +229,8 @@ class TriblerLaunchMany(TaskManager):
                                            self.session.dispersy_member, kargs=default_kwargs)
 
         # Tunnel Community
-        mc_community = None
         if self.session.config.get_tunnel_community_enabled():
+            from Tribler.community.tunnel.tunnel_community import TunnelSettings
             tunnel_settings = TunnelSettings(tribler_session=self.session)
             tunnel_kwargs = {'tribler_session': self.session, 'settings': tunnel_settings}
 
@@ -234,10 +243,10 @@ class TriblerLaunchMany(TaskManager):
                 dispersy_member = self.dispersy.get_member(private_key=keypair.key_to_bin())
 
                 from Tribler.community.triblerchain.community import TriblerChainCommunity
-                mc_community = self.dispersy.define_auto_load(TriblerChainCommunity,
-                                                              dispersy_member,
-                                                              load=True,
-                                                              kargs=trustchain_kwargs)[0]
+                self.triblerchain_community = self.dispersy.define_auto_load(TriblerChainCommunity,
+                                                                             dispersy_member,
+                                                                             load=True,
+                                                                             kargs=trustchain_kwargs)[0]
 
             else:
                 keypair = self.dispersy.crypto.generate_key(u"curve25519")
@@ -250,121 +259,175 @@ class TriblerLaunchMany(TaskManager):
             # We don't want to automatically load other instances of this community with other master members.
             self.dispersy.undefine_auto_load(HiddenTunnelCommunity)
 
-        # Use the permanent TrustChain ID for Market community/TradeChain if it's available
-        if self.session.config.get_market_community_enabled():
-            wallets = {}
-            btc_wallet = BitcoinWallet(os.path.join(self.session.config.get_state_dir(), 'wallet'),
-                                       testnet=self.session.config.get_btc_testnet())
-            wallets[btc_wallet.get_identifier()] = btc_wallet
-
-            mc_wallet = TrustchainWallet(mc_community)
-            wallets[mc_wallet.get_identifier()] = mc_wallet
-
-            if self.session.config.get_dummy_wallets_enabled():
-                # For debugging purposes, we create dummy wallets
-                dummy_wallet1 = DummyWallet1()
-                wallets[dummy_wallet1.get_identifier()] = dummy_wallet1
-
-                dummy_wallet2 = DummyWallet2()
-                wallets[dummy_wallet2.get_identifier()] = dummy_wallet2
-
-            from Tribler.community.market.community import MarketCommunity
-            keypair = self.session.tradechain_keypair
-            dispersy_member = self.dispersy.get_member(private_key=keypair.key_to_bin())
-
-            tradechain_community = self.dispersy.define_auto_load(TradeChainCommunity,
-                                                                  dispersy_member, load=True,
-                                                                  kargs={})[0]
-            market_kwargs = {'tribler_session': self.session, 'wallets': wallets,
-                             'tradechain_community': tradechain_community}
-            self.market_community = self.dispersy.define_auto_load(MarketCommunity, dispersy_member,
-                                                                   load=True, kargs=market_kwargs)[0]
-            tradechain_community.market_community = self.market_community
-
         self.session.config.set_anon_proxy_settings(2, ("127.0.0.1",
                                                         self.session.config.get_tunnel_community_socks5_listen_ports()))
 
         self._logger.info("tribler: communities are ready in %.2f seconds", timemod.time() - now_time)
 
-    def init(self):
-        if self.dispersy:
-            from Tribler.dispersy.community import HardKilledCommunity
-
-            self._logger.info("lmc: Starting Dispersy...")
-
-            now = timemod.time()
-            success = self.dispersy.start(self.session.autoload_discovery)
+    def create_wallets(self):
+        """
+        Create the wallets used by the market community. Opening the BTC wallet reads and decrypts the electrum wallet
+        file and starts its daemon, so this method is called on the thread pool during startup.
+        """
+        from Tribler.community.market.wallet.btc_wallet import BitcoinWallet
+        btc_wallet = BitcoinWallet(os.path.join(self.session.config.get_state_dir(), 'wallet'),
+                                   testnet=self.session.config.get_btc_testnet())
+        self.wallets[btc_wallet.get_identifier()] = btc_wallet
 
-            diff = timemod.time() - now
-            if success:
-                self._logger.info("lmc: Dispersy started successfully in %.2f seconds [port: %d]",
-                                  diff, self.dispersy.wan_address[1])
-            else:
-                self._logger.info("lmc: Dispersy failed to start in %.2f seconds", diff)
+        if self.session.config.get_dummy_wallets_enabled():
+            # For debugging purposes, we create dummy wallets
+            from Tribler.community.market.wallet.dummy_wallet import DummyWallet1, DummyWallet2
+            dummy_wallet1 = DummyWallet1()
+            self.wallets[dummy_wallet1.get_identifier()] = dummy_wallet1
 
-            self.upnp_ports.append((self.dispersy.wan_address[1], 'UDP'))
+            dummy_wallet2 = DummyWallet2()
+            self.wallets[dummy_wallet2.get_identifier()] = dummy_wallet2
 
-            from Tribler.dispersy.crypto import M2CryptoSK
-            private_key = self.dispersy.crypto.key_to_bin(
-                M2CryptoSK(filename=self.session.config.get_permid_keypair_filename()))
-            self.session.dispersy_member = blockingCallFromThread(reactor, self.dispersy.get_member,
-                                                                  private_key=private_key)
+    @blocking_call_on_reactor_thread
+    def load_market_community(self):
+        """
+        Load the market community and the TradeChain community. The wallets should have been created already.
+        """
+        from Tribler.community.market.community import MarketCommunity
+        from Tribler.community.market.wallet.tc_wallet import TrustchainWallet
+        from Tribler.community.tradechain.community import TradeChainCommunity
 
-            blockingCallFromThread(reactor, self.dispersy.define_auto_load, HardKilledCommunity,
-                                   self.session.dispersy_member, load=True)
+        mc_wallet = TrustchainWallet(self.triblerchain_community)
+        self.wallets[mc_wallet.get_identifier()] = mc_wallet
 
-            if self.session.config.get_megacache_enabled():
-                self.dispersy.database.attach_commit_callback(self.session.sqlite_db.commit_now)
+        # Use the permanent TrustChain ID for Market community/TradeChain if it's available
+        keypair = self.session.tradechain_keypair
+        dispersy_member = self.dispersy.get_member(private_key=keypair.key_to_bin())
+
+        tradechain_community = self.dispersy.define_auto_load(TradeChainCommunity,
+                                                              dispersy_member, load=True,
+                                                              kargs={})[0]
+        market_kwargs = {'tribler_session': self.session, 'wallets': self.wallets,
+                         'tradechain_community': tradechain_community}
+        self.market_community = self.dispersy.define_auto_load(MarketCommunity, dispersy_member,
+                                                               load=True, kargs=market_kwargs)[0]
+        tradechain_community.market_community = self.market_community
 
-            # notify dispersy finished loading
-            self.session.notifier.notify(NTFY_DISPERSY, NTFY_STARTED, None)
+    def init(self):
+        """
+        Start all components of the session. Components are started by the startup orchestrator as soon as the
+        components they depend on are running, so independent components are started concurrently.
+        :return: a Deferred that fires when all components have been started.
+        """
+        config = self.session.config
+        self.startup_orchestrator = StartupOrchestrator(self.session.notifier)
+        orchestrator = self.startup_orchestrator
 
-            self.load_communities()
+        if self.dispersy:
+            orchestrator.add_component("dispersy", self.start_dispersy)
+            orchestrator.add_component("communities", self.load_communities, depends_on=["dispersy"])
 
-            tunnel_community_ports = self.session.config.get_tunnel_community_socks5_listen_ports()
-            self.session.config.set_anon_proxy_settings(2, ("127.0.0.1", tunnel_community_ports))
+            if config.get_market_community_enabled():
+                orchestrator.add_component("wallets", self.create_wallets, threaded=True)
+                orchestrator.add_component("market_community", self.load_market_community,
+                                           depends_on=["communities", "wallets"])
 
-            if self.session.config.get_channel_search_enabled():
-                from Tribler.Core.Modules.channel.channel_manager import ChannelManager
-                self.channel_manager = ChannelManager(self.session)
-                self.channel_manager.initialize()
+            if config.get_channel_search_enabled():
+                orchestrator.add_component("channel_manager", self.start_channel_manager, depends_on=["communities"])
 
-        if self.session.config.get_mainline_dht_enabled():
-            from Tribler.Core.DecentralizedTracking import mainlineDHT
-            self.mainline_dht = mainlineDHT.init(('127.0.0.1', self.session.config.get_mainline_dht_port()),
-                                                 self.session.config.get_state_dir())
-            self.upnp_ports.append((self.session.config.get_mainline_dht_port(), 'UDP'))
+        if config.get_mainline_dht_enabled():
+            orchestrator.add_component("mainline_dht", self.start_mainline_dht)
 
-        if self.session.config.get_libtorrent_enabled():
+        if config.get_libtorrent_enabled():
             from Tribler.Core.Libtorrent.LibtorrentMgr import LibtorrentMgr
             self.ltmgr = LibtorrentMgr(self.session)
-            self.ltmgr.initialize()
-            for port, protocol in self.upnp_ports:
-                self.ltmgr.add_upnp_mapping(port, protocol)
+            orchestrator.add_component("libtorrent_session", self.ltmgr.get_session, threaded=True)
+            orchestrator.add_component("libtorrent", self.ltmgr.initialize, depends_on=["libtorrent_session"])
+            orchestrator.add_component("upnp", self.add_upnp_mappings,
+                                       depends_on=["libtorrent", "dispersy", "mainline_dht"])
 
-        # add task for tracker checking
-        if self.session.config.get_torrent_checking_enabled():
-            self.torrent_checker = TorrentChecker(self.session)
-            self.torrent_checker.initialize()
+        if config.get_torrent_checking_enabled():
+            orchestrator.add_component("torrent_checker", self.start_torrent_checker, depends_on=["libtorrent"])
 
         if self.rtorrent_handler:
-            self.rtorrent_handler.initialize()
+            orchestrator.add_component("remote_torrent_handler", self.rtorrent_handler.initialize,
+                                       depends_on=["communities"])
+
+        if config.get_watch_folder_enabled():
+            orchestrator.add_component("watch_folder", self.start_watch_folder, depends_on=["libtorrent"])
+
+        if config.get_credit_mining_enabled():
+            orchestrator.add_component("credit_mining", self.start_credit_mining,
+                                       depends_on=["libtorrent", "torrent_checker", "communities"])
+
+        orchestrator.add_component("version_check", self.start_version_check_manager)
 
         if self.api_manager:
-            self.api_manager.root_endpoint.start_endpoints()
+            # The other endpoints are only enabled once everything they might use is running
+            orchestrator.add_component("rest_api", self.api_manager.root_endpoint.start_endpoints,
+                                       depends_on=orchestrator.components.keys())
 
-        if self.session.config.get_watch_folder_enabled():
-            self.watch_folder = WatchFolder(self.session)
-            self.watch_folder.start()
+        def on_components_started(_):
+            self.session.set_download_states_callback(self.sesscb_states_callback)
+            self.initComplete = True
 
-        if self.session.config.get_credit_mining_enabled():
-            from Tribler.Core.CreditMining.BoostingManager import BoostingManager
-            self.boosting_manager = BoostingManager(self.session)
+        return orchestrator.start().addCallback(on_components_started)
 
-        self.version_check_manager = VersionCheckManager(self.session)
-        self.session.set_download_states_callback(self.sesscb_states_callback)
+    @blocking_call_on_reactor_thread
+    def start_dispersy(self):
+        from Tribler.dispersy.community import HardKilledCommunity
+
+        self._logger.info("lmc: Starting Dispersy...")
+
+        now = timemod.time()
+        success = self.dispersy.start(self.session.autoload_discovery)
+
+        diff = timemod.time() - now
+        if success:
+            self._logger.info("lmc: Dispersy started successfully in %.2f seconds [port: %d]",
+                              diff, self.dispersy.wan_address[1])
+        else:
+            self._logger.info("lmc: Dispersy failed to start in %.2f seconds", diff)
+
+        self.upnp_ports.append((self.dispersy.wan_address[1], 'UDP'))
+
+        from Tribler.dispersy.crypto import M2CryptoSK
+        private_key = self.dispersy.crypto.key_to_bin(
+            M2CryptoSK(filename=self.session.config.get_permid_keypair_filename()))
+        self.session.dispersy_member = self.dispersy.get_member(private_key=private_key)
+
+        self.dispersy.define_auto_load(HardKilledCommunity, self.session.dispersy_member, load=True)
 
-        self.initComplete = True
+        if self.session.config.get_megacache_enabled():
+            self.dispersy.database.attach_commit_callback(self.session.sqlite_db.commit_now)
+
+        # notify dispersy finished loading
+        self.session.notifier.notify(NTFY_DISPERSY, NTFY_STARTED, None)
+
+    def start_channel_manager(self):
+        from Tribler.Core.Modules.channel.channel_manager import ChannelManager
+        self.channel_manager = ChannelManager(self.session)
+        self.channel_manager.initialize()
+
+    def start_mainline_dht(self):
+        from Tribler.Core.DecentralizedTracking import mainlineDHT
+        self.mainline_dht = mainlineDHT.init(('127.0.0.1', self.session.config.get_mainline_dht_port()),
+                                             self.session.config.get_state_dir())
+        self.upnp_ports.append((self.session.config.get_mainline_dht_port(), 'UDP'))
+
+    def add_upnp_mappings(self):
+        for port, protocol in self.upnp_ports:
+            self.ltmgr.add_upnp_mapping(port, protocol)
+
+    def start_torrent_checker(self):
+        self.torrent_checker = TorrentChecker(self.session)
+        self.torrent_checker.initialize()
+
+    def start_watch_folder(self):
+        self.watch_folder = WatchFolder(self.session)
+        self.watch_folder.start()
+
+    def start_credit_mining(self):
+        from Tribler.Core.CreditMining.BoostingManager import BoostingManager
+        self.boosting_manager = BoostingManager(self.session)
+
+    def start_version_check_manager(self):
+        self.version_check_manager = VersionCheckManager(self.session)
 
     def add(self, tdef, dscfg, pstate=None, setupDelay=0, hidden=False,
             share_mode=False, checkpoint_disabled=False):
@@ -798,6 +861,9 @@ class TriblerLaunchMany(TaskManager):
             yield self.tracker_manager.shutdown()
         self.tracker_manager = None
 
+        for wallet in self.wallets.itervalues():
+            wallet.cancel_all_pending_tasks()
+
         if self.dispersy:
             self._logger.info("lmc: Shutting down Dispersy...")
             now = timemod.time()
@@ -858,6 +924,10 @@ class TriblerLaunchMany(TaskManager):
             yield self.watch_folder.stop()
         self.watch_folder = None
 
+        if self.reactor_lag_monitor is not None:
+            self.reactor_lag_monitor.stop()
+        self.reactor_lag_monitor = None
+
     def network_shutdown(self):
         try:
             self._logger.info("tlm: network_shutdown")
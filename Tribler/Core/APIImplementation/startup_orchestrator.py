@@ -0,0 +1,173 @@
+"""
+Dependency-driven startup of the session components.
+"""
+import logging
+import time
+
+from twisted.internet.defer import Deferred, maybeDeferred
+from twisted.internet.threads import deferToThread
+
+from Tribler.Core.simpledefs import NTFY_STARTUP_TICK, NTFY_STARTED, NTFY_FINISHED
+
+
+class StartupComponent(object):
+    """
+    A single step of the startup procedure, started when all its dependencies have been started.
+    """
+
+    def __init__(self, name, start_func, depends_on=(), threaded=False):
+        self.name = name
+        self.start_func = start_func
+        self.depends_on = list(depends_on)
+        self.threaded = threaded
+
+        self.start_time = None
+        self.end_time = None
+        self.failure = None
+
+    @property
+    def duration(self):
+        if self.start_time is None or self.end_time is None:
+            return None
+        return self.end_time - self.start_time
+
+    def to_dictionary(self, offset):
+        return {
+            "name": self.name,
+            "depends_on": self.depends_on,
+            "threaded": self.threaded,
+            "start": None if self.start_time is None else self.start_time - offset,
+            "duration": self.duration,
+            "failed": self.failure is not None
+        }
+
+
+class StartupOrchestrator(object):
+    """
+    Starts a graph of components. A component is started as soon as all the components it depends on have been
+    started, so independent components overlap: components that return a Deferred run concurrently with the rest of
+    the startup, and threaded components run on the reactor thread pool.
+
+    Every component start and finish is announced with a NTFY_STARTUP_TICK notification (with the name of the
+    component as object id) and the timing of every component is kept for the statistics.
+    """
+
+    def __init__(self, notifier=None):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.notifier = notifier
+
+        self.components = {}
+        self.pending = []
+        self.running = set()
+        self.started = set()
+
+        self.start_time = None
+        self.end_time = None
+        self.finished_deferred = None
+        self.failure = None
+
+    def add_component(self, name, start_func, depends_on=(), threaded=False):
+        """
+        Register a component that should be started. Dependencies on components that are never registered (because
+        they are disabled in the config) are ignored.
+        :param name: the unique name of this component
+        :param start_func: the function starting the component, can return a Deferred
+        :param depends_on: names of the components that should be started before this one
+        :param threaded: whether start_func is thread-safe and can be run on the thread pool
+        """
+        if name in self.components:
+            raise ValueError("Component %s is already registered" % name)
+        component = StartupComponent(name, start_func, depends_on, threaded)
+        self.components[name] = component
+        self.pending.append(component)
+        return component
+
+    def has_component(self, name):
+        return name in self.components
+
+    def start(self):
+        """
+        Start all registered components.
+        :return: a Deferred that fires when every component has been started, or errbacks with the first failure
+        after the components that were already running have finished.
+        """
+        for component in self.pending:
+            component.depends_on = [name for name in component.depends_on if name in self.components]
+            self._check_cycles(component, [])
+
+        self.start_time = time.time()
+        self.finished_deferred = Deferred()
+        self._start_ready_components()
+        return self.finished_deferred
+
+    def _check_cycles(self, component, path):
+        if component.name in path:
+            raise ValueError("Cyclic startup dependency: %s" % " -> ".join(path + [component.name]))
+        for name in component.depends_on:
+            self._check_cycles(self.components[name], path + [component.name])
+
+    def _start_ready_components(self):
+        if self.failure is None:
+            ready = [component for component in self.pending
+                     if all(name in self.started for name in component.depends_on)]
+            # Components can finish synchronously and re-enter this method, so claim all of them up front
+            for component in ready:
+                self.pending.remove(component)
+                self.running.add(component.name)
+            # Dispatch the threaded components first, since a synchronous component runs (together with the synchronous
+            # components that depend on it) to completion before this loop continues
+            for component in sorted(ready, key=lambda component: not component.threaded):
+                self._start_component(component)
+
+        if not self.running and self.finished_deferred and not self.finished_deferred.called:
+            self.end_time = time.time()
+            if self.failure is not None:
+                self.finished_deferred.errback(self.failure)
+            else:
+                self._logger.info("Session components started in %.2f seconds", self.end_time - self.start_time)
+                self.finished_deferred.callback(self.get_timings())
+
+    def _start_component(self, component):
+        self._logger.info("Starting %s...", component.name)
+        component.start_time = time.time()
+        self._notify(NTFY_STARTED, component)
+
+        if component.threaded:
+            deferred = deferToThread(component.start_func)
+        else:
+            deferred = maybeDeferred(component.start_func)
+        deferred.addCallbacks(self._on_component_started, self._on_component_failed,
+                              callbackArgs=(component,), errbackArgs=(component,))
+
+    def _on_component_started(self, _, component):
+        component.end_time = time.time()
+        self._logger.info("Started %s in %.2f seconds", component.name, component.duration)
+        self.running.discard(component.name)
+        self.started.add(component.name)
+        self._notify(NTFY_FINISHED, component)
+        self._start_ready_components()
+
+    def _on_component_failed(self, failure, component):
+        component.end_time = time.time()
+        component.failure = failure
+        self._logger.error("Failed to start %s: %s", component.name, failure.getErrorMessage())
+        self.running.discard(component.name)
+        if self.failure is None:
+            self.failure = failure
+        self._start_ready_components()
+
+    def _notify(self, change_type, component):
+        if self.notifier:
+            self.notifier.notify(NTFY_STARTUP_TICK, change_type, component.name, component.duration)
+
+    def get_timings(self):
+        """
+        Return the timing of every component, ordered by start time and relative to the start of the orchestrator.
+        """
+        offset = self.start_time or 0
+        components = sorted(self.components.itervalues(),
+                            key=lambda component: (component.start_time is None, component.start_time))
+        return {
+            "total_duration": None if self.end_time is None else self.end_time - self.start_time,
+            "components": [component.to_dictionary(offset) for component in components]
+        }
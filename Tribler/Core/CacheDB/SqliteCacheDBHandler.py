@@ -7,6 +7,7 @@ import json
 import logging
 import math
 import os
+import random
 import threading
 from collections import OrderedDict, defaultdict
 from copy import deepcopy
@@ -21,6 +22,7 @@ from twisted.internet.task import LoopingCall
 from Tribler.Core.CacheDB.sqlitecachedb import bin2str, str2bin
 from Tribler.Core.TorrentDef import TorrentDef
 from Tribler.Core.Utilities.search_utils import split_into_keywords, filter_keywords
+from Tribler.Core.Utilities.term_index import TermIndex, levenshtein
 from Tribler.Core.Utilities.tracker_utils import get_uniformed_tracker_url
 from Tribler.Core.Utilities.unicode import dunno2unicode
 from Tribler.Core.simpledefs import (INFOHASH_LENGTH, NTFY_UPDATE, NTFY_INSERT, NTFY_DELETE, NTFY_CREATE,
@@ -34,6 +36,16 @@ VOTECAST_FLUSH_DB_INTERVAL = 15
 
 DEFAULT_ID_CACHE_SIZE = 1024 * 5
 
+MAX_SUGGESTION_COMPLETIONS = 5  # The number of completions of every keyword that are used for search suggestions
+MAX_SUGGESTION_CANDIDATES = 100  # The number of swarm names that are ranked for search suggestions
+TERM_INDEX_CHUNK_SIZE = 1000  # The number of swarm names that are added to the term index per reactor iteration
+RANDOM_SAMPLE_ROUNDS = 3  # The number of times random channel torrent ids are looked up for random torrents
+RANDOM_SAMPLE_FACTOR = 2  # The number of random channel torrent ids that are looked up per random torrent needed
+
+# The columns of the Torrent table that are set when adding a torrent of which we do not have the torrent file
+TORRENT_NO_DEF_KEYS = (u'name', u'length', u'creation_date', u'num_files', u'insert_time', u'secret', u'relevance',
+                       u'category', u'status', u'comment', u'is_collected')
+
 
 class LimitedOrderedDict(OrderedDict):
 
@@ -119,6 +131,19 @@ class PeerDBHandler(BasicDBHandler):
 
         return peer_id
 
+    def addOrGetPeerIDS(self, permids):
+        """
+        Return the peer ids of the given permids, adding the peers that are not in the database yet with one insert.
+        """
+        peer_ids = self.getPeerIDS(permids)
+        new_permids = set(permid for permid, peer_id in zip(permids, peer_ids) if peer_id is None)
+        if new_permids:
+            sql_insert_peers = u"INSERT OR IGNORE INTO Peer (permid) VALUES (?)"
+            self._db.executemany(sql_insert_peers, [(bin2str(permid),) for permid in new_permids])
+            peer_ids = self.getPeerIDS(permids)
+
+        return peer_ids
+
     def getPeer(self, permid, keys=None):
         if keys is not None:
             res = self.getOne(keys, permid=bin2str(permid))
@@ -227,6 +252,12 @@ class TorrentDBHandler(BasicDBHandler):
         # to incoming remote torrents without doing a full text search.
         self.latest_matchinfo_torrent = None
 
+        # The index of the terms in the swarm names, which is built in chunks after initialization. Until it is
+        # ready, the partial index and the rowid of the last swarm name in it are kept separately.
+        self.term_index = None
+        self.partial_term_index = None
+        self.partial_term_index_rowid = 0
+
     def initialize(self, *args, **kwargs):
         super(TorrentDBHandler, self).initialize(*args, **kwargs)
         self.category = self.session.lm.category
@@ -234,6 +265,7 @@ class TorrentDBHandler(BasicDBHandler):
         self.votecast_db = self.session.open_dbhandler(NTFY_VOTECAST)
         self.channelcast_db = self.session.open_dbhandler(NTFY_CHANNELCAST)
         self._rtorrent_handler = self.session.lm.rtorrent_handler
+        self.build_term_index()
 
     def close(self):
         super(TorrentDBHandler, self).close()
@@ -312,35 +344,11 @@ class TorrentDBHandler(BasicDBHandler):
 
     def addExternalTorrentNoDef(self, infohash, name, files, trackers, timestamp, extra_info={}):
         if not self.hasTorrent(infohash):
-            metainfo = {'info': {}, 'encoding': 'utf_8'}
-            metainfo['info']['name'] = name.encode('utf_8')
-            metainfo['info']['piece length'] = -1
-            metainfo['info']['pieces'] = ''
-
-            if len(files) > 1:
-                files_as_dict = []
-                for filename, file_length in files:
-                    filename = filename.encode('utf_8')
-                    files_as_dict.append({'path': [filename], 'length': file_length})
-                metainfo['info']['files'] = files_as_dict
-
-            elif len(files) == 1:
-                metainfo['info']['length'] = files[0][1]
-            else:
+            torrentdef = self._create_torrentdef_no_def(infohash, name, files, trackers, timestamp)
+            if torrentdef is None:
                 return
 
-            if len(trackers) > 0:
-                metainfo['announce'] = trackers[0]
-                metainfo['announce-list'] = [list(trackers)]
-            else:
-                metainfo['nodes'] = []
-
-            metainfo['creation date'] = timestamp
-
             try:
-                torrentdef = TorrentDef.load_from_dict(metainfo)
-                torrentdef.infohash = infohash
-
                 torrent_id = self._addTorrentToDB(torrentdef, extra_info)
                 if self._rtorrent_handler:
                     self._rtorrent_handler.notify_possible_torrent_infohash(infohash)
@@ -349,8 +357,97 @@ class TorrentDBHandler(BasicDBHandler):
                 sql_insert_files = "INSERT OR IGNORE INTO TorrentFiles (torrent_id, path, length) VALUES (?,?,?)"
                 self._db.executemany(sql_insert_files, insert_files)
             except:
-                self._logger.error("Could not create a TorrentDef instance %r %r %r %r %r %r", infohash, timestamp, name, files, trackers, extra_info)
+                self._logger.error("Could not add torrent %r %r %r %r %r %r", infohash, timestamp, name, files, trackers, extra_info)
+                print_exc()
+
+    def addExternalTorrentsNoDef(self, torrents):
+        """
+        Add the metadata of torrents of which only the infohash is in the database, like addExternalTorrentNoDef does
+        for a single torrent, but with one statement per table for the whole list of torrents.
+
+        :param torrents: a list of (torrent_id, infohash, name, files, trackers, timestamp) tuples
+        """
+        update_torrents = []
+        index_torrents = []
+        torrent_trackers = []
+        insert_files = []
+        for torrent_id, infohash, name, files, trackers, timestamp in torrents:
+            torrentdef = self._create_torrentdef_no_def(infohash, name, files, trackers, timestamp)
+            if torrentdef is None:
+                continue
+
+            try:
+                database_dict = self._get_database_dict(torrentdef)
+                swarmname = torrentdef.get_name_as_unicode()
+                if not torrentdef.is_multifile_torrent():
+                    swarmname, _ = os.path.splitext(swarmname)
+                index_values = (torrent_id, swarmname, torrentdef.get_files())
+                tracker_list = self._get_torrent_trackers(torrentdef)
+                torrent_files = [(torrent_id, unicode(path), length) for path, length in files]
+            except:
+                self._logger.error("Could not add torrent %r %r %r %r %r", infohash, timestamp, name, files, trackers)
                 print_exc()
+                continue
+
+            update_torrents.append(tuple(database_dict[key] for key in TORRENT_NO_DEF_KEYS) + (torrent_id,))
+            index_torrents.append(index_values)
+            torrent_trackers.append((torrent_id, infohash, tracker_list))
+            insert_files.extend(torrent_files)
+
+        if not update_torrents:
+            return
+
+        sql_update_torrents = u"UPDATE Torrent SET %s WHERE torrent_id = ?" % \
+            u", ".join(u"%s = ?" % key for key in TORRENT_NO_DEF_KEYS)
+        self._db.executemany(sql_update_torrents, update_torrents)
+        self._indexTorrents(index_torrents)
+        self._addTorrentTrackerMappings(torrent_trackers)
+
+        if self._rtorrent_handler:
+            for _, infohash, _ in torrent_trackers:
+                self._rtorrent_handler.notify_possible_torrent_infohash(infohash)
+
+        sql_insert_files = "INSERT OR IGNORE INTO TorrentFiles (torrent_id, path, length) VALUES (?,?,?)"
+        self._db.executemany(sql_insert_files, insert_files)
+
+    def _create_torrentdef_no_def(self, infohash, name, files, trackers, timestamp):
+        """
+        Create a TorrentDef from the metadata of a torrent of which we do not have the torrent file, or return None if
+        the metadata has no files or is invalid.
+        """
+        metainfo = {'info': {}, 'encoding': 'utf_8'}
+        metainfo['info']['name'] = name.encode('utf_8')
+        metainfo['info']['piece length'] = -1
+        metainfo['info']['pieces'] = ''
+
+        if len(files) > 1:
+            files_as_dict = []
+            for filename, file_length in files:
+                filename = filename.encode('utf_8')
+                files_as_dict.append({'path': [filename], 'length': file_length})
+            metainfo['info']['files'] = files_as_dict
+
+        elif len(files) == 1:
+            metainfo['info']['length'] = files[0][1]
+        else:
+            return None
+
+        if len(trackers) > 0:
+            metainfo['announce'] = trackers[0]
+            metainfo['announce-list'] = [list(trackers)]
+        else:
+            metainfo['nodes'] = []
+
+        metainfo['creation date'] = timestamp
+
+        try:
+            torrentdef = TorrentDef.load_from_dict(metainfo)
+            torrentdef.infohash = infohash
+            return torrentdef
+        except:
+            self._logger.error("Could not create a TorrentDef instance %r %r %r %r %r", infohash, timestamp, name, files, trackers)
+            print_exc()
+            return None
 
     def addOrGetTorrentID(self, infohash):
         assert isinstance(infohash, str), "INFOHASH has invalid type: %s" % type(infohash)
@@ -431,6 +528,37 @@ class TorrentDBHandler(BasicDBHandler):
         return torrent_id
 
     def _indexTorrent(self, torrent_id, swarmname, files):
+        self._indexTorrents([(torrent_id, swarmname, files)])
+
+    def _indexTorrents(self, torrents):
+        """
+        Add the swarm names and file names of a list of (torrent_id, swarmname, files) tuples to the full text index.
+        """
+        values = [self._get_index_values(torrent_id, swarmname, files) for torrent_id, swarmname, files in torrents]
+        term_indices = [self._get_term_index_of(torrent_id) for torrent_id, _, _, _ in values]
+        try:
+            for term_index, (torrent_id, _, _, _) in zip(term_indices, values):
+                if term_index is not None:
+                    old_swarm_keywords = self._db.fetchone(u"SELECT swarmname FROM FullTextIndex WHERE rowid = ?",
+                                                           (torrent_id,))
+                    if old_swarm_keywords:
+                        term_index.remove(old_swarm_keywords.split())
+
+            # INSERT OR REPLACE not working for fts3 table
+            self._db.executemany(u"DELETE FROM FullTextIndex WHERE rowid = ?",
+                                 [(torrent_id,) for torrent_id, _, _, _ in values])
+            self._db.executemany(
+                u"INSERT INTO FullTextIndex (rowid, swarmname, filenames, fileextensions) VALUES(?,?,?,?)", values)
+
+            for term_index, (_, swarm_keywords, _, _) in zip(term_indices, values):
+                if term_index is not None:
+                    term_index.add(swarm_keywords.split())
+        except:
+            # this will fail if the fts3 module cannot be found
+            print_exc()
+
+    @staticmethod
+    def _get_index_values(torrent_id, swarmname, files):
         # Niels: new method for indexing, replaces invertedindex
         # Making sure that swarmname does not include extension for single file torrents
         swarm_keywords = " ".join(split_into_keywords(swarmname))
@@ -451,15 +579,7 @@ class TorrentDBHandler(BasicDBHandler):
             filenames.sort(cmp=popSort, reverse=True)
             filenames = filenames[:1000]
 
-        values = (torrent_id, swarm_keywords, " ".join(filenames), " ".join(fileextensions))
-        try:
-            # INSERT OR REPLACE not working for fts3 table
-            self._db.execute_write(u"DELETE FROM FullTextIndex WHERE rowid = ?", (torrent_id,))
-            self._db.execute_write(
-                u"INSERT INTO FullTextIndex (rowid, swarmname, filenames, fileextensions) VALUES(?,?,?,?)", values)
-        except:
-            # this will fail if the fts3 module cannot be found
-            print_exc()
+        return torrent_id, swarm_keywords, " ".join(filenames), " ".join(fileextensions)
 
     # ------------------------------------------------------------
     # Adds the trackers of a given torrent into the database.
@@ -468,6 +588,11 @@ class TorrentDBHandler(BasicDBHandler):
         # Set add_all to True if you want to put all multi-trackers into db.
         # In the current version (4.2) only the main tracker is used.
 
+        # add trackers in batch
+        self.addTorrentTrackerMappingInBatch(torrent_id, self._get_torrent_trackers(torrentdef))
+
+    @staticmethod
+    def _get_torrent_trackers(torrentdef):
         announce = torrentdef.get_tracker()
         announce_list = torrentdef.get_tracker_hierarchy()
 
@@ -491,8 +616,7 @@ class TorrentDBHandler(BasicDBHandler):
                     if tracker_url:
                         new_tracker_set.add(tracker_url)
 
-        # add trackers in batch
-        self.addTorrentTrackerMappingInBatch(torrent_id, list(new_tracker_set))
+        return list(new_tracker_set)
 
     def updateTorrent(self, infohash, notify=True, **kw):  # watch the schema of database
         if 'seeder' in kw:
@@ -606,6 +730,41 @@ class TorrentDBHandler(BasicDBHandler):
         result = self._db.fetchone(sql, (torrent_id,))
         return result
 
+    def getTorrentsCheckRetries(self, infohashes):
+        """
+        Return a dictionary mapping each known infohash to a (torrent_id, tracker_check_retries) tuple.
+        """
+        result = {}
+        infohashes = list(set(infohashes))
+        # Stay well below the maximum number of host parameters of SQLite
+        for start in xrange(0, len(infohashes), 500):
+            chunk = [bin2str(infohash) for infohash in infohashes[start:start + 500]]
+            sql = u"SELECT torrent_id, infohash, tracker_check_retries FROM Torrent WHERE infohash IN (%s)" \
+                  % u",".join(u"?" * len(chunk))
+            for torrent_id, infohash, retries in self._db.fetchall(sql, chunk):
+                result[str2bin(infohash)] = (torrent_id, retries or 0)
+        return result
+
+    def updateTorrentCheckResults(self, results):
+        """
+        Update the health of many torrents at once.
+        :param results: list of (torrent_id, infohash, seeders, leechers, last_check, next_check, status, retries)
+        """
+        if not results:
+            return
+
+        sql = u"UPDATE Torrent SET num_seeders = ?, num_leechers = ?, last_tracker_check = ?, next_tracker_check = ?," \
+              u" status = ?, tracker_check_retries = ? WHERE torrent_id = ?"
+        self._db.executemany(sql, [(seeders, leechers, last_check, next_check, status, retries, torrent_id)
+                                   for torrent_id, _, seeders, leechers, last_check, next_check, status, retries
+                                   in results])
+
+        self._logger.debug(u"updated the check results of %d torrents", len(results))
+
+        # notify
+        for result in results:
+            self.notifier.notify(NTFY_TORRENTS, NTFY_UPDATE, result[1])
+
     def updateTorrentCheckResult(self, torrent_id, infohash, seeders, leechers, last_check, next_check, status,
                                  retries):
         sql = u"UPDATE Torrent SET num_seeders = ?, num_leechers = ?, last_tracker_check = ?, next_tracker_check = ?," \
@@ -622,18 +781,28 @@ class TorrentDBHandler(BasicDBHandler):
         self.addTorrentTrackerMappingInBatch(torrent_id, [tracker, ])
 
     def addTorrentTrackerMappingInBatch(self, torrent_id, tracker_list):
-        if not tracker_list:
-            return
+        self._addTorrentTrackerMappings([(torrent_id, None, tracker_list)])
 
-        parameters = u"?," * len(tracker_list)
-        parameters = parameters[:-1]
-        sql = u"SELECT tracker FROM TrackerInfo WHERE tracker IN (%s)" % parameters
+    def _addTorrentTrackerMappings(self, torrent_trackers):
+        """
+        Add the trackers of a list of (torrent_id, infohash, tracker_list) tuples, looking up the trackers of all
+        torrents at once. The infohash may be None, in which case it is looked up when it is needed.
+        """
+        torrent_trackers = [(torrent_id, infohash, tracker_list)
+                            for torrent_id, infohash, tracker_list in torrent_trackers if tracker_list]
+        if not torrent_trackers:
+            return
 
-        found_tracker_list = self._db.fetchall(sql, tuple(tracker_list))
-        found_tracker_list = [tracker[0] for tracker in found_tracker_list]
+        all_trackers = list(set(tracker for _, _, tracker_list in torrent_trackers for tracker in tracker_list))
+        found_tracker_list = set()
+        # Stay well below the maximum number of host parameters of SQLite
+        for start in xrange(0, len(all_trackers), 500):
+            chunk = all_trackers[start:start + 500]
+            sql = u"SELECT tracker FROM TrackerInfo WHERE tracker IN (%s)" % u",".join(u"?" * len(chunk))
+            found_tracker_list.update(tracker for tracker, in self._db.fetchall(sql, chunk))
 
         # update tracker info
-        not_found_tracker_list = [tracker for tracker in tracker_list if tracker not in found_tracker_list]
+        not_found_tracker_list = [tracker for tracker in all_trackers if tracker not in found_tracker_list]
         for tracker in not_found_tracker_list:
             if self.session.lm.tracker_manager is not None:
                 self.session.lm.tracker_manager.add_tracker(tracker)
@@ -641,15 +810,18 @@ class TorrentDBHandler(BasicDBHandler):
         # update torrent-tracker mapping
         sql = 'INSERT OR IGNORE INTO TorrentTrackerMapping(torrent_id, tracker_id)'\
             + ' VALUES(?, (SELECT tracker_id FROM TrackerInfo WHERE tracker = ?))'
-        new_mapping_list = [(torrent_id, tracker) for tracker in tracker_list]
-        if new_mapping_list:
-            self._db.executemany(sql, new_mapping_list)
+        new_mapping_list = [(torrent_id, tracker) for torrent_id, _, tracker_list in torrent_trackers
+                            for tracker in tracker_list]
+        self._db.executemany(sql, new_mapping_list)
 
         # add trackers into the torrent file if it has been collected
         if not self.session.config.get_torrent_store_enabled() or self.session.lm.torrent_store is None:
             return
 
-        infohash = self.getInfohash(torrent_id)
+        for torrent_id, infohash, tracker_list in torrent_trackers:
+            self._addTrackersToCollectedTorrent(infohash or self.getInfohash(torrent_id), tracker_list)
+
+    def _addTrackersToCollectedTorrent(self, infohash, tracker_list):
         if infohash and self.session.has_collected_torrent(infohash):
             torrent_data = self.session.get_collected_torrent(infohash)
 
@@ -697,6 +869,26 @@ class TorrentDBHandler(BasicDBHandler):
         tracker_list = self._db.fetchall(sql, (torrent_id,))
         return [tracker[0] for tracker in tracker_list]
 
+    def getTrackersOfTorrents(self, infohashes, checked_before=None):
+        """
+        Return a dictionary mapping each tracker to the list of the given infohashes that are on that tracker.
+        :param checked_before: if given, only the torrents that have last been checked before this time are included
+        """
+        result = {}
+        infohashes = list(set(infohashes))
+        # Stay well below the maximum number of host parameters of SQLite
+        for start in xrange(0, len(infohashes), 500):
+            chunk = [bin2str(infohash) for infohash in infohashes[start:start + 500]]
+            sql = u"SELECT T.infohash, TR.tracker FROM Torrent T, TorrentTrackerMapping MP, TrackerInfo TR" \
+                  u" WHERE T.infohash IN (%s) AND MP.torrent_id = T.torrent_id AND TR.tracker_id = MP.tracker_id" \
+                  % u",".join(u"?" * len(chunk))
+            if checked_before is not None:
+                sql += u" AND T.last_tracker_check < ?"
+                chunk.append(checked_before)
+            for infohash, tracker in self._db.fetchall(sql, chunk):
+                result.setdefault(tracker, []).append(str2bin(infohash))
+        return result
+
     def getTrackerListByInfohash(self, infohash):
         torrent_id = self.getTorrentID(infohash)
         return self.getTrackerListByTorrentID(torrent_id)
@@ -1061,9 +1253,72 @@ class TorrentDBHandler(BasicDBHandler):
 
         return results
 
-    def getAutoCompleteTerms(self, keyword, max_terms, limit=100):
-        sql = "SELECT swarmname FROM FullTextIndex WHERE swarmname MATCH ? LIMIT ?"
-        result = self._db.fetchall(sql, ('"%s*"' % keyword, limit))
+    def build_term_index(self):
+        """
+        Start building the index of the terms in the swarm names from the full text index. The swarm names are added in
+        chunks, one chunk per reactor iteration, so the reactor is not blocked by a large database.
+        Returns a Deferred that fires when the index is ready.
+        """
+        self.term_index = None
+        self.partial_term_index = TermIndex()
+        self.partial_term_index_rowid = 0
+        return self.register_task(u"build term index", LoopingCall(self._index_terms)).start(0, now=True)
+
+    def _index_terms(self):
+        """
+        Add the next chunk of swarm names to the partial term index, and publish the index when all have been added.
+        """
+        rows = self._db.fetchall(u"SELECT rowid, swarmname FROM FullTextIndex WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                                 (self.partial_term_index_rowid, TERM_INDEX_CHUNK_SIZE))
+        for rowid, swarm_keywords in rows:
+            if swarm_keywords:
+                self.partial_term_index.add(swarm_keywords.split())
+            self.partial_term_index_rowid = rowid
+
+        if len(rows) < TERM_INDEX_CHUNK_SIZE:
+            self.term_index = self.partial_term_index
+            self.partial_term_index = None
+            self.cancel_pending_task(u"build term index")
+            self._logger.info(u"Indexed %d terms for autocompletion", len(self.term_index))
+
+    def _get_term_index_of(self, torrent_id):
+        """
+        Return the term index that a change to the swarm name of a torrent should be applied to. While the index is
+        being built, swarm names that have not been added yet are picked up by the next chunks instead.
+        """
+        if self.term_index is not None:
+            return self.term_index
+        if self.partial_term_index is not None and torrent_id <= self.partial_term_index_rowid:
+            return self.partial_term_index
+        return None
+
+    def get_term_index(self):
+        """
+        Return the index of the terms in the swarm names, which is kept up to date when torrents are indexed, or None
+        if it is still being built.
+        """
+        return self.term_index
+
+    def getAutoCompleteTerms(self, keyword, max_terms):
+        """
+        Return completions of the last word of keyword, prepended with the words before it. While the term index is
+        being built, the completions are looked up in the full text index instead.
+        """
+        term_index = self.get_term_index()
+        if term_index is None:
+            return self._get_full_text_completions(keyword, max_terms)
+
+        prefix, _, last_keyword = keyword.lower().rpartition(u" ")
+        if not last_keyword:
+            return []
+        completions = term_index.get_completions(last_keyword, max_terms)
+        if prefix:
+            return [u"%s %s" % (prefix, completion) for completion in completions]
+        return completions
+
+    def _get_full_text_completions(self, keyword, max_terms, limit=100):
+        sql = u"SELECT swarmname FROM FullTextIndex WHERE swarmname MATCH ? LIMIT ?"
+        result = self._db.fetchall(sql, (u'"%s*"' % keyword, limit))
 
         all_terms = set()
         for line, in result:
@@ -1073,55 +1328,33 @@ class TorrentDBHandler(BasicDBHandler):
             i2 = line.find(' ', i1 + len(keyword))
             all_terms.add(line[i1:i2] if i2 >= 0 else line[i1:])
 
-        if keyword in all_terms:
-            all_terms.remove(keyword)
-        if '' in all_terms:
-            all_terms.remove('')
-
+        all_terms.discard(keyword)
+        all_terms.discard('')
         return list(all_terms)
 
     def getSearchSuggestion(self, keywords, limit=1):
         match = [keyword.lower() for keyword in keywords if len(keyword) > 3]
+        if not match:
+            return []
 
-        def lev(a, b):
-            "Calculates the Levenshtein distance between a and b."
-            n, m = len(a), len(b)
-            if n > m:
-                # Make sure n <= m, to use O(min(n,m)) space
-                a, b = b, a
-                n, m = m, n
-
-            current = range(n + 1)
-            for i in range(1, m + 1):
-                previous, current = current, [i] + [0] * n
-                for j in range(1, n + 1):
-                    add, delete = previous[j] + 1, current[j - 1] + 1
-                    change = previous[j - 1]
-                    if a[j - 1] != b[i - 1]:
-                        change = change + 1
-                    current[j] = min(add, delete, change)
-
-            return current[n]
-
-        def levcollate(s1, s2):
-            l1 = sum(sorted([lev(a, b) for a in s1.split() for b in match])[:len(match)])
-            l2 = sum(sorted([lev(a, b) for a in s2.split() for b in match])[:len(match)])
-
-            # return -1 if s1<s2, +1 if s1>s2 else 0
-            if l1 < l2:
-                return -1
-            if l1 > l2:
-                return 1
-            return 0
+        # Look up the terms that are close to the keywords in the term index, so that only the swarm names with those
+        # terms have to be compared with the keywords
+        term_index = self.get_term_index()
+        if term_index is None:
+            return []
+        terms = set()
+        for keyword in match:
+            terms.update(term for _, term in term_index.get_similar_terms(keyword))
+            terms.update(term_index.get_completions(keyword, MAX_SUGGESTION_COMPLETIONS))
+        if not terms:
+            return []
 
-        cursor = self._db.get_cursor()
-        connection = cursor.getconnection()
-        connection.createcollation("leven", levcollate)
+        def levscore(swarmname):
+            return sum(sorted([levenshtein(a, b) for a in swarmname.split() for b in match])[:len(match)])
 
-        sql = "SELECT swarmname FROM FullTextIndex WHERE swarmname MATCH ? ORDER By swarmname collate leven ASC LIMIT ?"
-        results = self._db.fetchall(sql, (' OR '.join(['*%s*' % m for m in match]), limit))
-        connection.createcollation("leven", None)
-        return [result[0] for result in results]
+        sql = u"SELECT swarmname FROM FullTextIndex WHERE swarmname MATCH ? LIMIT ?"
+        results = self._db.fetchall(sql, (u' OR '.join(u'"%s"' % term for term in terms), MAX_SUGGESTION_CANDIDATES))
+        return sorted((result[0] for result in results), key=levscore)[:limit]
 
 
 class MyPreferenceDBHandler(BasicDBHandler):
@@ -1480,30 +1713,31 @@ ORDER BY CMD.time_stamp DESC LIMIT ?;
         torrent_ids, inserted = self.torrent_db.addOrGetTorrentIDSReturn(infohashes)
 
         insert_data = []
+        torrents_to_add = OrderedDict()
         updated_channels = {}
 
-        for i, torrent in enumerate(torrentlist):
+        for torrent, torrent_id in zip(torrentlist, torrent_ids):
             channel_id, dispersy_id, peer_id, infohash, timestamp, name, files, trackers = torrent
-            torrent_id = torrent_ids[i]
 
             # if new or not yet collected
             if infohash in inserted:
-                self.torrent_db.addExternalTorrentNoDef(
-                    infohash, name, files, trackers, timestamp, {'dispersy_id': dispersy_id})
+                torrents_to_add[infohash] = (torrent_id, infohash, name, files, trackers, timestamp)
 
             insert_data.append((dispersy_id, torrent_id, channel_id, peer_id, name, timestamp))
             updated_channels[channel_id] = updated_channels.get(channel_id, 0) + 1
 
+        self.torrent_db.addExternalTorrentsNoDef(torrents_to_add.values())
+
         if len(insert_data) > 0:
             sql_insert_torrent = "INSERT INTO _ChannelTorrents (dispersy_id, torrent_id, channel_id, peer_id, name, time_stamp) VALUES (?,?,?,?,?,?)"
             self._db.executemany(sql_insert_torrent, insert_data)
 
+        channel_torrent_ids = self.get_channel_torrent_ids(set(torrent_ids))
         updated_channel_torrent_dict = defaultdict(list)
-        for torrent in torrentlist:
-            channel_id, dispersy_id, peer_id, infohash, timestamp, name, files, trackers = torrent
-            channel_torrent_id = self.get_channel_torrent_id(channel_id, infohash)
-            updated_channel_torrent_dict[channel_id].append({u'info_hash': infohash,
-                                                             u'channel_torrent_id': channel_torrent_id})
+        for torrent, torrent_id in zip(torrentlist, torrent_ids):
+            channel_id, _, _, infohash = torrent[:4]
+            updated_channel_torrent_dict[channel_id].append(
+                {u'info_hash': infohash, u'channel_torrent_id': channel_torrent_ids.get((channel_id, torrent_id))})
 
         sql_update_channel = "UPDATE _Channels SET modified = strftime('%s','now'), nr_torrents = nr_torrents+? WHERE id = ?"
         update_channels = [(new_torrents, channel_id) for channel_id, new_torrents in updated_channels.iteritems()]
@@ -1569,6 +1803,26 @@ ORDER BY CMD.time_stamp DESC LIMIT ?;
             channeltorrent_id = self._db.fetchone(sql, (torrent_id, channel_id))
             return channeltorrent_id
 
+    def get_channel_torrent_ids(self, torrent_ids):
+        """
+        Return a dictionary of (channel_id, torrent_id) -> the id of the channel torrent, for the channel torrents of
+        all channels with one of the given torrent ids.
+        """
+        if not torrent_ids:
+            return {}
+
+        result = {}
+        torrent_ids = list(torrent_ids)
+        # Stay well below the maximum number of host parameters of SQLite
+        for start in xrange(0, len(torrent_ids), 500):
+            chunk = torrent_ids[start:start + 500]
+            sql = u"SELECT channel_id, torrent_id, id FROM ChannelTorrents WHERE torrent_id IN (%s) ORDER BY id DESC" \
+                % u", ".join(u'?' * len(chunk))
+            # When a torrent is in a channel more than once, the first channel torrent is returned
+            for channel_id, torrent_id, channeltorrent_id in self._db.fetchall(sql, chunk):
+                result[(channel_id, torrent_id)] = channeltorrent_id
+        return result
+
     def hasTorrent(self, channel_id, infohash):
         return True if self.get_channel_torrent_id(channel_id, infohash) else False
 
@@ -1944,12 +2198,44 @@ ORDER BY CMD.time_stamp DESC LIMIT ?;
     def get_random_channel_torrents(self, keys, limit=10):
         """
         Return some random (channel) torrents from the database.
+
+        Instead of ordering the whole join of the channel torrents and the torrents by RANDOM(), random ids between
+        the lowest and the highest channel torrent id are looked up by primary key. Some ids belong to deleted
+        channel torrents or to torrents without a name, so more ids than needed are looked up, in a few rounds. If
+        the ids are very sparse, fewer than limit torrents may be returned.
         """
-        sql = "SELECT %s FROM ChannelTorrents, Torrent " \
+        # Separate subqueries, as SQLite only looks up a single MIN or MAX in the index
+        min_id, max_id = self._db.fetchone("SELECT (SELECT MIN(id) FROM _ChannelTorrents),"
+                                           " (SELECT MAX(id) FROM _ChannelTorrents)")
+        if min_id is None:
+            return []
+
+        sql = "SELECT ChannelTorrents.id, %s FROM ChannelTorrents, Torrent " \
               "WHERE ChannelTorrents.torrent_id = Torrent.torrent_id AND Torrent.name IS NOT NULL " \
-              "ORDER BY RANDOM() LIMIT ?" % ", ".join(keys)
-        results = self._db.fetchall(sql, (limit,))
-        return self.__fixTorrents(keys, results)
+              "AND ChannelTorrents.id " % ", ".join(keys)
+        results = {}
+        if max_id - min_id < limit * RANDOM_SAMPLE_FACTOR * RANDOM_SAMPLE_ROUNDS:
+            # Looking up all ids of a small table takes fewer queries than sampling
+            for result in self._db.fetchall(sql + "BETWEEN ? AND ?", (min_id, max_id)):
+                results[result[0]] = result[1:]
+        else:
+            sampled_ids = set()
+            for _ in xrange(RANDOM_SAMPLE_ROUNDS):
+                channeltorrent_ids = set(random.randint(min_id, max_id)
+                                         for _ in xrange((limit - len(results)) * RANDOM_SAMPLE_FACTOR))
+                channeltorrent_ids = list(channeltorrent_ids - sampled_ids)
+                sampled_ids.update(channeltorrent_ids)
+                # Stay below the maximum number of parameters of a single statement
+                for index in xrange(0, len(channeltorrent_ids), 500):
+                    ids_batch = channeltorrent_ids[index:index + 500]
+                    for result in self._db.fetchall(sql + "IN (%s)" % ",".join("?" * len(ids_batch)), ids_batch):
+                        results[result[0]] = result[1:]
+                if len(results) >= limit:
+                    break
+
+        results = results.values()
+        random.shuffle(results)
+        return self.__fixTorrents(keys, results[:limit])
 
     def getTorrentFromChannelTorrentId(self, channeltorrent_id, keys):
         sql = "SELECT " + ", ".join(keys) + """ FROM Torrent, ChannelTorrents
@@ -102,6 +102,10 @@ directory = string(default='')
 enabled = boolean(default=False)
 port = integer(min=-1, max=65536, default=-1)
 
+[reactor_lag_monitor]
+enabled = boolean(default=False)
+threshold = float(min=0, default=0.1)
+
 [credit_mining]
 enabled = boolean(default=False)
 max_torrents_per_source = integer(default=20)
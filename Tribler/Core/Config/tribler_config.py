@@ -246,6 +246,20 @@ class TriblerConfig(object):
     def get_http_api_port(self):
         return self._obtain_port('http_api', 'port')
 
+    # Reactor lag monitor
+
+    def set_reactor_lag_monitor_enabled(self, value):
+        self.config['reactor_lag_monitor']['enabled'] = value
+
+    def get_reactor_lag_monitor_enabled(self):
+        return self.config['reactor_lag_monitor']['enabled']
+
+    def set_reactor_lag_monitor_threshold(self, value):
+        self.config['reactor_lag_monitor']['threshold'] = value
+
+    def get_reactor_lag_monitor_threshold(self):
+        return self.config['reactor_lag_monitor']['threshold']
+
     # Dispersy
 
     def set_dispersy_enabled(self, value):
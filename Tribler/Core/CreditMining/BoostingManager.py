@@ -258,7 +258,8 @@ class BoostingManager(TaskManager):
 
     def scrape_trackers(self):
         """
-        Manually scrape tracker by requesting to tracker manager
+        Manually scrape tracker by requesting to tracker manager. All torrents are checked in a single batch, which
+        scrapes every tracker with as few multi-infohash scrape requests as possible.
         """
 
         for infohash in list(self.torrents):
@@ -280,8 +281,9 @@ class BoostingManager(TaskManager):
 
             self._logger.debug("Seeder/leecher data translated from peers : seeder %s, leecher %s", num_seed, num_leech)
 
-            # check health(seeder/leecher)
-            self.session.lm.torrent_checker.add_gui_request(infohash, True)
+        # check health(seeder/leecher), the results come in through on_torrent_notify
+        if self.torrents:
+            return self.session.lm.torrent_checker.check_torrents(list(self.torrents))
 
     def set_archive(self, source, enable):
         """
@@ -12,8 +12,13 @@ class BoostingPolicy(object):
     Base class for determining what swarm selection policy will be applied
     """
 
-    def __init__(self, session):
+    def __init__(self, session, random_generator=None):
+        """
+        :param session: the session of which the downloads are boosted
+        :param random_generator: the random.Random used by the random policy, by default the global one
+        """
         self.session = session
+        self.random = random_generator or random
         # function that checks if key can be applied to torrent
         self.reverse = None
 
@@ -47,7 +52,7 @@ class BoostingPolicy(object):
                                                        torrents_start) < max_active / 2)):
             self._logger.error("Start and stop torrent list are empty. Fallback to Random")
             # fallback to random policy
-            torrents_start, torrents_stop = RandomPolicy(self.session).apply(torrents, max_active)
+            torrents_start, torrents_stop = RandomPolicy(self.session, self.random).apply(torrents, max_active)
 
         return torrents_start, torrents_stop
 
@@ -68,15 +73,15 @@ class RandomPolicy(BoostingPolicy):
     """
     A credit mining policy that chooses a swarm randomly
     """
-    def __init__(self, session):
-        BoostingPolicy.__init__(self, session)
+    def __init__(self, session, random_generator=None):
+        BoostingPolicy.__init__(self, session, random_generator)
         self.reverse = False
 
     def key_check(self, key):
         return True
 
     def key(self, key):
-        return random.random()
+        return self.random.random()
 
 
 class CreationDatePolicy(BoostingPolicy):
@@ -85,8 +90,8 @@ class CreationDatePolicy(BoostingPolicy):
 
     The idea is, older swarms need to be boosted.
     """
-    def __init__(self, session):
-        BoostingPolicy.__init__(self, session)
+    def __init__(self, session, random_generator=None):
+        BoostingPolicy.__init__(self, session, random_generator)
         self.reverse = True
 
     def key_check(self, key):
@@ -100,8 +105,8 @@ class SeederRatioPolicy(BoostingPolicy):
     """
     Default policy. Find the most underseeded swarm to boost.
     """
-    def __init__(self, session):
-        BoostingPolicy.__init__(self, session)
+    def __init__(self, session, random_generator=None):
+        BoostingPolicy.__init__(self, session, random_generator)
         self.reverse = False
 
     def key(self, key):
@@ -0,0 +1,200 @@
+"""
+Offline simulator of the credit mining policies.
+
+Replays recorded swarm traces through the boosting policies, the same way the BoostingManager applies them to a live
+session, and reports how much upload a policy earns per GB of disk it uses. The simulation is deterministic, so
+policies and settings can be compared on the same traces.
+
+A trace file is a JSON list of swarms:
+
+    [{"infohash": "<hex>", "size": <bytes>, "creation_date": <timestamp>,
+      "samples": [[<time>, <seeders>, <leechers>, <upload rate of a boosting peer in bytes/s>], ...]}, ...]
+
+Run it with: python -m Tribler.Core.CreditMining.policy_simulator <trace file> --policy seederratio
+"""
+import argparse
+import json
+import logging
+import random
+from binascii import unhexlify
+from bisect import bisect_right
+
+from Tribler.Core.CreditMining.BoostingPolicy import CreationDatePolicy, RandomPolicy, SeederRatioPolicy
+
+POLICIES = {"random": RandomPolicy, "creation": CreationDatePolicy, "seederratio": SeederRatioPolicy}
+GB = 1024 ** 3
+
+
+class SwarmTrace(object):
+    """
+    The recorded health and upload rate of a swarm over time. The samples are step functions: a sample holds until
+    the next sample. The trace also serves as the metainfo of the simulated torrent.
+    """
+
+    def __init__(self, infohash, size, creation_date, samples):
+        self.infohash = infohash
+        self.size = size
+        self.creation_date = creation_date
+        self.samples = sorted(tuple(sample) for sample in samples)
+        self.times = [sample[0] for sample in self.samples]
+
+    def get_infohash(self):
+        return self.infohash
+
+    @property
+    def start_time(self):
+        return self.times[0] if self.times else None
+
+    @property
+    def end_time(self):
+        return self.times[-1] if self.times else None
+
+    def sample_at(self, time):
+        """
+        Return the (time, seeders, leechers, upload rate) sample that holds at the given time, or None when the swarm
+        has not been seen yet.
+        """
+        index = bisect_right(self.times, time) - 1
+        return self.samples[index] if index >= 0 else None
+
+    def upload_between(self, start_time, end_time):
+        """
+        Return the number of bytes a boosting peer uploads in this swarm between the given times.
+        """
+        uploaded = 0
+        index = max(bisect_right(self.times, start_time) - 1, 0)
+        while index < len(self.samples) and self.times[index] < end_time:
+            sample_start = max(self.times[index], start_time)
+            sample_end = min(self.times[index + 1], end_time) if index + 1 < len(self.samples) else end_time
+            if sample_end > sample_start:
+                uploaded += self.samples[index][3] * (sample_end - sample_start)
+            index += 1
+        return uploaded
+
+
+class SimulatedSession(object):
+    """
+    The part of the Tribler session that the boosting policies use.
+    """
+
+    def __init__(self):
+        self.downloads = {}  # Dictionary of infohash -> torrent that is being boosted
+
+    def get_download(self, infohash):
+        return self.downloads.get(infohash, None)
+
+
+class PolicySimulator(object):
+    """
+    Replays swarm traces through a boosting policy.
+    """
+
+    def __init__(self, traces, policy_class, max_torrents_active=20, swarm_interval=100, seed=0, force=False):
+        """
+        :param traces: the SwarmTraces to replay
+        :param policy_class: the BoostingPolicy subclass to simulate
+        :param max_torrents_active: the maximum number of torrents that are boosted at the same time
+        :param swarm_interval: the number of seconds between two applications of the policy
+        :param seed: the seed of the random generator, used by the random policy and its fallbacks
+        :param force: whether the policy is applied without falling back to the random policy, which the
+        BoostingManager does when a policy neither starts nor stops torrents
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.traces = traces
+        self.policy_class = policy_class
+        self.max_torrents_active = max_torrents_active
+        self.swarm_interval = swarm_interval
+        self.seed = seed
+        self.force = force
+        self.random = None
+
+    def run(self, start_time=None, end_time=None):
+        """
+        Run the simulation from start_time to end_time, by default over the whole traces.
+        :return: a dictionary with the upload, the disk usage and the number of started torrents
+        """
+        traces = [trace for trace in self.traces if trace.samples]
+        if start_time is None:
+            start_time = min(trace.start_time for trace in traces) if traces else 0
+        if end_time is None:
+            end_time = max(trace.end_time for trace in traces) if traces else 0
+
+        # Every run draws the same random numbers, without touching the state of the global random generator
+        self.random = random.Random(self.seed)
+        session = SimulatedSession()
+        policy = self.policy_class(session, self.random)
+        torrents = {}
+
+        uploaded = 0
+        disk_seconds = 0
+        peak_disk = 0
+        num_started = 0
+        current_time = start_time
+        while current_time < end_time:
+            # Update the health of the torrents, like the tracker scrapes do
+            for trace in traces:
+                sample = trace.sample_at(current_time)
+                if sample:
+                    torrent = torrents.setdefault(trace.infohash, {"metainfo": trace,
+                                                                   "creation_date": trace.creation_date})
+                    torrent["num_seeders"], torrent["num_leechers"] = sample[1], sample[2]
+
+            if torrents:
+                torrents_start, torrents_stop = policy.apply(torrents, self.max_torrents_active, self.force)
+                for torrent in torrents_stop:
+                    session.downloads.pop(torrent["metainfo"].get_infohash(), None)
+                for torrent in torrents_start:
+                    session.downloads[torrent["metainfo"].get_infohash()] = torrent
+                num_started += len(torrents_start)
+
+            step = min(self.swarm_interval, end_time - current_time)
+            disk = sum(torrent["metainfo"].size for torrent in session.downloads.itervalues())
+            peak_disk = max(peak_disk, disk)
+            disk_seconds += disk * step
+            for torrent in session.downloads.itervalues():
+                uploaded += torrent["metainfo"].upload_between(current_time, current_time + step)
+            current_time += step
+
+        duration = end_time - start_time
+        average_disk = disk_seconds / float(duration) if duration > 0 else 0
+        return {"policy": self.policy_class.__name__,
+                "duration": duration,
+                "uploaded": uploaded,
+                "started": num_started,
+                "peak_disk": peak_disk,
+                "average_disk": average_disk,
+                "upload_per_gb": uploaded / (peak_disk / float(GB)) if peak_disk else 0,
+                "upload_per_average_gb": uploaded / (average_disk / float(GB)) if average_disk else 0}
+
+
+def load_traces(filename):
+    """
+    Load the swarm traces from a JSON trace file.
+    """
+    with open(filename) as trace_file:
+        return [SwarmTrace(unhexlify(swarm["infohash"]), swarm["size"], swarm.get("creation_date", 0),
+                           swarm["samples"]) for swarm in json.load(trace_file)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('traces', help='the JSON file with the swarm traces')
+    parser.add_argument('--policy', choices=sorted(POLICIES), action='append',
+                        help='the policy to simulate, can be given multiple times (default: all policies)')
+    parser.add_argument('--max-active', type=int, default=20, help='the maximum number of boosted torrents')
+    parser.add_argument('--interval', type=int, default=100, help='the number of seconds between policy rounds')
+    parser.add_argument('--seed', type=int, default=0, help='the seed of the random generator')
+    parser.add_argument('--force', action='store_true', help='never fall back to the random policy')
+    args = parser.parse_args()
+
+    traces = load_traces(args.traces)
+    for policy_name in args.policy or sorted(POLICIES):
+        result = PolicySimulator(traces, POLICIES[policy_name], args.max_active, args.interval, args.seed,
+                                 args.force).run()
+        print "%-12s uploaded %.2f GB, peak disk %.2f GB, %.2f GB uploaded per GB of disk, %d torrents started" % \
+            (policy_name, result["uploaded"] / float(GB), result["peak_disk"] / float(GB), result["upload_per_gb"] / GB,
+             result["started"])
+
+
+if __name__ == '__main__':
+    main()
@@ -32,6 +32,8 @@ from Tribler.Core.simpledefs import (DLSTATUS_WAITING4HASHCHECK, DLSTATUS_HASHCH
                                      UPLOAD, DOWNLOAD, DLMODE_NORMAL, PERSISTENTSTATE_CURRENTVERSION, dlstatus_strings)
 from Tribler.dispersy.taskmanager import TaskManager
 
+PEER_INFO_MAX_AGE = 1  # The number of seconds that the peers of a download are reused, one tick of the alert loop
+
 if sys.platform == "win32":
     try:
         import ctypes
@@ -142,6 +144,10 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
         self.pause_after_next_hashcheck = False
         self.checkpoint_after_next_hashcheck = False
         self.tracker_status = {}  # {url: [num_peers, status_str]}
+        # The torrent status of the last state update of libtorrent, and the peers of the download at that time
+        self.lt_status = None
+        self.peer_info = None
+        self.peer_info_time = 0
 
         self.prebuffsize = 5 * 1024 * 1024
         self.endbuffsize = 0
@@ -680,9 +686,24 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
                 self.set_byte_priority([(self.get_vod_fileindex(), 0, -1)], 1)
                 self.endbuffsize = 0
 
-    def update_lt_stats(self):
-        """ Update libtorrent stats and check if the download should be stopped."""
-        status = self.handle.status()
+    @checkHandleAndSynchronize()
+    def process_state_update(self, status):
+        """
+        Process the torrent status of this download from a state update alert.
+        """
+        self.update_lt_stats(status)
+
+    def update_lt_stats(self, status=None):
+        """
+        Update libtorrent stats and check if the download should be stopped.
+        :param status: the torrent status from a state update alert, or None to query the status of the handle
+        """
+        if status is None:
+            status = self.handle.status()
+        self.lt_status = status
+        # The peers are only fetched again when they are asked for after this status update
+        self.peer_info = None
+
         self.dlstate = self.dlstates[status.state] if not status.paused else DLSTATUS_STOPPED
         self.dlstate = DLSTATUS_STOPPED_ON_ERROR if self.dlstate == DLSTATUS_STOPPED and status.error else self.dlstate
         if self.get_mode() == DLMODE_VOD:
@@ -740,11 +761,12 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
 
             filepriorities = []
             torrent_storage = get_info_from_handle(self.handle).files()
+            selected_files_set = set(selected_files)
 
             for index, orig_path in enumerate(self.orig_files):
                 filename = orig_path[len(swarmname) + 1:] if swarmname else orig_path
 
-                if filename in selected_files or not selected_files:
+                if filename in selected_files_set or not selected_files:
                     filepriorities.append(1)
                     new_path = orig_path
                 else:
@@ -893,9 +915,26 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
 
         return (self.dlstate, stats, seeding_stats, logmsgs)
 
+    def get_lt_status(self):
+        """
+        Return the torrent status of the last state update, or query the handle if there has not been one yet.
+        """
+        return self.lt_status or self.handle.status()
+
+    def get_peer_info(self):
+        """
+        Return the peers of the download. They are fetched from libtorrent at most once per state update, and at
+        least once every PEER_INFO_MAX_AGE seconds, since the peers may change while the status of the torrent does not.
+        """
+        with self.dllock:
+            if self.peer_info is None or time.time() - self.peer_info_time >= PEER_INFO_MAX_AGE:
+                self.peer_info = self.handle.get_peer_info()
+                self.peer_info_time = time.time()
+            return self.peer_info
+
     @checkHandleAndSynchronize()
     def network_create_statistics_reponse(self):
-        status = self.handle.status()
+        status = self.get_lt_status()
         numTotSeeds = status.num_complete if status.num_complete >= 0 else status.list_seeds
         numTotPeers = status.num_incomplete if status.num_incomplete >= 0 else status.list_peers
         numleech = max(status.num_peers - status.num_seeds, 0)  # When anon downloading, this might become negative
@@ -962,9 +1001,7 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
 
     def network_create_spew_from_peerlist(self):
         plist = []
-        with self.dllock:
-            peer_infos = self.handle.get_peer_info()
-        for peer_info in peer_infos:
+        for peer_info in self.get_peer_info():
             # Only consider fully connected peers.
             # Disabling for now, to avoid presenting the user with conflicting information
             # (partially connected peers are included in seeder/leecher stats).
@@ -989,7 +1026,7 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
 
         # Count DHT and PeX peers
         dht_peers = pex_peers = 0
-        for peer_info in self.handle.get_peer_info():
+        for peer_info in self.get_peer_info():
             if peer_info.source & peer_info.dht:
                 dht_peers += 1
             if peer_info.source & peer_info.pex:
@@ -1069,6 +1106,7 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
                 if removestate:
                     self.ltmgr.remove_torrent(self, removecontent)
                     self.handle = None
+                    self.lt_status = self.peer_info = None
                 else:
                     self.set_vod_mode(False)
                     self.handle.pause()
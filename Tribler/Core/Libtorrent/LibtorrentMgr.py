@@ -9,8 +9,8 @@ import os
 import random
 import tempfile
 import threading
-import time
 from binascii import hexlify
+from collections import OrderedDict
 from copy import deepcopy
 from shutil import rmtree
 from urllib import url2pathname
@@ -21,6 +21,7 @@ from twisted.internet.defer import succeed, fail
 from twisted.python.failure import Failure
 
 from Tribler.Core.DownloadConfig import DefaultDownloadStartupConfig
+from Tribler.Core.Libtorrent.metainfo_cache import MetainfoCache
 from Tribler.Core.TorrentDef import TorrentDef, TorrentDefNoMetainfo
 from Tribler.Core.Utilities.torrent_utils import get_info_from_handle
 from Tribler.Core.Utilities.utilities import parse_magnetlink, fix_torrent
@@ -32,7 +33,7 @@ from Tribler.dispersy.taskmanager import LoopingCall, TaskManager
 from Tribler.dispersy.util import blocking_call_on_reactor_thread, call_on_reactor_thread
 
 LTSTATE_FILENAME = "lt.state"
-METAINFO_CACHE_PERIOD = 5 * 60
+MAX_METAINFO_REQUESTS = 50  # The maximum number of metainfo requests that have a torrent handle at the same time
 DHT_CHECK_RETRIES = 1
 
 
@@ -44,6 +45,7 @@ class LibtorrentMgr(TaskManager):
 
         self.tribler_session = tribler_session
         self.ltsessions = {}
+        self.session_lock = threading.RLock()
 
         self.notifier = tribler_session.notifier
 
@@ -58,8 +60,10 @@ class LibtorrentMgr(TaskManager):
 
         self.metadata_tmpdir = None
         self.metainfo_requests = {}
+        self.metainfo_queue = OrderedDict()  # The metainfo requests that wait for a torrent handle, oldest first
         self.metainfo_lock = threading.RLock()
-        self.metainfo_cache = {}
+        self.metainfo_cache = MetainfoCache()
+        self.metainfo_store_hits = 0
 
         self.process_alerts_lc = self.register_task("process_alerts", LoopingCall(self._task_process_alerts))
         self.check_reachability_lc = self.register_task("check_reachability", LoopingCall(self._check_reachability))
@@ -140,8 +144,8 @@ class LibtorrentMgr(TaskManager):
             ltsession.add_extension(lt.create_smart_ban_plugin)
 
         ltsession.set_settings(settings)
-        ltsession.set_alert_mask(lt.alert.category_t.stats_notification |
-                                 lt.alert.category_t.error_notification |
+        # The status of the torrents is polled with post_torrent_updates, instead of a stats alert per torrent
+        ltsession.set_alert_mask(lt.alert.category_t.error_notification |
                                  lt.alert.category_t.status_notification |
                                  lt.alert.category_t.storage_notification |
                                  lt.alert.category_t.performance_warning |
@@ -161,7 +165,7 @@ class LibtorrentMgr(TaskManager):
             listen_port = self.tribler_session.config.get_libtorrent_port()
             ltsession.listen_on(listen_port, listen_port + 10)
             if listen_port != ltsession.listen_port():
-                self.tribler_session.config.set_libtorrent_port_runtime(ltsession.listen_port())
+                self._set_libtorrent_port_runtime(ltsession.listen_port())
             try:
                 lt_state = lt.bdecode(
                     open(os.path.join(self.tribler_session.config.get_state_dir(), LTSTATE_FILENAME)).read())
@@ -191,10 +195,16 @@ class LibtorrentMgr(TaskManager):
         return ltsession
 
     def get_session(self, hops=0):
-        if hops not in self.ltsessions:
-            self.ltsessions[hops] = self.create_session(hops)
+        # The first session is created on the thread pool during startup, while the reactor may ask for it as well
+        with self.session_lock:
+            if hops not in self.ltsessions:
+                self.ltsessions[hops] = self.create_session(hops)
 
-        return self.ltsessions[hops]
+            return self.ltsessions[hops]
+
+    @call_on_reactor_thread
+    def _set_libtorrent_port_runtime(self, port):
+        self.tribler_session.config.set_libtorrent_port_runtime(port)
 
     def set_proxy_settings(self, ltsession, ptype, server=None, auth=None):
         proxy_settings = lt.proxy_settings()
@@ -276,6 +286,8 @@ class LibtorrentMgr(TaskManager):
                 request_handle = self.metainfo_requests.pop(infohash)['handle']
                 if request_handle:
                     ltsession.remove_torrent(request_handle, 0)
+                self._start_queued_metainfo_requests()
+            self.metainfo_queue.pop(infohash, None)
 
             torrent_handle = ltsession.add_torrent(encode_atp(atp))
             infohash = str(torrent_handle.info_hash())
@@ -318,6 +330,10 @@ class LibtorrentMgr(TaskManager):
 
     def process_alert(self, alert):
         alert_type = str(type(alert)).split("'")[1].split(".")[-1]
+        if alert_type == 'state_update_alert':
+            self.process_state_update_alert(alert)
+            return
+
         handle = getattr(alert, 'handle', None)
         if handle:
             if handle.is_valid():
@@ -332,7 +348,25 @@ class LibtorrentMgr(TaskManager):
             else:
                 self._logger.debug("Alert for invalid torrent")
 
-    def get_metainfo(self, infohash_or_magnet, callback, timeout=30, timeout_callback=None, notify=True):
+    def process_state_update_alert(self, alert):
+        """
+        Pass the status of every torrent that has changed since the previous state update to its download.
+        """
+        for status in alert.status:
+            infohash = str(status.info_hash)
+            if infohash in self.torrents:
+                self.torrents[infohash][0].process_state_update(status)
+
+    def get_metainfo(self, infohash_or_magnet, callback, timeout=30, timeout_callback=None, notify=True,
+                     use_store=True):
+        """
+        Fetch the metainfo of a torrent from the DHT and call the callback with it, or call the timeout callback with
+        the infohash when it has not been found within timeout seconds.
+
+        The metainfo that has been fetched recently is served from the cache. Otherwise, if use_store is True, the
+        metainfo is served from the torrent store, without the peers, seeders and leechers of the swarm. At most
+        MAX_METAINFO_REQUESTS requests have a torrent handle at the same time, other requests are queued.
+        """
         if not self.is_dht_ready() and timeout > 5:
             self._logger.info("DHT not ready, rescheduling get_metainfo")
 
@@ -340,7 +374,8 @@ class LibtorrentMgr(TaskManager):
                 random_id = ''.join(random.choice('0123456789abcdef') for _ in xrange(30))
                 self.register_task("schedule_metainfo_lookup_%s" % random_id,
                                    reactor.callLater(5, lambda i=infohash_or_magnet, c=callback, t=timeout - 5,
-                                                  tcb=timeout_callback, n=notify: self.get_metainfo(i, c, t, tcb, n)))
+                                                  tcb=timeout_callback, n=notify, s=use_store:
+                                                  self.get_metainfo(i, c, t, tcb, n, s)))
 
             reactor.callFromThread(schedule_call)
             return
@@ -355,56 +390,90 @@ class LibtorrentMgr(TaskManager):
         with self.metainfo_lock:
             self._logger.debug('get_metainfo %s %s %s', infohash_or_magnet, callback, timeout)
 
-            cache_result = self._get_cached_metainfo(infohash)
+            cache_result = self.metainfo_cache.get(infohash)
+            if not cache_result and use_store:
+                cache_result = self._get_stored_metainfo(infohash_bin)
             if cache_result:
                 callback(deepcopy(cache_result))
+                return
 
-            elif infohash not in self.metainfo_requests:
-                # Flags = 4 (upload mode), should prevent libtorrent from creating files
-                atp = {'save_path': self.metadata_tmpdir,
-                       'flags': (lt.add_torrent_params_flags_t.flag_duplicate_is_error |
-                                 lt.add_torrent_params_flags_t.flag_upload_mode)}
-                if magnet:
-                    atp['url'] = magnet
-                else:
-                    atp['info_hash'] = lt.big_number(infohash_bin)
-                try:
-                    handle = self.get_session().add_torrent(encode_atp(atp))
-                except TypeError as e:
-                    self._logger.warning("Failed to add torrent with infohash %s, "
-                                         "attempting to use it as it is and hoping for the best",
-                                         hexlify(infohash_bin))
-                    self._logger.warning("Error was: %s", e)
-                    atp['info_hash'] = infohash_bin
-                    handle = self.get_session().add_torrent(encode_atp(atp))
-
-                if notify:
-                    self.notifier.notify(NTFY_TORRENTS, NTFY_MAGNET_STARTED, infohash_bin)
-
-                self.metainfo_requests[infohash] = {'handle': handle,
-                                                    'callbacks': [callback],
-                                                    'timeout_callbacks': [timeout_callback] if timeout_callback else [],
-                                                    'notify': notify}
-
-                def schedule_call():
-                    random_id = ''.join(random.choice('0123456789abcdef') for _ in xrange(30))
-                    self.register_task("schedule_got_metainfo_lookup_%s" % random_id,
-                                       reactor.callLater(timeout, lambda: self.got_metainfo(infohash, timeout=True)))
-
-                reactor.callFromThread(schedule_call)
-            else:
-                self.metainfo_requests[infohash]['notify'] = self.metainfo_requests[infohash]['notify'] and notify
-                callbacks = self.metainfo_requests[infohash]['callbacks']
+            request_dict = self.metainfo_requests.get(infohash) or self.metainfo_queue.get(infohash)
+            if request_dict:
+                request_dict['notify'] = request_dict['notify'] and notify
+                callbacks = request_dict['callbacks']
                 if callback not in callbacks:
                     callbacks.append(callback)
                 else:
                     self._logger.debug('get_metainfo duplicate detected, ignoring')
+                return
+
+            request_dict = {'handle': None,
+                            'magnet': magnet,
+                            'callbacks': [callback],
+                            'timeout_callbacks': [timeout_callback] if timeout_callback else [],
+                            'notify': notify}
+            if len(self.metainfo_requests) < MAX_METAINFO_REQUESTS:
+                self._start_metainfo_request(infohash, request_dict)
+            else:
+                self._logger.debug('get_metainfo queued %s, %d requests are running', infohash,
+                                   len(self.metainfo_requests))
+                self.metainfo_queue[infohash] = request_dict
+
+            # The timeout counts from now, also for a request that is queued
+            def schedule_call():
+                random_id = ''.join(random.choice('0123456789abcdef') for _ in xrange(30))
+                self.register_task("schedule_got_metainfo_lookup_%s" % random_id,
+                                   reactor.callLater(timeout, lambda: self.got_metainfo(infohash, timeout=True)))
+
+            reactor.callFromThread(schedule_call)
+
+    def _start_metainfo_request(self, infohash, request_dict):
+        """
+        Add a torrent in upload mode to the session, so libtorrent looks up the metainfo of the infohash.
+        """
+        infohash_bin = binascii.unhexlify(infohash)
+        # Flags = 4 (upload mode), should prevent libtorrent from creating files
+        atp = {'save_path': self.metadata_tmpdir,
+               'flags': (lt.add_torrent_params_flags_t.flag_duplicate_is_error |
+                         lt.add_torrent_params_flags_t.flag_upload_mode)}
+        if request_dict['magnet']:
+            atp['url'] = request_dict['magnet']
+        else:
+            atp['info_hash'] = lt.big_number(infohash_bin)
+        try:
+            handle = self.get_session().add_torrent(encode_atp(atp))
+        except TypeError as e:
+            self._logger.warning("Failed to add torrent with infohash %s, "
+                                 "attempting to use it as it is and hoping for the best",
+                                 hexlify(infohash_bin))
+            self._logger.warning("Error was: %s", e)
+            atp['info_hash'] = infohash_bin
+            handle = self.get_session().add_torrent(encode_atp(atp))
+
+        if request_dict['notify']:
+            self.notifier.notify(NTFY_TORRENTS, NTFY_MAGNET_STARTED, infohash_bin)
+
+        request_dict['handle'] = handle
+        self.metainfo_requests[infohash] = request_dict
+
+    def _start_queued_metainfo_requests(self):
+        with self.metainfo_lock:
+            while self.metainfo_queue and len(self.metainfo_requests) < MAX_METAINFO_REQUESTS:
+                infohash, request_dict = self.metainfo_queue.popitem(last=False)
+                self._start_metainfo_request(infohash, request_dict)
 
     def got_metainfo(self, infohash, timeout=False):
         with self.metainfo_lock:
             infohash_bin = binascii.unhexlify(infohash)
 
-            if infohash in self.metainfo_requests:
+            if infohash in self.metainfo_queue:
+                # The request timed out before it got a torrent handle
+                request_dict = self.metainfo_queue.pop(infohash)
+                if timeout:
+                    for callback in request_dict['timeout_callbacks']:
+                        callback(infohash_bin)
+
+            elif infohash in self.metainfo_requests:
                 request_dict = self.metainfo_requests.pop(infohash)
                 handle = request_dict['handle']
                 callbacks = request_dict['callbacks']
@@ -416,7 +485,8 @@ class LibtorrentMgr(TaskManager):
                 assert handle
                 if handle:
                     if callbacks and not timeout:
-                        metainfo = {"info": lt.bdecode(get_info_from_handle(handle).metadata())}
+                        metadata = get_info_from_handle(handle).metadata()
+                        metainfo = {"info": lt.bdecode(metadata)}
                         trackers = [tracker.url for tracker in get_info_from_handle(handle).trackers()]
                         peers = []
                         leechers = 0
@@ -440,7 +510,8 @@ class LibtorrentMgr(TaskManager):
                         metainfo["leechers"] = leechers
                         metainfo["seeders"] = seeders
 
-                        self._add_cached_metainfo(infohash, metainfo)
+                        self.metainfo_cache.put(infohash, metainfo, len(metadata))
+                        self._save_stored_metainfo(infohash_bin, metainfo)
 
                         for callback in callbacks:
                             callback(deepcopy(metainfo))
@@ -459,27 +530,64 @@ class LibtorrentMgr(TaskManager):
                     if notify:
                         self.notifier.notify(NTFY_TORRENTS, NTFY_MAGNET_CLOSE, infohash_bin)
 
-    def _get_cached_metainfo(self, infohash):
-        if infohash in self.metainfo_cache:
-            return self.metainfo_cache[infohash]['meta_info']
+                self._start_queued_metainfo_requests()
 
-    def _add_cached_metainfo(self, infohash, metainfo):
-        self.metainfo_cache[infohash] = {'time': time.time(),
-                                         'meta_info': metainfo}
+    def _get_stored_metainfo(self, infohash_bin):
+        """
+        Return the metainfo of an infohash from the torrent store, or None if the torrent store does not have it.
+        """
+        if not self.tribler_session.config.get_torrent_store_enabled():
+            return None
+
+        data = self.tribler_session.get_collected_torrent(infohash_bin)
+        if not data:
+            return None
+        try:
+            metainfo = lt.bdecode(data)
+        except RuntimeError:
+            metainfo = None
+        if not isinstance(metainfo, dict) or "info" not in metainfo:
+            self._logger.warning("Ignoring invalid torrent %s in the torrent store", hexlify(infohash_bin))
+            return None
+
+        self.metainfo_store_hits += 1
+        return metainfo
+
+    def _save_stored_metainfo(self, infohash_bin, metainfo):
+        """
+        Save the metainfo of an infohash to the torrent store, so it is still known after a restart.
+        """
+        if not self.tribler_session.config.get_torrent_store_enabled() or \
+                self.tribler_session.has_collected_torrent(infohash_bin):
+            return
 
-    def _task_cleanup_metainfo_cache(self):
-        oldest_time = time.time() - METAINFO_CACHE_PERIOD
+        # The peers, seeders and leechers are outdated soon, so only the torrent itself is saved
+        torrent = {key: value for key, value in metainfo.iteritems()
+                   if key in ("info", "announce", "announce-list", "nodes")}
+        self.tribler_session.save_collected_torrent(infohash_bin, lt.bencode(torrent))
 
-        for info_hash, values in self.metainfo_cache.items():
-            last_time, metainfo = values
-            if last_time < oldest_time:
-                del self.metainfo_cache[info_hash]
+    def get_metainfo_statistics(self):
+        """
+        Return the statistics of the metainfo cache and the metainfo requests.
+        """
+        with self.metainfo_lock:
+            statistics = self.metainfo_cache.get_statistics()
+            statistics["store_hits"] = self.metainfo_store_hits
+            statistics["active_requests"] = len(self.metainfo_requests)
+            statistics["queued_requests"] = len(self.metainfo_queue)
+            return statistics
+
+    def _task_cleanup_metainfo_cache(self):
+        with self.metainfo_lock:
+            self.metainfo_cache.expire()
 
     def _task_process_alerts(self):
         for ltsession in self.ltsessions.itervalues():
             if ltsession:
                 for alert in ltsession.pop_alerts():
                     self.process_alert(alert)
+                # Ask for the status of all changed torrents at once, which arrives as a state update alert
+                ltsession.post_torrent_updates()
 
     def _check_reachability(self):
         if self.get_session() and self.get_session().status().has_incoming_connections:
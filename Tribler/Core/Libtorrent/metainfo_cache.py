@@ -0,0 +1,92 @@
+import time
+from collections import OrderedDict
+
+METAINFO_CACHE_SIZE = 1000  # The maximum number of metainfo dictionaries in the cache
+METAINFO_CACHE_BYTES = 32 * 1024 * 1024  # The maximum number of bytes of metadata in the cache
+METAINFO_CACHE_TTL = 5 * 60  # The number of seconds after which the swarm information in a metainfo is outdated
+
+
+class MetainfoCache(object):
+    """
+    Least recently used cache of the metainfo dictionaries that have been fetched from the DHT.
+
+    The cache is bounded by both the number of entries and the total size of their metadata, and an entry expires
+    after ttl seconds because the peers, seeders and leechers in it are outdated by then.
+    """
+
+    def __init__(self, max_size=METAINFO_CACHE_SIZE, max_bytes=METAINFO_CACHE_BYTES, ttl=METAINFO_CACHE_TTL):
+        """
+        :param max_size: The maximum number of entries in the cache
+        :param max_bytes: The maximum total size of the entries in the cache
+        :param ttl: The number of seconds after which an entry expires
+        """
+        super(MetainfoCache, self).__init__()
+
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # Dictionary of infohash -> (insert time, size, metainfo), least recent first
+        self.num_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, infohash):
+        entry = self._entries.get(infohash)
+        return entry is not None and entry[0] >= time.time() - self.ttl
+
+    def get(self, infohash):
+        """
+        Return the metainfo of an infohash and mark it as most recently used, or None if it is not in the cache.
+        """
+        entry = self._entries.pop(infohash, None)
+        if entry is not None and entry[0] < time.time() - self.ttl:
+            self.num_bytes -= entry[1]
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries[infohash] = entry
+        return entry[2]
+
+    def put(self, infohash, metainfo, size):
+        """
+        Add the metainfo of an infohash, and evict the least recently used entries until the cache is within bounds.
+        :param size: the size of the metainfo, usually the length of its bencoded info dictionary
+        """
+        self.remove(infohash)
+        self._entries[infohash] = (time.time(), size, metainfo)
+        self.num_bytes += size
+
+        while len(self._entries) > self.max_size or (self.num_bytes > self.max_bytes and len(self._entries) > 1):
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.num_bytes -= evicted_size
+            self.evictions += 1
+
+    def remove(self, infohash):
+        entry = self._entries.pop(infohash, None)
+        if entry is not None:
+            self.num_bytes -= entry[1]
+
+    def expire(self):
+        """
+        Remove the entries that are older than the time to live.
+        """
+        oldest_time = time.time() - self.ttl
+        for infohash, (insert_time, _, _) in self._entries.items():
+            if insert_time < oldest_time:
+                self.remove(infohash)
+
+    def get_statistics(self):
+        return {"entries": len(self._entries),
+                "bytes": self.num_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions}
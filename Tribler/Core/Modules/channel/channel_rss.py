@@ -7,8 +7,8 @@ import time
 from binascii import hexlify
 
 import feedparser
-from twisted.internet import reactor
-from twisted.internet.defer import DeferredList
+from twisted.internet import reactor, threads
+from twisted.internet.defer import DeferredList, DeferredSemaphore
 from twisted.web.client import getPage
 
 from Tribler.Core.Modules.channel.cache import SimpleCache
@@ -19,6 +19,7 @@ from Tribler.dispersy.taskmanager import TaskManager
 from Tribler.dispersy.util import blocking_call_on_reactor_thread
 
 DEFAULT_CHECK_INTERVAL = 1800  # half an hour
+MAX_CONCURRENT_FETCHES = 4  # The maximum number of feeds, torrents and thumbnails that are downloaded at once
 
 
 class ChannelRssParser(TaskManager):
@@ -33,6 +34,10 @@ class ChannelRssParser(TaskManager):
         self.check_interval = check_interval
 
         self._url_cache = None
+        # The ETag and modification time of the last fetch of the feed, for conditional requests
+        self._feed_etag = None
+        self._feed_modified = None
+        self._fetch_semaphore = DeferredSemaphore(MAX_CONCURRENT_FETCHES)
 
         self._pending_metadata_requests = {}
 
@@ -82,20 +87,44 @@ class ChannelRssParser(TaskManager):
         self.running = False
 
     def parse_feed(self):
+        """
+        Fetch the feed off the reactor thread, and download the torrents of the new items in the feed. Returns a
+        Deferred that fires with a DeferredList of the torrent downloads, which is empty if the feed did not change,
+        or with None if the feed could not be fetched.
+        """
+        if self._to_stop:
+            return None
+
         rss_parser = RSSFeedParser()
+        feed_deferred = self._fetch_semaphore.run(rss_parser.fetch, self.rss_url, etag=self._feed_etag,
+                                                  modified=self._feed_modified)
+        return feed_deferred.addCallback(self.on_got_feed, rss_parser).addErrback(self.on_feed_failed)
 
-        def_list = []
+    def on_got_feed(self, feed, rss_parser):
+        if self._to_stop:
+            return None
 
-        for rss_item in rss_parser.parse(self.rss_url, self._url_cache):
-            if self._to_stop:
-                return None
+        if feed.get(u'status') == 304:
+            self._logger.debug(u"RSS feed %s has not been modified", self.rss_url)
+            return DeferredList([])
+        self._feed_etag = feed.get(u'etag')
+        self._feed_modified = feed.get(u'modified')
 
-            torrent_deferred = getPage(rss_item[u'torrent_url'].encode('utf-8'))
+        def_list = []
+        for rss_item in rss_parser.parse_entries(feed, self._url_cache):
+            torrent_deferred = self._fetch_semaphore.run(getPage, rss_item[u'torrent_url'].encode('utf-8'))
             torrent_deferred.addCallback(lambda t, r=rss_item: self.on_got_torrent(t, rss_item=r))
+            torrent_deferred.addErrback(self.on_fetch_failed, rss_item[u'torrent_url'])
             def_list.append(torrent_deferred)
 
         return DeferredList(def_list)
 
+    def on_feed_failed(self, failure):
+        self._logger.warning(u"Failed to fetch RSS feed %s: %s", self.rss_url, failure.getErrorMessage())
+
+    def on_fetch_failed(self, failure, url):
+        self._logger.warning(u"Failed to fetch %s from RSS feed %s: %s", url, self.rss_url, failure.getErrorMessage())
+
     def _task_scrape(self):
         self.parse_feed()
 
@@ -140,8 +169,9 @@ class ChannelRssParser(TaskManager):
                 rss_item[u'info_hash'] = data[u'info_hash']
                 rss_item[u'channel_torrent_id'] = data[u'channel_torrent_id']
 
-                metadata_deferred = getPage(rss_item[u'thumbnail_url'].encode('utf-8'))
+                metadata_deferred = self._fetch_semaphore.run(getPage, rss_item[u'thumbnail_url'].encode('utf-8'))
                 metadata_deferred.addCallback(lambda md, r=rss_item: self.on_got_metadata(md, rss_item=r))
+                metadata_deferred.addErrback(self.on_fetch_failed, rss_item[u'thumbnail_url'])
 
     def on_got_metadata(self, metadata_data, rss_item=None):
         # save metadata
@@ -201,11 +231,21 @@ class RSSFeedParser(object):
 
         return parsed_html_content
 
+    def fetch(self, url, etag=None, modified=None):
+        """Fetches and parses a RSS feed on a thread from the reactor thread pool. If the ETag or the modification time
+        of a previous fetch are given, the feed is fetched with a conditional request, and the parsed feed has status
+        304 and no entries if the feed has not been modified since.
+        """
+        return threads.deferToThread(feedparser.parse, url, etag=etag, modified=modified)
+
     def parse(self, url, cache):
         """Parses a RSS feed. This methods supports RSS 2.0 and Media RSS.
         """
-        feed = feedparser.parse(url)
+        return self.parse_entries(feedparser.parse(url), cache)
 
+    def parse_entries(self, feed, cache):
+        """Parses the entries of a feed that has been fetched, skipping the ones that are in the cache.
+        """
         for item in feed.entries:
             # ignore the ones that we have seen before
             link = item.get(u'link', None)
@@ -1,18 +1,42 @@
 import json
+import time
 from twisted.web import http
 
 from Tribler.Core.Modules.restapi.channels.base_channels_endpoint import BaseChannelsEndpoint
+from Tribler.Core.Modules.restapi.listing_cache import ListingCache, render_cacheable
 from Tribler.Core.Modules.restapi.util import convert_db_channel_to_json
+from Tribler.Core.simpledefs import (NTFY_CHANNELCAST, NTFY_CREATE, NTFY_INSERT, NTFY_MODIFIED, NTFY_UPDATE,
+                                     NTFY_VOTECAST)
+
+POPULAR_CHANNELS_CACHE_SIZE = 50  # The number of popular channels that are cached, larger limits are not cached
 
 
 class ChannelsPopularEndpoint(BaseChannelsEndpoint):
 
+    def __init__(self, session):
+        BaseChannelsEndpoint.__init__(self, session)
+        self.popular_channels = ListingCache(lambda: self.get_popular_channels(POPULAR_CHANNELS_CACHE_SIZE))
+        self.session.add_observer(self.popular_channels.invalidate, NTFY_CHANNELCAST,
+                                  [NTFY_INSERT, NTFY_UPDATE, NTFY_CREATE, NTFY_MODIFIED])
+        self.session.add_observer(self.popular_channels.invalidate, NTFY_VOTECAST, [NTFY_UPDATE])
+
+    def get_popular_channels(self, max_nr):
+        """
+        Return a list of (channel json, is xxx) tuples of the most popular channels, so the family filter can be
+        applied without classifying the channel names again.
+        """
+        return [(channel_json, self.session.lm.category.xxx_filter.isXXX(channel_json['name']))
+                for channel_json in (convert_db_channel_to_json(channel)
+                                     for channel in self.channel_db_handler.getMostPopularChannels(max_nr=max_nr))]
+
     def render_GET(self, request):
         """
         .. http:get:: /channels/popular?limit=(int:max nr of channels)
 
         A GET request to this endpoint will return the most popular discovered channels in Tribler.
         You can optionally pass a limit parameter to limit the number of results.
+        The response has an ETag and a Last-Modified header, and a conditional request gets a 304 response if the
+        popular channels did not change.
 
             **Example request**:
 
@@ -48,14 +72,13 @@ class ChannelsPopularEndpoint(BaseChannelsEndpoint):
                 request.setResponseCode(http.BAD_REQUEST)
                 return json.dumps({"error": "the limit parameter must be a positive number"})
 
-        popular_channels = self.channel_db_handler.getMostPopularChannels(max_nr=limit_channels)
-        results_json = []
-        for channel in popular_channels:
-            channel_json = convert_db_channel_to_json(channel)
-            if self.session.config.get_family_filter_enabled() and \
-                    self.session.lm.category.xxx_filter.isXXX(channel_json['name']):
-                continue
-
-            results_json.append(channel_json)
+        family_filter = self.session.config.get_family_filter_enabled()
+        if limit_channels <= POPULAR_CHANNELS_CACHE_SIZE:
+            popular_channels = self.popular_channels.get_items()[:limit_channels]
+            modified_time = self.popular_channels.get_modified_time(family_filter)
+        else:
+            popular_channels = self.get_popular_channels(limit_channels)
+            modified_time = time.time()
 
-        return json.dumps({"channels": results_json})
+        results_json = [channel_json for channel_json, is_xxx in popular_channels if not (family_filter and is_xxx)]
+        return render_cacheable(request, json.dumps({"channels": results_json}), modified_time)
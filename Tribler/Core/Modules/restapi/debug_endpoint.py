@@ -1,6 +1,7 @@
 import json
 from twisted.web import http, resource
 
+from Tribler.Core.Modules.restapi import get_param
 from Tribler.community.tunnel.tunnel_community import TunnelCommunity
 
 
@@ -12,7 +13,8 @@ class DebugEndpoint(resource.Resource):
     def __init__(self, session):
         resource.Resource.__init__(self)
 
-        child_handler_dict = {"circuits": DebugCircuitsEndpoint}
+        child_handler_dict = {"circuits": DebugCircuitsEndpoint, "reactorlag": DebugReactorLagEndpoint,
+                              "events": DebugEventsEndpoint}
 
         for path, child_cls in child_handler_dict.iteritems():
             self.putChild(path, child_cls(session))
@@ -86,3 +88,149 @@ class DebugCircuitsEndpoint(resource.Resource):
             circuits_json.append(item)
 
         return json.dumps({'circuits': circuits_json})
+
+
+class DebugReactorLagEndpoint(resource.Resource):
+    """
+    This class handles requests regarding the reactor lag monitor.
+    """
+
+    def __init__(self, session):
+        resource.Resource.__init__(self)
+        self.session = session
+        self.putChild("flamegraph", DebugReactorLagFlamegraphEndpoint(session))
+
+    def render_GET(self, request):
+        """
+        .. http:get:: /debug/reactorlag
+
+        A GET request to this endpoint returns a histogram of the reactor scheduling delays (in seconds) and the
+        stacks that were sampled most often while the reactor was blocked. The reactor lag monitor should be enabled
+        in the configuration, otherwise a 404 is returned. Passing reset=1 clears the collected statistics after
+        returning them.
+
+            **Example request**:
+
+            .. sourcecode:: none
+
+                curl -X GET http://localhost:8085/debug/reactorlag?limit=5
+
+            **Example response**:
+
+            .. sourcecode:: javascript
+
+                {
+                    "reactor_lag": {
+                        "interval": 0.1,
+                        "threshold": 0.1,
+                        "num_heartbeats": 3483,
+                        "max_lag": 1.21,
+                        "avg_lag": 0.003,
+                        "histogram": [{"bucket": "<=0.005", "count": 3310}, ..., {"bucket": ">10.0", "count": 0}],
+                        "num_samples": 121,
+                        "num_dropped_samples": 0,
+                        "top_offenders": [{
+                            "function": "fetchall (sqlitecachedb.py:240)",
+                            "stack": "run (twisted_thread.py:51);...;fetchall (sqlitecachedb.py:240)",
+                            "samples": 84,
+                            "time": 0.84
+                        }, ...]
+                    }
+                }
+        """
+        monitor = self.session.lm.reactor_lag_monitor
+        if not monitor:
+            request.setResponseCode(http.NOT_FOUND)
+            return json.dumps({"error": "reactor lag monitor not enabled"})
+
+        limit = int(get_param(request.args, 'limit') or 10)
+        stats = monitor.get_statistics(limit)
+        if get_param(request.args, 'reset') == "1":
+            monitor.reset()
+
+        return json.dumps({"reactor_lag": stats})
+
+
+class DebugReactorLagFlamegraphEndpoint(resource.Resource):
+    """
+    This class returns the stacks sampled by the reactor lag monitor in the collapsed format of flamegraph.pl.
+    """
+
+    def __init__(self, session):
+        resource.Resource.__init__(self)
+        self.session = session
+
+    def render_GET(self, request):
+        """
+        .. http:get:: /debug/reactorlag/flamegraph
+
+        A GET request to this endpoint returns all stacks sampled while the reactor was blocked, one line per stack
+        with the frames separated by semicolons followed by the number of samples. The output can be fed to
+        flamegraph.pl directly.
+
+            **Example request**:
+
+            .. sourcecode:: none
+
+                curl -X GET http://localhost:8085/debug/reactorlag/flamegraph | flamegraph.pl > reactor.svg
+
+            **Example response**:
+
+            .. sourcecode:: none
+
+                run (twisted_thread.py:51);...;fetchall (sqlitecachedb.py:240) 84
+                run (twisted_thread.py:51);...;dumps (__init__.py:193) 12
+        """
+        monitor = self.session.lm.reactor_lag_monitor
+        if not monitor:
+            request.setResponseCode(http.NOT_FOUND)
+            return json.dumps({"error": "reactor lag monitor not enabled"})
+
+        request.setHeader(b'content-type', 'text/plain')
+        return monitor.get_collapsed_stacks()
+
+
+class DebugEventsEndpoint(resource.Resource):
+    """
+    This class handles requests regarding the statistics of the events stream.
+    """
+
+    def __init__(self, session):
+        resource.Resource.__init__(self)
+        self.session = session
+
+    def render_GET(self, request):
+        """
+        .. http:get:: /debug/events
+
+        A GET request to this endpoint returns the number of events that have been dropped for clients that did not
+        keep up with the events stream, the number of events that have been replaced by a newer event of the same
+        type, and the statistics of every connected events client.
+
+            **Example request**:
+
+            .. sourcecode:: none
+
+                curl -X GET http://localhost:8085/debug/events
+
+            **Example response**:
+
+            .. sourcecode:: javascript
+
+                {
+                    "events": {
+                        "dropped": 1204,
+                        "coalesced": 12,
+                        "clients": [{
+                            "event_types": null,
+                            "paused": false,
+                            "buffered": 0,
+                            "written": 4352,
+                            "dropped": 1204,
+                            "coalesced": 12
+                        }]
+                    }
+                }
+        """
+        events_endpoint = self.session.lm.api_manager.root_endpoint.events_endpoint
+        return json.dumps({"events": events_endpoint.get_statistics()})
@@ -167,7 +167,7 @@ class DownloadsEndpoint(DownloadBaseEndpoint):
 
             # Create files information of the download
             files_completion = dict((name, progress) for name, progress in state.get_files_completion())
-            selected_files = download.get_selected_files()
+            selected_files = set(download.get_selected_files())
             files_array = []
             file_index = 0
             for file, size in download.get_def().get_files_with_length():
@@ -363,9 +363,10 @@ class DownloadSpecificEndpoint(DownloadBaseEndpoint):
 
         if 'selected_files[]' in parameters:
             selected_files_list = []
+            files = download.tdef.get_files()
             for ind in parameters['selected_files[]']:
                 try:
-                    selected_files_list.append(download.tdef.get_files()[int(ind)])
+                    selected_files_list.append(files[int(ind)])
                 except IndexError:  # File could not be found
                     request.setResponseCode(http.BAD_REQUEST)
                     return json.dumps({"error": "index %s out of range" % ind})
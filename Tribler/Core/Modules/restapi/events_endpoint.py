@@ -1,5 +1,10 @@
 import json
+import logging
+
+from twisted.internet import reactor
+from twisted.internet.interfaces import IPushProducer
 from twisted.web import server, resource
+from zope.interface import implementer
 
 from Tribler.Core.Modules.restapi.util import convert_db_channel_to_json, convert_search_torrent_to_json, \
     fix_unicode_dict
@@ -9,8 +14,122 @@ from Tribler.Core.simpledefs import (NTFY_CHANNELCAST, SIGNAL_CHANNEL, SIGNAL_ON
                                      NTFY_DISCOVERED, NTFY_TORRENT, NTFY_ERROR, NTFY_DELETE, NTFY_MARKET_ON_ASK,
                                      NTFY_UPDATE, NTFY_MARKET_ON_BID, NTFY_MARKET_ON_TRANSACTION_COMPLETE,
                                      NTFY_MARKET_ON_ASK_TIMEOUT, NTFY_MARKET_ON_BID_TIMEOUT,
-                                     NTFY_MARKET_ON_PAYMENT_RECEIVED, NTFY_MARKET_ON_PAYMENT_SENT)
+                                     NTFY_MARKET_ON_PAYMENT_RECEIVED, NTFY_MARKET_ON_PAYMENT_SENT, NTFY_STARTUP_TICK)
 from Tribler.Core.version import version_id
+from Tribler.dispersy.util import call_on_reactor_thread
+
+# The maximum number of events buffered for a single client that does not keep up with the event stream
+MAX_EVENTS_BUFFER_SIZE = 1000
+
+# The number of buffered events at which a client that does not keep up is disconnected, whatever the event types
+MAX_EVENTS_BUFFER_HARD_LIMIT = 10 * MAX_EVENTS_BUFFER_SIZE
+
+# Events of which only the most recent one is relevant; a buffered event of this type is replaced by a newer one
+COALESCED_EVENT_TYPES = frozenset(["upgrader_tick"])
+
+# Events that are dropped when the buffer of a client is full, other events are always delivered
+DROPPABLE_EVENT_TYPES = frozenset(["search_result_channel", "search_result_torrent", "channel_discovered",
+                                   "torrent_discovered", "market_ask", "market_bid", "market_ask_timeout",
+                                   "market_bid_timeout"])
+
+
+@implementer(IPushProducer)
+class EventsClient(object):
+    """
+    A single open events connection. Events are buffered until the end of the reactor tick and then written to the
+    request as a single chunk. The transport pauses the client when it cannot keep up, in which case events keep
+    being buffered (droppable events up to MAX_EVENTS_BUFFER_SIZE) until the transport resumes the client. A client
+    that has MAX_EVENTS_BUFFER_HARD_LIMIT events buffered is disconnected.
+    """
+
+    def __init__(self, request, event_types=None):
+        """
+        :param request: the open GET request of the events connection
+        :param event_types: the event types the client is subscribed to, or None to receive all events
+        """
+        self.request = request
+        self.event_types = event_types
+        self.buffer = []
+        self.coalesce_indices = {}
+        self.paused = False
+        self.stopped = False
+
+        self.num_events_written = 0
+        self.num_events_dropped = 0
+        self.num_events_coalesced = 0
+
+    def is_subscribed(self, event_type):
+        return self.event_types is None or event_type in self.event_types
+
+    def add_event(self, event_type, message_str):
+        """
+        Buffer an event for this client.
+        :return: a tuple (dropped, coalesced) indicating what happened with the event
+        """
+        if event_type in self.coalesce_indices:
+            self.buffer[self.coalesce_indices[event_type]] = message_str
+            self.num_events_coalesced += 1
+            return False, True
+
+        if self.stopped:
+            return True, False
+
+        if len(self.buffer) >= MAX_EVENTS_BUFFER_SIZE and event_type in DROPPABLE_EVENT_TYPES:
+            self.num_events_dropped += 1
+            return True, False
+
+        if len(self.buffer) >= MAX_EVENTS_BUFFER_HARD_LIMIT:
+            # The client has not read anything for a long time, rather than buffering without limit we let it go
+            self.num_events_dropped += 1
+            self.disconnect()
+            return True, False
+
+        if event_type in COALESCED_EVENT_TYPES:
+            self.coalesce_indices[event_type] = len(self.buffer)
+        self.buffer.append(message_str)
+        return False, False
+
+    def flush(self):
+        """
+        Write all buffered events to the request in a single chunk, unless the transport asked us to pause.
+        """
+        if self.paused or self.stopped or not self.buffer:
+            return
+
+        data = ''.join(self.buffer)
+        self.num_events_written += len(self.buffer)
+        self.buffer = []
+        self.coalesce_indices = {}
+        self.request.write(data)
+
+    def pauseProducing(self):
+        self.paused = True
+
+    def resumeProducing(self):
+        self.paused = False
+        self.flush()
+
+    def stopProducing(self):
+        self.stopped = True
+        self.buffer = []
+        self.coalesce_indices = {}
+
+    def disconnect(self):
+        """
+        Stop buffering events for this client and close its connection.
+        """
+        self.stopProducing()
+        self.request.loseConnection()
+
+    def get_statistics(self):
+        return {
+            "event_types": sorted(self.event_types) if self.event_types is not None else None,
+            "paused": self.paused,
+            "buffered": len(self.buffer),
+            "written": self.num_events_written,
+            "dropped": self.num_events_dropped,
+            "coalesced": self.num_events_coalesced
+        }
 
 
 class EventsEndpoint(resource.Resource):
@@ -29,6 +148,8 @@ class EventsEndpoint(resource.Resource):
     - upgrader_finished: An indication that the Tribler upgrader has finished.
     - upgrader_tick: An indication that the state of the upgrader has changed. The dictionary contains a human-readable
       string with the new state.
+    - startup_tick: A component of the Tribler session has started ("started") or is ready ("finished"). The
+      dictionary contains the name of the component, its state and, when finished, the startup duration in seconds.
     - watch_folder_corrupt_torrent: This event is emitted when a corrupt .torrent file in the watch folder is found.
       The dictionary contains the name of the corrupt torrent file.
     - new_version_available: This event is emitted when a new version of Tribler is available.
@@ -54,13 +175,23 @@ class EventsEndpoint(resource.Resource):
     - market_payment_sent: We sent a payment in the market. The events contains the payment information.
     - market_iom_input_required: The Internet-of-Money modules requires user input (like a password or challenge
       response).
+
+    Events that are emitted during the same reactor tick are sent to a client in a single chunk. A client that does
+    not keep up with the stream gets its events buffered; when this buffer is full, search results, discovered
+    channels/torrents and market ticks are dropped for that client. Of the upgrader_tick events only the most recent
+    one is kept in the buffer. A client that buffers too many other events is disconnected.
     """
 
     def __init__(self, session):
         resource.Resource.__init__(self)
+        self._logger = logging.getLogger(self.__class__.__name__)
         self.session = session
         self.channel_db_handler = self.session.open_dbhandler(NTFY_CHANNELCAST)
-        self.events_requests = []
+        self.events_clients = []
+        self.flush_call = None
+
+        self.num_events_dropped = 0
+        self.num_events_coalesced = 0
 
         self.infohashes_sent = set()
         self.channel_cids_sent = set()
@@ -70,6 +201,7 @@ class EventsEndpoint(resource.Resource):
         self.session.add_observer(self.on_upgrader_started, NTFY_UPGRADER, [NTFY_STARTED])
         self.session.add_observer(self.on_upgrader_finished, NTFY_UPGRADER, [NTFY_FINISHED])
         self.session.add_observer(self.on_upgrader_tick, NTFY_UPGRADER_TICK, [NTFY_STARTED])
+        self.session.add_observer(self.on_startup_tick, NTFY_STARTUP_TICK, [NTFY_STARTED, NTFY_FINISHED])
         self.session.add_observer(self.on_watch_folder_corrupt_torrent,
                                   NTFY_WATCH_FOLDER_CORRUPT_TORRENT, [NTFY_INSERT])
         self.session.add_observer(self.on_new_version_available, NTFY_NEW_VERSION, [NTFY_INSERT])
@@ -88,20 +220,48 @@ class EventsEndpoint(resource.Resource):
         self.session.add_observer(self.on_market_payment_received, NTFY_MARKET_ON_PAYMENT_RECEIVED, [NTFY_UPDATE])
         self.session.add_observer(self.on_market_payment_sent, NTFY_MARKET_ON_PAYMENT_SENT, [NTFY_UPDATE])
 
+    @call_on_reactor_thread
     def write_data(self, message):
         """
-        Write data over the event socket if it's open.
+        Queue data for the clients of the event socket that are subscribed to this type of event. The queued events
+        are written at the end of the current reactor tick. The notifier calls the observers on the thread that emitted
+        the event, so the event is queued on the reactor thread, which owns the buffers of the clients.
         """
+        clients = [client for client in self.events_clients if client.is_subscribed(message["type"])]
+        if not clients:
+            return
+
         try:
             message_str = json.dumps(message)
         except UnicodeDecodeError:
             # The message contains invalid characters; fix them
             message_str = json.dumps(fix_unicode_dict(message))
+        message_str += '\n'
 
-        if len(self.events_requests) == 0:
-            return
-        else:
-            [request.write(message_str + '\n') for request in self.events_requests]
+        for client in clients:
+            dropped, coalesced = client.add_event(message["type"], message_str)
+            self.num_events_dropped += dropped
+            self.num_events_coalesced += coalesced
+
+        if not self.flush_call or not self.flush_call.active():
+            self.flush_call = reactor.callLater(0, self.flush)
+
+    def flush(self):
+        """
+        Write the queued events to all clients.
+        """
+        for client in self.events_clients:
+            client.flush()
+
+    def get_statistics(self):
+        """
+        Return the statistics of the event stream and the currently connected clients.
+        """
+        return {
+            "dropped": self.num_events_dropped,
+            "coalesced": self.num_events_coalesced,
+            "clients": [client.get_statistics() for client in self.events_clients]
+        }
 
     def start_new_query(self):
         self.infohashes_sent = set()
@@ -149,6 +309,10 @@ class EventsEndpoint(resource.Resource):
     def on_upgrader_tick(self, subject, changetype, objectID, *args):
         self.write_data({"type": "upgrader_tick", "event": {"text": args[0]}})
 
+    def on_startup_tick(self, subject, changetype, objectID, *args):
+        self.write_data({"type": "startup_tick", "event": {"component": objectID, "state": changetype,
+                                                           "duration": args[0]}})
+
     def on_watch_folder_corrupt_torrent(self, subject, changetype, objectID, *args):
         self.write_data({"type": "watch_folder_corrupt_torrent", "event": {"name": args[0]}})
 
@@ -162,7 +326,9 @@ class EventsEndpoint(resource.Resource):
         self.write_data({"type": "channel_discovered", "event": args[0]})
 
     def on_torrent_discovered(self, subject, changetype, objectID, *args):
-        self.write_data({"type": "torrent_discovered", "event": args[0]})
+        # The channel community notifies all torrents of a batch of messages at once
+        for torrent in args:
+            self.write_data({"type": "torrent_discovered", "event": torrent})
 
     def on_torrent_removed_from_channel(self, subject, changetype, objectID, *args):
         self.write_data({"type": "torrent_removed_from_channel", "event": args[0]})
@@ -201,18 +367,31 @@ class EventsEndpoint(resource.Resource):
         """
         .. http:get:: /events
 
-        A GET request to this endpoint will open the event connection.
+        A GET request to this endpoint will open the event connection. Optionally, the types of the events that
+        should be sent over the connection can be passed as a comma-separated list in the types parameter. By
+        default, all events are sent.
 
             **Example request**:
 
                 .. sourcecode:: none
 
-                    curl -X GET http://localhost:8085/events
+                    curl -X GET http://localhost:8085/events?types=torrent_finished,torrent_error
         """
+        event_types = None
+        if 'types' in request.args:
+            event_types = set(event_type for types in request.args['types']
+                              for event_type in types.split(',') if event_type)
+
+        client = EventsClient(request, event_types)
+
         def on_request_finished(_):
-            self.events_requests.remove(request)
+            client.stopProducing()
+            self.events_clients.remove(client)
+            if not self.events_clients and self.flush_call and self.flush_call.active():
+                self.flush_call.cancel()
 
-        self.events_requests.append(request)
+        self.events_clients.append(client)
+        request.registerProducer(client, True)
         request.notifyFinish().addCallbacks(on_request_finished, on_request_finished)
 
         request.write(json.dumps({"type": "events_start", "event": {
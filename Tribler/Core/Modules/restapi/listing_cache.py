@@ -0,0 +1,75 @@
+"""
+Caches of the listings that the GUI polls on its home page, such as the popular channels and the random torrents.
+"""
+import hashlib
+import math
+import time
+from twisted.web import http
+
+LISTING_MAX_AGE = 60  # The number of seconds after which a listing is refreshed, even if nothing has changed
+LISTING_MIN_AGE = 5  # The number of seconds for which a listing is served, even if the database has changed
+
+
+class ListingCache(object):
+    """
+    Keeps the items of a listing that is expensive to query.
+
+    The items are queried again when they are requested and they are older than max_age seconds, or when they have
+    been invalidated and they are older than min_age seconds. The number of queries is therefore bounded, no matter
+    how often the GUI polls the listing or how often the database changes.
+    """
+
+    def __init__(self, query_func, max_age=LISTING_MAX_AGE, min_age=LISTING_MIN_AGE):
+        self.query_func = query_func
+        self.max_age = max_age
+        self.min_age = min_age
+        self.items = None
+        self.refresh_time = 0
+        self.modified_time = 0
+        self.invalidated = False
+        self.variant = None
+        self.variant_time = 0
+
+    def invalidate(self, *_):
+        """
+        Mark the items as outdated. This method is used as a notifier observer, which can be called from any thread,
+        so it only sets a flag.
+        """
+        self.invalidated = True
+
+    def get_items(self):
+        age = time.time() - self.refresh_time
+        if self.items is None or age > self.max_age or (self.invalidated and age > self.min_age):
+            self.invalidated = False
+            items = self.query_func()
+            self.refresh_time = time.time()
+            if items != self.items:
+                self.items = items
+                self.modified_time = self.refresh_time
+        return self.items
+
+    def get_modified_time(self, variant=None):
+        """
+        Return the modification time of the listing as it is served with a variant, such as the state of the family
+        filter. A change of the variant changes the served listing as well, so it counts as a modification.
+        """
+        if variant != self.variant:
+            self.variant = variant
+            self.variant_time = time.time()
+        return max(self.modified_time, self.variant_time)
+
+
+def render_cacheable(request, body, modified_time):
+    """
+    Return the body of a response with an ETag and a Last-Modified header. If the client already has this body,
+    the status is set to 304 Not Modified and an empty body is returned instead.
+    """
+    etag = '"%s"' % hashlib.sha1(body).hexdigest()
+    if request.getHeader('if-none-match') is not None:
+        # The ETag is exact, so it takes precedence over the modification time, which only has a resolution of seconds
+        request.setHeader('last-modified', http.datetimeToString(int(math.ceil(modified_time))))
+        cached = request.setETag(etag)
+    else:
+        request.setETag(etag)
+        cached = request.setLastModified(modified_time)
+    return "" if cached == http.CACHED else body
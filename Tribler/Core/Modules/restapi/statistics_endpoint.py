@@ -12,7 +12,7 @@ class StatisticsEndpoint(resource.Resource):
         resource.Resource.__init__(self)
 
         child_handler_dict = {"tribler": StatisticsTriblerEndpoint, "dispersy": StatisticsDispersyEndpoint,
-                              "communities": StatisticsCommunitiesEndpoint}
+                              "communities": StatisticsCommunitiesEndpoint, "startup": StatisticsStartupEndpoint}
 
         for path, child_cls in child_handler_dict.iteritems():
             self.putChild(path, child_cls(session))
@@ -54,13 +54,70 @@ class StatisticsTriblerEndpoint(resource.Resource):
                             "type": "TFTP",
                             "pending": 1,
                             "success": 6
-                        }, ...]
+                        }, ...],
+                        "torrent_checker": {
+                            "checks_per_minute": 148,
+                            "active_scrapes": 3,
+                            "queued_trackers": 42,
+                            "pending_results": 74
+                        }
                     }
                 }
         """
         return json.dumps({'tribler_statistics': self.session.get_tribler_statistics()})
 
 
+class StatisticsStartupEndpoint(resource.Resource):
+    """
+    This class handles requests regarding the startup of the Tribler session.
+    """
+
+    def __init__(self, session):
+        resource.Resource.__init__(self)
+        self.session = session
+
+    def render_GET(self, request):
+        """
+        .. http:get:: /statistics/startup
+
+        A GET request to this endpoint returns how long it took to start each component of the Tribler session.
+        Components that do not depend on each other are started concurrently. All times are in seconds, the start
+        time of a component is relative to the start of the session.
+
+            **Example request**:
+
+            .. sourcecode:: none
+
+                curl -X GET http://localhost:8085/statistics/startup
+
+            **Example response**:
+
+            .. sourcecode:: javascript
+
+                {
+                    "startup_statistics": {
+                        "total_duration": 4.32,
+                        "components": [{
+                            "name": "dispersy",
+                            "depends_on": [],
+                            "threaded": false,
+                            "start": 0.0,
+                            "duration": 1.23,
+                            "failed": false
+                        }, {
+                            "name": "libtorrent_session",
+                            "depends_on": [],
+                            "threaded": true,
+                            "start": 0.01,
+                            "duration": 0.87,
+                            "failed": false
+                        }, ...]
+                    }
+                }
+        """
+        return json.dumps({'startup_statistics': self.session.get_startup_statistics()})
+
+
 class StatisticsDispersyEndpoint(resource.Resource):
     """
     This class handles requests regarding Dispersy statistics.
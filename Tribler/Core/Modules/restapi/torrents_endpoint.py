@@ -1,10 +1,15 @@
 import json
 import logging
+import random
+import time
 from twisted.web import http, resource
 from twisted.web.server import NOT_DONE_YET
 
+from Tribler.Core.Modules.restapi.listing_cache import ListingCache, render_cacheable
 from Tribler.Core.Modules.restapi.util import convert_db_torrent_to_json
-from Tribler.Core.simpledefs import NTFY_TORRENTS, NTFY_CHANNELCAST
+from Tribler.Core.simpledefs import NTFY_TORRENTS, NTFY_CHANNELCAST, NTFY_DELETE, NTFY_INSERT
+
+RANDOM_TORRENTS_POOL_SIZE = 100  # The number of random torrents that are cached and sampled from per request
 
 
 class TorrentsEndpoint(resource.Resource):
@@ -12,10 +17,9 @@ class TorrentsEndpoint(resource.Resource):
     def __init__(self, session):
         resource.Resource.__init__(self)
         self.session = session
+        self.putChild("random", TorrentsRandomEndpoint(self.session))
 
     def getChild(self, path, request):
-        if path == "random":
-            return TorrentsRandomEndpoint(self.session)
         return SpecificTorrentEndpoint(self.session, path)
 
 
@@ -26,6 +30,24 @@ class TorrentsRandomEndpoint(resource.Resource):
         self.session = session
         self.channel_db_handler = self.session.open_dbhandler(NTFY_CHANNELCAST)
         self.torrents_db_handler = self.session.open_dbhandler(NTFY_TORRENTS)
+        self.random_torrents = ListingCache(lambda: self.get_random_torrents(RANDOM_TORRENTS_POOL_SIZE))
+        self.session.add_observer(self.random_torrents.invalidate, NTFY_TORRENTS, [NTFY_INSERT, NTFY_DELETE])
+
+    def get_random_torrents(self, limit):
+        """
+        Return a list of (torrent json, is xxx) tuples of random channel torrents with a name, so the family filter
+        can be applied without classifying the torrents again.
+        """
+        torrent_db_columns = ['Torrent.torrent_id', 'infohash', 'Torrent.name', 'length', 'Torrent.category',
+                              'num_seeders', 'num_leechers', 'last_tracker_check', 'ChannelTorrents.inserted']
+
+        random_torrents = []
+        for torrent in self.channel_db_handler.get_random_channel_torrents(torrent_db_columns, limit=limit):
+            torrent_json = convert_db_torrent_to_json(torrent)
+            if torrent_json['name'] is not None:
+                random_torrents.append((torrent_json,
+                                        self.session.lm.category.xxx_filter.isXXX(torrent_json['category'])))
+        return random_torrents
 
     def render_GET(self, request):
         """
@@ -33,6 +55,9 @@ class TorrentsRandomEndpoint(resource.Resource):
 
         A GET request to this endpoint returns random (channel) torrents.
         You can optionally specify a limit parameter to limit the maximum number of results. By default, this is 10.
+        Every request returns a different sample of the random torrents in a pool, which is refreshed at most every
+        few seconds. Larger limits than the pool size are queried from the database directly. The response has an
+        ETag header, so a conditional request gets a 304 response if it happens to return the same torrents.
 
             **Example request**:
 
@@ -66,22 +91,17 @@ class TorrentsRandomEndpoint(resource.Resource):
                 request.setResponseCode(http.BAD_REQUEST)
                 return json.dumps({"error": "the limit parameter must be a positive number"})
 
-        torrent_db_columns = ['Torrent.torrent_id', 'infohash', 'Torrent.name', 'length', 'Torrent.category',
-                              'num_seeders', 'num_leechers', 'last_tracker_check', 'ChannelTorrents.inserted']
-
-        popular_torrents = self.channel_db_handler.get_random_channel_torrents(torrent_db_columns, limit=limit_torrents)
-
-        results_json = []
-        for popular_torrent in popular_torrents:
-            torrent_json = convert_db_torrent_to_json(popular_torrent)
-            if (self.session.config.get_family_filter_enabled() and
-                    self.session.lm.category.xxx_filter.isXXX(torrent_json['category'])) \
-                    or torrent_json['name'] is None:
-                continue
-
-            results_json.append(torrent_json)
-
-        return json.dumps({"torrents": results_json})
+        if limit_torrents <= RANDOM_TORRENTS_POOL_SIZE:
+            random_torrents = self.random_torrents.get_items()
+        else:
+            random_torrents = self.get_random_torrents(limit_torrents)
+
+        family_filter = self.session.config.get_family_filter_enabled()
+        results_json = [torrent_json for torrent_json, is_xxx in random_torrents if not (family_filter and is_xxx)]
+        results_json = random.sample(results_json, min(limit_torrents, len(results_json)))
+        # The sample differs per request, so only the ETag can tell whether the client already has these torrents
+        modified_time = time.time()
+        return render_cacheable(request, json.dumps({"torrents": results_json}), modified_time)
 
 
 class SpecificTorrentEndpoint(resource.Resource):
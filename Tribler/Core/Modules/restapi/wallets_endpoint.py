@@ -207,7 +207,8 @@ class WalletTransactionsEndpoint(resource.Resource):
                         "timestamp": "1489673696",
                         "fee_amount": 0.0,
                         "amount": 0.00395598,
-                        "id": "6f6c40d034d69c5113ad8cb3710c172955f84787b9313ede1c39cac85eeaaffe"
+                        "id": "6f6c40d034d69c5113ad8cb3710c172955f84787b9313ede1c39cac85eeaaffe",
+                        "confirmations": 3
                     }, ...]
                 }
         """
@@ -110,6 +110,17 @@ class TrackerManager(object):
                        tracker_info[u'id'])
         self._session.sqlite_db.execute(sql_stmt, value_tuple)
 
+    def get_next_check_time(self, tracker_url):
+        """
+        Gets the time at which the given tracker URL may be checked again.
+        :param tracker_url: The given tracker URL.
+        :return: The next check time (in seconds since the epoch).
+        """
+        tracker_info = self._tracker_dict.get(tracker_url, {u'is_alive': True, u'last_check': 0, u'failures': 0})
+
+        # this_interval = retry_interval * 2^failures
+        return tracker_info[u'last_check'] + self._tracker_retry_interval * (2**tracker_info[u'failures'])
+
     @call_on_reactor_thread
     def should_check_tracker(self, tracker_url):
         """
@@ -117,13 +128,16 @@ class TrackerManager(object):
         :param tracker_url: The given tracker URL.
         :return: True or False.
         """
-        current_time = int(time.time())
-
-        tracker_info = self._tracker_dict.get(tracker_url, {u'is_alive': True, u'last_check': 0, u'failures': 0})
+        return self.get_next_check_time(tracker_url) <= int(time.time())
 
-        # this_interval = retry_interval * 2^failures
-        next_check_time = tracker_info[u'last_check'] + self._tracker_retry_interval * (2**tracker_info[u'failures'])
-        return next_check_time <= current_time
+    @call_on_reactor_thread
+    def get_trackers_for_auto_check(self):
+        """
+        Gets all trackers that can be checked automatically, together with the time they may be checked again.
+        :return: A list of (tracker URL, next check time) tuples.
+        """
+        return [(tracker_url, self.get_next_check_time(tracker_url)) for tracker_url in self._tracker_dict
+                if tracker_url not in (u'DHT', u'no-DHT')]
 
     @call_on_reactor_thread
     def get_next_tracker_for_auto_check(self):
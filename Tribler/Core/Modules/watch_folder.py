@@ -1,5 +1,8 @@
 import logging
 import os
+import sys
+from collections import OrderedDict
+
 from twisted.internet.task import LoopingCall
 
 from Tribler.Core.DownloadConfig import DefaultDownloadStartupConfig
@@ -8,23 +11,86 @@ from Tribler.Core.Utilities.utilities import fix_torrent
 from Tribler.Core.simpledefs import NTFY_WATCH_FOLDER_CORRUPT_TORRENT, NTFY_INSERT
 from Tribler.dispersy.taskmanager import TaskManager
 
+try:
+    from twisted.internet import inotify
+    from twisted.python.filepath import FilePath
+
+    use_inotify = sys.platform.startswith('linux')
+except ImportError:
+    use_inotify = False
+
 WATCH_FOLDER_CHECK_INTERVAL = 10
+MAX_TORRENTS_PER_CHECK = 50  # The maximum number of new or changed torrent files handled per check
+FULL_SCAN_INTERVAL = 30  # When inotify is used, the watch folder is still scanned completely every this many checks
 
 
 class WatchFolder(TaskManager):
+    """
+    Starts downloads for the torrent files that are put in the watch folder.
+
+    The (mtime, size, inode) of every handled torrent file is cached, so only new and changed files are read. On Linux,
+    inotify tells us which files changed, so the watch folder does not have to be scanned on every check. New files
+    are queued and at most MAX_TORRENTS_PER_CHECK of them are handled per check.
+    """
 
     def __init__(self, session):
         super(WatchFolder, self).__init__()
 
         self._logger = logging.getLogger(self.__class__.__name__)
         self.session = session
+        self.file_stats = {}  # Dictionary of path -> (mtime, size, inode) of the handled torrent files
+        self.pending_files = OrderedDict()  # Dictionary of path -> (mtime, size, inode) of the files to handle
+        self.changed_paths = set()  # The paths reported by inotify since the last check
+        self.notifier = None
+        self.watched_path = None
+        self.checks_since_full_scan = 0
 
     def start(self):
+        self.watch(self.session.config.get_watch_folder_path())
         self.register_task("check watch folder", LoopingCall(self.check_watch_folder))\
             .start(WATCH_FOLDER_CHECK_INTERVAL, now=False)
 
     def stop(self):
         self.cancel_all_pending_tasks()
+        self.stop_inotify()
+
+    def watch(self, path):
+        """
+        Start watching another path, of which all torrent files will be handled again.
+        """
+        self.stop_inotify()
+        self.watched_path = path
+        self.file_stats.clear()
+        self.pending_files.clear()
+        self.changed_paths.clear()
+        self.checks_since_full_scan = FULL_SCAN_INTERVAL
+        if os.path.isdir(path):
+            self.start_inotify(path)
+
+    def start_inotify(self, path):
+        if not use_inotify:
+            return
+
+        try:
+            self.notifier = inotify.INotify()
+            self.notifier.startReading()
+            self.notifier.watch(FilePath(path), mask=inotify.IN_CLOSE_WRITE | inotify.IN_MOVED_TO | inotify.IN_CREATE,
+                                autoAdd=True, recursive=True, callbacks=[self.on_inotify_event])
+        except Exception as exc:
+            self._logger.warning("Could not watch %s with inotify, scanning it instead: %s", path, exc)
+            self.stop_inotify()
+
+    def stop_inotify(self):
+        if self.notifier:
+            self.notifier.loseConnection()
+            self.notifier = None
+
+    def on_inotify_event(self, _, file_path, mask):
+        if mask & inotify.IN_Q_OVERFLOW:
+            # Events have been dropped, so we do not know anymore which files have changed
+            self.checks_since_full_scan = FULL_SCAN_INTERVAL
+        elif file_path.path.endswith(u".torrent"):
+            self.changed_paths.add(file_path.path)
 
     def cleanup_torrent_file(self, root, name):
         if not os.path.exists(os.path.join(root, name)):
@@ -35,29 +101,84 @@ class WatchFolder(TaskManager):
         self._logger.warning("Watch folder - corrupt torrent file %s", name)
         self.session.notifier.notify(NTFY_WATCH_FOLDER_CORRUPT_TORRENT, NTFY_INSERT, None, name)
 
+    @staticmethod
+    def get_file_stat(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size, stat.st_ino
+
+    def scan_watch_folder(self, watch_folder_path):
+        """
+        Walk the watch folder and queue the torrent files that are new or have changed since they were handled.
+        """
+        found_paths = set()
+        for root, _, files in os.walk(watch_folder_path):
+            for name in files:
+                if name.endswith(u".torrent"):
+                    path = os.path.join(root, name)
+                    found_paths.add(path)
+                    self.queue_if_changed(path)
+
+        # Forget about the files that have been removed, so they are handled again when they are put back
+        for path in set(self.file_stats) - found_paths:
+            del self.file_stats[path]
+
+    def queue_if_changed(self, path):
+        file_stat = self.get_file_stat(path)
+        if file_stat is None:
+            self.file_stats.pop(path, None)
+        elif self.file_stats.get(path) != file_stat and path not in self.pending_files:
+            self.pending_files[path] = file_stat
+
     def check_watch_folder(self):
-        if not os.path.isdir(self.session.config.get_watch_folder_path()):
+        watch_folder_path = self.session.config.get_watch_folder_path()
+        if not os.path.isdir(watch_folder_path):
             return
 
-        for root, _, files in os.walk(self.session.config.get_watch_folder_path()):
-            for name in files:
-                if not name.endswith(u".torrent"):
-                    continue
-
-                try:
-                    tdef = TorrentDef.load_from_memory(fix_torrent(os.path.join(root, name)))
-                except:  # torrent appears to be corrupt
-                    self.cleanup_torrent_file(root, name)
-                    continue
-
-                infohash = tdef.get_infohash()
-
-                if not self.session.has_download(infohash):
-                    self._logger.info("Starting download from torrent file %s", name)
-                    dl_config = DefaultDownloadStartupConfig.getInstance().copy()
-
-                    anon_enabled = self.session.config.get_default_anonymity_enabled()
-                    default_num_hops = self.session.config.get_default_number_hops()
-                    dl_config.set_hops(default_num_hops if anon_enabled else 0)
-                    dl_config.set_safe_seeding(self.session.config.get_default_safeseeding_enabled())
-                    self.session.lm.ltmgr.start_download(tdef=tdef, dconfig=dl_config)
+        if watch_folder_path != self.watched_path:
+            self.watch(watch_folder_path)
+
+        if not self.notifier or self.checks_since_full_scan >= FULL_SCAN_INTERVAL:
+            self.changed_paths.clear()
+            self.checks_since_full_scan = 0
+            self.scan_watch_folder(watch_folder_path)
+        else:
+            self.checks_since_full_scan += 1
+            changed_paths, self.changed_paths = self.changed_paths, set()
+            for path in changed_paths:
+                self.queue_if_changed(path)
+
+        for _ in xrange(min(MAX_TORRENTS_PER_CHECK, len(self.pending_files))):
+            path, file_stat = self.pending_files.popitem(last=False)
+            self.handle_torrent_file(path, file_stat)
+
+        if self.pending_files:
+            self._logger.info("Watch folder - %d torrent files left to handle", len(self.pending_files))
+
+    def handle_torrent_file(self, path, file_stat):
+        root, name = os.path.split(path)
+        # The file might have been changed or removed after it was queued
+        if self.get_file_stat(path) != file_stat:
+            self.queue_if_changed(path)
+            return
+
+        try:
+            tdef = TorrentDef.load_from_memory(fix_torrent(path))
+        except:  # torrent appears to be corrupt
+            self.cleanup_torrent_file(root, name)
+            return
+
+        self.file_stats[path] = file_stat
+        infohash = tdef.get_infohash()
+
+        if not self.session.has_download(infohash):
+            self._logger.info("Starting download from torrent file %s", name)
+            dl_config = DefaultDownloadStartupConfig.getInstance().copy()
+
+            anon_enabled = self.session.config.get_default_anonymity_enabled()
+            default_num_hops = self.session.config.get_default_number_hops()
+            dl_config.set_hops(default_num_hops if anon_enabled else 0)
+            dl_config.set_safe_seeding(self.session.config.get_default_safeseeding_enabled())
+            self.session.lm.ltmgr.start_download(tdef=tdef, dconfig=dl_config)
@@ -435,6 +435,10 @@ class Session(object):
         """Return a dictionary with general Tribler statistics."""
         return TriblerStatistics(self).get_tribler_statistics()
 
+    def get_startup_statistics(self):
+        """Return a dictionary with the startup time of each session component."""
+        return TriblerStatistics(self).get_startup_statistics()
+
     def get_dispersy_statistics(self):
         """Return a dictionary with general Dispersy statistics."""
         return TriblerStatistics(self).get_dispersy_statistics()
@@ -486,6 +490,8 @@ class Session(object):
 
         self.start_database()
 
+        # The upgrader is not a component of the startup orchestrator, since it can replace the config and the database
+        # that the database handlers and the components are created with
         if self.config.get_upgrader_enabled():
             self.upgrader = TriblerUpgrader(self, self.sqlite_db)
             self.upgrader.run()
@@ -36,17 +36,18 @@ DHT_TRACKER_MAX_RETRIES = 8
 MAX_TRACKER_MULTI_SCRAPE = 74
 
 
-def create_tracker_session(tracker_url, timeout):
+def create_tracker_session(tracker_url, timeout, udp_socket=None):
     """
     Creates a tracker session with the given tracker URL.
     :param tracker_url: The given tracker URL.
     :param timeout: The timeout for the session.
+    :param udp_socket: The (optional) UDPScraperSocket shared by all UDP tracker sessions.
     :return: The tracker session.
     """
     tracker_type, tracker_address, announce_page = parse_tracker_url(tracker_url)
 
     if tracker_type == u'udp':
-        return UdpTrackerSession(tracker_url, tracker_address, announce_page, timeout)
+        return UdpTrackerSession(tracker_url, tracker_address, announce_page, timeout, udp_socket=udp_socket)
     else:
         return HttpTrackerSession(tracker_url, tracker_address, announce_page, timeout)
 
@@ -334,20 +335,97 @@ class HttpTrackerSession(TrackerSession):
         self.result_deferred = None
 
 
+class UDPScraperSocket(DatagramProtocol):
+    """
+    A single UDP socket that is shared by the scrapers of many concurrent UDP tracker sessions.
+    Every request carries a transaction ID, responses are dispatched to the scraper that sent the
+    request with the same transaction ID.
+    """
+
+    def __init__(self):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.scrapers = {}
+        self.listening_port = None
+
+    def start(self, port=0):
+        """
+        Starts listening on the given UDP port (by default a random one).
+        """
+        self.listening_port = reactor.listenUDP(port, self)
+
+    def stop(self):
+        """
+        Stops listening and forgets about all scrapers.
+        :return: A deferred that fires once the socket has been closed.
+        """
+        self.scrapers = {}
+        if self.listening_port:
+            listening_port, self.listening_port = self.listening_port, None
+            return maybeDeferred(listening_port.stopListening)
+        return defer.succeed(True)
+
+    def write(self, scraper, data):
+        """
+        Sends a request of a scraper to its tracker and remembers the scraper to dispatch the response to.
+        :param scraper: The UDPScraper sending the request.
+        :param data: The serialized request, starting with connection ID, action and transaction ID.
+        """
+        if scraper.transaction_id is not None and self.scrapers.get(scraper.transaction_id) is scraper:
+            del self.scrapers[scraper.transaction_id]
+
+        scraper.transaction_id = struct.unpack_from('!i', data, 12)[0]
+        self.scrapers[scraper.transaction_id] = scraper
+
+        if not self.transport:
+            self._logger.warning("Shared UDP scraper socket is not listening, dropping request")
+            return
+        self.transport.write(data, (scraper.ip_address, scraper.port))
+
+    def unregister(self, scraper):
+        """
+        Stops dispatching responses to the given scraper.
+        """
+        if scraper.transaction_id is not None and self.scrapers.get(scraper.transaction_id) is scraper:
+            del self.scrapers[scraper.transaction_id]
+
+    def datagramReceived(self, data, (host, port)):
+        """
+        Dispatches a response of a tracker to the scraper that is waiting for it.
+        """
+        if len(data) < 8:
+            self._logger.debug("Ignoring too short UDP tracker response from %s:%s", host, port)
+            return
+
+        transaction_id = struct.unpack_from('!i', data, 4)[0]
+        scraper = self.scrapers.get(transaction_id)
+        if scraper is None or scraper.port != port or scraper.ip_address != host:
+            self._logger.debug("Ignoring unexpected UDP tracker response from %s:%s", host, port)
+            return
+
+        scraper.datagramReceived(data, (host, port))
+
+    def get_num_scrapers(self):
+        return len(self.scrapers)
+
+
 class UDPScraper(DatagramProtocol):
     """
     The UDP scraper connects to a UDP tracker and queries
     seeders and leechers for every infohash appended to the UDPsession.
     All data received is given to the UDP session it's associated with.
+    When a UDPScraperSocket is given, the scraper sends its requests over that shared socket
+    instead of listening on a socket of its own.
     """
 
     _reactor = reactor
 
-    def __init__(self, udpsession, ip_address, port, timeout):
+    def __init__(self, udpsession, ip_address, port, timeout, udp_socket=None):
         self._logger = logging.getLogger(self.__class__.__name__)
         self.udpsession = udpsession
         self.ip_address = ip_address
         self.port = port
+        self.udp_socket = udp_socket
+        self.transaction_id = None
         self.expect_connection_response = True
         # Timeout after x seconds if nothing received.
         self.timeout = timeout
@@ -369,6 +447,10 @@ class UDPScraper(DatagramProtocol):
         if self.timeout_call.active():
             self.timeout_call.cancel()
 
+        if self.udp_socket:
+            self.udp_socket.unregister(self)
+            return defer.succeed(True)
+
         if self.transport and self.numPorts and self.transport.connected:
             return maybeDeferred(self.transport.stopListening)
         return defer.succeed(True)
@@ -387,7 +469,10 @@ class UDPScraper(DatagramProtocol):
         This function can be called to send serialized data to the tracker.
         :param data: The serialized data to be send.
         """
-        self.transport.write(data)  # no need to pass the ip and port
+        if self.udp_socket:
+            self.udp_socket.write(self, data)
+        else:
+            self.transport.write(data)  # no need to pass the ip and port
 
     def datagramReceived(self, data, (_host, _port)):
         """
@@ -430,12 +515,13 @@ class UdpTrackerSession(TrackerSession):
     # A list of transaction IDs that have been used in order to avoid conflict.
     _active_session_dict = dict()
 
-    def __init__(self, tracker_url, tracker_address, announce_page, timeout):
+    def __init__(self, tracker_url, tracker_address, announce_page, timeout, udp_socket=None):
         super(UdpTrackerSession, self).__init__(u'udp', tracker_url, tracker_address, announce_page, timeout)
         self._connection_id = 0
         self._transaction_id = 0
         self.port = tracker_address[1]
         self.ip_address = None
+        self.udp_socket = udp_socket
         self.scraper = None
         self.ip_resolve_deferred = None
         self.clean_defer_list = []
@@ -473,9 +559,12 @@ class UdpTrackerSession(TrackerSession):
         :param start_scraper: Whether we should start the scraper immediately.
         """
         self.ip_address = ip_address
-        self.scraper = UDPScraper(self, self.ip_address, self.port, self.timeout)
+        self.scraper = UDPScraper(self, self.ip_address, self.port, self.timeout, udp_socket=self.udp_socket)
         if start_scraper:
-            reactor.listenUDP(0, self.scraper)
+            if self.udp_socket:
+                self.on_start()
+            else:
+                reactor.listenUDP(0, self.scraper)
 
     def failed(self, msg=None):
         """
@@ -500,7 +589,7 @@ class UdpTrackerSession(TrackerSession):
         while True:
             # make sure there is no duplicated transaction IDs
             transaction_id = random.randint(0, MAX_INT32)
-            if transaction_id not in UdpTrackerSession._active_session_dict.items():
+            if transaction_id not in UdpTrackerSession._active_session_dict.values():
                 UdpTrackerSession._active_session_dict[self] = transaction_id
                 self._transaction_id = transaction_id
                 break
@@ -728,8 +817,10 @@ class FakeDHTSession(TrackerSession):
             self.result_deferred.errback(Failure(RuntimeError("DHT timeout")))
 
         if self._session:
+            # The torrent store has no information about the swarm, so the metainfo is always fetched from the DHT
             self._session.lm.ltmgr.get_metainfo(self.infohash, callback=on_metainfo_received,
-                                                timeout_callback=on_metainfo_timeout, timeout=self.timeout)
+                                                timeout_callback=on_metainfo_timeout, timeout=self.timeout,
+                                                use_store=False)
 
         return self.result_deferred
 
@@ -1,21 +1,30 @@
 import logging
 import time
-from binascii import hexlify
-from twisted.internet import reactor
+from binascii import hexlify, unhexlify
+from collections import deque
+from heapq import heappush, heappop
 from twisted.internet.defer import DeferredList, CancelledError, fail, succeed
 from twisted.internet.error import ConnectingCancelledError
+from twisted.internet.task import LoopingCall
 from twisted.python.failure import Failure
 
-from Tribler.Core.TorrentChecker.session import create_tracker_session, FakeDHTSession
+from Tribler.Core.TorrentChecker.session import create_tracker_session, FakeDHTSession, UDPScraperSocket, \
+    MAX_TRACKER_MULTI_SCRAPE
 from Tribler.Core.Utilities.tracker_utils import MalformedTrackerURLException
 from Tribler.Core.simpledefs import NTFY_TORRENTS
 from Tribler.dispersy.taskmanager import TaskManager
 from Tribler.dispersy.util import blocking_call_on_reactor_thread, call_on_reactor_thread
 
 # some settings
-DEFAULT_TORRENT_SELECTION_INTERVAL = 20  # every 20 seconds, the thread will select torrents to check
+DEFAULT_TORRENT_SELECTION_INTERVAL = 5  # every 5 seconds, the scheduler will start the scrapes that are due
 DEFAULT_TORRENT_CHECK_INTERVAL = 900  # base multiplier for the check delay
 
+DEFAULT_MAX_CONCURRENT_SCRAPES = 20  # max number of trackers that are scraped at the same time
+DEFAULT_TRACKER_SCRAPE_INTERVAL = 30  # min interval between two scrapes of the same tracker
+DEFAULT_TRACKER_IDLE_INTERVAL = 600  # interval to look again at a tracker without torrents that need a check
+DEFAULT_RESULT_FLUSH_INTERVAL = 5  # interval to write the received results to the database
+DEFAULT_RESULT_FLUSH_SIZE = 500  # number of pending results that triggers a write to the database
+
 DEFAULT_MAX_TORRENT_CHECK_RETRIES = 8  # max check delay increments when failed.
 DEFAULT_TORRENT_CHECK_RETRY_INTERVAL = 30  # interval when the torrent was successfully checked for the last time
 
@@ -38,13 +47,34 @@ class TorrentChecker(TaskManager):
         self._session_list = {'DHT': []}
         self._last_torrent_selection_time = 0
 
+        # The trackers that should be scraped, as a heap of (due time, tracker URL) tuples
+        self._tracker_queue = []
+        self._queued_trackers = set()
+        self._tracker_next_scrape = {}
+        self._active_scrapes = {}
+        self._max_concurrent_scrapes = DEFAULT_MAX_CONCURRENT_SCRAPES
+        self._tracker_scrape_interval = DEFAULT_TRACKER_SCRAPE_INTERVAL
+        self._tracker_idle_interval = DEFAULT_TRACKER_IDLE_INTERVAL
+
+        # The results of the automatic checks, written to the database in batches
+        self._pending_results = []
+        self._check_history = deque()
+
+        self.udp_socket = None
+
         # Track all session cleanups
         self.session_stop_defer_list = []
 
     @blocking_call_on_reactor_thread
     def initialize(self):
         self._torrent_db = self.tribler_session.open_dbhandler(NTFY_TORRENTS)
+
+        self.udp_socket = UDPScraperSocket()
+        self.udp_socket.start()
+
         self._reschedule_tracker_select()
+        self.register_task(u"torrent_checker_flush_results", LoopingCall(self._flush_torrent_results))\
+            .start(DEFAULT_RESULT_FLUSH_INTERVAL, now=False)
 
     def shutdown(self):
         """
@@ -57,12 +87,19 @@ class TorrentChecker(TaskManager):
 
         self.cancel_all_pending_tasks()
 
+        if self._torrent_db:
+            self._flush_torrent_results()
+
         # kill all the tracker sessions.
         # Wait for the defers to all have triggered by using a DeferredList
         for tracker_url in self._session_list.keys():
             for session in self._session_list[tracker_url]:
                 self.session_stop_defer_list.append(session.cleanup())
 
+        if self.udp_socket:
+            self.session_stop_defer_list.append(self.udp_socket.stop())
+            self.udp_socket = None
+
         defer_stop_list = DeferredList(self.session_stop_defer_list)
 
         self._session_list = None
@@ -74,59 +111,166 @@ class TorrentChecker(TaskManager):
 
     def _reschedule_tracker_select(self):
         """
-        Changes the tracker selection interval dynamically and schedules the task.
+        Schedules the task that starts the scrapes of the trackers that are due.
         """
-        # dynamically change the interval: update at least every 2h
-        num_torrents = self._torrent_db.getNumberCollectedTorrents()
+        self.register_task(u"torrent_checker_tracker_selection", LoopingCall(self._task_select_tracker))\
+            .start(DEFAULT_TORRENT_SELECTION_INTERVAL, now=False)
 
-        tracker_select_interval = min(max(7200 / num_torrents, 10), 100) if num_torrents \
-            else DEFAULT_TORRENT_SELECTION_INTERVAL
-
-        self._logger.debug(u"tracker selection interval changed to %s", tracker_select_interval)
+    def _schedule_tracker(self, tracker_url, due_time):
+        """
+        Puts a tracker in the queue of trackers to scrape.
+        """
+        if tracker_url in self._queued_trackers:
+            return
+        heappush(self._tracker_queue, (due_time, tracker_url))
+        self._queued_trackers.add(tracker_url)
 
-        self.register_task(u"torrent_checker_tracker_selection",
-                           reactor.callLater(tracker_select_interval, self._task_select_tracker))
+    def _refresh_tracker_queue(self):
+        """
+        Adds the trackers that are neither queued nor being scraped to the tracker queue. A tracker is due when both
+        the tracker manager allows a check (failing trackers back off) and the tracker has not been scraped in the
+        last tracker scrape interval.
+        """
+        for tracker_url, next_check_time in self.tribler_session.lm.tracker_manager.get_trackers_for_auto_check():
+            if tracker_url not in self._queued_trackers and tracker_url not in self._active_scrapes:
+                self._schedule_tracker(tracker_url, max(next_check_time, self._tracker_next_scrape.get(tracker_url, 0)))
 
     def _task_select_tracker(self):
         """
-        The regularly scheduled task that selects torrents associated with a specific tracker to check.
+        The regularly scheduled task that fills the free scrape slots with the trackers that are due. It does not wait
+        for the scrapes, so the slots of the scrapes that finish early are filled again at the next tick.
         """
+        self._start_due_scrapes()
 
-        # update the torrent selection interval
-        self._reschedule_tracker_select()
+    def _start_due_scrapes(self):
+        """
+        Starts scraping the trackers that are due, as long as the maximum number of concurrent scrapes has not been
+        reached.
+        :return: A DeferredList that fires when all the started scrapes have finished.
+        """
+        self._refresh_tracker_queue()
 
-        # start selecting torrents
-        result = self.tribler_session.lm.tracker_manager.get_next_tracker_for_auto_check()
-        if result is None:
-            self._logger.warn(u"No tracker to select from, skip")
-            return succeed(None)
+        current_time = time.time()
+        deferreds = []
+        while self._tracker_queue and self._tracker_queue[0][0] <= current_time \
+                and len(self._active_scrapes) < self._max_concurrent_scrapes:
+            _, tracker_url = heappop(self._tracker_queue)
+            self._queued_trackers.discard(tracker_url)
+            deferreds.append(self._scrape_tracker(tracker_url))
+
+        if not deferreds and not self._tracker_queue:
+            self._logger.debug(u"No tracker to select from, skip")
 
-        tracker_url, _ = result
-        self._logger.debug(u"Start selecting torrents on tracker %s.", tracker_url)
+        return DeferredList(deferreds)
+
+    def _scrape_tracker(self, tracker_url):
+        """
+        Scrapes the torrents on a tracker that need a check, as many as fit in a single scrape request.
+        """
+        current_time = int(time.time())
 
         # get the torrents that should be checked
-        infohashes = self._torrent_db.getTorrentsOnTracker(tracker_url, int(time.time()))
+        infohashes = self._torrent_db.getTorrentsOnTracker(tracker_url, current_time, limit=MAX_TRACKER_MULTI_SCRAPE)
 
         if len(infohashes) == 0:
             # We have not torrent to recheck for this tracker. Still update the last_check for this tracker.
-            self._logger.info("No torrent to check for tracker %s", tracker_url)
+            self._logger.debug("No torrent to check for tracker %s", tracker_url)
             self.tribler_session.lm.tracker_manager.update_tracker_info(tracker_url, True)
+            self._tracker_next_scrape[tracker_url] = current_time + self._tracker_idle_interval
             return succeed(None)
-        elif tracker_url != u'DHT' and tracker_url != u'no-DHT'\
-                and self.tribler_session.lm.tracker_manager.should_check_tracker(tracker_url):
 
-            try:
-                session = self._create_session_for_request(tracker_url, timeout=30)
-            except MalformedTrackerURLException as e:
-                self._logger.error(e)
-                return succeed(None)
+        try:
+            session = self._create_session_for_request(tracker_url, timeout=30)
+        except MalformedTrackerURLException as e:
+            self._logger.error(e)
+            self._tracker_next_scrape[tracker_url] = current_time + self._tracker_idle_interval
+            return succeed(None)
 
-            for infohash in infohashes:
-                session.add_infohash(infohash)
+        for infohash in infohashes:
+            session.add_infohash(infohash)
+
+        # When the scrape is full, there are probably more torrents that need a check on this tracker
+        is_full = len(infohashes) == MAX_TRACKER_MULTI_SCRAPE
+        self._active_scrapes[tracker_url] = session
+
+        def on_scrape_finished(_):
+            self._active_scrapes.pop(tracker_url, None)
+            interval = self._tracker_scrape_interval if is_full else self._tracker_idle_interval
+            self._tracker_next_scrape[tracker_url] = int(time.time()) + interval
+            self._clean_failed_session(session, None)
+
+        self._logger.info(u"Selected %d new torrents to check on tracker: %s", len(infohashes), tracker_url)
+        return session.connect_to_tracker().addCallbacks(*self.get_callbacks_for_session(session))\
+            .addCallback(self._on_scrape_results)\
+            .addErrback(self._on_scrape_error, tracker_url)\
+            .addBoth(on_scrape_finished)
+
+    def _on_scrape_error(self, failure, tracker_url):
+        """
+        Logs the failure of an automatic scrape. The session errors have already been logged by on_session_error.
+        """
+        if failure.check(ValueError, CancelledError, ConnectingCancelledError, RuntimeError) is None:
+            self._logger.error(u"Failed to scrape tracker %s: %s", tracker_url, failure.getErrorMessage())
+
+    def _on_scrape_results(self, result):
+        """
+        Queues the results of an automatic scrape, they are written to the database in batches.
+        """
+        if not result or self._should_stop:
+            return
+
+        current_time = time.time()
+        num_results = 0
+        for response_list in result.itervalues():
+            for response in response_list:
+                self._pending_results.append({'infohash': unhexlify(response['infohash']),
+                                              'seeders': response['seeders'], 'leechers': response['leechers'],
+                                              'last_check': current_time})
+                num_results += 1
+
+        self._check_history.append((current_time, num_results))
+
+        if len(self._pending_results) >= DEFAULT_RESULT_FLUSH_SIZE:
+            self._flush_torrent_results()
+
+    def _flush_torrent_results(self):
+        """
+        Writes the queued results of the automatic scrapes to the database in a single batch.
+        """
+        if not self._pending_results:
+            return
+
+        pending_results, self._pending_results = self._pending_results, []
+
+        check_info = self._torrent_db.getTorrentsCheckRetries([response['infohash'] for response in pending_results])
+        db_results = []
+        for response in pending_results:
+            if response['infohash'] not in check_info:
+                continue
+            torrent_id, retries = check_info[response['infohash']]
+            status, retries, next_check = self._get_check_status(response['seeders'], response['last_check'], retries)
+            db_results.append((torrent_id, response['infohash'], response['seeders'], response['leechers'],
+                               response['last_check'], next_check, status, retries))
+
+        self._torrent_db.updateTorrentCheckResults(db_results)
+
+    def get_checks_per_minute(self):
+        """
+        Returns the number of torrents that have been checked automatically in the last minute.
+        """
+        minute_ago = time.time() - 60
+        while self._check_history and self._check_history[0][0] < minute_ago:
+            self._check_history.popleft()
+        return sum(num_checks for _, num_checks in self._check_history)
 
-            self._logger.info(u"Selected %d new torrents to check on tracker: %s", len(infohashes), tracker_url)
-            return session.connect_to_tracker().addCallbacks(*self.get_callbacks_for_session(session))\
-                .addErrback(lambda _: None)
+    def get_statistics(self):
+        """
+        Returns statistics about the automatic torrent checks.
+        """
+        return {"checks_per_minute": self.get_checks_per_minute(),
+                "active_scrapes": len(self._active_scrapes),
+                "queued_trackers": len(self._tracker_queue),
+                "pending_results": len(self._pending_results)}
 
     def get_callbacks_for_session(self, session):
         success_lambda = lambda info_dict: self._on_result_from_session(session, info_dict)
@@ -206,6 +350,85 @@ class TorrentChecker(TaskManager):
         return DeferredList(deferred_list, consumeErrors=True).addCallback(
             lambda res: self.on_gui_request_completed(infohash, res))
 
+    @call_on_reactor_thread
+    def check_torrents(self, infohashes, timeout=20):
+        """
+        Public API for checking the health of many torrents at once. The torrents are grouped by tracker, so every
+        tracker is scraped with as few multi-infohash scrape requests as possible. The DHT can only look up one torrent
+        at a time, so it is only used for the torrents that have no tracker. Torrents that have been checked within
+        the torrent check interval are skipped.
+        :param infohashes: The infohashes of the torrents to check.
+        :param timeout: The timeout to use in the performed requests
+        :return: A deferred that fires with a dictionary of infohash -> (seeders, leechers) of the checked torrents.
+        """
+        trackers = self._torrent_db.getTrackersOfTorrents(infohashes,
+                                                          checked_before=time.time() - self._torrent_check_interval)
+        dht_infohashes = set(trackers.pop(u'DHT', []))
+        trackers.pop(u'no-DHT', None)
+        for tracker_infohashes in trackers.itervalues():
+            dht_infohashes.difference_update(tracker_infohashes)
+
+        deferred_list = []
+        for infohash in dht_infohashes:
+            session = FakeDHTSession(self.tribler_session, infohash, timeout)
+            self._session_list['DHT'].append(session)
+            deferred_list.append(session.connect_to_tracker()
+                                 .addCallbacks(*self.get_callbacks_for_session(session))
+                                 .addErrback(lambda failure, s=session: self._clean_failed_session(s, failure)))
+
+        for tracker_url, tracker_infohashes in trackers.iteritems():
+            for start in xrange(0, len(tracker_infohashes), MAX_TRACKER_MULTI_SCRAPE):
+                try:
+                    session = self._create_session_for_request(tracker_url, timeout=timeout)
+                except MalformedTrackerURLException as e:
+                    self._logger.error(e)
+                    break
+
+                for infohash in tracker_infohashes[start:start + MAX_TRACKER_MULTI_SCRAPE]:
+                    session.add_infohash(infohash)
+                deferred_list.append(session.connect_to_tracker()
+                                     .addCallbacks(*self.get_callbacks_for_session(session))
+                                     .addErrback(lambda failure, s=session: self._clean_failed_session(s, failure)))
+
+        self._logger.info(u"Checking %d torrents with %d scrape requests and %d DHT lookups", len(infohashes),
+                          len(deferred_list) - len(dht_infohashes), len(dht_infohashes))
+        return DeferredList(deferred_list, consumeErrors=True).addCallback(self._on_check_torrents_completed)
+
+    def _clean_failed_session(self, session, failure):
+        # Successful sessions are cleaned when their result comes in, clean the failed ones as well
+        if self._session_list and session in self._session_list.get(session.tracker_url, []):
+            self._session_list[session.tracker_url].remove(session)
+            self.session_stop_defer_list.append(session.cleanup())
+        return failure
+
+    def _on_check_torrents_completed(self, result):
+        """
+        Writes the best result of every checked torrent over all its trackers to the database, in a single batch.
+        """
+        health = {}
+        for success, response in result:
+            if not success or not response:
+                continue
+            for response_list in response.itervalues():
+                for torrent_response in response_list:
+                    infohash = unhexlify(torrent_response['infohash'])
+                    seeders, leechers = torrent_response['seeders'], torrent_response['leechers']
+                    if infohash not in health or seeders > health[infohash][0] or \
+                            (seeders == health[infohash][0] and leechers < health[infohash][1]):
+                        health[infohash] = (seeders, leechers)
+
+        if self._should_stop:
+            return health
+
+        current_time = time.time()
+        for infohash, (seeders, leechers) in health.iteritems():
+            self._pending_results.append({'infohash': infohash, 'seeders': seeders, 'leechers': leechers,
+                                          'last_check': current_time})
+        self._check_history.append((current_time, len(health)))
+        self._flush_torrent_results()
+
+        return health
+
     def on_session_error(self, session, failure):
         """
         Handles the scenario of when a tracker session has failed by calling the
@@ -226,7 +449,7 @@ class TorrentChecker(TaskManager):
         return failure
 
     def _create_session_for_request(self, tracker_url, timeout=20):
-        session = create_tracker_session(tracker_url, timeout)
+        session = create_tracker_session(tracker_url, timeout, udp_socket=self.udp_socket)
 
         if tracker_url not in self._session_list:
             self._session_list[tracker_url] = []
@@ -261,8 +484,17 @@ class TorrentChecker(TaskManager):
 
         result = self._torrent_db.getTorrent(infohash, (u'torrent_id', u'tracker_check_retries'), include_mypref=False)
         torrent_id = result[u'torrent_id']
-        retries = result[u'tracker_check_retries']
+        status, retries, next_check = self._get_check_status(seeders, last_check, result[u'tracker_check_retries'])
 
+        self._torrent_db.updateTorrentCheckResult(torrent_id,
+                                                  infohash, seeders, leechers, last_check, next_check,
+                                                  status, retries)
+
+    def _get_check_status(self, seeders, last_check, retries):
+        """
+        Determines the status of a checked torrent and when it should be checked again.
+        :return: A (status, retries, next_check) tuple.
+        """
         # the status logic
         if seeders > 0:
             retries = 0
@@ -278,7 +510,4 @@ class TorrentChecker(TaskManager):
 
         # calculate next check time: <last-time> + <interval> * (2 ^ <retries>)
         next_check = last_check + self._torrent_check_retry_interval * (2 ** retries)
-
-        self._torrent_db.updateTorrentCheckResult(torrent_id,
-                                                  infohash, seeders, leechers, last_check, next_check,
-                                                  status, retries)
+        return status, retries, next_check
@@ -6,6 +6,7 @@ Author(s): Arno Bakker
 import logging
 import os
 import sys
+from bisect import bisect_right
 from hashlib import sha1
 from types import StringType, ListType, IntType, LongType
 
@@ -21,6 +22,90 @@ from Tribler.Core.simpledefs import INFOHASH_LENGTH
 from Tribler.dispersy.util import blocking_call_on_reactor_thread
 
 
+class TorrentFileTable(object):
+    """
+    Immutable, compact table of the files in a finalized torrent: the decoded unicode names, the lengths and the
+    cumulative offsets of the files in the torrent content, together with an index of the files by extension.
+    """
+
+    __slots__ = ('names', 'lengths', 'offsets', '_extensions', '_raw_paths', '_path_index')
+
+    def __init__(self, files, raw_paths=()):
+        """
+        :param files: iterable of (unicode filename, length) tuples, in torrent order
+        :param raw_paths: the path lists from the metainfo, used to look up a file by its path in the torrent
+        """
+        self.names = tuple(name for name, _ in files)
+        self.lengths = tuple(length for _, length in files)
+
+        offsets = [0]
+        for length in self.lengths:
+            offsets.append(offsets[-1] + length)
+        self.offsets = tuple(offsets)
+
+        extensions = {}
+        for index, name in enumerate(self.names):
+            ext = os.path.splitext(name)[1]
+            if ext != "" and ext[0] == ".":
+                ext = ext[1:]
+            extensions.setdefault(ext.lower(), []).append(index)
+        self._extensions = dict((ext, tuple(indices)) for ext, indices in extensions.iteritems())
+
+        self._raw_paths = tuple(raw_paths)
+        self._path_index = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(zip(self.names, self.lengths))
+
+    @property
+    def total_length(self):
+        return self.offsets[-1]
+
+    def get_files_with_length(self, exts=None):
+        """
+        Return a list of (filename, length) tuples, optionally only of the files with one of the given extensions.
+        """
+        if exts is None:
+            return zip(self.names, self.lengths)
+
+        indices = set()
+        for ext in exts:
+            indices.update(self._extensions.get(ext, ()))
+        return [(self.names[index], self.lengths[index]) for index in sorted(indices)]
+
+    def get_index_of_path(self, path):
+        """
+        Return the index of the file with the given path in the torrent (as built by maketorrent.pathlist2filename).
+        """
+        if self._path_index is None:
+            path_index = {}
+            for index, pathlist in enumerate(self._raw_paths):
+                path_index.setdefault(maketorrent.pathlist2filename(pathlist), index)
+            self._path_index = path_index
+
+        if path not in self._path_index:
+            raise ValueError("File not found in torrent")
+        return self._path_index[path]
+
+    def get_file_offset(self, index):
+        """
+        Return the offset of the first byte of the file with the given index in the torrent content.
+        """
+        return self.offsets[index]
+
+    def get_file_index_at_offset(self, offset):
+        """
+        Return the index of the file containing the byte at the given offset in the torrent content.
+        """
+        if not 0 <= offset < self.total_length:
+            raise ValueError("Offset %d out of range" % offset)
+        # Files of zero length share their offset with the next file, bisect_right skips over them
+        return bisect_right(self.offsets, offset) - 1
+
+
 class TorrentDef(object):
 
     """
@@ -42,6 +127,7 @@ class TorrentDef(object):
         assert infohash is None or len(infohash) == INFOHASH_LENGTH, "INFOHASH has invalid length: %d" % len(infohash)
 
         self._logger = logging.getLogger(self.__class__.__name__)
+        self._file_table = None
 
         if input is not None:  # copy constructor
             self.input = input
@@ -66,6 +152,16 @@ class TorrentDef(object):
         # tracker by default when Session::start_download() is called, if the
         # 'announce' field is the empty string.
 
+    @property
+    def metainfo(self):
+        return self._metainfo
+
+    @metainfo.setter
+    def metainfo(self, metainfo):
+        # The file table is decoded from the metainfo, so it is outdated as soon as the metainfo is replaced
+        self._metainfo = metainfo
+        self._file_table = None
+
     def __eq__(self, other):
         return (isinstance(other, TorrentDef) and
                 self.metainfo_valid == other.metainfo_valid and
@@ -678,23 +774,28 @@ class TorrentDef(object):
             # Single-file torrent
             yield self.get_name_as_unicode(), self.metainfo["info"]["length"]
 
+    def get_file_table(self):
+        """ Returns the table of files in the finalized torrent def. The table
+        is decoded once and reused until the metainfo changes.
+        @return A TorrentFileTable.
+        """
+        if not self.metainfo_valid:
+            raise NotYetImplementedException()  # must save first
+
+        if self._file_table is None:
+            info = self.metainfo["info"]
+            raw_paths = [file_dict.get("path.utf-8", file_dict.get("path", []))
+                         for file_dict in info.get("files", [])]
+            self._file_table = TorrentFileTable(list(self._get_all_files_as_unicode_with_length()), raw_paths)
+        return self._file_table
+
     def get_files_with_length(self, exts=None):
         """ The list of files in the finalized torrent def.
         @param exts (Optional) list of filename extensions (without leading .)
         to search for.
         @return A list of filenames.
         """
-        if not self.metainfo_valid:
-            raise NotYetImplementedException()  # must save first
-
-        videofiles = []
-        for filename, length in self._get_all_files_as_unicode_with_length():
-            prefix, ext = os.path.splitext(filename)
-            if ext != "" and ext[0] == ".":
-                ext = ext[1:]
-            if exts is None or ext.lower() in exts:
-                videofiles.append((filename, length))
-        return videofiles
+        return self.get_file_table().get_files_with_length(exts)
 
     def get_files(self, exts=None):
         return [filename for filename, _ in self.get_files_with_length(exts)]
@@ -743,20 +844,8 @@ class TorrentDef(object):
         if not self.metainfo_valid:
             raise NotYetImplementedException()  # must save first
 
-        info = self.metainfo['info']
-
-        if file is not None and 'files' in info:
-            for i in range(len(info['files'])):
-                file_dict = info['files'][i]
-
-                if 'path.utf-8' in file_dict:
-                    intorrentpath = maketorrent.pathlist2filename(file_dict['path.utf-8'])
-                else:
-                    intorrentpath = maketorrent.pathlist2filename(file_dict['path'])
-
-                if intorrentpath == file:
-                    return i
-            raise ValueError("File not found in torrent")
+        if file is not None and 'files' in self.metainfo['info']:
+            return self.get_file_table().get_index_of_path(file)
         else:
             raise ValueError("File not found in single-file torrent")
 
@@ -5,18 +5,26 @@ Author(s): Elric Milon
 """
 import logging
 import os
+import time
 from binascii import hexlify
+from itertools import islice
+from multiprocessing.pool import ThreadPool
 from shutil import rmtree
 from sqlite3 import Connection
 
 from Tribler.Core.CacheDB.SqliteCacheDBHandler import TorrentDBHandler
 from Tribler.Core.CacheDB.db_versions import LOWEST_SUPPORTED_DB_VERSION, LATEST_DB_VERSION
-from Tribler.Core.CacheDB.sqlitecachedb import str2bin
+from Tribler.Core.CacheDB.sqlitecachedb import bin2str, str2bin
 from Tribler.Core.Category.Category import Category
 from Tribler.Core.TorrentDef import TorrentDef
 from Tribler.Core.Utilities.search_utils import split_into_keywords
 
 
+UPGRADE_BATCH_SIZE = 1000  # The number of torrents that are upgraded in a single transaction
+UPGRADE_PARSE_THREADS = 4  # The number of worker threads that parse the torrent files of a batch
+CHECKPOINT_ENTRY = u"upgrade_checkpoint_%s"  # The MyInfo entry with the last torrent id handled by an upgrade step
+
+
 class VersionNoLongerSupportedError(Exception):
     pass
 
@@ -25,6 +33,71 @@ class DatabaseUpgradeError(Exception):
     pass
 
 
+def load_torrent_file(filepath):
+    """
+    Return the TorrentDef of a .torrent file, or None if there is no such file or if it cannot be parsed.
+    """
+    if not os.path.exists(filepath):
+        return None
+    try:
+        return TorrentDef.load(filepath)
+    except Exception:
+        logging.getLogger(__name__).warning(u"Could not load torrent file %s", filepath)
+        return None
+
+
+def load_torrent_data(torrent_data):
+    """
+    Return the TorrentDef of bencoded torrent data, or None if it cannot be parsed.
+    """
+    try:
+        return TorrentDef.load_from_memory(torrent_data)
+    except Exception:
+        logging.getLogger(__name__).warning(u"Could not load torrent data")
+        return None
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return u"%d:%02d:%02d" % (hours, minutes, seconds) if hours else u"%d:%02d" % (minutes, seconds)
+
+
+class UpgradeProgress(object):
+
+    """
+    Reports the number of items of an upgrade step that are done out of the total, and an estimate of the time that
+    the step still takes, through the status update function of the upgrader.
+    """
+
+    def __init__(self, status_update_func, description, total, done=0):
+        self.status_update_func = status_update_func
+        self.description = description
+        self.total = total
+        self.done = done
+        # A resumed step only estimates the remaining time from the items that are done in this run
+        self.start_done = done
+        self.start_time = time.time()
+
+    def get_eta(self):
+        """
+        Return the estimated number of seconds until all items are done, or None if there is no estimate yet.
+        """
+        done_now = self.done - self.start_done
+        elapsed = time.time() - self.start_time
+        if done_now <= 0 or elapsed <= 0:
+            return None
+        return max(0, self.total - self.done) * elapsed / done_now
+
+    def update(self, num_done):
+        self.done += num_done
+        status = u"%s %d/%d" % (self.description, self.done, self.total)
+        eta = self.get_eta()
+        if eta is not None and self.done < self.total:
+            status += u", %s remaining" % format_duration(eta)
+        self.status_update_func(status + u"...")
+
+
 class DBUpgrader(object):
 
     """
@@ -42,6 +115,25 @@ class DBUpgrader(object):
         self.failed = True
         self.torrent_collecting_dir = self.session.config.get_torrent_collecting_dir()
 
+    def _get_checkpoint(self, step):
+        """
+        Return the last torrent id that was handled by an interrupted upgrade step, or None if the step has not
+        been started.
+        """
+        checkpoint = self.db.fetchone(u"SELECT value FROM MyInfo WHERE entry == ?", (CHECKPOINT_ENTRY % step,))
+        return None if checkpoint is None else int(checkpoint)
+
+    def _set_checkpoint(self, step, torrent_id):
+        """
+        Record the last torrent id handled by an upgrade step. The checkpoint is committed together with the batch
+        of torrents that it covers, so a crashed upgrade continues after the last batch that was committed.
+        """
+        self.db.execute_write(u"INSERT OR REPLACE INTO MyInfo (entry, value) VALUES (?, ?)",
+                              (CHECKPOINT_ENTRY % step, torrent_id))
+
+    def _clear_checkpoint(self, step):
+        self.db.execute_write(u"DELETE FROM MyInfo WHERE entry == ?", (CHECKPOINT_ENTRY % step,))
+
     def start_migrate(self):
         """
         Starts migrating from Tribler 6.3 to 6.4.
@@ -206,45 +298,12 @@ DROP INDEX IF EXISTS bartercast_idx;
 DROP INDEX IF EXISTS Torrent_swift_torrent_hash_idx;
 """)
 
-        try:
-            next(self.db.execute(u"SELECT * From sqlite_master WHERE name == '_tmp_Torrent' and type == 'table';"))
-
-        except StopIteration:
-            # no _tmp_Torrent table, check if the current Torrent table is new
-            lines = [(0, u'torrent_id', u'integer', 1, None, 1),
-                     (1, u'infohash', u'text', 1, None, 0),
-                     (2, u'name', u'text', 0, None, 0),
-                     (3, u'torrent_file_name', u'text', 0, None, 0),
-                     (4, u'length', u'integer', 0, None, 0),
-                     (5, u'creation_date', u'integer', 0, None, 0),
-                     (6, u'num_files', u'integer', 0, None, 0),
-                     (7, u'thumbnail', u'integer', 0, None, 0),
-                     (8, u'insert_time', u'numeric', 0, None, 0),
-                     (9, u'secret', u'integer', 0, None, 0),
-                     (10, u'relevance', u'numeric', 0, u'0', 0),
-                     (11, u'source_id', u'integer', 0, None, 0),
-                     (12, u'category_id', u'integer', 0, None, 0),
-                     (13, u'status_id', u'integer', 0, u'0', 0),
-                     (14, u'num_seeders', u'integer', 0, None, 0),
-                     (15, u'num_leechers', u'integer', 0, None, 0),
-                     (16, u'comment', u'text', 0, None, 0),
-                     (17, u'dispersy_id', u'integer', 0, None, 0),
-                     (18, u'last_tracker_check', u'integer', 0, u'0', 0),
-                     (19, u'tracker_check_retries', u'integer', 0, u'0', 0),
-                     (20, u'next_tracker_check', u'integer', 0, u'0', 0)
-                     ]
-            i = 0
-            is_new = True
-            for line in self.db.execute(u"PRAGMA table_info(Torrent);"):
-                if line != lines[i]:
-                    is_new = False
-                    break
-                i += 1
-
-            if not is_new:
-                # create the temporary table
-                self.db.execute(u"""
-CREATE TABLE IF NOT EXISTS _tmp_Torrent (
+        checkpoint = self._get_checkpoint(u"22_to_23")
+        if checkpoint is None and not self._is_torrent_table_v23():
+            # A _tmp_Torrent table without a checkpoint is left behind by an upgrader that could not resume
+            self.db.execute(u"""
+DROP TABLE IF EXISTS _tmp_Torrent;
+CREATE TABLE _tmp_Torrent (
   torrent_id       integer PRIMARY KEY AUTOINCREMENT NOT NULL,
   infohash		   text NOT NULL,
   name             text,
@@ -268,46 +327,18 @@ CREATE TABLE IF NOT EXISTS _tmp_Torrent (
   next_tracker_check    integer DEFAULT 0
 );
 """)
+            checkpoint = 0
+            self._set_checkpoint(u"22_to_23", checkpoint)
 
-                # migrate Torrent table
-                keys = (u"torrent_id", u"infohash", u"name", u"torrent_file_name", u"length", u"creation_date",
-                        u"num_files", u"thumbnail", u"insert_time", u"secret", u"relevance", u"source_id",
-                        u"category_id", u"status_id", u"num_seeders", u"num_leechers", u"comment", u"dispersy_id",
-                        u"last_tracker_check", u"tracker_check_retries", u"next_tracker_check")
-
-                keys_str = u", ".join(keys)
-                values_str = u"?," * len(keys)
-                insert_stmt = u"INSERT INTO _tmp_Torrent(%s) VALUES(%s)" % (keys_str, values_str[:-1])
-                current_count = 0
+        if checkpoint is not None:
+            self._migrate_torrents_22_to_23(checkpoint)
+            self.status_update_func(u"All updated torrent entries inserted.")
 
-                results = self.db.execute(u"SELECT %s FROM Torrent;" % keys_str)
-                new_torrents = []
-                for torrent in results:
-                    torrent_id, infohash, name, torrent_file_name = torrent[:4]
-
-                    filepath = os.path.join(self.torrent_collecting_dir, hexlify(str2bin(infohash)) + u".torrent")
-
-                    # Check if we have the actual .torrent
-                    torrent_file_name = None
-                    if os.path.exists(filepath):
-                        torrent_file_name = filepath
-                        tdef = TorrentDef.load(filepath)
-                        # Use the name on the .torrent file instead of the one stored in the database.
-                        name = tdef.get_name_as_unicode() or name
-
-                    new_torrents.append((torrent_id, infohash, name, torrent_file_name) + torrent[4:])
-
-                    current_count += 1
-                    self.status_update_func(u"Upgrading database, %s records upgraded..." % current_count)
-
-                self.status_update_func(u"All torrent entries processed, inserting in database...")
-                self.db.executemany(insert_stmt, new_torrents)
-                self.status_update_func(u"All updated torrent entries inserted.")
-
-                self.db.execute(u"""
+            self.db.execute(u"""
 DROP TABLE IF EXISTS Torrent;
 ALTER TABLE _tmp_Torrent RENAME TO Torrent;
 """)
+            self._clear_checkpoint(u"22_to_23")
 
         # cleanup metadata tables
         self.db.execute(u"""
@@ -338,6 +369,87 @@ CREATE TABLE IF NOT EXISTS MetadataData (
         # update database version
         self.db.write_version(23)
 
+    def _is_torrent_table_v23(self):
+        """
+        Check whether the Torrent table already has the columns of database version 23.
+        """
+        lines = [(0, u'torrent_id', u'integer', 1, None, 1),
+                 (1, u'infohash', u'text', 1, None, 0),
+                 (2, u'name', u'text', 0, None, 0),
+                 (3, u'torrent_file_name', u'text', 0, None, 0),
+                 (4, u'length', u'integer', 0, None, 0),
+                 (5, u'creation_date', u'integer', 0, None, 0),
+                 (6, u'num_files', u'integer', 0, None, 0),
+                 (7, u'thumbnail', u'integer', 0, None, 0),
+                 (8, u'insert_time', u'numeric', 0, None, 0),
+                 (9, u'secret', u'integer', 0, None, 0),
+                 (10, u'relevance', u'numeric', 0, u'0', 0),
+                 (11, u'source_id', u'integer', 0, None, 0),
+                 (12, u'category_id', u'integer', 0, None, 0),
+                 (13, u'status_id', u'integer', 0, u'0', 0),
+                 (14, u'num_seeders', u'integer', 0, None, 0),
+                 (15, u'num_leechers', u'integer', 0, None, 0),
+                 (16, u'comment', u'text', 0, None, 0),
+                 (17, u'dispersy_id', u'integer', 0, None, 0),
+                 (18, u'last_tracker_check', u'integer', 0, u'0', 0),
+                 (19, u'tracker_check_retries', u'integer', 0, u'0', 0),
+                 (20, u'next_tracker_check', u'integer', 0, u'0', 0)
+                 ]
+        i = 0
+        for line in self.db.execute(u"PRAGMA table_info(Torrent);"):
+            if line != lines[i]:
+                return False
+            i += 1
+        return True
+
+    def _migrate_torrents_22_to_23(self, checkpoint):
+        """
+        Copy the torrents after the checkpoint to the _tmp_Torrent table, in batches of UPGRADE_BATCH_SIZE torrents
+        that are committed together with the checkpoint. The names are taken from the .torrent files, which are
+        loaded on worker threads.
+        """
+        keys = (u"torrent_id", u"infohash", u"name", u"torrent_file_name", u"length", u"creation_date",
+                u"num_files", u"thumbnail", u"insert_time", u"secret", u"relevance", u"source_id",
+                u"category_id", u"status_id", u"num_seeders", u"num_leechers", u"comment", u"dispersy_id",
+                u"last_tracker_check", u"tracker_check_retries", u"next_tracker_check")
+
+        keys_str = u", ".join(keys)
+        values_str = u"?," * len(keys)
+        insert_stmt = u"INSERT INTO _tmp_Torrent(%s) VALUES(%s)" % (keys_str, values_str[:-1])
+        select_stmt = u"SELECT %s FROM Torrent WHERE torrent_id > ? ORDER BY torrent_id LIMIT ?" % keys_str
+
+        progress = UpgradeProgress(self.status_update_func, u"Upgrading database, torrents upgraded:",
+                                   self.db.fetchone(u"SELECT COUNT(*) FROM Torrent"),
+                                   self.db.fetchone(u"SELECT COUNT(*) FROM Torrent WHERE torrent_id <= ?",
+                                                    (checkpoint,)))
+        pool = ThreadPool(UPGRADE_PARSE_THREADS)
+        try:
+            while True:
+                torrents = self.db.fetchall(select_stmt, (checkpoint, UPGRADE_BATCH_SIZE))
+                if not torrents:
+                    break
+
+                filepaths = [os.path.join(self.torrent_collecting_dir, hexlify(str2bin(torrent[1])) + u".torrent")
+                             for torrent in torrents]
+                new_torrents = []
+                for torrent, filepath, tdef in zip(torrents, filepaths, pool.map(load_torrent_file, filepaths)):
+                    torrent_id, infohash, name = torrent[:3]
+                    # Use the name on the .torrent file instead of the one stored in the database.
+                    torrent_file_name = None
+                    if tdef:
+                        torrent_file_name = filepath
+                        name = tdef.get_name_as_unicode() or name
+                    new_torrents.append((torrent_id, infohash, name, torrent_file_name) + torrent[4:])
+
+                checkpoint = torrents[-1][0]
+                self.db.executemany(insert_stmt, new_torrents)
+                self._set_checkpoint(u"22_to_23", checkpoint)
+                self.db.commit_now()
+                progress.update(len(torrents))
+        finally:
+            pool.close()
+            pool.join()
+
     def _upgrade_23_to_24(self):
         self.status_update_func(u"Upgrading database from v%s to v%s..." % (23, 24))
 
@@ -521,20 +633,27 @@ DROP TABLE IF EXISTS MetaDataTypes;
     def _upgrade_28_to_29(self):
         self.status_update_func(u"Upgrading FTS engine...")
 
-        self.db.execute(u"""
+        # An interrupted reindex continues with the index that it was building
+        if self._get_checkpoint(u"reindex") is None:
+            self.db.execute(u"""
 DROP TABLE IF EXISTS FullTextIndex;
 CREATE VIRTUAL TABLE FullTextIndex USING fts4(swarmname, filenames, fileextensions);
         """)
-        self.db.commit_now()
+            self._set_checkpoint(u"reindex", 0)
+            self.db.commit_now()
 
         self.status_update_func(u"Reindexing torrents...")
         self.reindex_torrents()
+        self._clear_checkpoint(u"reindex")
 
         # update database version
         self.db.write_version(29)
 
     def reimport_torrents(self):
         """Import all torrent files in the collected torrent dir, all the files already in the database will be ignored.
+
+        The torrents are parsed on worker threads and registered in batches of UPGRADE_BATCH_SIZE torrents, so the
+        torrents that were registered before an interruption are skipped the next time.
         """
         self.status_update_func("Opening TorrentDBHandler...")
         # TODO(emilon): That's a freakishly ugly hack.
@@ -543,16 +662,37 @@ CREATE VIRTUAL TABLE FullTextIndex USING fts4(swarmname, filenames, fileextensio
 
         # TODO(emilon): It would be nice to drop the corrupted torrent data from the store as a bonus.
         self.status_update_func("Registering recovered torrents...")
+        progress = UpgradeProgress(self.status_update_func, u"Registering recovered torrents, torrents checked:",
+                                   len(self.torrent_store))
+        pool = ThreadPool(UPGRADE_PARSE_THREADS)
         try:
-            for infoshash_str, torrent_data in self.torrent_store.iteritems():
-                self.status_update_func("> %s" % infoshash_str)
-                torrentdef = TorrentDef.load_from_memory(torrent_data)
-                if torrentdef.is_finalized():
-                    infohash = torrentdef.get_infohash()
-                    if not torrent_db_handler.hasTorrent(infohash):
-                        self.status_update_func(u"Registering recovered torrent: %s" % hexlify(infohash))
-                        torrent_db_handler._addTorrentToDB(torrentdef, extra_info={"filename": infoshash_str})
+            torrents = self.torrent_store.iteritems()
+            while True:
+                batch = list(islice(torrents, UPGRADE_BATCH_SIZE))
+                if not batch:
+                    break
+
+                torrentdefs = {}
+                parsed = pool.map(load_torrent_data, [torrent_data for _, torrent_data in batch])
+                for (infohash_str, _), torrentdef in zip(batch, parsed):
+                    if torrentdef and torrentdef.is_finalized():
+                        torrentdefs[torrentdef.get_infohash()] = (infohash_str, torrentdef)
+
+                parameters = u",".join(u"?" * len(torrentdefs))
+                registered = set(str2bin(infohash) for infohash, in self.db.fetchall(
+                    u"SELECT infohash FROM CollectedTorrent WHERE infohash IN (%s)" % parameters,
+                    [bin2str(infohash) for infohash in torrentdefs])) if torrentdefs else set()
+
+                for infohash, (infohash_str, torrentdef) in torrentdefs.iteritems():
+                    if infohash not in registered:
+                        self._logger.info(u"Registering recovered torrent: %s", hexlify(infohash))
+                        torrent_db_handler._addTorrentToDB(torrentdef, extra_info={"filename": infohash_str})
+
+                self.db.commit_now()
+                progress.update(len(batch))
         finally:
+            pool.close()
+            pool.join()
             torrent_db_handler.close()
             self.db.commit_now()
             return self.torrent_store.flush()
@@ -560,24 +700,46 @@ CREATE VIRTUAL TABLE FullTextIndex USING fts4(swarmname, filenames, fileextensio
     def reindex_torrents(self):
         """
         Reindex all torrents in the database. Required when upgrading to a newer FTS engine.
-        """
-        results = self.db.fetchall("SELECT torrent_id, name FROM Torrent")
-        for torrent_result in results:
-            if torrent_result[1] is None:
-                continue
 
-            swarmname = split_into_keywords(torrent_result[1])
-            files_results = self.db.fetchall("SELECT path FROM TorrentFiles WHERE torrent_id = ?", (torrent_result[0],))
-            filenames = ""
-            fileexts = ""
-            for file_result in files_results:
-                filename, ext = os.path.splitext(file_result[0])
-                parts = split_into_keywords(filename)
-                filenames += " ".join(parts) + " "
-                fileexts += ext[1:] + " "
-
-            self.db.execute_write(u"INSERT INTO FullTextIndex (rowid, swarmname, filenames, fileextensions)"
-                                  u" VALUES(?,?,?,?)",
-                                  (torrent_result[0], " ".join(swarmname), filenames[:-1], fileexts[:-1]))
+        The torrents are indexed in batches of UPGRADE_BATCH_SIZE torrents, with one query for the files of a batch.
+        Every batch is committed together with the reindex checkpoint, so an interrupted reindex does not start over.
+        """
+        last_torrent_id = self._get_checkpoint(u"reindex") or 0
+        progress = UpgradeProgress(self.status_update_func, u"Reindexing torrents, torrents indexed:",
+                                   self.db.fetchone(u"SELECT COUNT(*) FROM Torrent WHERE name IS NOT NULL"),
+                                   self.db.fetchone(u"SELECT COUNT(*) FROM Torrent"
+                                                    u" WHERE name IS NOT NULL AND torrent_id <= ?",
+                                                    (last_torrent_id,)))
+        while True:
+            results = self.db.fetchall(u"SELECT torrent_id, name FROM Torrent"
+                                       u" WHERE torrent_id > ? AND name IS NOT NULL ORDER BY torrent_id LIMIT ?",
+                                       (last_torrent_id, UPGRADE_BATCH_SIZE))
+            if not results:
+                break
+
+            first_torrent_id, last_torrent_id = results[0][0], results[-1][0]
+            torrent_files = {}
+            for torrent_id, path in self.db.fetchall(u"SELECT torrent_id, path FROM TorrentFiles"
+                                                     u" WHERE torrent_id BETWEEN ? AND ?",
+                                                     (first_torrent_id, last_torrent_id)):
+                torrent_files.setdefault(torrent_id, []).append(path)
+
+            values = []
+            for torrent_id, name in results:
+                swarmname = split_into_keywords(name)
+                filenames = ""
+                fileexts = ""
+                for path in torrent_files.get(torrent_id, []):
+                    filename, ext = os.path.splitext(path)
+                    parts = split_into_keywords(filename)
+                    filenames += " ".join(parts) + " "
+                    fileexts += ext[1:] + " "
+                values.append((torrent_id, " ".join(swarmname), filenames[:-1], fileexts[:-1]))
+
+            self.db.executemany(u"INSERT INTO FullTextIndex (rowid, swarmname, filenames, fileextensions)"
+                                u" VALUES(?,?,?,?)", values)
+            self._set_checkpoint(u"reindex", last_torrent_id)
+            self.db.commit_now()
+            progress.update(len(results))
 
         self.db.commit_now()
@@ -0,0 +1,45 @@
+"""
+A compact in-memory bloom filter for membership tests of local keys.
+"""
+from hashlib import sha1
+from math import ceil, log
+from struct import unpack_from
+
+
+class BloomFilter(object):
+    """
+    Bloom filter backed by a bytearray. Adding keys beyond the capacity raises the false positive rate, so the owner
+    should rebuild the filter with a larger capacity when num_keys exceeds the capacity.
+
+    Unlike the bloom filter of Dispersy, which is used to synchronize with other peers, this filter never leaves this
+    process, so its bits are kept in a mutable bytearray that is cheap to update.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        """
+        :param capacity: the number of keys for which the false positive rate is at most error_rate
+        :param error_rate: the false positive rate at capacity
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(ceil(-capacity * log(error_rate) / (log(2) ** 2))))
+        self.num_functions = max(1, int(round(self.num_bits * log(2) / capacity)))
+        self.num_keys = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _get_indices(self, key):
+        # Double hashing with two 64 bit halves of the digest
+        first, second = unpack_from(">QQ", sha1(key).digest())
+        return [(first + i * second) % self.num_bits for i in xrange(self.num_functions)]
+
+    def add(self, key):
+        for index in self._get_indices(key):
+            self._bits[index >> 3] |= 1 << (index & 7)
+        self.num_keys += 1
+
+    def __contains__(self, key):
+        bits = self._bits
+        for index in self._get_indices(key):
+            if not bits[index >> 3] & (1 << (index & 7)):
+                return False
+        return True
@@ -206,21 +206,66 @@ def _a_decode_bytes(stream, offset, count, _):
         raise ValueError("Invalid stream length", len(stream), offset + count)
 
 
+_a_digits = {str(digit): digit for digit in xrange(10)}
+
+
+def _a_decode_values(stream, offset, count, mapping):
+    """
+    'a2l1i41i2',3,2 --> 9,[4,2]
+
+    Decodes COUNT consecutive values. Single digit counts are looked up instead of parsed, and bytes, unicode and int
+    values, which make up most of the flat dictionaries and tuples in packets, are decoded inline instead of through
+    the mapping.
+    """
+    values = []
+    append = values.append
+    digits = _a_digits
+    length = len(stream)
+    try:
+        for _ in xrange(count):
+            value_type = stream[offset + 1]
+            if value_type in digits:
+                index = offset + 2
+                while stream[index] in digits:
+                    index += 1
+                size = int(stream[offset:index])
+                value_type = stream[index]
+                offset = index + 1
+            else:
+                size = digits[stream[offset]]
+                offset += 2
+
+            if value_type == "b":
+                end = offset + size
+                if end > length:
+                    raise ValueError("Invalid stream length", length, end)
+                append(stream[offset:end])
+                offset = end
+            elif value_type == "s":
+                end = offset + size
+                if end > length:
+                    raise ValueError("Invalid stream length", length, end)
+                append(stream[offset:end].decode("UTF-8"))
+                offset = end
+            elif value_type == "i":
+                end = offset + size
+                append(int(stream[offset:end]))
+                offset = end
+            else:
+                offset, value = mapping[value_type](stream, offset, size, mapping)
+                append(value)
+    except (IndexError, KeyError):
+        raise ValueError("Invalid header", offset)
+
+    return offset, values
+
+
 def _a_decode_list(stream, offset, count, mapping):
     """
     'a1l3i123',3,1 --> 8,[123]
     'a2l1i41i2',3,1 --> 8,[4,2]
     """
-    container = []
-    for _ in range(count):
-
-        index = offset
-        while 48 <= ord(stream[index]) <= 57:
-            index += 1
-        offset, value = mapping[stream[index]](stream, index + 1, int(stream[offset:index]), mapping)
-        container.append(value)
-
-    return offset, container
+    return _a_decode_values(stream, offset, count, mapping)
 
 
 def _a_decode_set(stream, offset, count, mapping):
@@ -228,16 +273,8 @@ def _a_decode_set(stream, offset, count, mapping):
     'a1L3i123',3,1 --> 8,set(123)
     'a2L1i41i2',3,1 --> 8,set(4,2)
     """
-    container = set()
-    for _ in range(count):
-
-        index = offset
-        while 48 <= ord(stream[index]) <= 57:
-            index += 1
-        offset, value = mapping[stream[index]](stream, index + 1, int(stream[offset:index]), mapping)
-        container.add(value)
-
-    return offset, container
+    offset, values = _a_decode_values(stream, offset, count, mapping)
+    return offset, set(values)
 
 
 def _a_decode_tuple(stream, offset, count, mapping):
@@ -245,36 +282,16 @@ def _a_decode_tuple(stream, offset, count, mapping):
     'a1t3i123',3,1 --> 8,[123]
     'a2t1i41i2',3,1 --> 8,[4,2]
     """
-    container = []
-    for _ in range(count):
-
-        index = offset
-        while 48 <= ord(stream[index]) <= 57:
-            index += 1
-        offset, value = mapping[stream[index]](stream, index + 1, int(stream[offset:index]), mapping)
-        container.append(value)
-
-    return offset, tuple(container)
+    offset, values = _a_decode_values(stream, offset, count, mapping)
+    return offset, tuple(values)
 
 
 def _a_decode_dictionary(stream, offset, count, mapping):
     """
     'a2d3sfoo3sbar3smoo4smilk',3,2 -> 24,{'foo':'bar', 'moo':'milk'}
     """
-    container = {}
-    for _ in range(count):
-
-        index = offset
-        while 48 <= ord(stream[index]) <= 57:
-            index += 1
-        offset, key = mapping[stream[index]](stream, index + 1, int(stream[offset:index]), mapping)
-
-        index = offset
-        while 48 <= ord(stream[index]) <= 57:
-            index += 1
-        offset, value = mapping[stream[index]](stream, index + 1, int(stream[offset:index]), mapping)
-
-        container[key] = value
+    offset, values = _a_decode_values(stream, offset, count * 2, mapping)
+    container = dict(zip(values[::2], values[1::2]))
 
     if len(container) < count:
         raise ValueError("Duplicate key in dictionary")
@@ -331,10 +348,8 @@ def decode(stream, offset=0):
     assert isinstance(stream, bytes), "STREAM has invalid type: %s" % type(stream)
     assert isinstance(offset, int), "OFFSET has invalid type: %s" % type(offset)
     if stream[offset] == "a":
-        index = offset + 1
-        while 48 <= ord(stream[index]) <= 57:
-            index += 1
-        return _a_decode_mapping[stream[index]](stream, index + 1, int(stream[offset + 1:index]), _a_decode_mapping)
+        offset, values = _a_decode_values(stream, offset + 1, 1, _a_decode_mapping)
+        return offset, values[0]
 
     raise ValueError("Unknown version found")
 
@@ -4,13 +4,20 @@ instrumentation.
 Author(s): Elric Milon
 """
 import threading
+from collections import Counter
 from decorator import decorator
-from os import sys
-from threading import Lock, RLock, Thread
+from os import path, sys
+from threading import Event, Lock, RLock, Thread
 from time import sleep, time
 
 MAX_SAME_STACK_TIME = 60
 
+REACTOR_LAG_INTERVAL = 0.1
+REACTOR_LAG_THRESHOLD = 0.1
+REACTOR_LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REACTOR_LAG_SAMPLE_INTERVAL = 0.01
+REACTOR_LAG_MAX_STACKS = 1000
+
 
 @decorator
 def synchronized(wrapped, instance, *args, **kwargs):
@@ -169,3 +176,173 @@ class WatchDog(Thread):
                 self.stacks.pop(thread_id)
                 self.times.pop(thread_id)
                 self.print_all_stacks()
+
+
+class ReactorLagMonitor(Thread):
+
+    """
+    Reactor lag monitor. A heartbeat that is rescheduled on the reactor every interval measures how late it gets
+    called (the scheduling delay) and keeps a histogram of those delays.
+
+    The monitor thread itself sleeps until the next heartbeat is overdue by more than the threshold. When that happens,
+    some callback is blocking the reactor and the stack of the reactor thread is sampled every sample interval until
+    the heartbeat comes through again. Samples are aggregated as collapsed stacks, the input format of flamegraph.pl.
+    """
+
+    def __init__(self, interval=REACTOR_LAG_INTERVAL, threshold=REACTOR_LAG_THRESHOLD,
+                 sample_interval=REACTOR_LAG_SAMPLE_INTERVAL, max_stacks=REACTOR_LAG_MAX_STACKS):
+        super(ReactorLagMonitor, self).__init__()
+        self.setDaemon(True)
+        self.setName(self.__class__.__name__)
+
+        self.interval = interval
+        self.threshold = threshold
+        self.sample_interval = sample_interval
+        self.max_stacks = max_stacks
+
+        self._reactor = None
+        self._heartbeat_dc = None
+        self._reactor_thread_id = None
+        self._last_heartbeat = None
+        self._stop_event = Event()
+
+        self.lag_histogram = [0] * (len(REACTOR_LAG_BUCKETS) + 1)
+        self.num_heartbeats = 0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.num_samples = 0
+        self.num_dropped_samples = 0
+        self.stack_samples = Counter()
+
+    def start(self, *argv, **kwargs):
+        from twisted.internet import reactor
+        self._reactor = reactor
+        self._stop_event.clear()
+        self._reactor.callFromThread(self._schedule_heartbeat)
+        return super(ReactorLagMonitor, self).start(*argv, **kwargs)
+
+    def stop(self):
+        """
+        Stop sampling and cancel the heartbeat. Can be called from any thread.
+        """
+        self._stop_event.set()
+        if self._reactor:
+            self._reactor.callFromThread(self._cancel_heartbeat)
+        if self.is_alive():
+            self.join()
+
+    def _schedule_heartbeat(self):
+        self._reactor_thread_id = threading.current_thread().ident
+        self._last_heartbeat = time()
+        if not self._stop_event.is_set():
+            self._heartbeat_dc = self._reactor.callLater(self.interval, self._heartbeat, self._last_heartbeat)
+
+    def _cancel_heartbeat(self):
+        if self._heartbeat_dc and self._heartbeat_dc.active():
+            self._heartbeat_dc.cancel()
+        self._heartbeat_dc = None
+
+    def _heartbeat(self, scheduled_at):
+        self.record_lag(time() - scheduled_at - self.interval)
+        self._schedule_heartbeat()
+
+    @synchronized
+    def record_lag(self, lag):
+        """
+        Add a measured scheduling delay (in seconds) to the histogram.
+        """
+        lag = max(lag, 0.0)
+        bucket = 0
+        while bucket < len(REACTOR_LAG_BUCKETS) and lag > REACTOR_LAG_BUCKETS[bucket]:
+            bucket += 1
+        self.lag_histogram[bucket] += 1
+        self.num_heartbeats += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+
+    @staticmethod
+    def collapse_stack(frame):
+        """
+        Convert a frame to a single collapsed stack line, outermost frame first.
+        """
+        frames = []
+        while frame:
+            code = frame.f_code
+            frames.append("%s (%s:%d)" % (code.co_name, path.basename(code.co_filename), code.co_firstlineno))
+            frame = frame.f_back
+        return ";".join(reversed(frames))
+
+    @synchronized
+    def add_sample(self, frame):
+        """
+        Aggregate a sampled stack of the reactor thread.
+        """
+        stack = self.collapse_stack(frame)
+        if stack not in self.stack_samples and len(self.stack_samples) >= self.max_stacks:
+            self.num_dropped_samples += 1
+            return
+        self.stack_samples[stack] += 1
+        self.num_samples += 1
+
+    def run(self):
+        while not self._stop_event.is_set():
+            last_heartbeat = self._last_heartbeat
+            if last_heartbeat is None:
+                self._stop_event.wait(self.interval)
+                continue
+
+            overdue = time() - last_heartbeat - self.interval
+            if overdue < self.threshold:
+                # Nothing to do until the next heartbeat is late, so sleep until then.
+                self._stop_event.wait(max(self.threshold - overdue, self.sample_interval))
+                continue
+
+            frame = sys._current_frames().get(self._reactor_thread_id)
+            if frame is not None:
+                self.add_sample(frame)
+            del frame
+            self._stop_event.wait(self.sample_interval)
+
+    @synchronized
+    def reset(self):
+        self.lag_histogram = [0] * (len(REACTOR_LAG_BUCKETS) + 1)
+        self.num_heartbeats = 0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.num_samples = 0
+        self.num_dropped_samples = 0
+        self.stack_samples = Counter()
+
+    @synchronized
+    def get_top_offenders(self, limit=10):
+        """
+        Return the most sampled stacks, with the innermost function of each stack as offender.
+        """
+        return [{"function": stack.rsplit(";", 1)[-1], "stack": stack, "samples": count,
+                 "time": count * self.sample_interval}
+                for stack, count in self.stack_samples.most_common(limit)]
+
+    @synchronized
+    def get_collapsed_stacks(self):
+        """
+        Return all sampled stacks in collapsed format, one "stack count" line each.
+        """
+        return "".join("%s %d\n" % (stack, count) for stack, count in sorted(self.stack_samples.iteritems()))
+
+    @synchronized
+    def get_statistics(self, limit=10):
+        """
+        Return a dictionary with the lag histogram and the most sampled stacks.
+        """
+        bucket_names = ["<=%s" % bound for bound in REACTOR_LAG_BUCKETS] + [">%s" % REACTOR_LAG_BUCKETS[-1]]
+        return {
+            "interval": self.interval,
+            "threshold": self.threshold,
+            "num_heartbeats": self.num_heartbeats,
+            "max_lag": self.max_lag,
+            "avg_lag": self.total_lag / self.num_heartbeats if self.num_heartbeats else 0.0,
+            "histogram": [{"bucket": name, "count": count} for name, count in zip(bucket_names, self.lag_histogram)],
+            "num_samples": self.num_samples,
+            "num_dropped_samples": self.num_dropped_samples,
+            "top_offenders": self.get_top_offenders(limit)
+        }
@@ -0,0 +1,194 @@
+"""
+An in-memory index of the terms in the names of the torrents, for autocompletion and search suggestions.
+"""
+from bisect import bisect_left, insort
+from heapq import nlargest
+
+FUZZY_PREFIX_LENGTH = 7  # Only the deletes of this many leading characters of a term are indexed
+MAX_FUZZY_TERM_LENGTH = 32  # Longer terms, which are mostly hashes and garbage, are not fuzzy indexed
+MAX_COMPLETION_CANDIDATES = 2000  # The maximum number of terms with a given prefix that are ranked
+MAX_PENDING_INSORTS = 100  # Above this number of new terms, the sorted terms are sorted again instead
+
+
+def levenshtein(a, b):
+    """
+    Calculates the Levenshtein distance between a and b.
+    """
+    n, m = len(a), len(b)
+    if n > m:
+        # Make sure n <= m, to use O(min(n,m)) space
+        a, b = b, a
+        n, m = m, n
+
+    current = range(n + 1)
+    for i in range(1, m + 1):
+        previous, current = current, [i] + [0] * n
+        for j in range(1, n + 1):
+            add, delete = previous[j] + 1, current[j - 1] + 1
+            change = previous[j - 1]
+            if a[j - 1] != b[i - 1]:
+                change = change + 1
+            current[j] = min(add, delete, change)
+
+    return current[n]
+
+
+def get_deletes(term, max_distance):
+    """
+    Return the strings that can be made by deleting at most max_distance characters from term, including term itself.
+    """
+    deletes = {term}
+    edge = {term}
+    for _ in xrange(max_distance):
+        edge = {variant[:i] + variant[i + 1:] for variant in edge for i in xrange(len(variant))} - deletes
+        deletes |= edge
+    return deletes
+
+
+class TermIndex(object):
+    """
+    Index of the terms of a set of documents, that answers prefix and fuzzy lookups without looking at every term.
+
+    Prefix lookups use a sorted list of the terms. Fuzzy lookups use a symmetric delete index: every term is stored
+    under the strings that can be made by deleting up to max_distance characters from its first FUZZY_PREFIX_LENGTH
+    characters, so all terms within max_distance edits of a query share such a string with one of the deletes of the
+    query. The index is updated incrementally when documents are added or removed.
+    """
+
+    def __init__(self, max_distance=1):
+        """
+        :param max_distance: the maximum Levenshtein distance of the terms returned by get_similar_terms
+        """
+        self.max_distance = max_distance
+        self.frequencies = {}  # Dictionary of term -> the number of documents with that term
+        self.sorted_terms = []
+        self.pending_terms = set()  # The new terms that are not in sorted_terms yet
+        self.deletes = {}  # Dictionary of delete -> term, or a list of terms when multiple terms share the delete
+        self.completions_cache = {}  # Dictionary of (prefix, max_terms) -> completions, for the short prefixes
+
+    def __len__(self):
+        return len(self.frequencies)
+
+    def __contains__(self, term):
+        return term in self.frequencies
+
+    def get_frequency(self, term):
+        return self.frequencies.get(term, 0)
+
+    def _get_term_deletes(self, term):
+        return get_deletes(term[:FUZZY_PREFIX_LENGTH], self.max_distance)
+
+    def add(self, terms):
+        """
+        Add the terms of a document to the index.
+        """
+        for term in set(terms):
+            frequency = self.frequencies.get(term, 0)
+            self.frequencies[term] = frequency + 1
+            if frequency:
+                continue
+
+            self.pending_terms.add(term)
+            self.completions_cache.clear()
+            if len(term) <= MAX_FUZZY_TERM_LENGTH:
+                for delete in self._get_term_deletes(term):
+                    other_terms = self.deletes.get(delete)
+                    if other_terms is None:
+                        self.deletes[delete] = term
+                    elif isinstance(other_terms, list):
+                        other_terms.append(term)
+                    else:
+                        self.deletes[delete] = [other_terms, term]
+
+    def remove(self, terms):
+        """
+        Remove the terms of a document that has been added before from the index.
+        """
+        for term in set(terms):
+            frequency = self.frequencies.get(term, 0)
+            if frequency > 1:
+                self.frequencies[term] = frequency - 1
+                continue
+            elif not frequency:
+                continue
+
+            del self.frequencies[term]
+            self.completions_cache.clear()
+            if term in self.pending_terms:
+                self.pending_terms.remove(term)
+            else:
+                index = bisect_left(self.sorted_terms, term)
+                del self.sorted_terms[index]
+
+            if len(term) <= MAX_FUZZY_TERM_LENGTH:
+                for delete in self._get_term_deletes(term):
+                    other_terms = self.deletes.get(delete)
+                    if isinstance(other_terms, list):
+                        other_terms.remove(term)
+                        if len(other_terms) == 1:
+                            self.deletes[delete] = other_terms[0]
+                    else:
+                        del self.deletes[delete]
+
+    def _merge_pending_terms(self):
+        if len(self.pending_terms) > MAX_PENDING_INSORTS:
+            self.sorted_terms.extend(self.pending_terms)
+            self.sorted_terms.sort()
+        else:
+            for term in self.pending_terms:
+                insort(self.sorted_terms, term)
+        self.pending_terms.clear()
+
+    def get_completions(self, prefix, max_terms):
+        """
+        Return the most frequent terms that start with prefix, not including prefix itself. For short prefixes, only
+        the first MAX_COMPLETION_CANDIDATES terms with that prefix are considered, and the completions are cached until
+        terms are added or removed.
+        """
+        completions = self.completions_cache.get((prefix, max_terms))
+        if completions is not None:
+            return completions
+
+        if self.pending_terms:
+            self._merge_pending_terms()
+
+        index = bisect_left(self.sorted_terms, prefix)
+        candidates = self.sorted_terms[index:index + MAX_COMPLETION_CANDIDATES]
+        if candidates and candidates[-1].startswith(prefix):
+            completions = nlargest(max_terms, (term for term in candidates if term != prefix),
+                                   key=self.frequencies.get)
+            self.completions_cache[(prefix, max_terms)] = completions
+            return completions
+
+        completions = []
+        for term in candidates:
+            if not term.startswith(prefix):
+                break
+            if term != prefix:
+                completions.append(term)
+        return nlargest(max_terms, completions, key=self.frequencies.get)
+
+    def get_similar_terms(self, term, max_distance=None):
+        """
+        Return the terms within max_distance (at most the max_distance of the index) edits of term, as a list of
+        (distance, term) tuples, sorted by distance and then by frequency.
+        """
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+
+        candidates = set()
+        for delete in get_deletes(term[:FUZZY_PREFIX_LENGTH], max_distance):
+            other_terms = self.deletes.get(delete)
+            if isinstance(other_terms, list):
+                candidates.update(other_terms)
+            elif other_terms is not None:
+                candidates.add(other_terms)
+
+        similar_terms = []
+        for candidate in candidates:
+            if abs(len(candidate) - len(term)) <= max_distance:
+                distance = levenshtein(term, candidate)
+                if distance <= max_distance:
+                    similar_terms.append((distance, candidate))
+
+        similar_terms.sort(key=lambda (distance, candidate): (distance, -self.frequencies[candidate], candidate))
+        return similar_terms
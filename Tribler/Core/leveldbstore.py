@@ -4,8 +4,8 @@ LevelDBStore.
 Author(s): Elric Milon
 """
 import os
+import zlib
 from collections import MutableMapping
-from itertools import chain
 
 from shutil import rmtree
 
@@ -36,27 +36,54 @@ except ImportError:
     get_write_batch = get_write_batch_plyvel
 
 from twisted.internet import reactor
+from twisted.internet.defer import Deferred, succeed
 from twisted.internet.task import LoopingCall
+from twisted.internet.threads import deferToThread
+from twisted.python.failure import Failure
 
+from Tribler.Core.Utilities.bloom_filter import BloomFilter
 from Tribler.dispersy.taskmanager import TaskManager
 
 
 WRITEBACK_PERIOD = 120
+WRITE_BATCH_SIZE = 1000  # The maximum number of changes in one write batch
+MAX_PENDING_SIZE = 16 * 1024 * 1024  # The number of bytes of pending values after which we flush early
+MIN_BLOOM_FILTER_CAPACITY = 100000  # The minimum number of keys the bloom filter is sized for
+BLOOM_FILTER_GROWTH = 4  # The factor by which the capacity of a rebuilt bloom filter exceeds the number of keys
+COMPRESSED_VALUE_PREFIX = "\x00zlib"  # The prefix of compressed values in the database
+
+# Pending value of a key that is deleted
+DELETED = object()
 
 # TODO(emilon): Make sure the caching makes an actual difference in IO and kill
 # it if it doesn't as it complicates the code.
 
 
 class LevelDbStore(MutableMapping, TaskManager):
+    """
+    Key-value store on top of LevelDB. Changes are kept in memory and written periodically, in write batches on the
+    thread pool. The number of keys is counted on the thread pool when the store is opened and maintained afterwards.
+    A bloom filter of all keys, which is built at the same time, answers most lookups of missing keys without reading
+    from the database.
+    """
     _reactor = reactor
     _leveldb = LevelDB
     _writebatch = get_write_batch
+    _defer_to_thread = staticmethod(deferToThread)
 
-    def __init__(self, store_dir):
+    def __init__(self, store_dir, compress=False):
+        """
+        :param store_dir: the directory of the database
+        :param compress: whether to compress the values with zlib when writing them to the database
+        """
         super(LevelDbStore, self).__init__()
 
         self._store_dir = store_dir
+        self._compress = compress
         self._pending_torrents = {}
+        self._pending_size = 0
+        self._flushing = {}  # The changes that are being written to the database
+        self._flush_deferred = None
         self._logger = logging.getLogger(self.__class__.__name__)
         # This is done to work around LevelDB's inability to deal with non-ascii paths on windows.
         try:
@@ -75,36 +102,119 @@ class LevelDbStore(MutableMapping, TaskManager):
                 os.makedirs(self._store_dir)
                 self._db = self._leveldb(os.path.relpath(store_dir, os.getcwdu()))
 
+        # Until the keys in the database have been counted, the size is the number of keys added since opening
+        self._size = 0
+        self._bloom_filter = None
+        self._rebuilding_bloom_filter = False
+
         self._writeback_lc = self.register_task("flush cache ", LoopingCall(self.flush))
         self._writeback_lc.clock = self._reactor
         self._writeback_lc.start(WRITEBACK_PERIOD)
 
+        self._rebuild_bloom_filter(count_keys=True)
+
+    def _rebuild_bloom_filter(self, count_keys=False):
+        """
+        Build a new bloom filter of all keys on the thread pool. Flushes wait for the rebuild, and the rebuild waits for
+        a flush in progress, so the database does not change while its keys are read. Until the first bloom filter is
+        ready, lookups read from the database.
+        :param count_keys: whether to add the number of keys in the database to the size of the store
+        """
+        if self._flush_deferred:
+            self._rebuilding_bloom_filter = True
+            self._flush_deferred.addBoth(lambda result: self._rebuild_bloom_filter(count_keys) or result)
+            return
+
+        self._rebuilding_bloom_filter = True
+        self._flush_deferred = self._defer_to_thread(self._build_bloom_filter, self._db,
+                                                     BLOOM_FILTER_GROWTH * self._size)
+
+        def on_built(result):
+            bloom_filter, num_keys = result
+            # The pending keys have not been written yet, so they are not in the database
+            for key, value in self._pending_torrents.iteritems():
+                if value is not DELETED:
+                    bloom_filter.add(key)
+            self._bloom_filter = bloom_filter
+            if count_keys:
+                self._size += num_keys
+
+        def on_failure(failure):
+            self._logger.error("Failed to build the bloom filter of the store: %s", failure.getErrorMessage())
+
+        def on_done(_):
+            self._rebuilding_bloom_filter = False
+            self._flush_deferred = None
+
+        self._flush_deferred.addCallbacks(on_built, on_failure).addBoth(on_done)
+
+    @staticmethod
+    def _build_bloom_filter(db, min_capacity):
+        """
+        Return a bloom filter of the keys in the database and the number of keys. This method is called on the thread
+        pool. The keys are read twice, so they never all have to be in memory at once.
+        """
+        num_keys = sum(1 for _ in db.RangeIter(include_value=False))
+        bloom_filter = BloomFilter(max(MIN_BLOOM_FILTER_CAPACITY, min_capacity, BLOOM_FILTER_GROWTH * num_keys))
+        for key in db.RangeIter(include_value=False):
+            bloom_filter.add(key)
+        return bloom_filter, num_keys
+
     def __getitem__(self, key):
-        try:
-            return self._pending_torrents[key]
-        except KeyError:
-            return self._db.Get(key)
+        for changes in (self._pending_torrents, self._flushing):
+            if key in changes:
+                if changes[key] is DELETED:
+                    raise KeyError(key)
+                return changes[key]
+        if self._bloom_filter is not None and key not in self._bloom_filter:
+            raise KeyError(key)
+        return self._decompress(self._db.Get(key))
 
     def __setitem__(self, key, value):
-        self._pending_torrents[key] = value
-        # self._db.Put(key, value)
+        if key not in self:
+            self._size += 1
+            if self._bloom_filter is not None:
+                # The full bloom filter keeps answering lookups, with more false positives, until it is replaced
+                if self._bloom_filter.num_keys >= self._bloom_filter.capacity and not self._rebuilding_bloom_filter:
+                    self._rebuild_bloom_filter()
+                self._bloom_filter.add(key)
+        self._set_pending(key, value)
 
     def __delitem__(self, key):
-        if key in self._pending_torrents:
-            self._pending_torrents.pop(key)
-        self._db.Delete(key)
+        if key in self:
+            self._size -= 1
+            self._set_pending(key, DELETED)
+
+    def _set_pending(self, key, value):
+        old_value = self._pending_torrents.get(key, DELETED)
+        if old_value is not DELETED:
+            self._pending_size -= len(old_value)
+        if value is not DELETED:
+            self._pending_size += len(value)
+        self._pending_torrents[key] = value
+
+        # Bound the memory used by the pending values by flushing early
+        if self._pending_size > MAX_PENDING_SIZE and not self.is_pending_task_active("flush pending"):
+            self.register_task("flush pending", self._reactor.callLater(0, self.flush))
 
     def __iter__(self):
-        for k in self._pending_torrents.iterkeys():
-            yield k
-        for k, _ in self._db.RangeIter():
-            yield k
+        changes = dict(self._flushing)
+        changes.update(self._pending_torrents)
+        for k, v in changes.iteritems():
+            if v is not DELETED:
+                yield k
+        for k in self._db.RangeIter(include_value=False):
+            if k not in changes:
+                yield k
 
     def __contains__(self, key):
-        if key in self._pending_torrents:
-            return True
+        for changes in (self._pending_torrents, self._flushing):
+            if key in changes:
+                return changes[key] is not DELETED
+        if self._bloom_filter is not None and key not in self._bloom_filter:
+            return False
         try:
-            self.__getitem__(key)
+            self._db.Get(key)
             return True
         except KeyError:
             pass
@@ -112,34 +222,95 @@ class LevelDbStore(MutableMapping, TaskManager):
         return False
 
     def __len__(self):
-        return len(self._pending_torrents) + len(list(self.keys()))
+        """
+        Return the number of keys. Until the keys in the database have been counted, only new keys are included.
+        """
+        return self._size
 
     def keys(self):
-        return [k for k, _ in self._db.RangeIter()]
+        return list(self)
 
     def iteritems(self):
-        return chain(self._pending_torrents, self._db.RangeIter())
+        changes = dict(self._flushing)
+        changes.update(self._pending_torrents)
+        for k, v in changes.iteritems():
+            if v is not DELETED:
+                yield k, v
+        for k, v in self.rangescan():
+            if k not in changes:
+                yield k, v
 
     def put(self, k, v):
         self.__setitem__(k, v)
 
     def rangescan(self, start=None, end=None):
         if start is None and end is None:
-            return self._db.RangeIter()
+            items = self._db.RangeIter()
         elif end is None:
-            return self._db.RangeIter(key_from=start)
+            items = self._db.RangeIter(key_from=start)
         else:
-            return self._db.RangeIter(key_from=start, key_to=end)
+            items = self._db.RangeIter(key_from=start, key_to=end)
+        return ((k, self._decompress(v)) for k, v in items)
+
+    def _decompress(self, value):
+        if self._compress and value.startswith(COMPRESSED_VALUE_PREFIX):
+            try:
+                return zlib.decompress(value[len(COMPRESSED_VALUE_PREFIX):])
+            except zlib.error:
+                pass  # Not a compressed value after all
+        return value
 
     def flush(self):
-        if self._pending_torrents:
-            write_batch = self._writebatch(self._db)
-            for k, v in self._pending_torrents.iteritems():
-                write_batch.Put(k, v)
-            self._pending_torrents.clear()
-            return self._db.Write(write_batch)
+        """
+        Write the pending changes to the database in write batches, on the thread pool. When a flush is already in
+        progress, the changes are written after it, so older values never overwrite newer ones.
+        :return: a Deferred that fires when the changes have been written
+        """
+        self.cancel_pending_task("flush pending")
+        if self._flush_deferred:
+            waiter = Deferred()
+            self._flush_deferred.addBoth(lambda result: waiter.callback(None) or result)
+            return waiter.addCallback(lambda _: self.flush())
+
+        if not self._pending_torrents:
+            return succeed(None)
+
+        self._flushing = self._pending_torrents
+        self._pending_torrents = {}
+        self._pending_size = 0
+        self._flush_deferred = self._defer_to_thread(self._write_changes, self._db, self._flushing)
+        return self._flush_deferred.addBoth(self._on_flushed)
+
+    def _write_changes(self, db, changes):
+        """
+        Write changes to the database. This method is called on the thread pool.
+        """
+        items = changes.items()
+        for start in xrange(0, len(items), WRITE_BATCH_SIZE):
+            write_batch = self._writebatch(db)
+            for k, v in items[start:start + WRITE_BATCH_SIZE]:
+                if v is DELETED:
+                    write_batch.Delete(k)
+                elif self._compress:
+                    write_batch.Put(k, COMPRESSED_VALUE_PREFIX + zlib.compress(v))
+                else:
+                    write_batch.Put(k, v)
+            db.Write(write_batch)
+
+    def _on_flushed(self, result):
+        if isinstance(result, Failure):
+            self._logger.error("Failed to flush the store: %s", result.getErrorMessage())
+            # Keep the changes that have not been overwritten in the meantime, for the next flush
+            for k, v in self._flushing.iteritems():
+                if k not in self._pending_torrents:
+                    self._set_pending(k, v)
+        self._flushing = {}
+        self._flush_deferred = None
 
     def close(self):
         self.cancel_all_pending_tasks()
-        self.flush()
-        self._db = None
+
+        def on_flushed(_):
+            self._db = None
+
+        return self.flush().addCallback(on_flushed)
@@ -42,8 +42,22 @@ class TriblerStatistics(object):
             stats_dict["torrent_queue_size_stats"] = torrent_queue_size_stats
             stats_dict["torrent_queue_bandwidth_stats"] = torrent_queue_bandwidth_stats
 
+        if self.session.lm.torrent_checker:
+            stats_dict["torrent_checker"] = self.session.lm.torrent_checker.get_statistics()
+
+        if self.session.lm.ltmgr:
+            stats_dict["metainfo_cache"] = self.session.lm.ltmgr.get_metainfo_statistics()
+
         return stats_dict
 
+    def get_startup_statistics(self):
+        """
+        Return a dictionary with the time it took to start each component of the session.
+        """
+        if not self.session.lm.startup_orchestrator:
+            return {}
+        return self.session.lm.startup_orchestrator.get_timings()
+
     def get_dispersy_statistics(self):
         """
         Return a dictionary with some general Dispersy statistics.
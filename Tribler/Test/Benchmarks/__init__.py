@@ -0,0 +1,4 @@
+"""
+The Benchmarks package contains benchmark scripts for performance critical parts of Tribler.
+These are not run as part of the test suite, run a benchmark with: python -m Tribler.Test.Benchmarks.<name>
+"""
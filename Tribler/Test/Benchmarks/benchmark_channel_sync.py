@@ -0,0 +1,221 @@
+"""
+Benchmark of storing the torrents of a channel that is synced from dispersy into an empty megacache.
+
+Feeds the torrent messages of a channel in batches, like the channel community receives them, once through the
+reference path below, which stores the torrents like the channel community and the channelcast database handler used
+to (one peer id lookup, one notification and one set of statements per torrent), and once through the current bulk
+path.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from binascii import hexlify
+from collections import defaultdict
+
+from twisted.internet import reactor
+
+from Tribler.Core.CacheDB.SqliteCacheDBHandler import ChannelCastDBHandler, PeerDBHandler, TorrentDBHandler
+from Tribler.Core.CacheDB.sqlitecachedb import SQLiteCacheDB
+from Tribler.Core.Category.Category import Category
+from Tribler.Core.simpledefs import (NTFY_CHANNELCAST, NTFY_DISCOVERED, NTFY_TORRENT, NTFY_UPDATE,
+                                     SIGNAL_CHANNEL_COMMUNITY, SIGNAL_ON_TORRENT_UPDATED)
+
+WORDS = ["ubuntu", "debian", "desktop", "server", "amd64", "i386", "iso", "live", "linux", "mint", "fedora", "arch",
+         "documentary", "lecture", "concert", "album", "remastered", "collection", "season", "episode", "complete",
+         "hd", "1080p", "720p", "x264", "flac", "mp3", "ebook", "pdf", "course", "python", "tutorial"]
+EXTENSIONS = ["iso", "mkv", "mp4", "avi", "flac", "mp3", "pdf", "txt", "nfo", "jpg"]
+TRACKERS = ["udp://tracker%d.example.org:%d/announce" % (index, 6969 + index) for index in xrange(20)]
+
+
+class BenchmarkNotifier(object):
+
+    def __init__(self):
+        self.notifications = 0
+
+    def notify(self, *_):
+        self.notifications += 1
+
+
+class BenchmarkConfig(object):
+
+    def get_torrent_store_enabled(self):
+        return False
+
+
+class BenchmarkLaunchManyCore(object):
+
+    def __init__(self):
+        self.tracker_manager = None
+        self.torrent_store = None
+
+
+class BenchmarkSession(object):
+    """
+    The parts of a session that the database handlers use, with an empty database.
+    """
+
+    def __init__(self, state_dir):
+        self.notifier = BenchmarkNotifier()
+        self.sqlite_db = SQLiteCacheDB(os.path.join(state_dir, "tribler.sdb"))
+        self.sqlite_db.initialize()
+        self.sqlite_db.initial_begin()
+        self.config = BenchmarkConfig()
+        self.lm = BenchmarkLaunchManyCore()
+
+
+def create_handlers(session):
+    peer_db = PeerDBHandler(session)
+    torrent_db = TorrentDBHandler(session)
+    torrent_db.category = Category()
+    channel_db = ChannelCastDBHandler(session)
+    channel_db.torrent_db = torrent_db
+    return peer_db, torrent_db, channel_db
+
+
+def generate_torrents(num_torrents, rand):
+    """
+    Generate the (public_key, infohash, timestamp, name, files, trackers) tuples of the torrent messages of a channel.
+    """
+    public_keys = ["".join(chr(rand.randint(0, 255)) for _ in xrange(74)) for _ in xrange(3)]
+    torrents = []
+    for index in xrange(num_torrents):
+        infohash = "".join(chr(rand.randint(0, 255)) for _ in xrange(20))
+        name = u" ".join(rand.sample(WORDS, rand.randint(2, 6))) + u" %d" % index
+        files = [(u"%s %d.%s" % (rand.choice(WORDS), file_index, rand.choice(EXTENSIONS)),
+                  rand.randint(1, 2 ** 32)) for file_index in xrange(rand.randint(1, 5))]
+        trackers = tuple(rand.sample(TRACKERS, rand.randint(0, 3)))
+        torrents.append((rand.choice(public_keys), infohash, 1500000000 + index, name, files, trackers))
+    return torrents
+
+
+def reference_on_torrents_from_dispersy(channel_db, torrentlist):
+    """
+    Store the torrents like ChannelCastDBHandler.on_torrents_from_dispersy used to.
+    """
+    torrent_db = channel_db.torrent_db
+    infohashes = [torrent[3] for torrent in torrentlist]
+    torrent_ids, inserted = torrent_db.addOrGetTorrentIDSReturn(infohashes)
+
+    insert_data = []
+    updated_channels = {}
+    for i, torrent in enumerate(torrentlist):
+        channel_id, dispersy_id, peer_id, infohash, timestamp, name, files, trackers = torrent
+        if infohash in inserted:
+            torrent_db.addExternalTorrentNoDef(infohash, name, files, trackers, timestamp, {'dispersy_id': dispersy_id})
+        insert_data.append((dispersy_id, torrent_ids[i], channel_id, peer_id, name, timestamp))
+        updated_channels[channel_id] = updated_channels.get(channel_id, 0) + 1
+
+    channel_db._db.executemany("INSERT INTO _ChannelTorrents (dispersy_id, torrent_id, channel_id, peer_id, name, "
+                               "time_stamp) VALUES (?,?,?,?,?,?)", insert_data)
+
+    updated_channel_torrent_dict = defaultdict(list)
+    for torrent in torrentlist:
+        channel_id, infohash = torrent[0], torrent[3]
+        updated_channel_torrent_dict[channel_id].append(
+            {u'info_hash': infohash, u'channel_torrent_id': channel_db.get_channel_torrent_id(channel_id, infohash)})
+
+    channel_db._db.executemany("UPDATE _Channels SET modified = strftime('%s','now'), nr_torrents = nr_torrents+? "
+                               "WHERE id = ?", [(count, updated_id) for updated_id, count in updated_channels.items()])
+    for channel_id in updated_channels:
+        channel_db.notifier.notify(NTFY_CHANNELCAST, NTFY_UPDATE, channel_id)
+    for channel_id, item in updated_channel_torrent_dict.items():
+        channel_db.notifier.notify(SIGNAL_CHANNEL_COMMUNITY, SIGNAL_ON_TORRENT_UPDATED, channel_id, item)
+
+
+def reference_on_torrent_messages(peer_db, channel_db, channel_id, batch):
+    """
+    Handle a batch of torrent messages like ChannelCommunity._disp_on_torrent used to.
+    """
+    torrentlist = []
+    for dispersy_id, (public_key, infohash, timestamp, name, files, trackers) in batch:
+        peer_id = peer_db.addOrGetPeerID(public_key)
+        torrentlist.append((channel_id, dispersy_id, peer_id, infohash, timestamp, name, files, trackers))
+        channel_db.notifier.notify(NTFY_TORRENT, NTFY_DISCOVERED, None,
+                                   {"infohash": hexlify(infohash), "timestamp": timestamp, "name": name,
+                                    "files": files, "trackers": trackers})
+    reference_on_torrents_from_dispersy(channel_db, torrentlist)
+
+
+def on_torrent_messages(peer_db, channel_db, channel_id, batch):
+    """
+    Handle a batch of torrent messages like ChannelCommunity._disp_on_torrent does.
+    """
+    public_keys = list(set(torrent[0] for _, torrent in batch))
+    peer_ids = dict(zip(public_keys, peer_db.addOrGetPeerIDS(public_keys)))
+
+    torrentlist = []
+    discovered_torrents = []
+    for dispersy_id, (public_key, infohash, timestamp, name, files, trackers) in batch:
+        torrentlist.append((channel_id, dispersy_id, peer_ids[public_key], infohash, timestamp, name, files,
+                            trackers))
+        discovered_torrents.append({"infohash": hexlify(infohash), "timestamp": timestamp, "name": name,
+                                    "files": files, "trackers": trackers})
+    channel_db.on_torrents_from_dispersy(torrentlist)
+    channel_db.notifier.notify(NTFY_TORRENT, NTFY_DISCOVERED, None, *discovered_torrents)
+
+
+def sync_channel(handle_messages, torrents, batch_size):
+    """
+    Sync the torrents into an empty database and return the duration, the number of notifications and a summary of
+    the stored data.
+    """
+    state_dir = tempfile.mkdtemp()
+    try:
+        session = BenchmarkSession(state_dir)
+        peer_db, torrent_db, channel_db = create_handlers(session)
+        session.sqlite_db.execute_write(u"INSERT INTO _Channels (dispersy_cid, name) VALUES (?, ?)",
+                                        (buffer("c" * 20), u"Benchmark channel"))
+        channel_id = session.sqlite_db.fetchone(u"SELECT id FROM _Channels")
+        session.notifier.notifications = 0
+
+        messages = list(enumerate(torrents, 1))
+        start_time = time.time()
+        for index in xrange(0, len(messages), batch_size):
+            handle_messages(peer_db, channel_db, channel_id, messages[index:index + batch_size])
+        duration = time.time() - start_time
+
+        summary = [session.sqlite_db.fetchone(sql) for sql in (
+            "SELECT COUNT(*) FROM Torrent WHERE name IS NOT NULL",
+            "SELECT COUNT(*) FROM ChannelTorrents",
+            "SELECT COUNT(*) FROM TorrentFiles",
+            "SELECT COUNT(*) FROM TorrentTrackerMapping",
+            "SELECT COUNT(*) FROM FullTextIndex",
+            "SELECT COUNT(*) FROM Peer",
+            "SELECT nr_torrents FROM _Channels")]
+        session.sqlite_db.close()
+        return duration, session.notifier.notifications, summary
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+
+def run(args):
+    try:
+        torrents = generate_torrents(args.torrents, random.Random(1))
+        results = {}
+        for name, handle_messages in (("reference", reference_on_torrent_messages), ("current", on_torrent_messages)):
+            duration, notifications, summary = sync_channel(handle_messages, torrents, args.batch_size)
+            results[name] = duration
+            print "%-9s %7.2f s, %6d torrents/s, %6d notifications (torrents, channel torrents, files, trackers, " \
+                "indexed, peers, nr_torrents: %s)" % (name, duration, len(torrents) / duration, notifications,
+                                                       ", ".join(str(value) for value in summary))
+        print "Speedup: %.1fx" % (results["reference"] / results["current"])
+    finally:
+        reactor.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--torrents', type=int, default=50000, help='the number of torrents in the channel')
+    parser.add_argument('--batch-size', type=int, default=500, help='the number of torrent messages per batch')
+    args = parser.parse_args()
+
+    # The database handlers expect to be called on the reactor thread
+    reactor.callWhenRunning(run, args)
+    reactor.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark of the Diffie-Hellman handshakes of a relay that handles incoming create messages.
+
+Handles bursts of create messages on the reactor thread, with some idle time in between, once with a key pool that is
+not started, so every key is generated inline like TunnelCrypto used to, and once with a DHKeyPool that is refilled
+from a worker thread. Reports the reactor thread time per create and the number of creates per second that the reactor
+thread can handle.
+"""
+import argparse
+import time
+
+from twisted.internet import reactor
+from twisted.internet.defer import inlineCallbacks, returnValue
+from twisted.internet.task import deferLater
+
+from Tribler.community.tunnel.crypto.tunnelcrypto import TunnelCrypto
+
+
+def create_relay_crypto(use_pool):
+    crypto = TunnelCrypto()
+    crypto.key = crypto.generate_key(u"curve25519")
+    if use_pool:
+        crypto.key_pool.start()
+    return crypto
+
+
+@inlineCallbacks
+def handle_creates(crypto, keys_received, burst_size, idle_time):
+    """
+    Handle the create messages in bursts, and return the time spent on the reactor thread.
+    """
+    # Give the pool the same head start as a relay that has been idle before the first burst
+    yield deferLater(reactor, idle_time, lambda: None)
+
+    busy_time = 0
+    for index in xrange(0, len(keys_received), burst_size):
+        start_time = time.time()
+        for dh_received in keys_received[index:index + burst_size]:
+            crypto.generate_diffie_shared_secret(dh_received)
+        busy_time += time.time() - start_time
+        yield deferLater(reactor, idle_time, lambda: None)
+    returnValue(busy_time)
+
+
+@inlineCallbacks
+def run(args):
+    try:
+        client_crypto = TunnelCrypto()
+        keys_received = [client_crypto.generate_diffie_secret()[1] for _ in xrange(args.creates)]
+
+        results = {}
+        for name, use_pool in (("reference", False), ("current", True)):
+            crypto = create_relay_crypto(use_pool)
+            busy_time = yield handle_creates(crypto, keys_received, args.burst_size, args.idle_time)
+            crypto.key_pool.stop()
+            results[name] = busy_time
+            statistics = crypto.key_pool.get_statistics()
+            print "%-9s %7.1f us per create, %6d creates/s (pool hits %d, misses %d)" % \
+                (name, busy_time * 1e6 / args.creates, args.creates / busy_time, statistics['dh_pool_hits'],
+                 statistics['dh_pool_misses'])
+        print "Speedup: %.1fx" % (results["reference"] / results["current"])
+    finally:
+        reactor.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--creates', type=int, default=5000, help='the number of create messages')
+    parser.add_argument('--burst-size', type=int, default=32, help='the number of create messages per burst')
+    parser.add_argument('--idle-time', type=float, default=0.05, help='the number of seconds between two bursts')
+    args = parser.parse_args()
+
+    reactor.callWhenRunning(run, args)
+    reactor.run()
+
+
+if __name__ == '__main__':
+    main()
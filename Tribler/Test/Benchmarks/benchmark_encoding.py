@@ -0,0 +1,163 @@
+"""
+Benchmark of the decoding of Tribler/Core/Utilities/encoding.py.
+
+Decodes the shapes of data that the community conversions and the database blobs use, once with the reference
+decoder below, which is the decoder that encoding.py used to have, and once with the current decoder.
+"""
+import argparse
+import random
+import time
+
+from Tribler.Core.Utilities.encoding import encode, decode
+
+
+def _reference_decode_int(stream, offset, count, _):
+    return offset + count, int(stream[offset:offset + count])
+
+
+def _reference_decode_long(stream, offset, count, _):
+    return offset + count, long(stream[offset:offset + count])
+
+
+def _reference_decode_float(stream, offset, count, _):
+    return offset + count, float(stream[offset:offset + count])
+
+
+def _reference_decode_unicode(stream, offset, count, _):
+    if len(stream) >= offset + count:
+        return offset + count, stream[offset:offset + count].decode("UTF-8")
+    else:
+        raise ValueError("Invalid stream length", len(stream), offset + count)
+
+
+def _reference_decode_bytes(stream, offset, count, _):
+    if len(stream) >= offset + count:
+        return offset + count, stream[offset:offset + count]
+    else:
+        raise ValueError("Invalid stream length", len(stream), offset + count)
+
+
+def _reference_decode_list(stream, offset, count, mapping):
+    container = []
+    for _ in range(count):
+
+        index = offset
+        while 48 <= ord(stream[index]) <= 57:
+            index += 1
+        offset, value = mapping[stream[index]](stream, index + 1, int(stream[offset:index]), mapping)
+        container.append(value)
+
+    return offset, container
+
+
+def _reference_decode_set(stream, offset, count, mapping):
+    offset, container = _reference_decode_list(stream, offset, count, mapping)
+    return offset, set(container)
+
+
+def _reference_decode_tuple(stream, offset, count, mapping):
+    offset, container = _reference_decode_list(stream, offset, count, mapping)
+    return offset, tuple(container)
+
+
+def _reference_decode_dictionary(stream, offset, count, mapping):
+    container = {}
+    for _ in range(count):
+
+        index = offset
+        while 48 <= ord(stream[index]) <= 57:
+            index += 1
+        offset, key = mapping[stream[index]](stream, index + 1, int(stream[offset:index]), mapping)
+
+        index = offset
+        while 48 <= ord(stream[index]) <= 57:
+            index += 1
+        offset, value = mapping[stream[index]](stream, index + 1, int(stream[offset:index]), mapping)
+
+        container[key] = value
+
+    if len(container) < count:
+        raise ValueError("Duplicate key in dictionary")
+    return offset, container
+
+
+def _reference_decode_constant(constant):
+    def decode_constant(stream, offset, count, mapping):
+        assert count == 0
+        return offset, constant
+    return decode_constant
+
+
+_reference_decode_mapping = {"i": _reference_decode_int,
+                             "J": _reference_decode_long,
+                             "f": _reference_decode_float,
+                             "s": _reference_decode_unicode,
+                             "b": _reference_decode_bytes,
+                             "l": _reference_decode_list,
+                             "L": _reference_decode_set,
+                             "t": _reference_decode_tuple,
+                             "d": _reference_decode_dictionary,
+                             "n": _reference_decode_constant(None),
+                             "T": _reference_decode_constant(True),
+                             "F": _reference_decode_constant(False)}
+
+
+def reference_decode(stream, offset=0):
+    """
+    Decode STREAM from index OFFSET like encoding.decode used to, by scanning the digits of every header one by one.
+    """
+    if stream[offset] == "a":
+        index = offset + 1
+        while 48 <= ord(stream[index]) <= 57:
+            index += 1
+        return _reference_decode_mapping[stream[index]](stream, index + 1, int(stream[offset + 1:index]),
+                                                        _reference_decode_mapping)
+
+    raise ValueError("Unknown version found")
+
+
+def random_bytes(rand, length):
+    return "".join(chr(rand.randint(0, 255)) for _ in xrange(length))
+
+
+def create_shapes(rand):
+    """
+    Return the data shapes to benchmark, by name.
+    """
+    torrent = {"infohash": random_bytes(rand, 20), "timestamp": 1500000000, "name": u"Ubuntu 17.04 desktop amd64",
+               "files": tuple((u"file %d.mkv" % index, rand.randint(0, 2 ** 30)) for index in xrange(5)),
+               "trackers": (u"udp://tracker.example.org:80/announce",)}
+    return {
+        "flat dict": {"mid": random_bytes(rand, 20), "timestamp": 1500000000, "name": u"Tribler channel",
+                      "description": u"A channel", "modified": 1500000001, "votes": 12},
+        "flat tuple": tuple(random_bytes(rand, 20) for _ in xrange(10)) + (1, 2, 3, u"text"),
+        "torrent": torrent,
+        "torrent list": [torrent] * 20,
+        "big blob": (random_bytes(rand, 65536), 1),
+    }
+
+
+def timed(function, stream, iterations):
+    start_time = time.time()
+    for _ in xrange(iterations):
+        function(stream)
+    return (time.time() - start_time) * 1e6 / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=5000, help='the number of decodes per shape')
+    args = parser.parse_args()
+
+    shapes = create_shapes(random.Random(1))
+    for name in sorted(shapes):
+        stream = encode(shapes[name])
+        assert decode(stream) == reference_decode(stream)
+        reference_us = timed(reference_decode, stream, args.iterations)
+        current_us = timed(decode, stream, args.iterations)
+        print "%-13s %6d bytes: reference %8.1f us, current %8.1f us (%.1fx)" % \
+            (name, len(stream), reference_us, current_us, reference_us / current_us)
+
+
+if __name__ == '__main__':
+    main()
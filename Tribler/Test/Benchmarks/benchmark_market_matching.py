@@ -0,0 +1,118 @@
+"""
+Benchmark of the matching of the local orders when ticks are received in the market community.
+
+Replays synthetic ticks against the local asks, once by matching every order (like the market community used to do)
+and once by only matching the orders crossed by a received bid.
+"""
+import argparse
+import random
+import time
+
+from Tribler.community.market.core.matching_engine import MatchingEngine, PriceTimeStrategy
+from Tribler.community.market.core.message import TraderId, MessageId, MessageNumber
+from Tribler.community.market.core.message_repository import MemoryMessageRepository
+from Tribler.community.market.core.order import OrderId, OrderNumber, Order
+from Tribler.community.market.core.order_repository import MemoryOrderRepository
+from Tribler.community.market.core.orderbook import OrderBook
+from Tribler.community.market.core.price import Price
+from Tribler.community.market.core.quantity import Quantity
+from Tribler.community.market.core.tick import Ask, Bid
+from Tribler.community.market.core.timeout import Timeout
+from Tribler.community.market.core.timestamp import Timestamp
+
+ORDER_BOOK_SIZE = 1000  # The number of remote ticks kept in the order book, older ticks are removed
+
+
+def create_orders(order_repository, num_orders):
+    for _ in xrange(num_orders):
+        order_id = order_repository.next_identity()
+        order_repository.add(Order(order_id, Price(random.randint(100, 200), 'DUM1'), Quantity(10, 'DUM2'),
+                                   Timeout(3600.0), Timestamp.now(), True))
+
+
+def create_ticks(num_ticks):
+    ticks = []
+    for tick_number in xrange(num_ticks):
+        tick_class = random.choice((Ask, Bid))
+        price = random.randint(100, 300) if tick_class is Ask else random.randint(0, 105)
+        ticks.append(tick_class(MessageId(TraderId('1'), MessageNumber(str(tick_number))),
+                                OrderId(TraderId('1'), OrderNumber(tick_number)),
+                                Price(price, 'DUM1'), Quantity(random.randint(1, 10), 'DUM2'),
+                                Timeout(3600.0), Timestamp.now()))
+    return ticks
+
+
+def match(matching_engine, order):
+    # Release the reserved quantity again, so the state of the local orders does not change during the benchmark
+    proposed_trades = matching_engine.match_order(order)
+    for proposed_trade in proposed_trades:
+        order.release_quantity_for_tick(proposed_trade.recipient_order_id, proposed_trade.quantity)
+    return len(proposed_trades)
+
+
+def match_all_orders(order_repository, matching_engine, _):
+    num_trades = 0
+    for order in order_repository.find_all():
+        if order.is_ask() and order.is_valid():
+            num_trades += match(matching_engine, order)
+    return num_trades
+
+
+def match_crossing_orders(order_repository, matching_engine, tick):
+    num_trades = 0
+    if isinstance(tick, Bid):
+        for order in order_repository.find_crossing_orders(tick):
+            if order.is_valid():
+                num_trades += match(matching_engine, order)
+    return num_trades
+
+
+def replay(ticks, num_orders, match_func):
+    random.seed(42)
+    order_repository = MemoryOrderRepository('0')
+    create_orders(order_repository, num_orders)
+    order_book = OrderBook(MemoryMessageRepository('0'))
+    matching_engine = MatchingEngine(PriceTimeStrategy(order_book))
+
+    num_trades = 0
+    duration = 0
+    for index, tick in enumerate(ticks):
+        if index >= ORDER_BOOK_SIZE:
+            order_book.remove_tick(ticks[index - ORDER_BOOK_SIZE].order_id)
+        if isinstance(tick, Ask):
+            order_book.insert_ask(tick)
+        else:
+            order_book.insert_bid(tick)
+
+        # Only the matching is timed, the time to maintain the order book is the same for both methods
+        start_time = time.time()
+        num_trades += match_func(order_repository, matching_engine, tick)
+        duration += time.time() - start_time
+
+    order_book.cancel_all_pending_tasks()
+    return duration, num_trades
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ticks', type=int, default=100000, help='the number of ticks to replay')
+    parser.add_argument('--orders', type=int, default=1000, help='the number of local orders')
+    parser.add_argument('--full-ticks', type=int, default=2000,
+                        help='the number of ticks to replay when matching all orders on every tick')
+    args = parser.parse_args()
+
+    random.seed(1)
+    ticks = create_ticks(args.ticks)
+
+    full_ticks = min(args.full_ticks, args.ticks)
+    duration, num_trades = replay(ticks[:full_ticks], args.orders, match_all_orders)
+    print "Matching all orders:      %d ticks in %.2f s (%.1f us/tick, %d proposed trades)" % \
+        (full_ticks, duration, duration * 1e6 / full_ticks, num_trades)
+
+    duration, num_trades = replay(ticks, args.orders, match_crossing_orders)
+    print "Matching crossed orders: %d ticks in %.2f s (%.1f us/tick, %d proposed trades)" % \
+        (args.ticks, duration, duration * 1e6 / args.ticks, num_trades)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark of the personalised PageRank of the market reputation on synthetic power-law interaction graphs.
+
+Builds the reputation of a graph from scratch, then adds new blocks in small batches like the market community does
+when it updates the reputations, and compares the result with the exact PageRank of networkx. Reports the time per
+batch, the time of a query without new blocks and the largest and the total error of the reputations.
+"""
+import argparse
+import random
+import time
+from collections import namedtuple
+
+import networkx as nx
+
+from Tribler.community.market.reputation.incremental_pagerank_manager import IncrementalPagerankReputationManager
+
+SyntheticBlock = namedtuple('SyntheticBlock', ['public_key', 'link_public_key', 'transaction'])
+
+
+def create_blocks(num_nodes, num_blocks):
+    """
+    Create blocks between nodes that are picked with preferential attachment, so the degrees follow a power law.
+    """
+    endpoints = [0]
+    blocks = []
+    for _ in xrange(num_blocks):
+        public_key = random.choice(endpoints) if random.random() < 0.8 else random.randrange(num_nodes)
+        link_public_key = random.randrange(num_nodes)
+        endpoints.extend((public_key, link_public_key))
+        transaction = {"asset1_amount": random.randint(1, 100), "asset2_amount": random.randint(1, 100)}
+        blocks.append(SyntheticBlock(public_key, link_public_key, transaction))
+    return blocks
+
+
+def get_exact_reputation(rep_manager, own_public_key):
+    graph = nx.DiGraph()
+    graph.add_nodes_from(rep_manager.out_edges)
+    for source, edges in rep_manager.out_edges.iteritems():
+        for target, weight in edges.iteritems():
+            graph.add_edge(source, target, weight=weight)
+    return nx.pagerank(graph, alpha=rep_manager.alpha, personalization={own_public_key: 1}, max_iter=1000,
+                       tol=1e-10)
+
+
+def run(args):
+    blocks = create_blocks(args.nodes, args.blocks)
+    new_blocks = blocks[args.blocks - args.new_blocks:]
+
+    rep_manager = IncrementalPagerankReputationManager(blocks[:args.blocks - args.new_blocks], epsilon=args.epsilon)
+    start_time = time.time()
+    rep_manager.compute(0)
+    print "From scratch: %.2f s for %d blocks" % (time.time() - start_time, args.blocks - args.new_blocks)
+
+    batch_time = 0
+    for index in xrange(0, len(new_blocks), args.batch_size):
+        start_time = time.time()
+        rep_manager.add_blocks(new_blocks[index:index + args.batch_size])
+        reputation = rep_manager.compute(0)
+        batch_time += time.time() - start_time
+    num_batches = (len(new_blocks) + args.batch_size - 1) / args.batch_size
+    print "Incremental:  %.1f ms per batch of %d blocks" % (batch_time * 1000 / num_batches, args.batch_size)
+
+    start_time = time.time()
+    rep_manager.compute(0)
+    print "Query:        %.3f ms" % ((time.time() - start_time) * 1000)
+
+    num_edges = sum(len(edges) for edges in rep_manager.out_edges.itervalues())
+    start_time = time.time()
+    exact_reputation = get_exact_reputation(rep_manager, 0)
+    print "Exact:        %.2f s for %d nodes and %d edges" % \
+        (time.time() - start_time, len(exact_reputation), num_edges)
+
+    errors = [abs(reputation.get(node, 0) - value) for node, value in exact_reputation.iteritems()]
+    print "Error:        max %.2e, total %.2e" % (max(errors), sum(errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=20000, help='the number of nodes in the graph')
+    parser.add_argument('--blocks', type=int, default=100000, help='the number of blocks, two edges each')
+    parser.add_argument('--new-blocks', type=int, default=1000, help='the number of blocks added incrementally')
+    parser.add_argument('--batch-size', type=int, default=10, help='the number of blocks per update')
+    parser.add_argument('--epsilon', type=float, default=1e-6, help='the largest residual that is not pushed')
+    parser.add_argument('--seed', type=int, default=42, help='the seed of the synthetic graph')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark of the routing of SOCKS5 traffic over the circuits of the tunnel community.
+
+Routes incoming tunnel data to the SOCKS5 sessions, removes dead circuits and selects circuits for new destinations,
+once by scanning all sessions, destinations and circuits (like the tunnel community used to do) and once through the
+reverse indexes.
+"""
+import argparse
+import random
+import time
+
+from Tribler.community.tunnel import CIRCUIT_STATE_READY, CIRCUIT_TYPE_DATA
+from Tribler.community.tunnel.Socks5 import conversion
+from Tribler.community.tunnel.Socks5.server import Socks5Server, Socks5Connection
+from Tribler.community.tunnel.tunnel_community import RoundRobin
+
+
+class BenchmarkCircuit(object):
+
+    def __init__(self, circuit_id, hops):
+        self.circuit_id = circuit_id
+        self.goal_hops = hops
+        self.hops = [None] * hops
+        self.state = CIRCUIT_STATE_READY
+        self.ctype = CIRCUIT_TYPE_DATA
+
+
+class BenchmarkUDPSocket(object):
+
+    def sendDatagram(self, _):
+        pass
+
+
+class BenchmarkCommunity(object):
+
+    def __init__(self, circuits):
+        self.circuits = {circuit.circuit_id: circuit for circuit in circuits}
+
+    def active_data_circuits(self, hops=None):
+        return {cid: c for cid, c in self.circuits.items()
+                if c.state == CIRCUIT_STATE_READY and c.ctype == CIRCUIT_TYPE_DATA and
+                (hops is None or hops == len(c.hops))}
+
+
+def create_server(circuits, num_sessions, num_destinations):
+    server = Socks5Server(None, [])
+    for _ in xrange(num_sessions):
+        session = Socks5Connection(server, None, 1)
+        session._udp_socket = BenchmarkUDPSocket()
+        for _ in xrange(num_destinations):
+            destination = ("%d.%d.%d.%d" % tuple(random.randint(1, 254) for _ in xrange(4)), random.randint(1, 65535))
+            session.set_destination(destination, random.choice(circuits))
+        server.sessions.append(session)
+    return server
+
+
+def scan_incoming(server, circuit, origin, data):
+    # The old data path: every session checks whether the circuit is one of the values of its destinations
+    for session in server.sessions:
+        if session.hops == circuit.goal_hops and circuit in session.destinations.values():
+            session.destinations[origin] = circuit
+            session._udp_socket.sendDatagram(conversion.encode_udp_packet(
+                0, 0, conversion.ADDRESS_TYPE_IPV4, origin[0], origin[1], data))
+
+
+def scan_circuit_dead(server, circuit):
+    affected_destinations = set()
+    for session in server.sessions:
+        affected_destinations.update(destination for destination, tunnel_circuit in session.destinations.iteritems()
+                                     if tunnel_circuit == circuit)
+    return affected_destinations
+
+
+def scan_select(community, index, hops):
+    circuit_ids = sorted(community.active_data_circuits(hops).keys())
+    index = (index + 1) % len(circuit_ids)
+    return index, community.active_data_circuits()[circuit_ids[index]]
+
+
+def timed(func, num_calls):
+    start_time = time.time()
+    for _ in xrange(num_calls):
+        func()
+    duration = time.time() - start_time
+    return duration * 1e6 / num_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=500, help='the number of SOCKS5 sessions')
+    parser.add_argument('--circuits', type=int, default=300, help='the number of ready data circuits')
+    parser.add_argument('--destinations', type=int, default=50, help='the number of destinations per session')
+    parser.add_argument('--packets', type=int, default=2000, help='the number of incoming packets to route')
+    args = parser.parse_args()
+
+    random.seed(1)
+    circuits = [BenchmarkCircuit(circuit_id, 1) for circuit_id in xrange(1, args.circuits + 1)]
+    server = create_server(circuits, args.sessions, args.destinations)
+    origin = ("1.2.3.4", 1234)
+
+    print "Incoming data, scanning:  %.1f us/packet" % \
+        timed(lambda: scan_incoming(server, random.choice(circuits), origin, ""), args.packets)
+    print "Incoming data, indexed:   %.1f us/packet" % \
+        timed(lambda: server.on_incoming_from_tunnel(None, random.choice(circuits), origin, ""), args.packets)
+
+    print "Dead circuit, scanning:   %.1f us/circuit" % \
+        timed(lambda: scan_circuit_dead(server, random.choice(circuits)), args.circuits)
+    # Removing circuits changes the state of the server, so the indexed path is measured last
+    dead_circuits = list(circuits)
+    print "Dead circuit, indexed:    %.1f us/circuit" % \
+        timed(lambda: server.circuit_dead(dead_circuits.pop()), args.circuits)
+
+    community = BenchmarkCommunity(circuits)
+    selection_strategy = RoundRobin(community)
+    for circuit in circuits:
+        selection_strategy.add_circuit(circuit)
+    state = {'index': -1}
+
+    def select_scanning():
+        state['index'], _ = scan_select(community, state['index'], 1)
+
+    print "Circuit selection, scanning: %.1f us/selection" % timed(select_scanning, args.packets)
+    print "Circuit selection, indexed:  %.1f us/selection" % \
+        timed(lambda: selection_strategy.select(None, 1), args.packets)
+
+
+if __name__ == '__main__':
+    main()
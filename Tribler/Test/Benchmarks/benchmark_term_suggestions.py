@@ -0,0 +1,132 @@
+"""
+Benchmark of the autocompletion and search suggestions of the term index.
+
+Replays typed queries keystroke by keystroke: every keystroke asks for completions of the word being typed and every
+finished word asks for similar terms, once by scanning all terms (like the torrent database used to do) and once
+through the term index. The terms are read from the full text index of a Tribler database, or generated.
+"""
+import argparse
+import random
+import sqlite3
+import time
+
+from Tribler.Core.Utilities.term_index import TermIndex, levenshtein
+
+ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789"
+
+
+def generate_documents(num_terms, num_documents, rand):
+    terms = list(set("".join(rand.choice(ALPHABET[:26]) for _ in xrange(rand.randint(2, 12)))
+                     for _ in xrange(num_terms)))
+
+    def choose_term():
+        # Pick terms with a Zipf-like distribution, like the words in swarm names
+        return terms[int(len(terms) ** rand.random()) - 1]
+
+    return [[choose_term() for _ in xrange(rand.randint(2, 6))] for _ in xrange(num_documents)]
+
+
+def load_documents(database):
+    connection = sqlite3.connect(database)
+    return [swarmname.split() for swarmname, in connection.execute("SELECT swarmname FROM FullTextIndex")
+            if swarmname]
+
+
+def load_traces(filename):
+    with open(filename) as trace_file:
+        return [line.strip().lower() for line in trace_file if line.strip()]
+
+
+def generate_traces(term_index, num_queries, typo_rate, rand):
+    """
+    Generate queries of one to three frequent terms, some of which contain a typo.
+    """
+    terms = sorted(term_index.frequencies, key=term_index.frequencies.get, reverse=True)[:10000]
+    queries = []
+    for _ in xrange(num_queries):
+        words = []
+        for _ in xrange(rand.randint(1, 3)):
+            word = rand.choice(terms)
+            if len(word) > 3 and rand.random() < typo_rate:
+                position = rand.randrange(len(word))
+                word = word[:position] + rand.choice(ALPHABET[:26]) + word[position + 1:]
+            words.append(word)
+        queries.append(" ".join(words))
+    return queries
+
+
+def scan_completions(frequencies, prefix, max_terms):
+    candidates = [term for term in frequencies if term.startswith(prefix) and term != prefix]
+    candidates.sort(key=lambda term: (-frequencies[term], term))
+    return candidates[:max_terms]
+
+
+def scan_similar_terms(frequencies, word, max_distance):
+    return [term for term in frequencies if abs(len(term) - len(word)) <= max_distance and
+            levenshtein(word, term) <= max_distance]
+
+
+def replay(queries, complete, suggest):
+    """
+    Replay the queries and return the number of microseconds per keystroke and per suggestion.
+    """
+    completion_time = suggestion_time = 0
+    num_keystrokes = num_suggestions = 0
+    for query in queries:
+        for length in xrange(1, len(query) + 1):
+            typed = query[:length]
+            if typed.endswith(" "):
+                start_time = time.time()
+                suggest(typed.split()[-1])
+                suggestion_time += time.time() - start_time
+                num_suggestions += 1
+            elif typed.split():
+                start_time = time.time()
+                complete(typed.split()[-1])
+                completion_time += time.time() - start_time
+                num_keystrokes += 1
+    return completion_time * 1e6 / max(num_keystrokes, 1), suggestion_time * 1e6 / max(num_suggestions, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database', help='a Tribler database to read the swarm names from')
+    parser.add_argument('--traces', help='a file with one typed query per line')
+    parser.add_argument('--terms', type=int, default=200000, help='the number of generated terms')
+    parser.add_argument('--documents', type=int, default=500000, help='the number of generated swarm names')
+    parser.add_argument('--queries', type=int, default=200, help='the number of generated queries')
+    parser.add_argument('--scan-queries', type=int, default=5, help='the number of queries replayed by scanning')
+    parser.add_argument('--typo-rate', type=float, default=0.3, help='the fraction of words with a typo')
+    parser.add_argument('--max-distance', type=int, default=1, help='the maximum edit distance of suggestions')
+    args = parser.parse_args()
+
+    rand = random.Random(1)
+    documents = load_documents(args.database) if args.database else \
+        generate_documents(args.terms, args.documents, rand)
+
+    start_time = time.time()
+    term_index = TermIndex(max_distance=args.max_distance)
+    for document in documents:
+        term_index.add(document)
+    term_index.get_completions("", 0)
+    print "Indexed %d terms of %d swarm names in %.1f s" % (len(term_index), len(documents), time.time() - start_time)
+
+    queries = load_traces(args.traces) if args.traces else \
+        generate_traces(term_index, args.queries, args.typo_rate, rand)
+    # Every word is finished with a space, so a suggestion is asked for every word
+    queries = [query + " " for query in queries]
+
+    frequencies = term_index.frequencies
+    completion_us, suggestion_us = replay(queries[:args.scan_queries],
+                                          lambda prefix: scan_completions(frequencies, prefix, 5),
+                                          lambda word: scan_similar_terms(frequencies, word, args.max_distance))
+    print "Scanning:  %.1f us/keystroke, %.1f us/suggestion" % (completion_us, suggestion_us)
+
+    completion_us, suggestion_us = replay(queries,
+                                          lambda prefix: term_index.get_completions(prefix, 5),
+                                          term_index.get_similar_terms)
+    print "Indexed:   %.1f us/keystroke, %.1f us/suggestion" % (completion_us, suggestion_us)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+from Tribler.Test.Community.Market.Reputation.test_reputation_base import TestReputationBase
+from Tribler.community.market.reputation.incremental_pagerank_manager import IncrementalPagerankReputationManager
+from Tribler.community.market.reputation.pagerank_manager import PagerankReputationManager
+
+
+class TestReputationIncrementalPagerank(TestReputationBase):
+    """
+    Contains tests to test the reputation based on incremental personalised pagerank
+    """
+
+    def setUp(self, annotate=True):
+        super(TestReputationIncrementalPagerank, self).setUp(annotate=annotate)
+        self.insert_transaction('a', 'b', 1, 20, 2, 20)
+        self.insert_transaction('a', 'b', 1, 20, 2, 10)
+        self.insert_transaction('b', 'c', 1, 20, 2, 20)
+        self.insert_transaction('b', 'd', 1, 20, 2, 5)
+        self.insert_transaction('d', 'e', 1, 10, 2, 0)
+        self.insert_transaction('c', 'a', 1, 30, 2, 15)
+
+    def assert_reputation_equal(self, reputation, expected_reputation):
+        self.assertEqual(set(reputation), set(expected_reputation))
+        for node, value in expected_reputation.iteritems():
+            self.assertAlmostEqual(reputation[node], value, places=4)
+        # The nodes are ranked in the same order
+        self.assertEqual(sorted(reputation, key=reputation.get),
+                         sorted(expected_reputation, key=expected_reputation.get))
+
+    def test_compute(self):
+        """
+        Test whether the reputation is close to that of the pagerank reputation manager
+        """
+        blocks = self.tradechain_db.get_all_blocks()
+        rep_manager = IncrementalPagerankReputationManager(blocks)
+        self.assert_reputation_equal(rep_manager.compute(own_public_key='a'),
+                                     PagerankReputationManager(blocks).compute(own_public_key='a'))
+        self.assert_reputation_equal(rep_manager.compute(own_public_key='c'),
+                                     PagerankReputationManager(blocks).compute(own_public_key='c'))
+
+    def test_compute_empty(self):
+        """
+        Test whether there is no reputation without blocks
+        """
+        self.assertEqual(IncrementalPagerankReputationManager().compute(own_public_key='a'), {})
+
+    def test_add_blocks(self):
+        """
+        Test whether the reputation is updated when blocks are added after the reputation has been computed, and
+        whether a later block between the same nodes replaces the weight of an earlier one
+        """
+        blocks, row_id = self.tradechain_db.get_blocks_after(0, limit=3)
+        self.assertEqual(len(blocks), 3)
+        rep_manager = IncrementalPagerankReputationManager(blocks)
+        rep_manager.compute(own_public_key='a')
+
+        self.insert_transaction('e', 'a', 1, 30, 2, 30)
+        self.insert_transaction('b', 'd', 1, 20, 2, 50)
+        new_blocks, _ = self.tradechain_db.get_blocks_after(row_id)
+        self.assertEqual(len(new_blocks), 5)
+        rep_manager.add_blocks(new_blocks)
+
+        self.assert_reputation_equal(rep_manager.compute(own_public_key='a'),
+                                     PagerankReputationManager(blocks + new_blocks).compute(own_public_key='a'))
@@ -1,4 +1,4 @@
-from twisted.internet.defer import inlineCallbacks, succeed, Deferred
+from twisted.internet.defer import inlineCallbacks, succeed, Deferred, DeferredList
 
 from Tribler.Test.Core.base_test import MockObject
 from Tribler.Test.test_as_server import AbstractServer
@@ -148,3 +148,30 @@ class TestBtcWallet(AbstractServer):
         mock_daemon.get_server = lambda _: mock_server
         wallet.get_daemon = lambda: mock_daemon
         return wallet.get_transactions()
+
+    @deferred(timeout=10)
+    def test_monitor_many_transactions(self):
+        """
+        Test whether monitoring many transactions fetches the history from the electrum daemon once per poll
+        """
+        history_requests = []
+
+        def mocked_run_cmdline(request):
+            history_requests.append(request)
+            return [{'value': 1, 'txid': 'tx%d' % index, 'timestamp': 1, 'confirmations': 1}
+                    for index in xrange(3000)]
+
+        wallet = BitcoinWallet(self.session_base_dir)
+        mock_daemon = MockObject()
+        mock_server = MockObject()
+        mock_server.run_cmdline = mocked_run_cmdline
+        mock_daemon.get_server = lambda _: mock_server
+        wallet.get_daemon = lambda: mock_daemon
+        wallet.transaction_watcher.interval = 0.1
+
+        def verify(_):
+            self.assertEqual(len(history_requests), 1)
+            self.assertEqual(history_requests[0]['cmd'], 'history')
+
+        return DeferredList([wallet.monitor_transaction('tx%d' % index) for index in xrange(3000)])\
+            .addCallback(verify)
@@ -0,0 +1,127 @@
+from twisted.internet import reactor
+from twisted.internet.defer import inlineCallbacks, succeed, fail
+from twisted.internet.task import deferLater
+
+from Tribler.Test.test_as_server import AbstractServer
+from Tribler.Test.twisted_thread import deferred
+from Tribler.community.market.wallet.transaction_watcher import TransactionWatcher
+from Tribler.dispersy.taskmanager import TaskManager
+from Tribler.dispersy.util import blocking_call_on_reactor_thread
+
+
+class FakeElectrumWallet(TaskManager):
+    """
+    Wallet with an electrum-like transaction history, that counts the number of times the history is fetched.
+    """
+
+    def __init__(self):
+        super(FakeElectrumWallet, self).__init__()
+        self.min_confirmations = 0
+        self.history = []
+        self.num_fetches = 0
+        self.fail_fetch = False
+
+    def add_transactions(self, txids, confirmations=0):
+        self.history += [{'id': txid, 'confirmations': confirmations} for txid in txids]
+
+    def get_transactions(self):
+        self.num_fetches += 1
+        if self.fail_fetch:
+            return fail(RuntimeError("electrum server unreachable"))
+        return succeed(list(self.history))
+
+
+class TestTransactionWatcher(AbstractServer):
+
+    @blocking_call_on_reactor_thread
+    @inlineCallbacks
+    def setUp(self, annotate=True):
+        yield super(TestTransactionWatcher, self).setUp(annotate=annotate)
+        self.wallet = FakeElectrumWallet()
+        self.watcher = TransactionWatcher(self.wallet, interval=0.01)
+        self.resolved = set()
+
+    @blocking_call_on_reactor_thread
+    @inlineCallbacks
+    def tearDown(self, annotate=True):
+        self.wallet.cancel_all_pending_tasks()
+        yield super(TestTransactionWatcher, self).tearDown(annotate=annotate)
+
+    def watch(self, txids):
+        for txid in txids:
+            self.watcher.watch(txid).addCallback(lambda _, txid=txid: self.resolved.add(txid))
+
+    @blocking_call_on_reactor_thread
+    def test_poll_many_pending(self):
+        """
+        Test whether the history is fetched once per poll, regardless of the number of pending transactions
+        """
+        txids = ["tx%d" % index for index in xrange(5000)]
+        self.watch(txids)
+
+        for index in xrange(5):
+            self.wallet.add_transactions(txids[index * 1000:(index + 1) * 1000])
+            self.watcher.poll()
+            self.assertEqual(len(self.resolved), (index + 1) * 1000)
+            self.assertEqual(self.wallet.num_fetches, index + 1)
+
+        self.assertFalse(self.watcher.pending_transactions)
+
+    @deferred(timeout=10)
+    def test_poll_scheduled(self):
+        """
+        Test whether the watched transactions are resolved by the scheduled polls, and polling stops afterwards
+        """
+        self.wallet.add_transactions(["tx%d" % index for index in xrange(2000)])
+        self.watch(["tx%d" % index for index in xrange(2000)])
+        watch_deferred = self.watcher.watch("tx0")
+
+        def verify():
+            self.assertEqual(len(self.resolved), 2000)
+            self.assertEqual(self.wallet.num_fetches, 1)
+            self.assertFalse(self.watcher.polling)
+            self.assertFalse(self.wallet.is_pending_task_active("transaction_watcher_poll"))
+
+        return watch_deferred.addCallback(lambda _: deferLater(reactor, 0.1, verify))
+
+    @blocking_call_on_reactor_thread
+    def test_confirmations(self):
+        """
+        Test whether a transaction is only resolved when it has enough confirmations
+        """
+        self.wallet.min_confirmations = 2
+        self.watch(["tx1"])
+        self.wallet.add_transactions(["tx1"], confirmations=1)
+        self.watcher.poll()
+        self.assertFalse(self.resolved)
+
+        self.wallet.history = []
+        self.wallet.add_transactions(["tx1"], confirmations=2)
+        self.watcher.poll()
+        self.assertEqual(self.resolved, {"tx1"})
+
+    @deferred(timeout=10)
+    def test_poll_interval(self):
+        """
+        Test whether the history is polled at the base interval while a transaction is pending, also when polls fail
+        """
+        self.watch(["tx1"])
+
+        def fail_fetches():
+            self.assertFalse(self.resolved)
+            self.assertGreaterEqual(self.wallet.num_fetches, 5)
+            self.wallet.fail_fetch = True
+            self.wallet.num_fetches = 0
+            return deferLater(reactor, 0.2, resolve)
+
+        def resolve():
+            self.assertGreaterEqual(self.wallet.num_fetches, 5)
+            self.wallet.fail_fetch = False
+            self.wallet.add_transactions(["tx1"])
+            return deferLater(reactor, 0.2, verify)
+
+        def verify():
+            self.assertEqual(self.resolved, {"tx1"})
+            self.assertFalse(self.wallet.is_pending_task_active("transaction_watcher_poll"))
+
+        return deferLater(reactor, 0.2, fail_fetches)
@@ -302,6 +302,39 @@ class CommunityTestSuite(AbstractTestCommunity):
         new_timestamp = self.market_community.order_book.get_tick(self.ask.order_id).tick.timestamp
         self.assertGreater(new_timestamp, ask_timestamp)
 
+    @blocking_call_on_reactor_thread
+    def test_on_tick_match(self):
+        """
+        Test whether only our asks that are crossed by a received bid are matched
+        """
+        matched_orders = []
+        self.market_community.match = lambda order: matched_orders.append(order)
+        cheap_ask = self.market_community.create_ask(300, 'DUM1', 10, 'DUM2', 3600)
+        self.market_community.create_ask(400, 'DUM1', 10, 'DUM2', 3600)
+        self.market_community.create_bid(200, 'DUM1', 10, 'DUM2', 3600)
+        del matched_orders[:]
+
+        self.market_community.on_tick([self.get_tick_message(self.ask)])
+        self.assertEqual(matched_orders, [])
+
+        self.market_community.on_tick([self.get_tick_message(self.bid)])
+        self.assertEqual(matched_orders, [cheap_ask])
+
+    @blocking_call_on_reactor_thread
+    def test_on_tick_relay(self):
+        """
+        Test whether a received tick is only relayed again when it has been updated
+        """
+        relayed_messages = []
+        self.market_community.relay_message = lambda message: relayed_messages.append(message)
+        self.market_community.on_tick([self.get_tick_message(self.ask)])
+        self.market_community.on_tick([self.get_tick_message(self.ask)])
+        self.assertEqual(len(relayed_messages), 1)
+
+        self.ask.update_timestamp()
+        self.market_community.on_tick([self.get_tick_message(self.ask)])
+        self.assertEqual(len(relayed_messages), 2)
+
     @blocking_call_on_reactor_thread
     def test_create_bid(self):
         # Test for create bid
@@ -400,7 +433,7 @@ class CommunityTestSuite(AbstractTestCommunity):
         """
         self.market_community.tradechain_community = MockObject()
         self.market_community.tradechain_community.persistence = MockObject()
-        self.market_community.tradechain_community.persistence.get_all_blocks = lambda: []
+        self.market_community.tradechain_community.persistence.get_blocks_after = lambda row_id: ([], row_id)
         self.market_community.compute_reputation()
         self.assertFalse(self.market_community.reputation_dict)
 
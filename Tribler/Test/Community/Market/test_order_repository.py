@@ -4,11 +4,12 @@ import unittest
 from twisted.internet.defer import inlineCallbacks
 
 from Tribler.Test.test_as_server import AbstractServer
-from Tribler.community.market.core.message import TraderId
+from Tribler.community.market.core.message import TraderId, MessageId, MessageNumber
 from Tribler.community.market.core.order import Order, OrderId, OrderNumber
 from Tribler.community.market.core.order_repository import MemoryOrderRepository, DatabaseOrderRepository
 from Tribler.community.market.core.price import Price
 from Tribler.community.market.core.quantity import Quantity
+from Tribler.community.market.core.tick import Ask, Bid
 from Tribler.community.market.core.timeout import Timeout
 from Tribler.community.market.core.timestamp import Timestamp
 from Tribler.community.market.database import MarketDB
@@ -67,6 +68,45 @@ class MemoryOrderRepositoryTestSuite(unittest.TestCase):
         self.assertNotEquals(self.order, self.memory_order_repository.find_by_id(self.order_id))
         self.assertEquals(self.order2, self.memory_order_repository.find_by_id(self.order_id))
 
+    def test_find_crossing_orders(self):
+        """
+        Test whether only the orders with a price crossing the price of a tick are found, best priced first
+        """
+        asks = [Order(OrderId(TraderId("0"), OrderNumber(number)), Price(price, 'BTC'), Quantity(30, 'MC'),
+                      Timeout(3600.0), Timestamp.now(), True) for number, price in [(2, 10), (3, 30), (4, 20)]]
+        for ask in asks:
+            self.memory_order_repository.add(ask)
+        self.memory_order_repository.add(self.order)
+
+        bid = Bid(MessageId(TraderId("1"), MessageNumber("1")), OrderId(TraderId("1"), OrderNumber(1)),
+                  Price(20, 'BTC'), Quantity(30, 'MC'), Timeout(3600.0), Timestamp.now())
+        self.assertEqual(self.memory_order_repository.find_crossing_orders(bid), [asks[0], asks[2]])
+
+        ask = Ask(MessageId(TraderId("1"), MessageNumber("2")), OrderId(TraderId("1"), OrderNumber(2)),
+                  Price(500, 'BTC'), Quantity(30, 'MC'), Timeout(3600.0), Timestamp.now())
+        self.assertEqual(self.memory_order_repository.find_crossing_orders(ask), [])
+        ask = Ask(MessageId(TraderId("1"), MessageNumber("2")), OrderId(TraderId("1"), OrderNumber(2)),
+                  Price(100, 'BTC'), Quantity(30, 'MC'), Timeout(3600.0), Timestamp.now())
+        self.assertEqual(self.memory_order_repository.find_crossing_orders(ask), [self.order])
+
+        # Orders in another market are never crossing
+        bid = Bid(MessageId(TraderId("1"), MessageNumber("3")), OrderId(TraderId("1"), OrderNumber(3)),
+                  Price(20, 'BTC'), Quantity(30, 'DUM1'), Timeout(3600.0), Timestamp.now())
+        self.assertEqual(self.memory_order_repository.find_crossing_orders(bid), [])
+
+    def test_find_crossing_orders_update(self):
+        """
+        Test whether the price index is kept up to date when orders are updated or deleted
+        """
+        self.memory_order_repository.add(self.order)
+        self.memory_order_repository.update(self.order2)
+        ask = Ask(MessageId(TraderId("1"), MessageNumber("1")), OrderId(TraderId("1"), OrderNumber(1)),
+                  Price(500, 'BTC'), Quantity(30, 'MC'), Timeout(3600.0), Timestamp.now())
+        self.assertEqual(self.memory_order_repository.find_crossing_orders(ask), [self.order2])
+
+        self.memory_order_repository.delete_by_id(self.order_id)
+        self.assertEqual(self.memory_order_repository.find_crossing_orders(ask), [])
+
 
 class DatabaseOrderRepositoryTestSuite(AbstractServer):
 
@@ -87,3 +127,44 @@ class DatabaseOrderRepositoryTestSuite(AbstractServer):
         Test the initialization of the database order repository
         """
         self.assertRaises(ValueError, DatabaseOrderRepository, 'g' * 10, None)
+
+    def test_cache(self):
+        """
+        Test whether the orders in the database are cached and the cache is kept up to date
+        """
+        order_id = OrderId(TraderId("a" * 10), OrderNumber(1))
+        order = Order(order_id, Price(100, 'BTC'), Quantity(30, 'MC'), Timeout(0.0), Timestamp(10.0), False)
+        self.database_order_repo.add(order)
+        self.assertEqual(self.database_order_repo.find_all(), [order])
+
+        # A new repository restores the orders from the database
+        database_order_repo = DatabaseOrderRepository('a' * 10, self.database_order_repo.persistence)
+        self.assertEqual(len(database_order_repo.find_all()), 1)
+        self.assertEqual(database_order_repo.find_by_id(order_id).price, Price(100, 'BTC'))
+
+        order.cancel()
+        self.database_order_repo.update(order)
+        self.assertTrue(self.database_order_repo.find_by_id(order_id).cancelled)
+        self.assertTrue(self.database_order_repo.persistence.get_order(order_id).cancelled)
+
+        self.database_order_repo.delete_by_id(order_id)
+        self.assertEqual(self.database_order_repo.find_all(), [])
+        self.assertIsNone(self.database_order_repo.find_by_id(order_id))
+
+    def test_update_required(self):
+        """
+        Test whether a modified order is only written to the database when update is called
+        """
+        order_id = OrderId(TraderId("a" * 10), OrderNumber(1))
+        self.database_order_repo.add(Order(order_id, Price(100, 'BTC'), Quantity(30, 'MC'), Timeout(0.0),
+                                           Timestamp(10.0), False))
+
+        order = self.database_order_repo.find_by_id(order_id)
+        order.cancel()
+        self.assertTrue(self.database_order_repo.find_by_id(order_id).cancelled)
+        self.assertFalse(self.database_order_repo.persistence.get_order(order_id).cancelled)
+
+        self.database_order_repo.update(order)
+        self.assertTrue(self.database_order_repo.persistence.get_order(order_id).cancelled)
+        database_order_repo = DatabaseOrderRepository('a' * 10, self.database_order_repo.persistence)
+        self.assertTrue(database_order_repo.find_by_id(order_id).cancelled)
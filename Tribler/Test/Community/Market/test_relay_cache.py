@@ -0,0 +1,42 @@
+import unittest
+
+from Tribler.community.market.core.message import TraderId
+from Tribler.community.market.core.order import OrderId, OrderNumber
+from Tribler.community.market.core.relay_cache import RelayCache
+from Tribler.community.market.core.timestamp import Timestamp
+
+
+class RelayCacheTestSuite(unittest.TestCase):
+    """Relay cache test cases."""
+
+    def setUp(self):
+        # Object creation
+        self.relay_cache = RelayCache(max_size=2, ttl=3600)
+        self.order_id = OrderId(TraderId("0"), OrderNumber(1))
+        self.order_id2 = OrderId(TraderId("0"), OrderNumber(2))
+        self.order_id3 = OrderId(TraderId("0"), OrderNumber(3))
+
+    def test_should_relay(self):
+        # Test whether a tick is only relayed again when it is more recent
+        self.assertTrue(self.relay_cache.should_relay(self.order_id, Timestamp(10.0)))
+        self.assertFalse(self.relay_cache.should_relay(self.order_id, Timestamp(10.0)))
+        self.assertFalse(self.relay_cache.should_relay(self.order_id, Timestamp(5.0)))
+        self.assertTrue(self.relay_cache.should_relay(self.order_id, Timestamp(11.0)))
+        self.assertEqual(1, len(self.relay_cache))
+
+    def test_max_size(self):
+        # Test whether the least recently relayed tick is dropped when the cache is full
+        self.relay_cache.should_relay(self.order_id, Timestamp(10.0))
+        self.relay_cache.should_relay(self.order_id2, Timestamp(10.0))
+        self.relay_cache.should_relay(self.order_id, Timestamp(11.0))
+        self.relay_cache.should_relay(self.order_id3, Timestamp(10.0))
+        self.assertEqual(2, len(self.relay_cache))
+        self.assertIn(self.order_id, self.relay_cache)
+        self.assertNotIn(self.order_id2, self.relay_cache)
+
+    def test_expire(self):
+        # Test whether ticks are forgotten after the time to live
+        self.relay_cache.ttl = -1
+        self.relay_cache.should_relay(self.order_id, Timestamp(10.0))
+        self.assertNotIn(self.order_id, self.relay_cache)
+        self.assertTrue(self.relay_cache.should_relay(self.order_id, Timestamp(10.0)))
@@ -39,6 +39,37 @@ class TestTunnelCommunity(TestTunnelBase):
 
         yield self.test_deferred
 
+    @staticmethod
+    def wait_for(condition):
+        """
+        Return a deferred that fires once the condition holds.
+        """
+        condition_deferred = Deferred()
+
+        def check():
+            if condition():
+                condition_deferred.callback(None)
+            else:
+                reactor.callLater(0.5, check)
+        check()
+        return condition_deferred
+
+    @deferred(timeout=60)
+    @inlineCallbacks
+    def test_circuits_spread_over_exits(self):
+        """
+        Testing whether our data circuits are spread over the available exit nodes
+        """
+        yield self.setup_nodes(num_relays=0, num_exitnodes=3)
+        yield self.wait_for(lambda: len(self.tunnel_community.exit_candidates) == 3)
+
+        self.tunnel_community.build_tunnels(1)
+        yield self.wait_for(lambda: len(self.tunnel_community.active_data_circuits(1)) >= 6)
+
+        exits = set(self.tunnel_community.crypto.key_to_bin(circuit.hops[-1].public_key)
+                    for circuit in self.tunnel_community.active_data_circuits(1).itervalues())
+        self.assertEqual(exits, set(self.tunnel_community.exit_candidates))
+
     @deferred(timeout=60)
     @inlineCallbacks
     def test_anon_download_no_exitnodes(self):
@@ -7,13 +7,31 @@ from Tribler.dispersy.util import blocking_call_on_reactor_thread
 
 
 class MockSocks5Server(object):
+    def __init__(self):
+        self.used_circuits = []
+
     def connectionLost(self, _):
         pass
 
+    def on_circuit_used(self, _, circuit):
+        self.used_circuits.append(circuit)
+
+    def on_circuit_released(self, _, circuit):
+        self.used_circuits.remove(circuit)
+
 
 class MockSelectionStrategy(object):
+    def __init__(self):
+        self.circuits = []
+
     def select(self, *_):
-        pass
+        if self.circuits:
+            return self.circuits.pop(0)
+
+
+class MockCircuit(object):
+    def __init__(self, circuit_id):
+        self.circuit_id = circuit_id
 
 
 class MockHost(object):
@@ -94,6 +112,54 @@ class TestSocks5Connection(AbstractServer):
         # Second close
         self.assertTrue(self.connection.close())
 
+    def test_select_reverse_index(self):
+        """
+        Test whether selecting circuits for destinations keeps the index of circuits to destinations up to date
+        """
+        circuit1, circuit2 = MockCircuit(1), MockCircuit(2)
+        self.connection.selection_strategy.circuits = [circuit1, circuit2]
+
+        self.assertEqual(self.connection.select(("1.1.1.1", 1)), circuit1)
+        self.assertEqual(self.connection.select(("2.2.2.2", 2)), circuit2)
+        self.assertEqual(self.connection.select(("1.1.1.1", 1)), circuit1)
+        self.assertEqual(self.connection.circuit_destinations, {circuit1: {("1.1.1.1", 1)},
+                                                                circuit2: {("2.2.2.2", 2)}})
+        self.assertEqual(self.connection.socksserver.used_circuits, [circuit1, circuit2])
+
+        # Incoming data from a new origin over a circuit we use is routed back over that circuit
+        self.connection.on_incoming_from_tunnel(None, circuit1, ("3.3.3.3", 3), "")
+        self.assertEqual(self.connection.circuit_destinations[circuit1], {("1.1.1.1", 1), ("3.3.3.3", 3)})
+
+        # Moving the last destination of a circuit to another circuit releases the first circuit
+        self.connection.set_destination(("2.2.2.2", 2), circuit1)
+        self.assertNotIn(circuit2, self.connection.circuit_destinations)
+        self.assertEqual(self.connection.socksserver.used_circuits, [circuit1])
+
+    def test_incoming_unknown_circuit(self):
+        """
+        Test whether incoming data over a circuit that is not used by this session is only accepted when forced
+        """
+        circuit = MockCircuit(1)
+        self.connection.on_incoming_from_tunnel(None, circuit, ("1.1.1.1", 1), "")
+        self.assertEqual(self.connection.destinations, {})
+
+        self.connection.on_incoming_from_tunnel(None, circuit, ("1.1.1.1", 1), "", force=True)
+        self.assertEqual(self.connection.destinations, {("1.1.1.1", 1): circuit})
+
+    def test_circuit_dead(self):
+        """
+        Test whether the destinations of a dead circuit are removed
+        """
+        circuit1, circuit2 = MockCircuit(1), MockCircuit(2)
+        self.connection.set_destination(("1.1.1.1", 1), circuit1)
+        self.connection.set_destination(("2.2.2.2", 2), circuit1)
+        self.connection.set_destination(("3.3.3.3", 3), circuit2)
+
+        self.assertEqual(self.connection.circuit_dead(circuit1), {("1.1.1.1", 1), ("2.2.2.2", 2)})
+        self.assertEqual(self.connection.destinations, {("3.3.3.3", 3): circuit2})
+        self.assertEqual(self.connection.socksserver.used_circuits, [circuit2])
+        self.assertEqual(self.connection.circuit_dead(circuit1), set())
+
 
 class TestSocksUDPConnection(AbstractServer):
 
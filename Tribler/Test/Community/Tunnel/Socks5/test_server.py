@@ -0,0 +1,99 @@
+from Tribler.Test.Core.base_test import MockObject
+from Tribler.Test.test_as_server import AbstractServer
+from Tribler.community.tunnel import CIRCUIT_TYPE_DATA
+from Tribler.community.tunnel.Socks5.server import Socks5Server, Socks5Connection
+
+
+class MockUDPSocket(object):
+    def __init__(self):
+        self.out = []
+
+    def sendDatagram(self, data):
+        self.out.append(data)
+
+    def close(self):
+        return True
+
+
+class MockTransport(object):
+    def loseConnection(self):
+        pass
+
+
+class TestSocks5Server(AbstractServer):
+
+    def setUp(self, annotate=True):
+        super(TestSocks5Server, self).setUp(annotate=annotate)
+        self.server = Socks5Server(None, [])
+
+    def create_session(self, hops=1):
+        session = Socks5Connection(self.server, None, hops)
+        session.transport = MockTransport()
+        session._udp_socket = MockUDPSocket()
+        self.server.sessions.append(session)
+        return session
+
+    def create_circuit(self, circuit_id, goal_hops=1):
+        circuit = MockObject()
+        circuit.circuit_id = circuit_id
+        circuit.goal_hops = goal_hops
+        circuit.ctype = CIRCUIT_TYPE_DATA
+        return circuit
+
+    def test_incoming_routed_by_circuit(self):
+        """
+        Test whether incoming data is only delivered to the sessions that use the circuit
+        """
+        session1, session2 = self.create_session(), self.create_session()
+        circuit1, circuit2 = self.create_circuit(1), self.create_circuit(2)
+        session1.set_destination(("1.1.1.1", 1), circuit1)
+        session2.set_destination(("2.2.2.2", 2), circuit2)
+
+        self.server.on_incoming_from_tunnel(None, circuit1, ("1.1.1.1", 1), "data")
+        self.assertEqual(len(session1._udp_socket.out), 1)
+        self.assertEqual(len(session2._udp_socket.out), 0)
+
+        # Sessions that use the circuit with a different number of hops do not get the data
+        session3 = self.create_session(hops=2)
+        session3.set_destination(("3.3.3.3", 3), circuit2)
+        self.server.on_incoming_from_tunnel(None, circuit2, ("3.3.3.3", 3), "data")
+        self.assertEqual(len(session2._udp_socket.out), 1)
+        self.assertEqual(len(session3._udp_socket.out), 0)
+
+    def test_incoming_forced(self):
+        """
+        Test whether forced incoming data is delivered to all sessions and indexes the circuit
+        """
+        session1, session2 = self.create_session(), self.create_session()
+        circuit = self.create_circuit(1)
+
+        self.server.on_incoming_from_tunnel(None, circuit, ("1.1.1.1", 1), "data", force=True)
+        self.assertEqual(len(session1._udp_socket.out), 1)
+        self.assertEqual(len(session2._udp_socket.out), 1)
+        self.assertEqual(self.server.circuit_sessions[circuit], [session1, session2])
+
+    def test_circuit_dead(self):
+        """
+        Test whether a dead circuit is removed from the sessions that use it and from the index
+        """
+        session1, session2 = self.create_session(), self.create_session()
+        circuit1, circuit2 = self.create_circuit(1), self.create_circuit(2)
+        session1.set_destination(("1.1.1.1", 1), circuit1)
+        session2.set_destination(("2.2.2.2", 2), circuit1)
+        session2.set_destination(("3.3.3.3", 3), circuit2)
+
+        self.assertEqual(self.server.circuit_dead(circuit1), {("1.1.1.1", 1), ("2.2.2.2", 2)})
+        self.assertNotIn(circuit1, self.server.circuit_sessions)
+        self.assertEqual(self.server.circuit_sessions[circuit2], [session2])
+
+    def test_connection_lost(self):
+        """
+        Test whether a lost session is removed from the index
+        """
+        session = self.create_session()
+        circuit = self.create_circuit(1)
+        session.set_destination(("1.1.1.1", 1), circuit)
+
+        self.server.connectionLost(session)
+        self.assertNotIn(session, self.server.sessions)
+        self.assertEqual(self.server.circuit_sessions, {})
@@ -0,0 +1,122 @@
+from collections import Counter
+
+from Tribler.Test.Core.base_test import TriblerCoreTest
+from Tribler.community.tunnel.circuit_pool import CircuitDemand, ExitSelector, MIN_THROUGHPUT_BYTES
+from Tribler.community.tunnel.routing import Circuit
+
+
+class TestExitSelector(TriblerCoreTest):
+
+    def setUp(self, annotate=True):
+        super(TestExitSelector, self).setUp(annotate=annotate)
+        self.selector = ExitSelector()
+        self.exit_candidates = {"exit %d" % index: "candidate %d" % index for index in xrange(3)}
+        self.next_circuit_id = 1
+
+    def build_circuits(self, num_circuits):
+        """
+        Select the exits of a number of new circuits and return how many circuits go through every exit.
+        """
+        exits = Counter()
+        for _ in xrange(num_circuits):
+            candidate = self.selector.select(self.exit_candidates)
+            public_key = "exit %s" % candidate.split()[-1]
+            self.selector.add_circuit(self.next_circuit_id, public_key)
+            self.selector.circuit_ready(self.next_circuit_id)
+            self.next_circuit_id += 1
+            exits[public_key] += 1
+        return exits
+
+    def test_select_no_exits(self):
+        """
+        Test whether no exit is selected when there are no exit candidates
+        """
+        self.assertIsNone(self.selector.select({}))
+
+    def test_spread_over_exits(self):
+        """
+        Test whether the circuits are spread evenly over exits that are equally good
+        """
+        exits = self.build_circuits(9)
+        self.assertEqual(sorted(exits.values()), [3, 3, 3])
+
+    def test_prefer_fast_exits(self):
+        """
+        Test whether exits with a lower round trip time get more circuits, but not all of them
+        """
+        for circuit_id, public_key in enumerate(["exit 0", "exit 1", "exit 2"], 100):
+            self.selector.add_circuit(circuit_id, public_key)
+            self.selector.add_rtt(circuit_id, 0.1 if public_key == "exit 0" else 0.4)
+            self.selector.remove_circuit(Circuit(long(circuit_id)))
+
+        exits = self.build_circuits(12)
+        self.assertGreater(exits["exit 0"], exits["exit 1"])
+        self.assertGreater(exits["exit 0"], exits["exit 2"])
+        self.assertGreater(exits["exit 1"], 0)
+
+    def test_avoid_failing_exits(self):
+        """
+        Test whether exits at which circuits fail get fewer circuits
+        """
+        for circuit_id in xrange(100, 105):
+            self.selector.add_circuit(circuit_id, "exit 2")
+            self.selector.circuit_failed(circuit_id)
+            self.selector.remove_circuit(Circuit(long(circuit_id)))
+
+        exits = self.build_circuits(6)
+        self.assertEqual(exits["exit 2"], 0)
+
+    def test_measure_throughput(self):
+        """
+        Test whether the throughput is only measured for circuits that downloaded enough
+        """
+        circuit = Circuit(1L)
+        circuit.creation_time -= 10
+        self.selector.add_circuit(1L, "exit 0")
+        self.selector.remove_circuit(circuit)
+        self.assertIsNone(self.selector.statistics["exit 0"].throughput)
+
+        circuit = Circuit(2L)
+        circuit.creation_time -= 10
+        circuit.bytes_down = 10 * MIN_THROUGHPUT_BYTES
+        self.selector.add_circuit(2L, "exit 0")
+        self.selector.remove_circuit(circuit)
+        self.assertAlmostEqual(self.selector.statistics["exit 0"].throughput, MIN_THROUGHPUT_BYTES, delta=1000)
+        self.assertEqual(self.selector.statistics["exit 0"].num_circuits, 0)
+
+    def test_prune(self):
+        """
+        Test whether only the statistics of the unavailable exits without circuits are dropped
+        """
+        self.selector.add_circuit(1L, "exit 0")
+        self.selector.add_circuit(2L, "exit 1")
+        self.selector.remove_circuit(Circuit(2L))
+        self.selector.add_circuit(3L, "exit 2")
+        self.selector.remove_circuit(Circuit(3L))
+
+        self.selector.prune({"exit 2": "candidate 2"})
+        self.assertEqual(sorted(self.selector.statistics), ["exit 0", "exit 2"])
+
+
+class TestCircuitDemand(TriblerCoreTest):
+
+    def test_pool_sizes(self):
+        """
+        Test whether the pool sizes follow the recent peak demand and decay over time
+        """
+        demand = CircuitDemand(half_life=100)
+        demand.update(1, 8, now=0)
+        demand.update(1, 2, now=10)
+        demand.update(3, 1, now=0)
+        self.assertEqual(demand.get_pool_sizes(4, now=10), {1: 4, 3: 1})
+        self.assertEqual(demand.get_pool_sizes(4, now=200), {1: 2})
+        self.assertEqual(demand.get_pool_sizes(4, now=1000), {})
+        self.assertEqual(demand.peaks, {})
+
+    def test_no_demand(self):
+        """
+        Test whether no circuits are kept for a number of hops that is not needed
+        """
+        demand = CircuitDemand()
+        demand.update(1, 0)
+        self.assertEqual(demand.get_pool_sizes(4), {})
@@ -1,11 +1,30 @@
 import time
 
-from Tribler.Core.simpledefs import DLSTATUS_DOWNLOADING
+from Tribler.Core.simpledefs import DLSTATUS_DOWNLOADING, DLSTATUS_SEEDING, DLSTATUS_STOPPED
 from Tribler.Test.Community.Tunnel.test_tunnel_base import AbstractTestTunnelCommunity
 from Tribler.Test.Core.base_test import MockObject
+from Tribler.community.tunnel.hidden_community import INTRO_POINT_TIMEOUT
+from Tribler.community.tunnel.routing import Circuit
+from Tribler.community.tunnel.tunnel_community import TunnelSettings
 from Tribler.dispersy.util import blocking_call_on_reactor_thread
 
 
+def create_download_state(index, status):
+    """
+    Create the state of an anonymous download with a different infohash for every index.
+    """
+    tdef = MockObject()
+    tdef.get_infohash = lambda: "%020d" % index
+    download = MockObject()
+    download.get_hops = lambda: 1
+    download.get_def = lambda: tdef
+    download.add_peer = lambda _: None
+    ds = MockObject()
+    ds.get_download = lambda: download
+    ds.get_status = lambda: status
+    return ds
+
+
 class TestHiddenCommunity(AbstractTestTunnelCommunity):
 
     @blocking_call_on_reactor_thread
@@ -29,3 +48,66 @@ class TestHiddenCommunity(AbstractTestTunnelCommunity):
         """
         self.tunnel_community.find_download = lambda _: None
         self.tunnel_community.create_introduction_point('a' * 20)
+
+    @blocking_call_on_reactor_thread
+    def test_monitor_many_hidden_seeders(self):
+        """
+        Test whether the hidden services of 1000 seeding downloads are only maintained when the status of a download
+        changes or when one of its timers is due
+        """
+        community = self.tunnel_community
+        community.settings = TunnelSettings()
+        community.send_cell = lambda *_: None
+
+        created_circuits = {}  # Dictionary of circuit id -> (info hash, callback) of the introducing circuits
+
+        def create_circuit(_, __, callback, info_hash=None):
+            circuit_id = long(len(created_circuits) + 1)
+            created_circuits[circuit_id] = (info_hash, callback)
+            return circuit_id
+        community.create_circuit = create_circuit
+
+        dht_lookups = []
+        community.do_dht_lookup = lambda info_hash: dht_lookups.append(info_hash) or True
+
+        states = [create_download_state(index, DLSTATUS_SEEDING) for index in xrange(1000)]
+        community.monitor_downloads(states)
+        self.assertEqual(len(created_circuits), 1000)
+        self.assertEqual(len(set(dht_lookups)), 1000)
+
+        # Monitoring downloads that did not change does not do anything
+        del dht_lookups[:]
+        for _ in xrange(10):
+            community.monitor_downloads(states)
+        self.assertEqual(len(created_circuits), 1000)
+        self.assertEqual(dht_lookups, [])
+
+        # The introducing circuits of half of the downloads become introduction points in time, the others are rebuilt
+        info_hashes = [community.get_lookup_info_hash("%020d" % index) for index in xrange(1000)]
+        seeding_info_hashes = set(info_hashes[:500])
+        intro_circuit_ids = {}
+        for circuit_id, (info_hash, callback) in created_circuits.items():
+            if info_hash in seeding_info_hashes:
+                callback(Circuit(circuit_id, first_hop=("127.0.0.1", 1234)))
+                intro_circuit_ids[info_hash] = circuit_id
+        for _ in xrange(INTRO_POINT_TIMEOUT):
+            community.timer_wheel.tick()
+        self.assertEqual(len(created_circuits), 1500)
+        self.assertEqual(len(community.my_intro_points), 500)
+
+        # Every download has done exactly one more DHT lookup
+        self.assertEqual(len(dht_lookups), 1000)
+        self.assertEqual(len(set(dht_lookups)), 1000)
+
+        # Stopping a download removes its introduction point and stops its DHT lookups
+        info_hash = info_hashes[0]
+        states[0] = create_download_state(0, DLSTATUS_STOPPED)
+        community.monitor_downloads(states)
+        self.assertNotIn(intro_circuit_ids[info_hash], community.my_intro_points)
+        self.assertNotIn(info_hash, community.infohash_ip_circuits)
+
+        del dht_lookups[:]
+        for _ in xrange(community.settings.dht_lookup_interval):
+            community.timer_wheel.tick()
+        self.assertEqual(len(dht_lookups), 999)
+        self.assertNotIn(info_hash, dht_lookups)
@@ -0,0 +1,231 @@
+import json
+import os
+import signal
+import sys
+
+from twisted.internet.defer import inlineCallbacks
+from twisted.internet.error import ProcessTerminated
+from twisted.internet.task import deferLater
+from twisted.python.failure import Failure
+
+import Tribler
+from Tribler.Test.Core.base_test import TriblerCoreTest, MockObject
+from Tribler.Test.twisted_thread import deferred, reactor
+from Tribler.community.tunnel.supervisor import TunnelSupervisor, WorkerStatusReporter, STATUS_FD
+
+# A worker that listens on its own UDP port on loopback and reports some tunnel statistics
+WORKER_SCRIPT = """
+import sys
+sys.path.insert(0, %r)
+from twisted.internet import reactor
+from twisted.internet.protocol import DatagramProtocol
+from Tribler.community.tunnel.supervisor import WorkerStatusReporter
+
+port = reactor.listenUDP(0, DatagramProtocol(), interface="127.0.0.1")
+status = {'port': port.getHost().port, 'circuits': int(sys.argv[1]), 'bytes_exit': 1024}
+WorkerStatusReporter(lambda: status, %d, 0.1).start()
+reactor.run()
+""" % (os.path.dirname(os.path.dirname(os.path.abspath(Tribler.__file__))), STATUS_FD)
+
+
+class TestTunnelSupervisor(TriblerCoreTest):
+
+    def setUp(self, annotate=True):
+        TriblerCoreTest.setUp(self, annotate=annotate)
+        self.supervisor = TunnelSupervisor(3, self.get_worker_args, restart_delay=0.1)
+
+    def tearDown(self, annotate=True):
+        self.supervisor.cancel_all_pending_tasks()
+        TriblerCoreTest.tearDown(self, annotate=annotate)
+
+    def get_worker_args(self, index):
+        return [sys.executable, "-c", WORKER_SCRIPT, str(index + 1)]
+
+    @inlineCallbacks
+    def wait_for(self, condition):
+        while not condition():
+            yield deferLater(reactor, 0.1, lambda: None)
+
+    def all_workers_reported(self):
+        return all(worker and worker.status for worker in self.supervisor.workers)
+
+    @deferred(timeout=30)
+    @inlineCallbacks
+    def test_workers_on_loopback(self):
+        """
+        Testing whether the workers are started on their own ports and whether their stats are rolled up
+        """
+        self.supervisor.start()
+        yield self.wait_for(self.all_workers_reported)
+
+        worker_stats = self.supervisor.get_worker_stats()
+        self.assertEqual(len(set(stats['status']['port'] for stats in worker_stats)), 3)
+        self.assertEqual(len(set(stats['pid'] for stats in worker_stats)), 3)
+
+        stats = self.supervisor.get_stats()
+        self.assertEqual(stats['workers'], 3)
+        self.assertEqual(stats['circuits'], 1 + 2 + 3)
+        self.assertEqual(stats['bytes_exit'], 3 * 1024)
+
+        yield self.supervisor.stop()
+        self.assertEqual(self.supervisor.workers, [None, None, None])
+
+
+class FakeWorkerTransport(object):
+    """
+    Transport of a worker process that is not actually spawned.
+    """
+
+    def __init__(self, worker, pid):
+        self.worker = worker
+        self.pid = pid
+        self.signals = []
+
+    def signalProcess(self, signal_id):
+        self.signals.append(signal_id)
+        self.end(signal_id)
+
+    def end(self, signal_id=signal.SIGKILL):
+        self.pid = None
+        reactor.callLater(0, self.worker.processEnded, Failure(ProcessTerminated(signal=signal_id)))
+
+
+class TestTunnelSupervisorLogic(TriblerCoreTest):
+    """
+    Tests the restarts and the statistics of the supervisor, without spawning worker processes.
+    """
+
+    def setUp(self, annotate=True):
+        TriblerCoreTest.setUp(self, annotate=annotate)
+        self.spawned = []
+        self.supervisor = TunnelSupervisor(3, lambda index: ["worker", str(index)], restart_delay=0.1)
+        self.supervisor.spawn_worker = self.spawn_worker
+
+    def tearDown(self, annotate=True):
+        self.supervisor.cancel_all_pending_tasks()
+        TriblerCoreTest.tearDown(self, annotate=annotate)
+
+    def spawn_worker(self, worker, args):
+        self.spawned.append(args)
+        worker.makeConnection(FakeWorkerTransport(worker, 1000 + len(self.spawned)))
+
+    def report(self, worker, status):
+        line = json.dumps(status) + "\n"
+        # The status may arrive in multiple chunks
+        worker.childDataReceived(STATUS_FD, line[:5])
+        worker.childDataReceived(STATUS_FD, line[5:])
+
+    @deferred(timeout=10)
+    @inlineCallbacks
+    def test_restart_worker(self):
+        """
+        Testing whether a worker that dies is restarted, with a back-off if it died right after being started
+        """
+        self.supervisor.start()
+        self.assertEqual(self.spawned, [["worker", "0"], ["worker", "1"], ["worker", "2"]])
+
+        old_worker = self.supervisor.workers[1]
+        old_worker.transport.end()
+        yield old_worker.ended_deferred
+        self.assertIsNone(self.supervisor.workers[1])
+        self.assertEqual(self.supervisor.restarts, [0, 1, 0])
+        self.assertEqual(self.supervisor.restart_delays[1], 0.2)
+        self.assertTrue(self.supervisor.is_pending_task_active("restart worker 1"))
+
+        yield deferLater(reactor, 0.2, lambda: None)
+        self.assertEqual(self.spawned[-1], ["worker", "1"])
+        self.assertIsNot(self.supervisor.workers[1], old_worker)
+        self.assertEqual(self.supervisor.get_stats()['workers'], 3)
+
+    def test_stats(self):
+        """
+        Testing whether the numeric statistics that the workers report are rolled up
+        """
+        self.supervisor.start()
+        for index, worker in enumerate(self.supervisor.workers):
+            self.report(worker, {'circuits': index + 1, 'bytes_exit': 1024, 'version': "1.0"})
+        self.supervisor.workers[0].childDataReceived(STATUS_FD, "invalid\n")
+        # Output on other file descriptors is not a status
+        self.supervisor.workers[0].childDataReceived(1, "{}\n")
+
+        self.assertEqual(self.supervisor.get_stats(), {'workers': 3, 'circuits': 1 + 2 + 3, 'bytes_exit': 3 * 1024})
+        worker_stats = self.supervisor.get_worker_stats()
+        self.assertEqual([stats['pid'] for stats in worker_stats], [1001, 1002, 1003])
+        self.assertEqual(worker_stats[0]['status'], {'circuits': 1, 'bytes_exit': 1024, 'version': "1.0"})
+
+        self.supervisor.build_history()
+        self.assertEqual(self.supervisor.history_stats[-1]['circuits'], 1 + 2 + 3)
+
+    @deferred(timeout=10)
+    @inlineCallbacks
+    def test_stop(self):
+        """
+        Testing whether stopping the supervisor terminates the workers without restarting them
+        """
+        self.supervisor.start()
+        workers = list(self.supervisor.workers)
+        yield self.supervisor.stop()
+
+        self.assertEqual([worker.transport.signals for worker in workers], [[signal.SIGTERM]] * 3)
+        self.assertEqual(self.supervisor.workers, [None, None, None])
+        self.assertEqual(self.supervisor.restarts, [0, 0, 0])
+        self.assertEqual(len(self.spawned), 3)
+
+
+class TestTunnelHelperWorkers(TriblerCoreTest):
+    """
+    Contains tests for the worker plumbing of the tunnel helper plugin.
+    """
+
+    def setUp(self, annotate=True):
+        TriblerCoreTest.setUp(self, annotate=annotate)
+        from twisted.plugins.tunnel_helper_plugin import Options, TunnelHelperServiceMaker
+        self.options_class = Options
+        self.service_maker = TunnelHelperServiceMaker()
+
+    def test_get_worker_args(self):
+        """
+        Testing whether every worker gets its own ports and a status file descriptor, and keeps the other options
+        """
+        options = self.options_class()
+        options.parseOptions(["--workers=3", "--socks5=5000", "--dispersy=6000", "--introduce=7000", "--exit"])
+
+        args = self.service_maker.get_worker_args(options, 5000, 2)
+        self.assertEqual(args[0], sys.executable)
+
+        worker_options = self.options_class()
+        worker_options.parseOptions(args[args.index(self.service_maker.tapname) + 1:])
+        self.assertEqual(worker_options["socks5"], 5010)
+        self.assertEqual(worker_options["dispersy"], 6002)
+        self.assertEqual(worker_options["introduce"], 7000)
+        self.assertEqual(worker_options["statusfd"], STATUS_FD)
+        self.assertEqual(worker_options["workers"], 1)
+        self.assertTrue(worker_options["exit"])
+        self.assertFalse(worker_options["trustchain"])
+
+    def test_report_tunnel_status(self):
+        """
+        Testing whether a worker writes the status of its tunnel as a line of JSON to the status file descriptor
+        """
+        from twisted.plugins.tunnel_helper_plugin import Tunnel
+        tunnel = Tunnel.__new__(Tunnel)
+        tunnel.community = MockObject()
+        tunnel.community.circuits = {1: None, 2: None}
+        tunnel.community.relay_from_to = {3: None}
+        tunnel.community.exit_sockets = {}
+        tunnel.community.stats = {'bytes_exit': 1024}
+        tunnel.community.crypto = MockObject()
+        tunnel.community.crypto.key_pool = MockObject()
+        tunnel.community.crypto.key_pool.get_statistics = lambda: {'dh_pool_keys': 5}
+
+        read_fd, write_fd = os.pipe()
+        try:
+            WorkerStatusReporter(tunnel.get_status, write_fd).report()
+            line = os.read(read_fd, 4096)
+        finally:
+            os.close(read_fd)
+            os.close(write_fd)
+
+        self.assertTrue(line.endswith("\n"))
+        self.assertEqual(json.loads(line), {'circuits': 2, 'relays': 1, 'exit_sockets': 0,
+                                            'bytes_exit': 1024, 'dh_pool_keys': 5})
@@ -0,0 +1,58 @@
+from Tribler.Test.Core.base_test import TriblerCoreTest
+from Tribler.community.tunnel.timer_wheel import TimerWheel
+
+
+class TestTimerWheel(TriblerCoreTest):
+
+    def setUp(self, annotate=True):
+        TriblerCoreTest.setUp(self, annotate=annotate)
+        self.timer_wheel = TimerWheel(tick_interval=1.0, num_slots=8)
+        self.fired = []
+
+    def schedule(self, key, delay):
+        self.timer_wheel.schedule(key, delay, lambda: self.fired.append((key, self.timer_wheel.current_tick)))
+
+    def test_schedule(self):
+        """
+        Test whether timers fire in the tick in which they are due, also when they go around the wheel
+        """
+        self.schedule("a", 0)
+        self.schedule("b", 2.5)
+        self.schedule("c", 11)
+        self.assertEqual(len(self.timer_wheel), 3)
+
+        for _ in xrange(12):
+            self.timer_wheel.tick()
+        self.assertEqual(self.fired, [("a", 1), ("b", 3), ("c", 11)])
+        self.assertEqual(len(self.timer_wheel), 0)
+
+    def test_cancel_and_reschedule(self):
+        """
+        Test whether cancelled timers do not fire and rescheduled timers only fire at their new time
+        """
+        self.schedule("a", 3)
+        self.schedule("b", 3)
+        self.timer_wheel.cancel("b")
+        self.schedule("a", 5)
+        self.assertNotIn("b", self.timer_wheel)
+
+        for _ in xrange(6):
+            self.timer_wheel.tick()
+        self.assertEqual(self.fired, [("a", 5)])
+
+    def test_reschedule_from_callback(self):
+        """
+        Test whether a callback can reschedule its own timer, and whether a failing callback does not stop the others
+        """
+        def periodic():
+            self.fired.append(("periodic", self.timer_wheel.current_tick))
+            self.timer_wheel.schedule("periodic", 8, periodic)
+
+        def fail():
+            raise RuntimeError("fail")
+
+        self.timer_wheel.schedule("periodic", 8, periodic)
+        self.timer_wheel.schedule("fail", 8, fail)
+        for _ in xrange(16):
+            self.timer_wheel.tick()
+        self.assertEqual(self.fired, [("periodic", 8), ("periodic", 16)])
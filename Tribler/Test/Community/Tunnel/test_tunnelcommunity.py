@@ -62,6 +62,20 @@ class TestTunnelCommunity(AbstractTestTunnelCommunity):
 
         self.tunnel_community.request_cache.pop(u"ping", ping_num)
 
+    @blocking_call_on_reactor_thread
+    def test_on_pong_duplicate(self):
+        circuit = Circuit(42L)
+        ping_num = self.tunnel_community.request_cache.add(PingRequestCache(self.tunnel_community, circuit)).number
+        meta = self.tunnel_community.get_meta_message(u"pong")
+        msg = meta.impl(distribution=(self.tunnel_community.global_time,),
+                        candidate=Candidate(("127.0.0.1", 1234), False), payload=(42, ping_num))
+
+        # The second pong with the same identifier is ignored
+        rtts = []
+        self.tunnel_community.exit_selector.add_rtt = lambda circuit_id, rtt: rtts.append(circuit_id)
+        self.tunnel_community.on_pong([msg, msg])
+        self.assertEqual(rtts, [42])
+
     def test_check_destroy(self):
         # Only the first and last node in the circuit may check a destroy message
         with self.assertRaises(StopIteration):
@@ -279,3 +293,59 @@ class TestTunnelCommunity(AbstractTestTunnelCommunity):
 
         self.assertTrue(self.tunnel_community.notifier.called)
         self.assertNotEqual(self.tunnel_community.notifier.candidate, None)
+
+    def create_ready_circuit(self, circuit_id, hops):
+        circuit = Circuit(circuit_id, goal_hops=hops)
+        for _ in xrange(hops):
+            circuit.add_hop(Hop())
+        self.tunnel_community.circuits[circuit_id] = circuit
+        return circuit
+
+    @blocking_call_on_reactor_thread
+    def test_round_robin_select(self):
+        """
+        Test whether the round robin selection cycles through the indexed ready circuits with the requested hops
+        """
+        selection_strategy = self.tunnel_community.selection_strategy
+        for circuit_id in [3L, 1L, 2L]:
+            selection_strategy.add_circuit(self.create_ready_circuit(circuit_id, 1))
+        selection_strategy.add_circuit(self.create_ready_circuit(4L, 2))
+
+        self.assertTrue(selection_strategy.has_options(1))
+        self.assertFalse(selection_strategy.has_options(3))
+        self.assertEqual([selection_strategy.select(None, 1).circuit_id for _ in xrange(4)], [1, 2, 3, 1])
+        self.assertEqual(selection_strategy.select(None, 2).circuit_id, 4)
+        self.assertIsNone(selection_strategy.select(None, 3))
+
+    @blocking_call_on_reactor_thread
+    def test_round_robin_remove_circuit(self):
+        """
+        Test whether removed and broken circuits are no longer selected
+        """
+        selection_strategy = self.tunnel_community.selection_strategy
+        for circuit_id in [1L, 2L, 3L]:
+            selection_strategy.add_circuit(self.create_ready_circuit(circuit_id, 1))
+
+        self.tunnel_community.remove_circuit(2L)
+        self.tunnel_community.circuits[3L]._broken = True
+
+        self.assertEqual([selection_strategy.select(None, 1).circuit_id for _ in xrange(3)], [1, 1, 1])
+        self.assertEqual(selection_strategy.get_circuit_ids(1), [1])
+
+    @blocking_call_on_reactor_thread
+    def test_do_circuits_pool(self):
+        """
+        Test whether a pool of circuits is kept for a number of hops after the downloads no longer need them
+        """
+        self.tunnel_community.settings = TunnelSettings()
+        created_hops = []
+        self.tunnel_community.create_circuit = lambda hops: created_hops.append(hops) or len(created_hops)
+
+        self.tunnel_community.circuits_needed[1] = self.tunnel_community.settings.max_circuits
+        self.tunnel_community.do_circuits()
+        self.assertEqual(created_hops, [1] * self.tunnel_community.settings.max_circuits)
+
+        del created_hops[:]
+        self.tunnel_community.circuits_needed[1] = 0
+        self.tunnel_community.do_circuits()
+        self.assertEqual(created_hops, [1] * self.tunnel_community.settings.circuit_pool_size)
@@ -0,0 +1,72 @@
+from twisted.internet.defer import inlineCallbacks
+from twisted.internet.task import deferLater
+
+from Tribler.Test.Core.base_test import TriblerCoreTest
+from Tribler.Test.twisted_thread import deferred, reactor
+from Tribler.community.tunnel.crypto.tunnelcrypto import DH_POOL_REFILL_DELAY, DHKeyPool, TunnelCrypto
+
+
+class TestDHKeyPool(TriblerCoreTest):
+
+    def setUp(self, annotate=True):
+        TriblerCoreTest.setUp(self, annotate=annotate)
+        self.crypto = TunnelCrypto()
+        self.pool = DHKeyPool(self.crypto, size=8, low_watermark=4)
+
+    def tearDown(self, annotate=True):
+        self.pool.stop()
+        TriblerCoreTest.tearDown(self, annotate=annotate)
+
+    @inlineCallbacks
+    def wait_for_refill(self):
+        while self.pool.refilling:
+            yield deferLater(reactor, 0.05, lambda: None)
+
+    def test_get_key_empty_pool(self):
+        """
+        Testing whether a key is generated synchronously when the pool is empty
+        """
+        key = self.pool.get_key()
+        self.assertTrue(self.crypto.is_key_compatible(key))
+        self.assertEqual(self.pool.get_statistics(), {'dh_pool_keys': 0, 'dh_pool_hits': 0, 'dh_pool_misses': 1,
+                                                      'dh_pool_generated': 0})
+
+    @deferred(timeout=10)
+    @inlineCallbacks
+    def test_refill(self):
+        """
+        Testing whether the pool is filled in the background and topped up after keys have been taken
+        """
+        self.pool.start()
+        yield self.wait_for_refill()
+        self.assertEqual(len(self.pool.keys), 8)
+
+        # Above the low watermark, the pool is only topped up once no keys have been taken for a while
+        keys = [self.pool.get_key() for _ in xrange(2)]
+        self.assertFalse(self.pool.refilling)
+        self.assertTrue(self.pool.refill_call.active())
+        yield deferLater(reactor, DH_POOL_REFILL_DELAY * 2, lambda: None)
+        yield self.wait_for_refill()
+        self.assertEqual(len(self.pool.keys), 8)
+
+        # Below the low watermark, the pool is topped up right away
+        keys += [self.pool.get_key() for _ in xrange(5)]
+        self.assertTrue(self.pool.refilling)
+        yield self.wait_for_refill()
+
+        self.assertEqual(len(set(key.key.pk for key in keys)), 7)
+        self.assertEqual(self.pool.get_statistics(), {'dh_pool_keys': 8, 'dh_pool_hits': 7, 'dh_pool_misses': 0,
+                                                      'dh_pool_generated': 15})
+
+    @deferred(timeout=10)
+    @inlineCallbacks
+    def test_stop(self):
+        """
+        Testing whether keys that are generated after the pool has been stopped are dropped
+        """
+        self.pool.start()
+        self.pool.stop()
+        yield self.wait_for_refill()
+        self.assertEqual(len(self.pool.keys), 0)
+        self.pool.get_key()
+        self.assertFalse(self.pool.refilling)
@@ -157,6 +157,15 @@ class TestTriblerConfig(TriblerCoreTest):
         self.tribler_config.set_http_api_port(True)
         self.assertEqual(self.tribler_config.get_http_api_port(), True)
 
+    def test_get_set_methods_reactor_lag_monitor(self):
+        """
+        Check whether reactor lag monitor get and set methods are working as expected.
+        """
+        self.tribler_config.set_reactor_lag_monitor_enabled(True)
+        self.assertEqual(self.tribler_config.get_reactor_lag_monitor_enabled(), True)
+        self.tribler_config.set_reactor_lag_monitor_threshold(0.5)
+        self.assertEqual(self.tribler_config.get_reactor_lag_monitor_threshold(), 0.5)
+
     def test_get_set_methods_dispersy(self):
         """
         Check whether dispersy get and set methods are working as expected.
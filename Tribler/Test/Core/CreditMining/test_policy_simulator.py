@@ -0,0 +1,82 @@
+import json
+import os
+import random
+
+from Tribler.Core.CreditMining.BoostingPolicy import SeederRatioPolicy, RandomPolicy
+from Tribler.Core.CreditMining.policy_simulator import SwarmTrace, PolicySimulator, load_traces, GB
+from Tribler.Test.Core.base_test import TriblerCoreTest
+
+
+class TestPolicySimulator(TriblerCoreTest):
+    """
+    This class contains tests for the offline credit mining policy simulator.
+    """
+
+    def setUp(self, annotate=True):
+        super(TestPolicySimulator, self).setUp(annotate=annotate)
+        # The underseeded swarm earns more upload than the well seeded one
+        self.traces = [SwarmTrace('a' * 20, GB, 10, [(0, 1, 20, 1000), (100, 1, 30, 2000)]),
+                       SwarmTrace('b' * 20, GB, 20, [(0, 50, 5, 10), (100, 60, 5, 10)]),
+                       SwarmTrace('c' * 20, 2 * GB, 30, [(100, 2, 10, 500)])]
+
+    def test_sample_at(self):
+        """
+        Testing whether the sample that holds at a time is returned
+        """
+        trace = self.traces[0]
+        self.assertIsNone(SwarmTrace('d' * 20, GB, 0, [(50, 1, 1, 1)]).sample_at(0))
+        self.assertEqual(trace.sample_at(0), (0, 1, 20, 1000))
+        self.assertEqual(trace.sample_at(99), (0, 1, 20, 1000))
+        self.assertEqual(trace.sample_at(500), (100, 1, 30, 2000))
+
+    def test_upload_between(self):
+        """
+        Testing whether the upload rate is integrated over the samples
+        """
+        trace = self.traces[0]
+        self.assertEqual(trace.upload_between(0, 100), 100 * 1000)
+        self.assertEqual(trace.upload_between(50, 150), 50 * 1000 + 50 * 2000)
+        self.assertEqual(trace.upload_between(200, 300), 100 * 2000)
+
+    def test_run_seeder_ratio(self):
+        """
+        Testing whether the seeder ratio policy boosts the most underseeded swarms
+        """
+        result = PolicySimulator(self.traces, SeederRatioPolicy, max_torrents_active=1, swarm_interval=50,
+                                 force=True).run(end_time=200)
+        self.assertEqual(result["uploaded"], 100 * 1000 + 100 * 2000)
+        self.assertEqual(result["peak_disk"], GB)
+        self.assertEqual(result["upload_per_gb"], result["uploaded"])
+        self.assertEqual(result["started"], 1)
+
+    def test_run_deterministic(self):
+        """
+        Testing whether simulating a policy twice with the same seed gives the same result, also when the policy falls
+        back to the random policy
+        """
+        for policy_class in [RandomPolicy, SeederRatioPolicy]:
+            simulator = PolicySimulator(self.traces, policy_class, max_torrents_active=1, swarm_interval=10, seed=42)
+            self.assertEqual(simulator.run(), simulator.run())
+
+    def test_run_global_random(self):
+        """
+        Testing whether simulating a policy does not reseed the global random generator
+        """
+        random.seed(1)
+        expected = random.random()
+        random.seed(1)
+        PolicySimulator(self.traces, RandomPolicy, max_torrents_active=1, swarm_interval=10, seed=42).run()
+        self.assertEqual(random.random(), expected)
+
+    def test_load_traces(self):
+        """
+        Testing whether traces are loaded from a JSON trace file
+        """
+        filename = os.path.join(self.session_base_dir, "traces.json")
+        with open(filename, "w") as trace_file:
+            json.dump([{"infohash": ('a' * 20).encode('hex'), "size": GB, "samples": [[0, 1, 2, 3]]}], trace_file)
+
+        traces = load_traces(filename)
+        self.assertEqual(len(traces), 1)
+        self.assertEqual(traces[0].get_infohash(), 'a' * 20)
+        self.assertEqual(traces[0].sample_at(0), (0, 1, 2, 3))
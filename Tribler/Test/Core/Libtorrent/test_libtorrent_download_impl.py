@@ -5,7 +5,7 @@ from twisted.internet.defer import Deferred
 import libtorrent as lt
 
 from Tribler.Core.DownloadConfig import DownloadStartupConfig
-from Tribler.Core.Libtorrent.LibtorrentDownloadImpl import LibtorrentDownloadImpl
+from Tribler.Core.Libtorrent.LibtorrentDownloadImpl import LibtorrentDownloadImpl, PEER_INFO_MAX_AGE
 from Tribler.Core.TorrentDef import TorrentDef
 from Tribler.Core.Utilities.configparser import CallbackConfigParser
 from Tribler.Core.Utilities.torrent_utils import get_info_from_handle
@@ -584,3 +584,47 @@ class TestLibtorrentDownloadImplNoSession(TriblerCoreTest):
             self.libtorrent_download_impl._on_resume_err).addCallback(on_error))
         self.libtorrent_download_impl.on_save_resume_data_failed_alert(mock_alert)
         return test_deferred
+
+    def test_update_lt_stats_state_update(self):
+        """
+        Testing whether the status of a state update is used by the statistics and the peers are fetched only once
+        """
+        status = MockObject()
+        status.paused = False
+        status.state = DLSTATUS_DOWNLOADING
+        status.progress = 0.5
+        status.error = None
+        status.total_wanted = 33
+        status.download_payload_rate = 928
+        status.upload_payload_rate = 929
+        status.all_time_upload = 42
+        status.all_time_download = 43
+        status.finished_time = 1234
+        status.num_complete = status.num_incomplete = -1
+        status.list_seeds = 3
+        status.list_peers = 4
+        status.num_peers = 2
+        status.num_seeds = 1
+        status.pieces = [True, False]
+
+        peer_info_calls = []
+        self.libtorrent_download_impl.handle.status = lambda: self.fail("the status should not be queried")
+        self.libtorrent_download_impl.handle.get_peer_info = lambda: peer_info_calls.append(None) or []
+
+        self.libtorrent_download_impl.update_lt_stats(status)
+        self.assertEqual(self.libtorrent_download_impl.progress, 0.5)
+        stats = self.libtorrent_download_impl.network_create_statistics_reponse()
+        self.assertEqual((stats.numTotSeeds, stats.numTotPeers, stats.numSeeds, stats.numPeers), (3, 4, 1, 1))
+
+        self.libtorrent_download_impl.network_create_spew_from_peerlist()
+        self.libtorrent_download_impl.network_create_spew_from_peerlist()
+        self.assertEqual(len(peer_info_calls), 1)
+
+        self.libtorrent_download_impl.process_state_update(status)
+        self.libtorrent_download_impl.network_create_spew_from_peerlist()
+        self.assertEqual(len(peer_info_calls), 2)
+
+        # The peers are fetched again after a while, even without a state update
+        self.libtorrent_download_impl.peer_info_time -= PEER_INFO_MAX_AGE
+        self.libtorrent_download_impl.network_create_spew_from_peerlist()
+        self.assertEqual(len(peer_info_calls), 3)
@@ -1,11 +1,13 @@
 import os
 import shutil
 import tempfile
+import threading
+import time
 from libtorrent import bencode
 from twisted.internet.defer import inlineCallbacks, Deferred
 
 from Tribler.Core.CacheDB.Notifier import Notifier
-from Tribler.Core.Libtorrent.LibtorrentMgr import LibtorrentMgr
+from Tribler.Core.Libtorrent.LibtorrentMgr import LibtorrentMgr, MAX_METAINFO_REQUESTS
 from Tribler.Core.exceptions import DuplicateDownloadException, TorrentFileException
 from Tribler.Test.Core.base_test import MockObject
 from Tribler.Test.test_as_server import AbstractServer
@@ -37,6 +39,7 @@ class TestLibtorrentMgr(AbstractServer):
         self.tribler_session.config.set_listen_port_runtime = lambda: None
         self.tribler_session.config.get_libtorrent_max_upload_rate = lambda: 100
         self.tribler_session.config.get_libtorrent_max_download_rate = lambda: 120
+        self.tribler_session.config.get_torrent_store_enabled = lambda: False
 
         self.ltmgr = LibtorrentMgr(self.tribler_session)
 
@@ -57,6 +60,29 @@ class TestLibtorrentMgr(AbstractServer):
         ltsession = self.ltmgr.get_session(1)
         self.assertTrue(ltsession)
 
+    def test_get_session_concurrent(self):
+        """
+        Testing whether a session is only created once when it is requested from several threads at the same time
+        """
+        mock_ltsession = MockObject()
+        mock_ltsession.stop_upnp = lambda: None
+        mock_ltsession.save_state = lambda: None
+        created_sessions = []
+
+        def mock_create_session(_):
+            time.sleep(0.1)
+            created_sessions.append(mock_ltsession)
+            return mock_ltsession
+
+        self.ltmgr.create_session = mock_create_session
+        self.ltmgr.metadata_tmpdir = tempfile.mkdtemp(suffix=u'tribler_metainfo_tmpdir')
+
+        thread = threading.Thread(target=self.ltmgr.get_session)
+        thread.start()
+        self.assertEqual(self.ltmgr.get_session(), mock_ltsession)
+        thread.join()
+        self.assertEqual(len(created_sessions), 1)
+
     def test_get_session_zero_hops_corrupt_lt_state(self):
         file = open(os.path.join(self.session_base_dir, 'lt.state'), "w")
         file.write("Lorem ipsum")
@@ -93,11 +119,76 @@ class TestLibtorrentMgr(AbstractServer):
 
         self.ltmgr.initialize()
         self.ltmgr.is_dht_ready = lambda: True
-        self.ltmgr.metainfo_cache[("a" * 20).encode('hex')] = {'meta_info': 'test'}
+        self.ltmgr.metainfo_cache.put(("a" * 20).encode('hex'), "test", 4)
         self.ltmgr.get_metainfo("a" * 20, metainfo_cb)
 
         return test_deferred
 
+    def test_get_metainfo_from_store(self):
+        """
+        Testing whether the metainfo is served from the torrent store, unless the swarm information is needed
+        """
+        received_metainfo = []
+        self.tribler_session.config.get_torrent_store_enabled = lambda: True
+        self.tribler_session.get_collected_torrent = lambda _: bencode({'info': {'pieces': 'a'}})
+
+        self.ltmgr.initialize()
+        self.ltmgr.is_dht_ready = lambda: True
+        self.ltmgr.get_metainfo("a" * 20, received_metainfo.append)
+        self.assertEqual(received_metainfo, [{'info': {'pieces': 'a'}}])
+        self.assertEqual(self.ltmgr.get_metainfo_statistics()['store_hits'], 1)
+
+        self.ltmgr._start_metainfo_request = lambda *_: None
+        self.ltmgr.get_metainfo("a" * 20, received_metainfo.append, use_store=False)
+        self.assertEqual(len(received_metainfo), 1)
+
+    def test_get_metainfo_queued(self):
+        """
+        Testing whether metainfo requests are queued when too many requests are running
+        """
+        mock_handle = MockObject()
+        mock_ltsession = MockObject()
+        mock_ltsession.add_torrent = lambda _: mock_handle
+        mock_ltsession.remove_torrent = lambda *_: None
+        mock_ltsession.stop_upnp = lambda: None
+        mock_ltsession.save_state = lambda: None
+
+        self.ltmgr.get_session = lambda *_: mock_ltsession
+        self.ltmgr.metadata_tmpdir = tempfile.mkdtemp(suffix=u'tribler_metainfo_tmpdir')
+        self.ltmgr.is_dht_ready = lambda: True
+
+        for index in xrange(MAX_METAINFO_REQUESTS):
+            self.ltmgr.get_metainfo("%020d" % index, lambda _: None, notify=False)
+        self.ltmgr.get_metainfo("b" * 20, lambda _: None, notify=False)
+        self.assertEqual(len(self.ltmgr.metainfo_requests), MAX_METAINFO_REQUESTS)
+        self.assertIn(("b" * 20).encode('hex'), self.ltmgr.metainfo_queue)
+        self.assertEqual(self.ltmgr.get_metainfo_statistics()['queued_requests'], 1)
+
+        self.ltmgr.got_metainfo(("%020d" % 0).encode('hex'), timeout=True)
+        self.assertIn(("b" * 20).encode('hex'), self.ltmgr.metainfo_requests)
+        self.assertFalse(self.ltmgr.metainfo_queue)
+
+    @deferred(timeout=20)
+    def test_got_metainfo_queued_timeout(self):
+        """
+        Testing whether the timeout callback is invoked when a queued request times out
+        """
+        test_deferred = Deferred()
+
+        def metainfo_timeout_cb(infohash):
+            self.assertEqual(infohash, 'a' * 20)
+            test_deferred.callback(None)
+
+        self.ltmgr.initialize()
+        self.ltmgr.metainfo_queue[('a' * 20).encode('hex')] = {'handle': None,
+                                                               'magnet': None,
+                                                               'timeout_callbacks': [metainfo_timeout_cb],
+                                                               'callbacks': [],
+                                                               'notify': True}
+        self.ltmgr.got_metainfo(('a' * 20).encode('hex'), timeout=True)
+
+        return test_deferred
+
     @deferred(timeout=20)
     def test_got_metainfo(self):
         """
@@ -173,6 +264,28 @@ class TestLibtorrentMgr(AbstractServer):
         self.assertEqual(self.ltmgr.add_torrent(None, {'ti': infohash}), mock_handle)
         self.assertRaises(DuplicateDownloadException, self.ltmgr.add_torrent, None, {'ti': infohash})
 
+    def test_process_state_update_alert(self):
+        """
+        Testing whether the status of every changed torrent in a state update alert is passed to its download
+        """
+        updated_statuses = []
+        mock_download = MockObject()
+        mock_download.process_state_update = updated_statuses.append
+        self.ltmgr.torrents['a' * 40] = (mock_download, None)
+
+        class state_update_alert(object):
+            pass
+
+        known_status = MockObject()
+        known_status.info_hash = 'a' * 40
+        unknown_status = MockObject()
+        unknown_status.info_hash = 'b' * 40
+        alert = state_update_alert()
+        alert.status = [known_status, unknown_status]
+
+        self.ltmgr.process_alert(alert)
+        self.assertEqual(updated_statuses, [known_status])
+
     def test_start_download_corrupt(self):
         """
         Testing whether starting the download of a corrupt torrent file raises an exception
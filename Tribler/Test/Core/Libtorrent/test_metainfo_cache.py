@@ -0,0 +1,67 @@
+from Tribler.Core.Libtorrent.metainfo_cache import MetainfoCache
+from Tribler.Test.Core.base_test import TriblerCoreTest
+
+
+class TestMetainfoCache(TriblerCoreTest):
+    """
+    Contains tests for the least recently used cache of metainfo dictionaries.
+    """
+
+    def setUp(self, annotate=True):
+        super(TestMetainfoCache, self).setUp(annotate=annotate)
+        self.cache = MetainfoCache(max_size=2, max_bytes=100, ttl=3600)
+
+    def test_get(self):
+        """
+        Test whether a metainfo is returned from the cache and whether hits and misses are counted
+        """
+        self.cache.put('a', {'info': 'a'}, 10)
+        self.assertEqual(self.cache.get('a'), {'info': 'a'})
+        self.assertIsNone(self.cache.get('b'))
+
+        statistics = self.cache.get_statistics()
+        self.assertEqual(statistics['hits'], 1)
+        self.assertEqual(statistics['misses'], 1)
+        self.assertEqual(statistics['bytes'], 10)
+
+    def test_max_size(self):
+        """
+        Test whether the least recently used metainfo is evicted when there are too many entries
+        """
+        self.cache.put('a', {'info': 'a'}, 10)
+        self.cache.put('b', {'info': 'b'}, 10)
+        self.cache.get('a')
+        self.cache.put('c', {'info': 'c'}, 10)
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertIn('a', self.cache)
+        self.assertNotIn('b', self.cache)
+        self.assertEqual(self.cache.get_statistics()['evictions'], 1)
+
+    def test_max_bytes(self):
+        """
+        Test whether metainfo is evicted when the entries are too large, but the newest entry is always kept
+        """
+        self.cache.put('a', {'info': 'a'}, 60)
+        self.cache.put('b', {'info': 'b'}, 60)
+        self.assertEqual(len(self.cache), 1)
+        self.assertIn('b', self.cache)
+
+        self.cache.put('c', {'info': 'c'}, 200)
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.num_bytes, 200)
+
+    def test_expire(self):
+        """
+        Test whether metainfo is forgotten after the time to live
+        """
+        self.cache.put('a', {'info': 'a'}, 10)
+        self.cache.ttl = -1
+        self.assertNotIn('a', self.cache)
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.num_bytes, 0)
+
+        self.cache.put('b', {'info': 'b'}, 10)
+        self.cache.expire()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.num_bytes, 0)
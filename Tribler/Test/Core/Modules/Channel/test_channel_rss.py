@@ -1,12 +1,16 @@
+import json
 import os
-from twisted.internet.defer import DeferredList, inlineCallbacks
+import shutil
+
+from twisted.internet.defer import inlineCallbacks, fail
 
 from Tribler.Core.Modules.channel.cache import SimpleCache
-from Tribler.Core.Modules.channel.channel_rss import ChannelRssParser, RSSFeedParser
+from Tribler.Core.Modules.channel.channel_rss import ChannelRssParser, RSSFeedParser, MAX_CONCURRENT_FETCHES
 from Tribler.Test.Core.base_test import TriblerCoreTest
 from Tribler.Test.Core.base_test_channel import BaseTestChannel
 from Tribler.Test.common import TESTS_DATA_DIR
 from Tribler.Test.twisted_thread import deferred
+from Tribler.Test.util.util import prepare_xml_rss
 
 
 class TestChannelRss(BaseTestChannel):
@@ -51,9 +55,43 @@ class TestChannelRss(BaseTestChannel):
     def test_parse_rss_feed(self):
         self.channel_rss.rss_url = os.path.join(TESTS_DATA_DIR, 'test_rss.xml')
         self.channel_rss._url_cache = SimpleCache(os.path.join(self.session_base_dir, 'cache.txt'))
-        dl = self.channel_rss.parse_feed()
-        self.assertIsInstance(dl, DeferredList)
-        yield dl
+        yield self.channel_rss.parse_feed()
+
+    @deferred(10)
+    @inlineCallbacks
+    def test_parse_rss_feed_not_modified(self):
+        """
+        Testing whether a feed that has not been modified since the last time it was fetched is not parsed again
+        """
+        files_path, file_server_port = prepare_xml_rss(self.session_base_dir, 'test_rss.xml')
+        shutil.copyfile(os.path.join(self.session_base_dir, 'test_rss.xml'), os.path.join(files_path, 'test_rss.xml'))
+        self.setUpFileServer(file_server_port, files_path)
+
+        self.channel_rss.rss_url = 'http://localhost:%d/test_rss.xml' % file_server_port
+        self.channel_rss._url_cache = SimpleCache(os.path.join(self.session_base_dir, 'cache.txt'))
+        yield self.channel_rss.parse_feed()
+        self.assertIsNotNone(self.channel_rss._feed_modified)
+
+        results = yield self.channel_rss.parse_feed()
+        self.assertEqual(results, [])
+
+    @deferred(10)
+    @inlineCallbacks
+    def test_parse_rss_feed_failed(self):
+        """
+        Testing whether a feed that cannot be fetched is logged and releases its fetch slot
+        """
+        warnings = []
+        self.channel_rss._logger.warning = lambda *args: warnings.append(args)
+        original_fetch = RSSFeedParser.fetch
+        RSSFeedParser.fetch = lambda *_, **__: fail(RuntimeError("feed unreachable"))
+        try:
+            result = yield self.channel_rss.parse_feed()
+        finally:
+            RSSFeedParser.fetch = original_fetch
+        self.assertIsNone(result)
+        self.assertEqual(len(warnings), 1)
+        self.assertEqual(self.channel_rss._fetch_semaphore.tokens, MAX_CONCURRENT_FETCHES)
 
     def test_parse_feed_stopped(self):
         self.channel_rss.rss_url = os.path.join(TESTS_DATA_DIR, 'test_rss.xml')
@@ -62,6 +100,45 @@ class TestChannelRss(BaseTestChannel):
         self.assertIsNone(self.channel_rss.parse_feed())
 
 
+class TestSimpleCache(TriblerCoreTest):
+
+    def test_save_load(self):
+        """
+        Testing whether the keys that are added to the cache are appended to the cache file
+        """
+        cache_path = os.path.join(self.session_base_dir, 'cache.txt')
+        cache = SimpleCache(cache_path)
+        cache.add(u'a')
+        cache.add(u'b')
+        cache.save()
+        cache.add(u'c')
+        cache.save()
+        with open(cache_path, 'r') as cache_file:
+            self.assertEqual(len(cache_file.readlines()), 3)
+
+        cache = SimpleCache(cache_path)
+        cache.load()
+        self.assertTrue(cache.has(u'a'))
+        self.assertTrue(cache.has(u'c'))
+        self.assertFalse(cache.has(u'd'))
+
+    def test_load_legacy_cache(self):
+        """
+        Testing whether a cache file with a JSON list is loaded and rewritten in the new format
+        """
+        cache_path = os.path.join(self.session_base_dir, 'cache.txt')
+        with open(cache_path, 'w') as cache_file:
+            json.dump([u'a', u'b'], cache_file)
+
+        cache = SimpleCache(cache_path)
+        cache.load()
+        self.assertTrue(cache.has(u'b'))
+        cache.save()
+
+        with open(cache_path, 'r') as cache_file:
+            self.assertEqual(sorted(json.loads(line) for line in cache_file), [u'a', u'b'])
+
+
 class TestRssParser(TriblerCoreTest):
 
     def test_parse_html(self):
@@ -1,6 +1,9 @@
 import json
+import sys
+
 from twisted.internet.defer import inlineCallbacks
 
+from Tribler.Core.Utilities.instrumentation import ReactorLagMonitor
 from Tribler.Test.Core.Modules.RestApi.base_api_test import AbstractApiTest
 from Tribler.Test.Core.base_test import MockObject
 from Tribler.Test.twisted_thread import deferred
@@ -69,3 +72,67 @@ class TestCircuitDebugEndpoint(AbstractApiTest):
 
         self.should_check_equality = False
         return self.do_request('debug/circuits', expected_code=200).addCallback(verify_response)
+
+
+class TestReactorLagDebugEndpoint(AbstractApiTest):
+
+    @deferred(timeout=10)
+    def test_get_reactor_lag_not_enabled(self):
+        """
+        Testing whether the API returns error 404 if the reactor lag monitor is not enabled
+        """
+        return self.do_request('debug/reactorlag', expected_code=404)
+
+    @deferred(timeout=10)
+    def test_get_reactor_lag(self):
+        """
+        Testing whether the API returns the lag histogram and the top offenders
+        """
+        monitor = ReactorLagMonitor()
+        monitor.record_lag(0.3)
+        monitor.add_sample(sys._getframe())
+        self.session.lm.reactor_lag_monitor = monitor
+
+        def verify_response(response):
+            response_json = json.loads(response)['reactor_lag']
+            self.assertEqual(response_json['num_heartbeats'], 1)
+            self.assertEqual(response_json['num_samples'], 1)
+            self.assertEqual(len(response_json['top_offenders']), 1)
+            self.assertEqual(monitor.num_heartbeats, 0)
+
+        self.should_check_equality = False
+        return self.do_request('debug/reactorlag?reset=1', expected_code=200).addCallback(verify_response)
+
+    @deferred(timeout=10)
+    def test_get_reactor_lag_flamegraph(self):
+        """
+        Testing whether the API returns the sampled stacks in collapsed format
+        """
+        monitor = ReactorLagMonitor()
+        monitor.add_sample(sys._getframe())
+        monitor.add_sample(sys._getframe())
+        self.session.lm.reactor_lag_monitor = monitor
+
+        def verify_response(response):
+            self.assertTrue(response.endswith(" 2\n"))
+            self.assertIn("test_get_reactor_lag_flamegraph", response)
+
+        self.should_check_equality = False
+        return self.do_request('debug/reactorlag/flamegraph', expected_code=200).addCallback(verify_response)
+
+
+class TestEventsDebugEndpoint(AbstractApiTest):
+
+    @deferred(timeout=10)
+    def test_get_events_statistics(self):
+        """
+        Testing whether the API returns the statistics of the events stream
+        """
+        def verify_response(response):
+            response_json = json.loads(response)['events']
+            self.assertEqual(response_json['dropped'], 0)
+            self.assertEqual(response_json['coalesced'], 0)
+            self.assertEqual(response_json['clients'], [])
+
+        self.should_check_equality = False
+        return self.do_request('debug/events', expected_code=200).addCallback(verify_response)
@@ -4,16 +4,20 @@ from twisted.internet import reactor
 from twisted.internet.defer import Deferred, inlineCallbacks
 from twisted.internet.protocol import Protocol
 from twisted.internet.task import deferLater
+from twisted.internet.threads import deferToThread
 from twisted.web.client import Agent, HTTPConnectionPool
 from twisted.web.http_headers import Headers
 
+from Tribler.Core.Modules.restapi.events_endpoint import EventsClient, MAX_EVENTS_BUFFER_SIZE, \
+    MAX_EVENTS_BUFFER_HARD_LIMIT
 from Tribler.Core.simpledefs import SIGNAL_CHANNEL, SIGNAL_ON_SEARCH_RESULTS, SIGNAL_TORRENT, NTFY_UPGRADER, \
     NTFY_STARTED, NTFY_FINISHED, NTFY_UPGRADER_TICK, NTFY_WATCH_FOLDER_CORRUPT_TORRENT, NTFY_INSERT, NTFY_NEW_VERSION, \
     NTFY_CHANNEL, NTFY_DISCOVERED, NTFY_TORRENT, NTFY_ERROR, NTFY_DELETE, NTFY_MARKET_ON_ASK, NTFY_UPDATE, \
     NTFY_MARKET_ON_BID, NTFY_MARKET_ON_ASK_TIMEOUT, NTFY_MARKET_ON_BID_TIMEOUT, NTFY_MARKET_ON_TRANSACTION_COMPLETE, \
-    NTFY_MARKET_ON_PAYMENT_RECEIVED, NTFY_MARKET_ON_PAYMENT_SENT
+    NTFY_MARKET_ON_PAYMENT_RECEIVED, NTFY_MARKET_ON_PAYMENT_SENT, NTFY_STARTUP_TICK
 from Tribler.Core.version import version_id
 from Tribler.Test.Core.Modules.RestApi.base_api_test import AbstractApiTest
+from Tribler.Test.Core.base_test import TriblerCoreTest, MockObject
 from Tribler.Test.twisted_thread import deferred
 from Tribler.dispersy.util import blocking_call_on_reactor_thread
 
@@ -31,21 +35,25 @@ class EventDataProtocol(Protocol):
 
     def dataReceived(self, data):
         self._logger.info("Received data: %s" % data)
-        self.json_buffer.append(json.loads(data))
-        self.messages_to_wait_for -= 1
-        if self.messages_to_wait_for == 0:
+        # Events emitted during the same reactor tick arrive in a single chunk
+        for line in data.splitlines():
+            self.json_buffer.append(json.loads(line))
+            self.messages_to_wait_for -= 1
+        if self.messages_to_wait_for <= 0:
             self.response.loseConnection()
 
     def connectionLost(self, reason="done"):
         self.finished.callback(self.json_buffer[1:])
 
 
-class TestEventsEndpoint(AbstractApiTest):
+class EventsEndpointTestBase(AbstractApiTest):
+
+    events_query = ''
 
     @blocking_call_on_reactor_thread
     @inlineCallbacks
     def setUp(self, autoload_discovery=True):
-        yield super(TestEventsEndpoint, self).setUp(autoload_discovery=autoload_discovery)
+        yield super(EventsEndpointTestBase, self).setUp(autoload_discovery=autoload_discovery)
         self.events_deferred = Deferred()
         self.connection_pool = HTTPConnectionPool(reactor, False)
         self.socket_open_deferred = self.tribler_started_deferred.addCallback(self.open_events_socket)
@@ -59,20 +67,24 @@ class TestEventsEndpoint(AbstractApiTest):
         # Wait to make sure the HTTPChannel is closed, see https://twistedmatrix.com/trac/ticket/2447
         yield deferLater(reactor, 0.3, lambda: None)
 
-        yield super(TestEventsEndpoint, self).tearDown(annotate=annotate)
+        yield super(EventsEndpointTestBase, self).tearDown(annotate=annotate)
 
     def on_event_socket_opened(self, response):
         response.deliverBody(EventDataProtocol(self.messages_to_wait_for, self.events_deferred, response))
 
     def open_events_socket(self, _):
         agent = Agent(reactor, pool=self.connection_pool)
-        return agent.request('GET', 'http://localhost:%s/events' % self.session.config.get_http_api_port(),
+        return agent.request('GET', 'http://localhost:%s/events%s' % (self.session.config.get_http_api_port(),
+                                                                       self.events_query),
                              Headers({'User-Agent': ['Tribler ' + version_id]}), None)\
             .addCallback(self.on_event_socket_opened)
 
     def close_connections(self):
         return self.connection_pool.closeCachedConnections()
 
+
+class TestEventsEndpoint(EventsEndpointTestBase):
+
     @deferred(timeout=20)
     def test_search_results(self):
         """
@@ -99,7 +111,7 @@ class TestEventsEndpoint(AbstractApiTest):
         """
         Testing whether various events are coming through the events endpoints
         """
-        self.messages_to_wait_for = 20
+        self.messages_to_wait_for = 21
 
         def send_notifications(_):
             self.session.lm.api_manager.root_endpoint.events_endpoint.start_new_query()
@@ -109,6 +121,7 @@ class TestEventsEndpoint(AbstractApiTest):
             self.session.notifier.notify(NTFY_UPGRADER, NTFY_STARTED, None, None)
             self.session.notifier.notify(NTFY_UPGRADER_TICK, NTFY_STARTED, None, None)
             self.session.notifier.notify(NTFY_UPGRADER, NTFY_FINISHED, None, None)
+            self.session.notifier.notify(NTFY_STARTUP_TICK, NTFY_FINISHED, 'dispersy', 1.5)
             self.session.notifier.notify(NTFY_WATCH_FOLDER_CORRUPT_TORRENT, NTFY_INSERT, None, None)
             self.session.notifier.notify(NTFY_NEW_VERSION, NTFY_INSERT, None, None)
             self.session.notifier.notify(NTFY_CHANNEL, NTFY_DISCOVERED, None, None)
@@ -154,3 +167,148 @@ class TestEventsEndpoint(AbstractApiTest):
         self.socket_open_deferred.addCallback(send_searches)
 
         return self.events_deferred
+
+    @deferred(timeout=20)
+    def test_coalesce_upgrader_ticks(self):
+        """
+        Testing whether only the last upgrader tick emitted during a reactor tick is sent
+        """
+        self.messages_to_wait_for = 2
+
+        def send_notifications(_):
+            for index in xrange(10):
+                self.session.notifier.notify(NTFY_UPGRADER_TICK, NTFY_STARTED, None, "tick %d" % index)
+            self.session.notifier.notify(NTFY_UPGRADER, NTFY_FINISHED, None, None)
+
+        def verify_events(events):
+            self.assertEqual(events[0], {"type": "upgrader_tick", "event": {"text": "tick 9"}})
+            self.assertEqual(events[1], {"type": "upgrader_finished"})
+            self.assertEqual(self.session.lm.api_manager.root_endpoint.events_endpoint.num_events_coalesced, 9)
+
+        self.socket_open_deferred.addCallback(send_notifications)
+
+        return self.events_deferred.addCallback(verify_events)
+
+    @deferred(timeout=20)
+    def test_events_from_thread(self):
+        """
+        Testing whether events that are emitted on another thread than the reactor thread are sent
+        """
+        self.messages_to_wait_for = 2
+
+        def send_notifications(_):
+            def notify():
+                self.session.notifier.notify(NTFY_TORRENT, NTFY_FINISHED, 'a' * 10, None)
+                self.session.notifier.notify(NTFY_TORRENT, NTFY_ERROR, 'a' * 10, 'This is an error message')
+            return deferToThread(notify)
+
+        def verify_events(events):
+            self.assertEqual([event["type"] for event in events], ["torrent_finished", "torrent_error"])
+
+        self.socket_open_deferred.addCallback(send_notifications)
+
+        return self.events_deferred.addCallback(verify_events)
+
+
+class TestEventsEndpointSubscription(EventsEndpointTestBase):
+
+    events_query = '?types=torrent_finished,torrent_error'
+
+    @deferred(timeout=20)
+    def test_subscribed_events(self):
+        """
+        Testing whether only the events the client subscribed to are sent
+        """
+        self.messages_to_wait_for = 2
+
+        def send_notifications(_):
+            self.session.notifier.notify(NTFY_UPGRADER, NTFY_STARTED, None, None)
+            self.session.notifier.notify(NTFY_TORRENT, NTFY_FINISHED, 'a' * 10, None)
+            self.session.notifier.notify(NTFY_NEW_VERSION, NTFY_INSERT, None, None)
+            self.session.notifier.notify(NTFY_TORRENT, NTFY_ERROR, 'a' * 10, 'This is an error message')
+
+        def verify_events(events):
+            self.assertEqual([event["type"] for event in events], ["torrent_finished", "torrent_error"])
+
+        self.socket_open_deferred.addCallback(send_notifications)
+
+        return self.events_deferred.addCallback(verify_events)
+
+
+class TestEventsClient(TriblerCoreTest):
+    """
+    This class contains tests for the buffering of events for a single client of the events endpoint.
+    """
+
+    def setUp(self, annotate=True):
+        TriblerCoreTest.setUp(self, annotate=annotate)
+        self.written = []
+        request = MockObject()
+        request.write = self.written.append
+        request.loseConnection = lambda: self.written.append(None)
+        self.client = EventsClient(request)
+
+    def test_flush_single_chunk(self):
+        """
+        Testing whether all buffered events are written in a single chunk
+        """
+        self.client.add_event("torrent_finished", "a\n")
+        self.client.add_event("torrent_error", "b\n")
+        self.client.flush()
+        self.assertEqual(self.written, ["a\nb\n"])
+        self.client.flush()
+        self.assertEqual(len(self.written), 1)
+
+    def test_pause_resume(self):
+        """
+        Testing whether events are buffered while the client is paused and written when it resumes
+        """
+        self.client.pauseProducing()
+        self.client.add_event("torrent_finished", "a\n")
+        self.client.flush()
+        self.assertEqual(self.written, [])
+        self.client.resumeProducing()
+        self.assertEqual(self.written, ["a\n"])
+
+    def test_drop_when_full(self):
+        """
+        Testing whether droppable events are dropped when the buffer is full but other events are not
+        """
+        self.client.pauseProducing()
+        for _ in xrange(MAX_EVENTS_BUFFER_SIZE + 5):
+            self.client.add_event("search_result_torrent", "a\n")
+        self.assertEqual(self.client.add_event("torrent_finished", "b\n"), (False, False))
+        self.assertEqual(len(self.client.buffer), MAX_EVENTS_BUFFER_SIZE + 1)
+        self.assertEqual(self.client.num_events_dropped, 5)
+
+    def test_disconnect_when_full(self):
+        """
+        Testing whether a client is disconnected when it buffers too many events that cannot be dropped
+        """
+        self.client.pauseProducing()
+        for _ in xrange(MAX_EVENTS_BUFFER_HARD_LIMIT):
+            self.client.add_event("torrent_finished", "a\n")
+        self.assertEqual(self.client.add_event("torrent_finished", "b\n"), (True, False))
+        self.assertEqual(self.written, [None])
+        self.assertEqual(self.client.buffer, [])
+        self.assertEqual(self.client.add_event("torrent_finished", "c\n"), (True, False))
+        self.assertEqual(self.client.buffer, [])
+
+    def test_coalesce(self):
+        """
+        Testing whether a buffered upgrader tick is replaced by a newer one
+        """
+        self.client.add_event("upgrader_tick", "a\n")
+        self.client.add_event("torrent_finished", "b\n")
+        self.assertEqual(self.client.add_event("upgrader_tick", "c\n"), (False, True))
+        self.client.flush()
+        self.assertEqual(self.written, ["c\nb\n"])
+
+    def test_subscription(self):
+        """
+        Testing whether a client is only subscribed to the requested event types
+        """
+        self.assertTrue(self.client.is_subscribed("torrent_finished"))
+        client = EventsClient(None, set(["torrent_error"]))
+        self.assertTrue(client.is_subscribed("torrent_error"))
+        self.assertFalse(client.is_subscribed("torrent_finished"))
@@ -0,0 +1,87 @@
+from twisted.web import http
+from twisted.web.test.requesthelper import DummyChannel
+
+from Tribler.Core.Modules.restapi.listing_cache import ListingCache, render_cacheable
+from Tribler.Test.Core.base_test import TriblerCoreTest
+
+
+class TestListingCache(TriblerCoreTest):
+
+    def setUp(self, annotate=True):
+        super(TestListingCache, self).setUp(annotate=annotate)
+        self.queries = 0
+        self.listing = ["item"]
+        self.cache = ListingCache(self.query, max_age=60, min_age=5)
+
+    def query(self):
+        self.queries += 1
+        return list(self.listing)
+
+    def create_request(self, **headers):
+        request = http.Request(DummyChannel(), False)
+        request.method = "GET"
+        for name, value in headers.iteritems():
+            request.requestHeaders.setRawHeaders(name.replace('_', '-'), [value])
+        return request
+
+    def test_get_items(self):
+        """
+        Testing whether the listing is only queried again when it is too old, or when it has been invalidated
+        """
+        self.assertEqual(self.cache.get_items(), ["item"])
+        self.assertEqual(self.cache.get_items(), ["item"])
+        self.assertEqual(self.queries, 1)
+
+        # An invalidated listing is kept for at least min_age seconds
+        self.listing.append("new item")
+        self.cache.invalidate()
+        self.assertEqual(self.cache.get_items(), ["item"])
+        self.cache.refresh_time -= 10
+        self.assertEqual(self.cache.get_items(), ["item", "new item"])
+        self.assertEqual(self.queries, 2)
+
+        # A listing that is older than max_age is queried again, but is only modified if the items changed
+        modified_time = self.cache.modified_time
+        self.cache.refresh_time -= 100
+        self.cache.modified_time -= 100
+        self.assertEqual(self.cache.get_items(), ["item", "new item"])
+        self.assertEqual(self.queries, 3)
+        self.assertEqual(self.cache.modified_time, modified_time - 100)
+
+    def test_get_modified_time(self):
+        """
+        Testing whether a change of the variant of a listing, such as the family filter state, counts as a modification
+        """
+        self.cache.get_items()
+        self.cache.modified_time = 1000
+        self.cache.get_modified_time(True)
+        self.cache.variant_time = 500
+        self.assertEqual(self.cache.get_modified_time(True), 1000)
+
+        # A client that got the listing with the previous variant does not get a 304 response
+        request = self.create_request(if_modified_since=http.datetimeToString(1000))
+        self.assertEqual(render_cacheable(request, "body", self.cache.get_modified_time(False)), "body")
+        self.assertEqual(request.code, http.OK)
+
+    def test_render_cacheable(self):
+        """
+        Testing whether a conditional request for a body that the client already has gets a 304 response
+        """
+        request = self.create_request()
+        self.assertEqual(render_cacheable(request, "body", 1000), "body")
+        self.assertEqual(request.code, http.OK)
+
+        request = self.create_request(if_none_match=request.etag)
+        self.assertEqual(render_cacheable(request, "body", 1000), "")
+        self.assertEqual(request.code, http.NOT_MODIFIED)
+
+        request = self.create_request(if_none_match=request.etag)
+        self.assertEqual(render_cacheable(request, "other body", 1000), "other body")
+        self.assertEqual(request.code, http.OK)
+
+        request = self.create_request(if_modified_since=http.datetimeToString(1000))
+        self.assertEqual(render_cacheable(request, "body", 1000), "")
+        self.assertEqual(request.code, http.NOT_MODIFIED)
+
+        request = self.create_request(if_modified_since=http.datetimeToString(999))
+        self.assertEqual(render_cacheable(request, "body", 1000), "body")
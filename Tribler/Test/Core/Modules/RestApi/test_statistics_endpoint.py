@@ -43,3 +43,18 @@ class TestStatisticsEndpoint(AbstractApiTest):
 
         self.should_check_equality = False
         return self.do_request('statistics/communities', expected_code=200).addCallback(verify_dict)
+
+    @deferred(timeout=10)
+    def test_get_startup_statistics(self):
+        """
+        Testing whether the API returns the startup time of the session components when requested
+        """
+        def verify_dict(data):
+            startup_stats = json.loads(data)["startup_statistics"]
+            self.assertIsNotNone(startup_stats["total_duration"])
+            component_names = [component["name"] for component in startup_stats["components"]]
+            self.assertIn("dispersy", component_names)
+            self.assertIn("rest_api", component_names)
+
+        self.should_check_equality = False
+        return self.do_request('statistics/startup', expected_code=200).addCallback(verify_dict)
@@ -40,6 +40,39 @@ class TestTorrentsEndpoint(AbstractApiTest):
         self.should_check_equality = False
         return self.do_request('torrents/random?limit=5', expected_code=200).addCallback(verify_torrents)
 
+    @deferred(timeout=10)
+    def test_get_random_torrents_sample(self):
+        """
+        Testing whether every request for random torrents returns a new sample of the cached random torrents
+        """
+        channel_db_handler = self.session.open_dbhandler(NTFY_CHANNELCAST)
+        channel_db_handler._get_my_dispersy_cid = lambda: "myfakedispersyid"
+        channel_id = channel_db_handler.on_channel_from_dispersy('rand', 42, 'Fancy channel', 'Fancy description')
+
+        torrent_list = [
+            [channel_id, 1, 1, ('a' * 40).decode('hex'), 1460000000, "ubuntu-torrent.iso", [['file1.txt', 42]], []],
+            [channel_id, 2, 2, ('b' * 40).decode('hex'), 1470000000, "ubuntu2-torrent.iso", [['file2.txt', 42]], []],
+            [channel_id, 3, 3, ('c' * 40).decode('hex'), 1480000000, "ubuntu3-torrent.iso", [['file3.txt', 42]], []],
+        ]
+        channel_db_handler.on_torrents_from_dispersy(torrent_list)
+
+        infohashes = set()
+
+        def on_torrents(results):
+            json_results = json.loads(results)
+            self.assertEqual(len(json_results['torrents']), 1)
+            infohashes.add(json_results['torrents'][0]['infohash'])
+
+        def verify_infohashes(_):
+            self.assertGreater(len(infohashes), 1)
+
+        self.should_check_equality = False
+        deferred_chain = self.do_request('torrents/random?limit=1', expected_code=200).addCallback(on_torrents)
+        for _ in xrange(19):
+            deferred_chain.addCallback(lambda _: self.do_request('torrents/random?limit=1', expected_code=200))
+            deferred_chain.addCallback(on_torrents)
+        return deferred_chain.addCallback(verify_infohashes)
+
     @deferred(timeout=10)
     def test_random_torrents_negative(self):
         """
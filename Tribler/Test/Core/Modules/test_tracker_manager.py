@@ -94,3 +94,17 @@ class TestTrackerManager(TriblerCoreTest):
         self.tracker_manager._tracker_dict["http://test1.com/announce"]['last_check'] = 0
         self.tracker_manager._tracker_dict["DHT"]['last_check'] = 1000
         self.assertEqual('http://test1.com/announce', self.tracker_manager.get_next_tracker_for_auto_check()[0])
+
+    @blocking_call_on_reactor_thread
+    def test_get_trackers_for_auto_check(self):
+        """
+        Test whether all trackers except the DHT are returned with their next check time
+        """
+        self.tracker_manager.initialize()
+        self.tracker_manager.add_tracker("http://test1.com:80/announce")
+        self.tracker_manager.update_tracker_info("http://test1.com/announce", False)
+
+        trackers = dict(self.tracker_manager.get_trackers_for_auto_check())
+        self.assertEqual(trackers.keys(), ["http://test1.com/announce"])
+        self.assertEqual(trackers["http://test1.com/announce"],
+                         self.tracker_manager._tracker_dict["http://test1.com/announce"]['last_check'] + 120)
@@ -1,8 +1,16 @@
 import os
 import shutil
 
-from Tribler.Test.common import TORRENT_UBUNTU_FILE, TESTS_DATA_DIR
+from twisted.internet.defer import inlineCallbacks
+from twisted.internet.task import deferLater
+
+import Tribler.Core.Modules.watch_folder as watch_folder_module
+from Tribler.Core.Modules.watch_folder import WatchFolder, MAX_TORRENTS_PER_CHECK, use_inotify
+from Tribler.Test.Core.base_test import TriblerCoreTest, MockObject
+from Tribler.Test.common import TORRENT_UBUNTU_FILE, TESTS_DATA_DIR, TORRENT_UBUNTU_FILE_INFOHASH, \
+    TORRENT_VIDEO_FILE, TORRENT_VIDEO_FILE_INFOHASH
 from Tribler.Test.test_as_server import TestAsServer
+from Tribler.Test.twisted_thread import deferred, reactor
 
 
 class TestWatchFolder(TestAsServer):
@@ -44,3 +52,96 @@ class TestWatchFolder(TestAsServer):
     def test_cleanup(self):
         self.session.lm.watch_folder.cleanup_torrent_file(TESTS_DATA_DIR, 'thisdoesnotexist123.bla')
         self.assertFalse(os.path.exists(os.path.join(TESTS_DATA_DIR, 'thisdoesnotexist123.bla.corrupt')))
+
+
+class TestWatchFolderScanner(TriblerCoreTest):
+    """
+    This class contains tests for the change detection and rate limiting of the watch folder, using a mocked session.
+    """
+
+    def setUp(self, annotate=True):
+        TriblerCoreTest.setUp(self, annotate=annotate)
+        self.watch_dir = os.path.join(self.session_base_dir, 'watch')
+        os.mkdir(self.watch_dir)
+
+        self.started_downloads = []
+        session = MockObject()
+        session.config = MockObject()
+        session.config.get_watch_folder_path = lambda: self.watch_dir
+        session.config.get_default_anonymity_enabled = lambda: False
+        session.config.get_default_number_hops = lambda: 1
+        session.config.get_default_safeseeding_enabled = lambda: False
+        session.has_download = lambda _: False
+        session.lm = MockObject()
+        session.lm.ltmgr = MockObject()
+        session.lm.ltmgr.start_download = lambda tdef, dconfig: self.started_downloads.append(tdef.get_infohash())
+        self.watch_folder = WatchFolder(session)
+        # The tests scan the watch folder, except for the inotify test
+        watch_folder_module.use_inotify = False
+
+    def tearDown(self, annotate=True):
+        self.watch_folder.stop_inotify()
+        watch_folder_module.MAX_TORRENTS_PER_CHECK = MAX_TORRENTS_PER_CHECK
+        watch_folder_module.use_inotify = use_inotify
+        TriblerCoreTest.tearDown(self, annotate=annotate)
+
+    def test_unchanged_files_handled_once(self):
+        """
+        Testing whether torrent files are only handled again when they change
+        """
+        torrent_path = os.path.join(self.watch_dir, "test.torrent")
+        shutil.copyfile(TORRENT_UBUNTU_FILE, torrent_path)
+        self.watch_folder.check_watch_folder()
+        self.watch_folder.check_watch_folder()
+        self.assertEqual(self.started_downloads, [TORRENT_UBUNTU_FILE_INFOHASH])
+
+        shutil.copyfile(TORRENT_VIDEO_FILE, torrent_path)
+        os.utime(torrent_path, (0, 0))
+        self.watch_folder.check_watch_folder()
+        self.assertEqual(self.started_downloads, [TORRENT_UBUNTU_FILE_INFOHASH, TORRENT_VIDEO_FILE_INFOHASH])
+
+    def test_removed_files_forgotten(self):
+        """
+        Testing whether a torrent file that is removed and put back is handled again
+        """
+        torrent_path = os.path.join(self.watch_dir, "test.torrent")
+        shutil.copyfile(TORRENT_UBUNTU_FILE, torrent_path)
+        self.watch_folder.check_watch_folder()
+        os.remove(torrent_path)
+        self.watch_folder.check_watch_folder()
+        self.assertEqual(self.watch_folder.file_stats, {})
+
+    def test_rate_limit(self):
+        """
+        Testing whether at most MAX_TORRENTS_PER_CHECK torrent files are handled per check
+        """
+        watch_folder_module.MAX_TORRENTS_PER_CHECK = 2
+        for index in xrange(5):
+            shutil.copyfile(TORRENT_UBUNTU_FILE, os.path.join(self.watch_dir, "test%d.torrent" % index))
+
+        for num_started in [2, 4, 5, 5]:
+            self.watch_folder.check_watch_folder()
+            self.assertEqual(len(self.started_downloads), num_started)
+
+    @deferred(timeout=10)
+    @inlineCallbacks
+    def test_inotify(self):
+        """
+        Testing whether inotify reports the new torrent files, so the watch folder is not scanned
+        """
+        if not use_inotify:
+            return
+
+        watch_folder_module.use_inotify = True
+        self.watch_folder.watch(self.watch_dir)
+        self.watch_folder.check_watch_folder()
+        self.assertIsNotNone(self.watch_folder.notifier)
+
+        torrent_path = os.path.join(self.watch_dir, "test.torrent")
+        shutil.copyfile(TORRENT_UBUNTU_FILE, torrent_path)
+        while torrent_path not in self.watch_folder.changed_paths:
+            yield deferLater(reactor, 0.1, lambda: None)
+
+        self.watch_folder.scan_watch_folder = lambda _: self.fail("The watch folder should not be scanned")
+        self.watch_folder.check_watch_folder()
+        self.assertEqual(self.started_downloads, [TORRENT_UBUNTU_FILE_INFOHASH])
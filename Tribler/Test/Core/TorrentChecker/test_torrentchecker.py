@@ -1,5 +1,5 @@
 import time
-from twisted.internet.defer import Deferred
+from twisted.internet.defer import Deferred, succeed
 
 from Tribler.Core.CacheDB.SqliteCacheDBHandler import TorrentDBHandler
 from Tribler.Core.Category.Category import Category
@@ -9,7 +9,7 @@ from Tribler.Core.Session import Session
 from Tribler.Core.TorrentChecker.session import HttpTrackerSession
 from Tribler.Core.TorrentChecker.torrent_checker import TorrentChecker
 from Tribler.Core.simpledefs import NTFY_TORRENTS
-from Tribler.Test.Core.base_test import TriblerCoreTest
+from Tribler.Test.Core.base_test import TriblerCoreTest, MockObject
 from Tribler.Test.twisted_thread import deferred
 from Tribler.dispersy.util import blocking_call_on_reactor_thread
 
@@ -105,7 +105,8 @@ class TestTorrentChecker(TriblerCoreTest):
         controlled_session.connect_to_tracker = lambda: Deferred()
 
         self.torrent_checker._create_session_for_request = lambda *args, **kwargs: controlled_session
-        self.torrent_checker._task_select_tracker()
+        # The looping call should not wait for the scrapes that are still running
+        self.assertIsNone(self.torrent_checker._task_select_tracker())
 
         self.assertEqual(len(controlled_session.infohash_list), 1)
 
@@ -116,7 +117,7 @@ class TestTorrentChecker(TriblerCoreTest):
         """
         self.torrent_checker._torrent_db.addExternalTorrentNoDef(
             'a' * 20, 'ubuntu.iso', [['a.test', 1234]], ['udp://non123exiszzting456tracker89fle.abc:80/announce'], 5)
-        return self.torrent_checker._task_select_tracker()
+        return self.torrent_checker._start_due_scrapes()
 
     @blocking_call_on_reactor_thread
     def test_tracker_test_invalid_tracker(self):
@@ -148,7 +149,154 @@ class TestTorrentChecker(TriblerCoreTest):
         Test the check of a tracker without associated torrents
         """
         self.session.lm.tracker_manager.add_tracker('http://trackertest.com:80/announce')
-        return self.torrent_checker._task_select_tracker()
+        return self.torrent_checker._start_due_scrapes()
+
+    @blocking_call_on_reactor_thread
+    def test_task_select_concurrent_trackers(self):
+        """
+        Test whether multiple trackers are scraped at the same time, up to the maximum number of concurrent scrapes
+        """
+        for index in xrange(3):
+            self.torrent_checker._torrent_db.addExternalTorrentNoDef(
+                chr(ord('a') + index) * 20, 'ubuntu.iso', [['a.test', 1234]],
+                ['http://tracker%d.com/announce' % index], 5)
+
+        sessions = []
+
+        def create_session(*_, **__):
+            session = HttpTrackerSession(None, None, None, None)
+            session.connect_to_tracker = lambda: Deferred()
+            sessions.append(session)
+            return session
+
+        self.torrent_checker._create_session_for_request = create_session
+        self.torrent_checker._max_concurrent_scrapes = 2
+        self.torrent_checker._task_select_tracker()
+        self.assertEqual(len(sessions), 2)
+        self.assertEqual(len(self.torrent_checker._active_scrapes), 2)
+
+        # The remaining tracker is scraped as soon as a scrape slot is available
+        self.torrent_checker._max_concurrent_scrapes = 3
+        self.torrent_checker._task_select_tracker()
+        self.assertEqual(len(sessions), 3)
+
+    @blocking_call_on_reactor_thread
+    def test_task_select_tracker_rate_limit(self):
+        """
+        Test whether a tracker is not scraped again before its scrape interval has passed
+        """
+        self.torrent_checker._torrent_db.addExternalTorrentNoDef(
+            'a' * 20, 'ubuntu.iso', [['a.test', 1234]], ['http://google.com/announce'], 5)
+
+        sessions = []
+
+        def create_session(*_, **__):
+            session = HttpTrackerSession(None, None, None, None)
+            session.connect_to_tracker = lambda: succeed({'http://google.com/announce': []})
+            sessions.append(session)
+            return session
+
+        self.torrent_checker._create_session_for_request = create_session
+        self.torrent_checker._on_result_from_session = lambda _, result: result
+        self.torrent_checker._task_select_tracker()
+        self.torrent_checker._task_select_tracker()
+        self.assertEqual(len(sessions), 1)
+        self.assertEqual(self.torrent_checker.get_statistics()['queued_trackers'], 1)
+
+    @blocking_call_on_reactor_thread
+    def test_task_select_tracker_error(self):
+        """
+        Test whether an unexpected error during a scrape is logged and the scrape slot is released
+        """
+        self.torrent_checker._torrent_db.addExternalTorrentNoDef(
+            'a' * 20, 'ubuntu.iso', [['a.test', 1234]], ['http://google.com/announce'], 5)
+
+        controlled_session = HttpTrackerSession(None, None, None, None)
+        controlled_session.connect_to_tracker = lambda: succeed({'http://google.com/announce': []})
+        self.torrent_checker._create_session_for_request = lambda *args, **kwargs: controlled_session
+        self.torrent_checker._on_result_from_session = lambda *_: {}['crash']
+
+        errors = []
+        self.torrent_checker._logger.error = lambda *args: errors.append(args)
+        self.torrent_checker._task_select_tracker()
+        self.assertEqual(len(errors), 1)
+        self.assertFalse(self.torrent_checker._active_scrapes)
+
+    @blocking_call_on_reactor_thread
+    def test_flush_torrent_results(self):
+        """
+        Test whether the results of the automatic checks are written to the database in a batch
+        """
+        self.torrent_checker._torrent_db.addExternalTorrentNoDef('a' * 20, 'ubuntu.iso', [['a.test', 1234]], [], 5)
+        self.torrent_checker._on_scrape_results({'http://google.com/announce': [
+            {'infohash': ('a' * 20).encode('hex'), 'seeders': 5, 'leechers': 10},
+            {'infohash': ('b' * 20).encode('hex'), 'seeders': 1, 'leechers': 2}]})
+        self.assertEqual(self.torrent_checker.get_checks_per_minute(), 2)
+
+        self.torrent_checker._flush_torrent_results()
+        self.assertFalse(self.torrent_checker._pending_results)
+
+        result = self.torrent_checker._torrent_db.getTorrent('a' * 20, (u'num_seeders', u'num_leechers', u'status'),
+                                                             False)
+        self.assertEqual(result[u'num_seeders'], 5)
+        self.assertEqual(result[u'num_leechers'], 10)
+        self.assertEqual(result[u'status'], u'good')
+
+    @deferred(timeout=10)
+    def test_check_torrents(self):
+        """
+        Test whether many torrents are checked with one scrape request per tracker and the best results are stored
+        """
+        for index in xrange(3):
+            self.torrent_checker._torrent_db.addExternalTorrentNoDef(
+                chr(ord('a') + index) * 20, 'ubuntu.iso', [['a.test', 1234]],
+                ['http://tracker1.com/announce', 'http://tracker2.com/announce'], 5)
+
+        sessions = []
+
+        def create_session(tracker_url, **_):
+            session = HttpTrackerSession(tracker_url, None, None, None)
+            seeders = 10 if tracker_url == 'http://tracker1.com/announce' else 5
+            session.connect_to_tracker = lambda: succeed({tracker_url: [
+                {'infohash': infohash.encode('hex'), 'seeders': seeders, 'leechers': 1}
+                for infohash in session.infohash_list]})
+            sessions.append(session)
+            return session
+
+        self.torrent_checker._create_session_for_request = create_session
+        self.torrent_checker._on_result_from_session = lambda _, result: result
+
+        def verify(health):
+            self.assertEqual(len(sessions), 2)
+            self.assertEqual(health, {'a' * 20: (10, 1), 'b' * 20: (10, 1)})
+            result = self.torrent_checker._torrent_db.getTorrent('b' * 20, (u'num_seeders', u'status'), False)
+            self.assertEqual(result[u'num_seeders'], 10)
+            self.assertEqual(result[u'status'], u'good')
+
+        return self.torrent_checker.check_torrents(['a' * 20, 'b' * 20]).addCallback(verify)
+
+    @deferred(timeout=10)
+    def test_check_torrents_dht_recent(self):
+        """
+        Test whether torrents without a tracker are looked up in the DHT and recently checked torrents are skipped
+        """
+        torrent_db = self.torrent_checker._torrent_db
+        torrent_db.addExternalTorrentNoDef('a' * 20, 'ubuntu.iso', [['a.test', 1234]], [], 5)
+        torrent_db.addExternalTorrentNoDef('b' * 20, 'ubuntu.iso', [['a.test', 1234]],
+                                           ['http://tracker1.com/announce'], 5)
+        current_time = int(time.time())
+        torrent_db.updateTorrentCheckResults([(torrent_db.getTorrentID('b' * 20), 'b' * 20, 1, 2, current_time,
+                                               current_time + 900, u'good', 0)])
+
+        self.torrent_checker._create_session_for_request = lambda *_, **__: self.fail("No tracker should be scraped")
+        self.torrent_checker._on_result_from_session = lambda _, result: result
+        self.session.lm.ltmgr = MockObject()
+        self.session.lm.ltmgr.get_metainfo = lambda _, callback, **__: callback({'seeders': 3, 'leechers': 4})
+
+        def verify(health):
+            self.assertEqual(health, {'a' * 20: (3, 4)})
+
+        return self.torrent_checker.check_torrents(['a' * 20, 'b' * 20]).addCallback(verify)
 
     @blocking_call_on_reactor_thread
     def tearDown(self, annotate=True):
@@ -7,7 +7,7 @@ from twisted.python.failure import Failure
 from Tribler.Core.Config.tribler_config import TriblerConfig
 from Tribler.Core.Session import Session
 from Tribler.Core.TorrentChecker.session import FakeDHTSession, DHT_TRACKER_MAX_RETRIES, DHT_TRACKER_RECHECK_INTERVAL, \
-    UdpTrackerSession, UDPScraper, HttpTrackerSession
+    UdpTrackerSession, UDPScraper, HttpTrackerSession, UDPScraperSocket
 from Tribler.Test.Core.base_test import TriblerCoreTest, MockObject
 from Tribler.Test.twisted_thread import deferred
 
@@ -276,6 +276,73 @@ class TestTorrentCheckerSession(TriblerCoreTest):
         return test_deferred
 
 
+class TestUDPScraperSocket(TriblerCoreTest):
+    """
+    This class contains tests for the UDP socket that is shared by the UDP tracker sessions.
+    """
+
+    def setUp(self, annotate=True):
+        super(TestUDPScraperSocket, self).setUp(annotate=annotate)
+        self.udp_socket = UDPScraperSocket()
+        self.written = []
+        self.udp_socket.transport = MockObject()
+        self.udp_socket.transport.write = lambda data, address: self.written.append((data, address))
+
+    def create_session(self, ip_address, port):
+        session = UdpTrackerSession("udp://localhost:%d/announce" % port, ("localhost", port), "/announce", 5,
+                                    udp_socket=self.udp_socket)
+        session.result_deferred = Deferred()
+        session.on_ip_address_resolved(ip_address)
+        return session
+
+    def test_dispatch_responses(self):
+        """
+        Test whether the responses of multiple trackers are dispatched to the right sessions over one socket
+        """
+        session1 = self.create_session("127.0.0.1", 1234)
+        session2 = self.create_session("127.0.0.2", 1235)
+        self.assertEqual(len(self.written), 2)
+        self.assertEqual(self.written[0][1], ("127.0.0.1", 1234))
+        self.assertEqual(self.udp_socket.get_num_scrapers(), 2)
+
+        session1._infohash_list = ["a" * 20]
+        packet = struct.pack("!iiq", session1._action, session1._transaction_id, 126)
+        self.udp_socket.datagramReceived(packet, ("127.0.0.1", 1234))
+        self.assertEqual(len(self.written), 3)
+
+        packet = struct.pack("!iiiii", session1._action, session1._transaction_id, 0, 1, 2)
+        self.udp_socket.datagramReceived(packet, ("127.0.0.1", 1234))
+        self.assertTrue(session1.is_finished)
+        self.assertFalse(session2.is_finished)
+        self.assertEqual(self.udp_socket.get_num_scrapers(), 1)
+
+        session2.failed()
+        self.assertEqual(self.udp_socket.get_num_scrapers(), 0)
+        session2.result_deferred.addErrback(lambda _: None)
+
+    def test_ignore_unknown_response(self):
+        """
+        Test whether responses that do not belong to a session are ignored
+        """
+        session = self.create_session("127.0.0.1", 1234)
+        packet = struct.pack("!iiq", session._action, session._transaction_id, 126)
+        self.udp_socket.datagramReceived(packet, ("127.0.0.3", 1234))
+        self.udp_socket.datagramReceived("short", ("127.0.0.1", 1234))
+        self.assertTrue(session.scraper.expect_connection_response)
+
+        session.scraper.stop()
+
+    @deferred(timeout=5)
+    def test_start_stop(self):
+        """
+        Test starting and stopping the shared socket
+        """
+        udp_socket = UDPScraperSocket()
+        udp_socket.start()
+        self.assertIsNotNone(udp_socket.listening_port)
+        return udp_socket.stop()
+
+
 class TestDHTSession(TriblerCoreTest):
     """
     Test the DHT session that we use to fetch the swarm status from the DHT.
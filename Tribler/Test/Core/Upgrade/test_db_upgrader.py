@@ -2,10 +2,12 @@ import os
 
 from Tribler.Core.CacheDB.SqliteCacheDBHandler import TorrentDBHandler
 from Tribler.Core.CacheDB.db_versions import LATEST_DB_VERSION
-from Tribler.Core.Upgrade.db_upgrader import DBUpgrader, VersionNoLongerSupportedError, DatabaseUpgradeError
+from Tribler.Core.Upgrade.db_upgrader import (DBUpgrader, VersionNoLongerSupportedError, DatabaseUpgradeError,
+                                              UpgradeProgress)
 from Tribler.Core.Utilities.utilities import fix_torrent
 from Tribler.Core.leveldbstore import LevelDbStore
 from Tribler.Test.Core.Upgrade.upgrade_base import AbstractUpgrader, MockTorrentStore
+from Tribler.Test.Core.base_test import TriblerCoreTest
 from Tribler.Test.common import TORRENT_UBUNTU_FILE, TORRENT_UBUNTU_FILE_INFOHASH
 
 
@@ -62,3 +64,35 @@ class TestDBUpgrader(AbstractUpgrader):
 
         torrent_db_handler = TorrentDBHandler(self.session)
         self.assertEqual(torrent_db_handler.getTorrentID(TORRENT_UBUNTU_FILE_INFOHASH), 3)
+
+    def test_reindex_torrents_resume(self):
+        """
+        Testing whether an interrupted reindex continues after the last torrent that was indexed
+        """
+        self.copy_and_initialize_upgrade_database('tribler_v17.sdb')
+        db_migrator = DBUpgrader(self.session, self.sqlitedb, torrent_store=MockTorrentStore())
+        db_migrator.start_migrate()
+        self.assertIsNone(db_migrator._get_checkpoint(u"reindex"))
+
+        self.sqlitedb.execute_write(u"DELETE FROM FullTextIndex")
+        db_migrator._set_checkpoint(u"reindex", self.sqlitedb.fetchone(u"SELECT MAX(torrent_id) FROM Torrent"))
+        db_migrator.reindex_torrents()
+        self.assertEqual(self.sqlitedb.fetchall(u"SELECT * FROM FullTextIndex"), [])
+
+        db_migrator._set_checkpoint(u"reindex", 0)
+        db_migrator.reindex_torrents()
+        self.assertEqual(len(self.sqlitedb.fetchall(u"SELECT * FROM FullTextIndex")), 1)
+
+
+class TestUpgradeProgress(TriblerCoreTest):
+
+    def test_update(self):
+        """
+        Testing whether the progress reports the items that are done and the remaining time
+        """
+        statuses = []
+        progress = UpgradeProgress(statuses.append, u"Upgrading:", 100, done=20)
+        progress.start_time -= 60
+        progress.update(20)
+        progress.update(60)
+        self.assertEqual(statuses, [u"Upgrading: 40/100, 3:00 remaining...", u"Upgrading: 100/100..."])
@@ -0,0 +1,24 @@
+from Tribler.Core.Utilities.bloom_filter import BloomFilter
+from Tribler.Test.Core.base_test import TriblerCoreTest
+
+
+class TestBloomFilter(TriblerCoreTest):
+
+    def test_no_false_negatives(self):
+        bloom_filter = BloomFilter(1000)
+        keys = ["key%d" % index for index in xrange(1000)]
+        for key in keys:
+            bloom_filter.add(key)
+        self.assertEqual(bloom_filter.num_keys, 1000)
+        self.assertTrue(all(key in bloom_filter for key in keys))
+
+    def test_false_positive_rate(self):
+        bloom_filter = BloomFilter(1000, error_rate=0.01)
+        for index in xrange(1000):
+            bloom_filter.add("key%d" % index)
+        false_positives = sum(1 for index in xrange(10000) if "other%d" % index in bloom_filter)
+        self.assertLess(false_positives, 300)
+
+    def test_empty(self):
+        bloom_filter = BloomFilter(10)
+        self.assertFalse("key" in bloom_filter)
@@ -0,0 +1,78 @@
+import random
+
+from Tribler.Core.Utilities.term_index import TermIndex, get_deletes, levenshtein
+from Tribler.Test.Core.base_test import TriblerCoreTest
+
+
+class TestTermIndex(TriblerCoreTest):
+
+    def setUp(self, annotate=True):
+        TriblerCoreTest.setUp(self, annotate=annotate)
+        self.term_index = TermIndex()
+        self.term_index.add(["ubuntu", "desktop", "amd64"])
+        self.term_index.add(["ubuntu", "server", "amd64"])
+        self.term_index.add(["ubuntu", "ubuntu", "budgie"])
+        self.term_index.add(["debian", "desktop"])
+
+    def test_frequencies(self):
+        self.assertEqual(len(self.term_index), 6)
+        self.assertEqual(self.term_index.get_frequency("ubuntu"), 3)
+        self.assertEqual(self.term_index.get_frequency("fedora"), 0)
+        self.assertIn("budgie", self.term_index)
+
+    def test_get_completions(self):
+        self.term_index.add(["debug", "deb"])
+        self.assertEqual(self.term_index.get_completions("de", 5), ["desktop", "deb", "debian", "debug"])
+        self.assertEqual(self.term_index.get_completions("deb", 1), ["debian"])
+        self.assertEqual(self.term_index.get_completions("ubuntu", 5), [])
+        self.assertEqual(self.term_index.get_completions("z", 5), [])
+
+    def test_get_similar_terms(self):
+        self.assertEqual(self.term_index.get_similar_terms("ubunto"), [(1, "ubuntu")])
+        self.assertEqual(self.term_index.get_similar_terms("dsktop"), [(1, "desktop")])
+        self.assertEqual(self.term_index.get_similar_terms("ubuntu"), [(0, "ubuntu")])
+        self.assertEqual(self.term_index.get_similar_terms("fedora"), [])
+
+    def test_get_similar_long_terms(self):
+        """
+        Testing whether terms that only differ after the indexed prefix are found
+        """
+        self.term_index.add(["programming", "programmers"])
+        self.assertEqual(self.term_index.get_similar_terms("programmint"), [(1, "programming")])
+
+    def test_remove(self):
+        self.term_index.remove(["ubuntu", "server", "amd64"])
+        self.assertEqual(self.term_index.get_frequency("ubuntu"), 2)
+        self.assertNotIn("server", self.term_index)
+        self.assertEqual(self.term_index.get_completions("se", 5), [])
+        self.assertEqual(self.term_index.get_similar_terms("servers"), [])
+
+        self.term_index.remove(["debian", "desktop"])
+        self.term_index.remove(["fedora"])
+        self.assertEqual(self.term_index.get_completions("de", 5), ["desktop"])
+        self.assertEqual(self.term_index.get_similar_terms("debion"), [])
+
+    def test_matches_linear_scan(self):
+        """
+        Testing whether the index returns the same terms as comparing the query with every term
+        """
+        rand = random.Random(42)
+        terms = set("".join(rand.choice("abcde") for _ in xrange(rand.randint(1, 9))) for _ in xrange(1000))
+        term_index = TermIndex(max_distance=2)
+        term_index.add(terms)
+
+        for _ in xrange(50):
+            query = "".join(rand.choice("abcde") for _ in xrange(rand.randint(1, 9)))
+            expected = set((levenshtein(query, term), term) for term in terms if levenshtein(query, term) <= 2)
+            self.assertEqual(set(term_index.get_similar_terms(query)), expected)
+            self.assertEqual(set(term_index.get_completions(query, len(terms))),
+                             set(term for term in terms if term.startswith(query) and term != query))
+
+    def test_get_deletes(self):
+        self.assertEqual(get_deletes("abc", 1), {"abc", "bc", "ac", "ab"})
+        self.assertEqual(len(get_deletes("abc", 3)), 8)
+
+    def test_levenshtein(self):
+        self.assertEqual(levenshtein("kitten", "sitting"), 3)
+        self.assertEqual(levenshtein("", "abc"), 3)
+        self.assertEqual(levenshtein("abc", "abc"), 0)
@@ -1,3 +1,5 @@
+import random
+
 from nose.tools import raises
 
 from Tribler.Core.Utilities.encoding import (_a_encode_int, _a_encode_long, _a_encode_float, _a_encode_unicode,
@@ -8,6 +10,7 @@ from Tribler.Core.Utilities.encoding import (_a_encode_int, _a_encode_long, _a_e
                                              _a_decode_unicode, encode, _a_decode_bytes, _a_decode_list,
                                              _a_decode_mapping, _a_decode_set, _a_decode_tuple,
                                              _a_decode_dictionary, decode)
+from Tribler.Test.Benchmarks.benchmark_encoding import reference_decode
 from Tribler.Test.Core.base_test import TriblerCoreTest
 
 
@@ -194,3 +197,74 @@ class TriblerCoreTestUnicode(TriblerCoreTest):
 
     def test_decode(self):
         self.assertEqual(decode("a2d3sfoo3sbar3smoo4smilk", 0), (24, {'foo': 'bar', 'moo': 'milk'}))
+
+    def test_decode_offset(self):
+        self.assertEqual(decode("xxa2t3bfoo12i123456789012", 2), (25, ('foo', 123456789012)))
+
+    @raises(ValueError)
+    def test_decode_truncated(self):
+        decode("a2t3bfoo3bxy")
+
+    @raises(ValueError)
+    def test_decode_invalid_header(self):
+        decode("a2tx3bfoo")
+
+    @raises(ValueError)
+    def test_decode_unknown_type(self):
+        decode("a1t3xfoo")
+
+
+class TestEncodingRoundTrip(TriblerCoreTest):
+    """
+    Property tests of the decoder against the reference decoder, which is the decoder that encoding.py used to have.
+    """
+
+    def setUp(self, annotate=True):
+        TriblerCoreTest.setUp(self, annotate=annotate)
+        self.random = random.Random(42)
+
+    def random_value(self, depth=0):
+        value_type = self.random.randint(0, 11 if depth < 3 else 7)
+        if value_type == 0:
+            return self.random.randint(-2 ** 31, 2 ** 31)
+        elif value_type == 1:
+            return long(self.random.randint(-2 ** 80, 2 ** 80))
+        elif value_type == 2:
+            return round(self.random.uniform(-1000, 1000), 3)
+        elif value_type == 3:
+            return u"".join(unichr(self.random.randint(32, 0x2000)) for _ in xrange(self.random.randint(0, 20)))
+        elif value_type in (4, 5):
+            return "".join(chr(self.random.randint(0, 255)) for _ in xrange(self.random.choice([0, 1, 9, 10, 200])))
+        elif value_type == 6:
+            return None
+        elif value_type == 7:
+            return self.random.choice([True, False])
+        elif value_type == 8:
+            return [self.random_value(depth + 1) for _ in xrange(self.random.randint(0, 12))]
+        elif value_type == 9:
+            return tuple(self.random_value(depth + 1) for _ in xrange(self.random.randint(0, 12)))
+        elif value_type == 10:
+            return set(self.random.randint(0, 100) for _ in xrange(self.random.randint(0, 12)))
+        return {"".join(chr(self.random.randint(0, 255)) for _ in xrange(self.random.randint(0, 12))):
+                self.random_value(depth + 1) for _ in xrange(self.random.randint(0, 12))}
+
+    def test_round_trip(self):
+        for _ in xrange(500):
+            value = self.random_value()
+            stream = encode(value)
+            self.assertEqual(decode(stream), (len(stream), value))
+            self.assertEqual(decode(stream), reference_decode(stream))
+
+    def test_truncated_streams(self):
+        """
+        Testing whether truncated streams are either rejected or decoded like the reference decoder does
+        """
+        for _ in xrange(50):
+            stream = encode(self.random_value())
+            for length in xrange(1, len(stream)):
+                try:
+                    expected = reference_decode(stream[:length])
+                except Exception:
+                    self.assertRaises(ValueError, decode, stream[:length])
+                else:
+                    self.assertEqual(decode(stream[:length]), expected)
@@ -1,6 +1,8 @@
+import sys
 from threading import Event, Thread
+from time import sleep
 
-from Tribler.Core.Utilities.instrumentation import synchronized, WatchDog
+from Tribler.Core.Utilities.instrumentation import synchronized, WatchDog, ReactorLagMonitor
 from Tribler.Test.Core.base_test import TriblerCoreTest
 
 
@@ -121,3 +123,67 @@ class TriblerCoreTestWatchDog(TriblerCoreTest):
         self.watchdog.start()
         # The even gets set when a thread has the same stack for more than 0 seconds.
         self.assertTrue(self._printe_event.wait(1))
+
+
+class TriblerCoreTestReactorLagMonitor(TriblerCoreTest):
+    def setUp(self):
+        self.monitor = ReactorLagMonitor(interval=0.05, threshold=0.05, sample_interval=0.01)
+
+    def tearDown(self):
+        self.monitor.stop()
+        self.monitor = None
+
+    def test_record_lag(self):
+        self.monitor.record_lag(0.001)
+        self.monitor.record_lag(0.3)
+        self.monitor.record_lag(42)
+
+        stats = self.monitor.get_statistics()
+        self.assertEqual(stats["num_heartbeats"], 3)
+        self.assertEqual(stats["max_lag"], 42)
+        self.assertEqual(stats["histogram"][0], {"bucket": "<=0.005", "count": 1})
+        self.assertEqual(stats["histogram"][5], {"bucket": "<=0.5", "count": 1})
+        self.assertEqual(stats["histogram"][-1], {"bucket": ">10.0", "count": 1})
+
+    def test_add_sample(self):
+        frame = sys._getframe()
+        self.monitor.add_sample(frame)
+        self.monitor.add_sample(frame)
+
+        offenders = self.monitor.get_top_offenders()
+        self.assertEqual(len(offenders), 1)
+        self.assertEqual(offenders[0]["samples"], 2)
+        self.assertTrue(offenders[0]["function"].startswith("test_add_sample (test_instrumentation.py:"))
+
+        collapsed = self.monitor.get_collapsed_stacks()
+        self.assertTrue(collapsed.endswith("test_add_sample (test_instrumentation.py:%d) 2\n"
+                                           % frame.f_code.co_firstlineno))
+
+        self.monitor.reset()
+        self.assertEqual(self.monitor.get_collapsed_stacks(), "")
+
+    def test_add_sample_max_stacks(self):
+        self.monitor.max_stacks = 1
+        self.monitor.add_sample(sys._getframe())
+        self.monitor.add_sample(sys._getframe().f_back)
+        self.assertEqual(self.monitor.num_samples, 1)
+        self.assertEqual(self.monitor.num_dropped_samples, 1)
+
+    def test_sample_blocked_reactor(self):
+        """
+        Test whether the reactor thread gets sampled when it is blocked
+        """
+        self.monitor.start()
+        sleep(0.2)
+
+        def block_reactor():
+            sleep(0.5)
+
+        from Tribler.Test.twisted_thread import reactor
+        reactor.callFromThread(block_reactor)
+        sleep(0.8)
+
+        stats = self.monitor.get_statistics()
+        self.assertGreater(stats["num_heartbeats"], 0)
+        self.assertGreater(stats["max_lag"], 0.3)
+        self.assertIn("block_reactor", [offender["function"].split(" ")[0] for offender in stats["top_offenders"]])
@@ -4,13 +4,17 @@ Tests for the LevelDB.
 Author(s): Elric Milon
 """
 import os
+import zlib
 
 from nose.tools import raises
 from shutil import rmtree
 from tempfile import mkdtemp
+from twisted.internet.defer import maybeDeferred, Deferred
 from twisted.internet.task import Clock
 
-from Tribler.Core.leveldbstore import LevelDbStore, WRITEBACK_PERIOD, get_write_batch_leveldb
+from Tribler.Core.Utilities.bloom_filter import BloomFilter
+from Tribler.Core.leveldbstore import (LevelDbStore, WRITEBACK_PERIOD, get_write_batch_leveldb, WRITE_BATCH_SIZE,
+                                      MAX_PENDING_SIZE, COMPRESSED_VALUE_PREFIX)
 from Tribler.Test.test_as_server import BaseTestCase
 
 
@@ -20,6 +24,7 @@ V = "bar"
 
 class ClockedAbstractLevelDBStore(LevelDbStore):
     _reactor = Clock()
+    _defer_to_thread = staticmethod(maybeDeferred)
 
 
 class ClockedLevelDBStore(ClockedAbstractLevelDBStore):
@@ -101,13 +106,141 @@ class AbstractTestLevelDBStore(BaseTestCase):
     def test_iter_one_element(self):
         self.store[K] = V
         iteritems = self.store.iteritems()
-        self.assertEqual(iteritems.next(), K)
+        self.assertEqual(iteritems.next(), (K, V))
+
+    def test_iteritems_changes(self):
+        self.store[K] = V
+        self.store["foo2"] = V
+        self.store.flush()
+        self.store[K] = "baz"
+        del self.store["foo2"]
+        self.store._flushing = {"foo3": V}
+        self.assertEqual(sorted(self.store.iteritems()), [(K, "baz"), ("foo3", V)])
 
     def test_iter(self):
         self.store[K] = V
         for key in iter(self.store):
             self.assertTrue(key)
 
+    def test_len_maintained(self):
+        self.store[K] = V
+        self.store[K] = V
+        self.store["foo2"] = V
+        self.store.flush()
+        self.store["foo3"] = V
+        self.assertEqual(3, len(self.store))
+        del self.store["foo2"]
+        del self.store["foo2"]
+        self.assertEqual(2, len(self.store))
+
+        # The size is counted again when the store is opened
+        store_dir = self.store._store_dir
+        self.store.close()
+        self.openStore(store_dir)
+        self.assertEqual(2, len(self.store))
+        self.assertEqual(sorted(self.store.keys()), [K, "foo3"])
+
+    def test_contains_bloom_filter(self):
+        self.store[K] = V
+        self.store.flush()
+        self.assertIn(K, self.store._bloom_filter)
+        self.assertNotIn("missing", self.store._bloom_filter)
+        self.assertTrue(K in self.store)
+        self.assertFalse("missing" in self.store)
+
+    def test_delete_flushed(self):
+        self.store[K] = V
+        self.store.flush()
+        del self.store[K]
+        self.assertFalse(K in self.store)
+        self.store.flush()
+        self.assertFalse(K in self.store)
+        self.assertEqual(0, len(self.store))
+        self.assertEqual([], list(self.store))
+
+    def test_flush_batches(self):
+        for index in xrange(WRITE_BATCH_SIZE * 2 + 1):
+            self.store["key%d" % index] = V
+        self.store.flush()
+        self.assertEqual(0, len(self.store._pending_torrents))
+        self.assertEqual(WRITE_BATCH_SIZE * 2 + 1, len(list(self.store.rangescan())))
+
+    def test_flush_pending_size(self):
+        self.store[K] = "a" * (MAX_PENDING_SIZE + 1)
+        self.assertTrue(self.store.is_pending_task_active("flush pending"))
+        self.store._reactor.advance(0)
+        self.assertEqual(0, len(self.store._pending_torrents))
+        self.assertEqual(0, self.store._pending_size)
+
+    def test_flush_in_progress(self):
+        write_deferred = Deferred()
+        self.store._defer_to_thread = lambda func, *args: write_deferred.addCallback(lambda _: func(*args))
+
+        self.store[K] = "bar1"
+        self.store.flush()
+        self.store[K] = "bar2"
+        self.assertEqual("bar2", self.store[K])
+        self.store.flush()
+
+        # The second flush only writes after the first one
+        write_deferred.callback(None)
+        self.assertEqual("bar2", self.store._db.Get(K))
+        self.assertEqual("bar2", self.store[K])
+
+    def test_compression(self):
+        store_dir = self.store._store_dir
+        self.store.close()
+        self.store = self._storetype(store_dir, compress=True)
+        self.store[K] = V * 100
+        self.store.flush()
+        self.assertTrue(self.store._db.Get(K).startswith(COMPRESSED_VALUE_PREFIX))
+        self.assertEqual(V * 100, self.store[K])
+        self.assertEqual([(K, V * 100)], list(self.store.rangescan()))
+
+    def test_no_compression(self):
+        value = COMPRESSED_VALUE_PREFIX + zlib.compress(V)
+        self.store[K] = value
+        self.store.flush()
+        self.assertEqual(value, self.store[K])
+        self.assertEqual([(K, value)], list(self.store.rangescan()))
+
+    def test_bloom_filter_off_reactor(self):
+        self.store[K] = V
+        self.store.flush()
+        store_dir = self.store._store_dir
+        self.store.close()
+
+        # The keys are counted on the thread pool, and lookups read from the database until they have been counted
+        build_deferred = Deferred()
+        self._storetype._defer_to_thread = staticmethod(
+            lambda func, *args: build_deferred.addCallback(lambda _: func(*args)))
+        try:
+            self.openStore(store_dir)
+        finally:
+            del self._storetype._defer_to_thread
+        self.assertIsNone(self.store._bloom_filter)
+        self.assertTrue(K in self.store)
+        self.store["foo2"] = V
+        self.assertEqual(1, len(self.store))
+        self.store.flush()
+        self.assertEqual({"foo2": V}, self.store._pending_torrents)
+
+        build_deferred.callback(None)
+        self.assertEqual(2, len(self.store))
+        self.assertIn(K, self.store._bloom_filter)
+        self.assertIn("foo2", self.store._bloom_filter)
+        self.assertFalse("missing" in self.store)
+        self.assertEqual({}, self.store._pending_torrents)
+        self.assertEqual(V, self.store._db.Get("foo2"))
+
+    def test_bloom_filter_rebuild(self):
+        self.store._bloom_filter = BloomFilter(1)
+        self.store[K] = V
+        self.store["foo2"] = V
+        self.assertGreater(self.store._bloom_filter.capacity, 1)
+        self.assertIn(K, self.store._bloom_filter)
+        self.assertIn("foo2", self.store._bloom_filter)
+
 
 class TestLevelDBStore(AbstractTestLevelDBStore):
     __test__ = True
@@ -2,7 +2,9 @@ from binascii import unhexlify
 from twisted.internet.defer import inlineCallbacks
 
 from Tribler.Core.CacheDB.SqliteCacheDBHandler import ChannelCastDBHandler, TorrentDBHandler, VoteCastDBHandler
-from Tribler.Core.CacheDB.sqlitecachedb import str2bin
+from Tribler.Core.CacheDB.sqlitecachedb import bin2str, str2bin
+from Tribler.Core.Category.Category import Category
+from Tribler.Core.simpledefs import SIGNAL_ON_TORRENT_UPDATED
 from Tribler.Test.Core.test_sqlitecachedbhandler import AbstractDB
 from Tribler.dispersy.util import blocking_call_on_reactor_thread
 
@@ -16,6 +18,7 @@ class TestChannelDBHandler(AbstractDB):
 
         self.cdb = ChannelCastDBHandler(self.session)
         self.tdb = TorrentDBHandler(self.session)
+        self.tdb.category = Category()
         self.vdb = VoteCastDBHandler(self.session)
         self.cdb.votecast_db = self.vdb
         self.cdb.torrent_db = self.tdb
@@ -75,6 +78,15 @@ class TestChannelDBHandler(AbstractDB):
         self.assertEqual(res[1][0], 7)
         self.assertEqual(res[2][0], 8)
 
+    def test_get_random_channel_torrents(self):
+        keys = ['ChannelTorrents.id', 'infohash', 'Torrent.name']
+        torrents = self.cdb.get_random_channel_torrents(keys, limit=100)
+        all_ids = self.cdb._db.fetchall("SELECT ChannelTorrents.id FROM ChannelTorrents, Torrent"
+                                        " WHERE ChannelTorrents.torrent_id = Torrent.torrent_id"
+                                        " AND Torrent.name IS NOT NULL")
+        self.assertEqual(sorted(torrent[0] for torrent in torrents), sorted(row[0] for row in all_ids))
+        self.assertEqual(len(self.cdb.get_random_channel_torrents(keys, limit=1)), 1)
+
     def test_get_my_subscribed_channels(self):
         res = self.cdb.getMySubscribedChannels(include_dispersy=True)
         self.assertEqual(len(res), 1)
@@ -115,6 +127,38 @@ class TestChannelDBHandler(AbstractDB):
         self.cdb.on_remove_torrent_from_dispersy(1, 3, False)
         self.assertIsNone(self.cdb.getTorrentFromChannelTorrentId(1, ['ChannelTorrents.dispersy_id']))
 
+    def test_on_torrents_from_dispersy(self):
+        updates = []
+        self.cdb.notifier.notify = lambda *args: updates.append(args)
+        existing_infohash = str2bin('AA8cTG7ZuPsyblbRE7CyxsrKUCg=')
+        new_infohash = unhexlify('50865489ac16e2f34ea0cd3043cfd970cc24ec09')
+        self.cdb.on_torrents_from_dispersy([
+            (1, 42, None, existing_infohash, 1234, u"existing", [(u"file.txt", 42)], []),
+            (2, 43, None, new_infohash, 1235, u"new torrent", [(u"file1.txt", 42), (u"file2.txt", 43)], []),
+            (1, 44, None, new_infohash, 1235, u"new torrent", [(u"file1.txt", 42), (u"file2.txt", 43)], [])])
+
+        self.assertEqual(self.tdb.getOne(('name', 'num_files'), infohash=bin2str(new_infohash)), (u"new torrent", 2))
+        torrent_updates = {args[2]: args[3] for args in updates if args[1] == SIGNAL_ON_TORRENT_UPDATED}
+        self.assertEqual(sorted(torrent_updates), [1, 2])
+        for channel_id, items in torrent_updates.iteritems():
+            for item in items:
+                self.assertEqual(item[u'channel_torrent_id'],
+                                 self.cdb.get_channel_torrent_id(channel_id, item[u'info_hash']))
+        self.assertEqual(len(torrent_updates[1]), 2)
+        self.assertNotEqual(torrent_updates[1][1][u'channel_torrent_id'],
+                            torrent_updates[2][0][u'channel_torrent_id'])
+
+    def test_get_channel_torrent_ids_many(self):
+        """
+        Test whether the channel torrents of more torrents than SQLite has host parameters can be looked up at once
+        """
+        torrent_ids = range(1, 2000)
+        expected = {}
+        for start in xrange(0, len(torrent_ids), 100):
+            expected.update(self.cdb.get_channel_torrent_ids(torrent_ids[start:start + 100]))
+        self.assertTrue(expected)
+        self.assertEqual(self.cdb.get_channel_torrent_ids(torrent_ids), expected)
+
     def test_search_local_channels(self):
         """
         Testing whether the right results are returned when searching in the local database for channels
@@ -97,6 +97,14 @@ class TestSqlitePeerDBHandler(AbstractDB):
         self.assertIsInstance(self.pdb.addOrGetPeerID(FAKE_PERMID_X), int)
         self.assertIsInstance(self.pdb.addOrGetPeerID(FAKE_PERMID_X), int)
 
+    @blocking_call_on_reactor_thread
+    def test_add_or_get_peers(self):
+        oldsize = self.pdb.size()
+        peer_ids = self.pdb.addOrGetPeerIDS([FAKE_PERMID_X, self.p1, FAKE_PERMID_X])
+        self.assertEqual(self.pdb.size(), oldsize + 1)
+        self.assertEqual(peer_ids[0], peer_ids[2])
+        self.assertEqual(peer_ids[:2], [self.pdb.getPeerID(FAKE_PERMID_X), self.pdb.getPeerID(self.p1)])
+
     @blocking_call_on_reactor_thread
     def test_get_peer_by_id(self):
         self.assertEqual(self.pdb.getPeerById(1, ['name']), 'Peer 1')
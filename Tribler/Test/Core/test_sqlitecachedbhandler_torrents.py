@@ -34,6 +34,7 @@ class TestTorrentFullSessionDBHandler(AbstractDB):
         self.assertIsNone(self.tdb.mypref_db)
         self.assertIsNone(self.tdb.votecast_db)
         self.assertIsNone(self.tdb.channelcast_db)
+        self.tdb.close()
 
 
 class TestTorrentDBHandler(AbstractDB):
@@ -209,6 +210,30 @@ class TestTorrentDBHandler(AbstractDB):
                                          [], 1234)
         self.assertFalse(self.tdb.getTorrentID(infohash))
 
+    @blocking_call_on_reactor_thread
+    def test_add_external_torrents_no_def(self):
+        infohashes = [unhexlify('%040x' % index) for index in xrange(1, 5)]
+        torrent_ids, _ = self.tdb.addOrGetTorrentIDSReturn(infohashes)
+        self.tdb.addExternalTorrentsNoDef([
+            (torrent_ids[0], infohashes[0], u"single file.iso", [(u"single file.iso", 42)],
+             [u'http://localhost/announce'], 1234),
+            (torrent_ids[1], infohashes[1], u"more files", [(u"file1.txt", 42), (u"file2.txt", 43)], [], 1235),
+            (torrent_ids[2], infohashes[2], u"no files", [], [], 1236),
+            (torrent_ids[3], infohashes[3], u"invalid", [(u"file1", {}), (u"file2", 43)], [], 1237)])
+
+        self.assertEqual(self.tdb.getOne(('name', 'length', 'num_files'), torrent_id=torrent_ids[0]),
+                         (u"single file.iso", 42, 1))
+        self.assertEqual(self.tdb.getOne(('name', 'length', 'num_files'), torrent_id=torrent_ids[1]),
+                         (u"more files", 85, 2))
+        self.assertEqual(self.tdb._db.fetchone(u"SELECT swarmname FROM FullTextIndex WHERE rowid = ?",
+                                               (torrent_ids[0],)), u"single file")
+        self.assertEqual(self.tdb._db.fetchone(u"SELECT COUNT(*) FROM TorrentFiles WHERE torrent_id = ?",
+                                               (torrent_ids[1],)), 2)
+        self.assertEqual(set(self.tdb.getTrackerListByTorrentID(torrent_ids[0])),
+                         {u'DHT', u'http://localhost/announce'})
+        self.assertIsNone(self.tdb.getOne('name', torrent_id=torrent_ids[2]))
+        self.assertIsNone(self.tdb.getOne('name', torrent_id=torrent_ids[3]))
+
     @blocking_call_on_reactor_thread
     def test_add_get_torrent_id(self):
         infohash = str2bin('AA8cTG7ZuPsyblbRE7CyxsrKUCg=')
@@ -245,13 +270,64 @@ class TestTorrentDBHandler(AbstractDB):
         self.assertEqual(res, old_res-20)
 
     @blocking_call_on_reactor_thread
+    @inlineCallbacks
     def test_get_search_suggestions(self):
+        yield self.tdb.build_term_index()
         self.assertEqual(self.tdb.getSearchSuggestion(["content", "cont"]), ["content 1"])
 
     @blocking_call_on_reactor_thread
+    @inlineCallbacks
     def test_get_autocomplete_terms(self):
+        yield self.tdb.build_term_index()
         self.assertEqual(len(self.tdb.getAutoCompleteTerms("content", 100)), 0)
 
+    @blocking_call_on_reactor_thread
+    @inlineCallbacks
+    def test_get_autocomplete_terms_indexed(self):
+        yield self.tdb.build_term_index()
+        self.assertEqual(self.tdb.getAutoCompleteTerms("conte", 100), ["content"])
+        self.tdb._indexTorrent(1, u"contents of ubuntu", [])
+        self.assertEqual(self.tdb.getAutoCompleteTerms("conte", 100), ["content", "contents"])
+        self.assertEqual(self.tdb.getAutoCompleteTerms("ubun", 100), ["ubuntu"])
+        self.assertEqual(self.tdb.get_term_index().get_frequency("content"), 4848)
+
+    @blocking_call_on_reactor_thread
+    @inlineCallbacks
+    def test_get_autocomplete_terms_multiple_words(self):
+        """
+        Test whether only the last word of a query is completed and whether the words before it are kept
+        """
+        yield self.tdb.build_term_index()
+        self.tdb._indexTorrent(1, u"ubuntu server", [])
+        self.assertEqual(self.tdb.getAutoCompleteTerms("ubuntu se", 100), ["ubuntu server"])
+        self.assertEqual(self.tdb.getAutoCompleteTerms("Ubuntu Se", 100), ["ubuntu server"])
+        self.assertEqual(self.tdb.getAutoCompleteTerms("ubuntu ", 100), [])
+
+    @blocking_call_on_reactor_thread
+    @inlineCallbacks
+    def test_build_term_index(self):
+        """
+        Test whether autocompletions come from the full text index until the term index is built, and whether swarm
+        names that are indexed while it is being built end up in the term index
+        """
+        term_index_built = self.tdb.build_term_index()
+        self.assertIsNone(self.tdb.get_term_index())
+        self.assertEqual(self.tdb.getAutoCompleteTerms("conte", 100), ["content"])
+        self.assertEqual(self.tdb.getSearchSuggestion(["content"]), [])
+        self.tdb._indexTorrent(1, u"contents of ubuntu", [])
+        self.assertEqual(self.tdb.getAutoCompleteTerms("contents o", 100), ["contents of"])
+
+        yield term_index_built
+        self.assertEqual(self.tdb.getAutoCompleteTerms("conte", 100), ["content", "contents"])
+        self.assertEqual(self.tdb.get_term_index().get_frequency("content"), 4848)
+
+    @blocking_call_on_reactor_thread
+    @inlineCallbacks
+    def test_get_search_suggestions_typo(self):
+        yield self.tdb.build_term_index()
+        self.assertEqual(self.tdb.getSearchSuggestion(["contnt"]), ["content 1"])
+        self.assertEqual(self.tdb.getSearchSuggestion(["abc"]), [])
+
     @blocking_call_on_reactor_thread
     def test_get_recently_randomly_collected_torrents(self):
         self.assertEqual(len(self.tdb.getRecentlyCollectedTorrents(limit=10)), 10)
@@ -301,3 +377,20 @@ class TestTorrentDBHandler(AbstractDB):
         self.assertNotEqual(results[0][-1], 0.0)  # Relevance score of result should not be zero
         results = self.tdb.search_in_local_torrents_db('fdsafasfds', ['infohash'])
         self.assertEqual(len(results), 0)
+
+    @blocking_call_on_reactor_thread
+    def test_update_torrent_check_results(self):
+        """
+        Test updating the health of multiple torrents at once
+        """
+        infohashes = [self.tdb.getInfohash(1), self.tdb.getInfohash(2)]
+        check_info = self.tdb.getTorrentsCheckRetries(infohashes + ['a' * 20])
+        self.assertEqual(sorted(check_info.keys()), sorted(infohashes))
+
+        self.tdb.updateTorrentCheckResults([(check_info[infohash][0], infohash, 12, 34, 1000, 2000, u'good', 0)
+                                            for infohash in infohashes])
+        for infohash in infohashes:
+            torrent = self.tdb.getTorrent(infohash, keys=(u'num_seeders', u'num_leechers', u'status'))
+            self.assertEqual(torrent[u'num_seeders'], 12)
+            self.assertEqual(torrent[u'num_leechers'], 34)
+            self.assertEqual(torrent[u'status'], u'good')
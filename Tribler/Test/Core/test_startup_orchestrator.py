@@ -0,0 +1,157 @@
+from nose.tools import raises
+from twisted.internet.defer import Deferred
+from twisted.internet.task import deferLater
+
+from Tribler.Core.APIImplementation.startup_orchestrator import StartupOrchestrator
+from Tribler.Core.simpledefs import NTFY_STARTUP_TICK, NTFY_STARTED, NTFY_FINISHED
+from Tribler.Test.Core.base_test import TriblerCoreTest, MockObject
+from Tribler.Test.twisted_thread import deferred, reactor
+
+
+class TestStartupOrchestrator(TriblerCoreTest):
+    """
+    This class contains tests for the startup orchestrator of the session components.
+    """
+
+    def setUp(self, annotate=True):
+        TriblerCoreTest.setUp(self, annotate=annotate)
+        self.notifications = []
+        self.notifier = MockObject()
+        self.notifier.notify = lambda *args: self.notifications.append(args)
+        self.orchestrator = StartupOrchestrator(self.notifier)
+        self.start_order = []
+
+    def start_func(self, name):
+        return lambda: self.start_order.append(name)
+
+    @deferred(timeout=10)
+    def test_start_dependency_order(self):
+        """
+        Testing whether components are only started after their dependencies
+        """
+        self.orchestrator.add_component("c", self.start_func("c"), depends_on=["a", "b"])
+        self.orchestrator.add_component("b", self.start_func("b"), depends_on=["a"])
+        self.orchestrator.add_component("a", self.start_func("a"))
+
+        def verify(timings):
+            self.assertEqual(self.start_order, ["a", "b", "c"])
+            self.assertEqual(len(timings["components"]), 3)
+            self.assertIsNotNone(timings["total_duration"])
+
+        return self.orchestrator.start().addCallback(verify)
+
+    @deferred(timeout=10)
+    def test_start_concurrent(self):
+        """
+        Testing whether independent components are started concurrently
+        """
+        slow_deferred = Deferred()
+        self.orchestrator.add_component("slow", lambda: slow_deferred)
+        self.orchestrator.add_component("fast", self.start_func("fast"))
+        self.orchestrator.add_component("after_fast", self.start_func("after_fast"), depends_on=["fast"])
+        self.orchestrator.add_component("after_slow", self.start_func("after_slow"), depends_on=["slow"])
+
+        def verify_before_slow(_):
+            self.assertEqual(self.start_order, ["fast", "after_fast"])
+            slow_deferred.callback(None)
+
+        def verify(_):
+            self.assertEqual(self.start_order, ["fast", "after_fast", "after_slow"])
+
+        start_deferred = self.orchestrator.start()
+        return deferLater(reactor, 0.1, lambda: None).addCallback(verify_before_slow)\
+            .addCallback(lambda _: start_deferred).addCallback(verify)
+
+    @deferred(timeout=10)
+    def test_start_threaded(self):
+        """
+        Testing whether threaded components are run on the thread pool
+        """
+        from twisted.python.threadable import isInIOThread
+        self.orchestrator.add_component("threaded", lambda: self.start_order.append(isInIOThread()), threaded=True)
+
+        def verify(_):
+            self.assertEqual(self.start_order, [False])
+
+        return self.orchestrator.start().addCallback(verify)
+
+    @deferred(timeout=10)
+    def test_threaded_dispatched_first(self):
+        """
+        Testing whether threaded components are dispatched before a chain of synchronous components runs
+        """
+        self.orchestrator.add_component("a", self.start_func("a"))
+        self.orchestrator.add_component("b", self.start_func("b"), depends_on=["a"])
+        self.orchestrator.add_component("threaded", self.start_func("threaded"), threaded=True)
+
+        def verify(_):
+            started = [args[2] for args in self.notifications if args[1] == NTFY_STARTED]
+            self.assertEqual(started, ["threaded", "a", "b"])
+
+        return self.orchestrator.start().addCallback(verify)
+
+    @deferred(timeout=10)
+    def test_unknown_dependency_ignored(self):
+        """
+        Testing whether dependencies on components that are not registered are ignored
+        """
+        self.orchestrator.add_component("a", self.start_func("a"), depends_on=["disabled"])
+
+        def verify(_):
+            self.assertEqual(self.start_order, ["a"])
+            self.assertEqual(self.orchestrator.components["a"].depends_on, [])
+
+        return self.orchestrator.start().addCallback(verify)
+
+    @deferred(timeout=10)
+    def test_start_failure(self):
+        """
+        Testing whether a failing component fails the startup and its dependants are not started
+        """
+        def fail_start():
+            raise RuntimeError("fail")
+
+        self.orchestrator.add_component("failing", fail_start)
+        self.orchestrator.add_component("dependant", self.start_func("dependant"), depends_on=["failing"])
+
+        def on_success(_):
+            self.fail("Startup should have failed")
+
+        def on_failure(failure):
+            failure.trap(RuntimeError)
+            self.assertEqual(self.start_order, [])
+            self.assertTrue(self.orchestrator.get_timings()["components"][0]["failed"])
+
+        return self.orchestrator.start().addCallbacks(on_success, on_failure)
+
+    @deferred(timeout=10)
+    def test_startup_ticks(self):
+        """
+        Testing whether the start and finish of every component is notified
+        """
+        self.orchestrator.add_component("a", self.start_func("a"))
+
+        def verify(_):
+            self.assertEqual(len(self.notifications), 2)
+            self.assertEqual(self.notifications[0], (NTFY_STARTUP_TICK, NTFY_STARTED, "a", None))
+            self.assertEqual(self.notifications[1][:3], (NTFY_STARTUP_TICK, NTFY_FINISHED, "a"))
+            self.assertIsNotNone(self.notifications[1][3])
+
+        return self.orchestrator.start().addCallback(verify)
+
+    @raises(ValueError)
+    def test_duplicate_component(self):
+        """
+        Testing whether registering a component twice raises a ValueError
+        """
+        self.orchestrator.add_component("a", self.start_func("a"))
+        self.orchestrator.add_component("a", self.start_func("a"))
+
+    @raises(ValueError)
+    def test_cyclic_dependency(self):
+        """
+        Testing whether a dependency cycle is detected before starting
+        """
+        self.orchestrator.add_component("a", self.start_func("a"), depends_on=["b"])
+        self.orchestrator.add_component("b", self.start_func("b"), depends_on=["a"])
+        self.orchestrator.start()
@@ -13,7 +13,7 @@ from twisted.web.static import File
 from Tribler.Core.TorrentDef import TorrentDef, TorrentDefNoMetainfo
 from Tribler.Core.Utilities.network_utils import get_random_port
 from Tribler.Core.Utilities.utilities import create_valid_metainfo, valid_torrent_file
-from Tribler.Core.exceptions import TorrentDefNotFinalizedException, HttpError
+from Tribler.Core.exceptions import TorrentDefNotFinalizedException, HttpError, NotYetImplementedException
 from Tribler.Core.simpledefs import INFOHASH_LENGTH
 from Tribler.Test.common import TESTS_DATA_DIR, TORRENT_UBUNTU_FILE
 from Tribler.Test.test_as_server import BaseTestCase
@@ -430,3 +430,53 @@ class TestTorrentDef(BaseTestCase):
 
         t.metainfo = {'info': {'files': [{'path': ['a.txt'], 'path.utf-8': ['b.txt'], 'length': 123}]}}
         self.assertEqual(t.get_index_of_file_in_files('b.txt'), 0)
+
+    def test_get_index_many_files(self):
+        t = TorrentDef()
+        t.metainfo_valid = True
+        t.metainfo = {'info': {'files': [{'path': ['dir', 'file%d.txt' % i], 'length': i} for i in xrange(1000)]}}
+        self.assertEqual(t.get_index_of_file_in_files(os.path.join(u'dir', u'file999.txt')), 999)
+        self.assertEqual(t.get_index_of_file_in_files(os.path.join(u'dir', u'file0.txt')), 0)
+
+    def test_file_table(self):
+        t = TorrentDef()
+        t.metainfo_valid = True
+        t.metainfo = {'info': {'files': [{'path': ['a.avi'], 'length': 10},
+                                         {'path': ['b.txt'], 'length': 0},
+                                         {'path': ['c.AVI'], 'length': 5}]}}
+        table = t.get_file_table()
+        self.assertIs(table, t.get_file_table())
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table.names, (u'a.avi', u'b.txt', u'c.AVI'))
+        self.assertEqual(table.offsets, (0, 10, 10, 15))
+        self.assertEqual(table.total_length, 15)
+        self.assertEqual(table.get_file_offset(2), 10)
+        self.assertEqual(t.get_files_with_length(), [(u'a.avi', 10), (u'b.txt', 0), (u'c.AVI', 5)])
+        self.assertEqual(t.get_files(exts=['avi']), [u'a.avi', u'c.AVI'])
+        self.assertEqual(t.get_files(exts=['mkv']), [])
+
+    def test_file_table_offsets(self):
+        t = TorrentDef()
+        t.metainfo_valid = True
+        t.metainfo = {'info': {'files': [{'path': ['a.avi'], 'length': 10},
+                                         {'path': ['b.txt'], 'length': 0},
+                                         {'path': ['c.avi'], 'length': 5}]}}
+        table = t.get_file_table()
+        self.assertEqual(table.get_file_index_at_offset(0), 0)
+        self.assertEqual(table.get_file_index_at_offset(9), 0)
+        self.assertEqual(table.get_file_index_at_offset(10), 2)
+        self.assertEqual(table.get_file_index_at_offset(14), 2)
+        self.assertRaises(ValueError, table.get_file_index_at_offset, 15)
+        self.assertRaises(ValueError, table.get_file_index_at_offset, -1)
+
+    def test_file_table_invalidated(self):
+        t = TorrentDef()
+        t.metainfo_valid = True
+        t.metainfo = {'info': {'files': [{'path': ['a.txt'], 'length': 123}]}}
+        self.assertEqual(t.get_files(), [u'a.txt'])
+        t.metainfo = {'info': {'files': [{'path': ['b.txt'], 'length': 123}]}}
+        self.assertEqual(t.get_files(), [u'b.txt'])
+
+    @raises(NotYetImplementedException)
+    def test_file_table_not_finalized(self):
+        TorrentDef().get_file_table()
@@ -0,0 +1,134 @@
+import os
+import sys
+import unittest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QApplication, QLabel, QTreeView
+
+from TriblerGUI.defs import DOWNLOADS_FILTER_DOWNLOADING, DOWNLOADS_FILTER_INACTIVE
+from TriblerGUI.widgets.downloadslistmodel import COLUMN_NAME, COLUMN_PROGRESS, COLUMN_SIZE, \
+    DownloadProgressDelegate, DownloadsFilterModel, DownloadsListModel
+from TriblerGUI.widgets.lazyloadlist import ITEM_LOAD_BATCH, LazyLoadList
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+def create_download(index, **kwargs):
+    download = {"infohash": "%040x" % index, "name": "download %d" % index, "size": 1024 * (index + 1),
+                "progress": 0.5, "status": "DLSTATUS_DOWNLOADING", "vod_mode": False, "num_seeds": 1, "num_peers": 2,
+                "speed_down": 100, "speed_up": 10, "ratio": 0.1, "anon_download": True, "hops": 1, "eta": 60,
+                "time_added": 1500000000}
+    download.update(kwargs)
+    return download
+
+
+class TestDownloadsListModel(unittest.TestCase):
+    """
+    This class contains tests for the model, the proxy model and the delegate of the downloads list. They run without
+    a display, on the offscreen Qt platform.
+    """
+
+    def setUp(self):
+        self.model = DownloadsListModel()
+        self.changed_rows = []
+        self.model.dataChanged.connect(lambda first, last: self.changed_rows.append((first.row(), last.row())))
+
+    def test_update_downloads(self):
+        downloads = [create_download(index) for index in xrange(5)]
+        self.model.update_downloads(downloads)
+        self.assertEqual(self.model.rowCount(), 5)
+        self.assertEqual(self.model.index(2, COLUMN_NAME).data(), "download 2")
+        self.assertEqual(self.model.index(2, COLUMN_PROGRESS).data(), "50%")
+
+        # Unchanged downloads are not signalled
+        self.model.update_downloads([dict(download) for download in downloads])
+        self.assertEqual(self.changed_rows, [])
+
+        downloads[1] = create_download(1, speed_down=200)
+        downloads[2] = create_download(2, speed_down=200)
+        downloads[4] = create_download(4, progress=1.0, status="DLSTATUS_SEEDING")
+        self.model.update_downloads(downloads)
+        self.assertEqual(self.changed_rows, [(1, 2), (4, 4)])
+        self.assertEqual(self.model.index(4, COLUMN_PROGRESS).data(), "100%")
+
+    def test_add_remove_downloads(self):
+        self.model.update_downloads([create_download(index) for index in xrange(5)])
+        self.model.update_downloads([create_download(index) for index in (0, 2, 4, 5)])
+        self.assertEqual([self.model.get_download(row)["name"] for row in xrange(self.model.rowCount())],
+                         ["download 0", "download 2", "download 4", "download 5"])
+        self.assertEqual(self.model.get_row("%040x" % 5), 3)
+
+        self.model.remove_download("%040x" % 2)
+        self.assertEqual(self.model.rowCount(), 3)
+        self.assertEqual(self.model.get_row("%040x" % 4), 1)
+        self.assertIsNone(self.model.get_row("%040x" % 2))
+
+    def test_filter_and_sort(self):
+        filter_model = DownloadsFilterModel()
+        filter_model.setSourceModel(self.model)
+        self.model.update_downloads([create_download(index, status="DLSTATUS_STOPPED" if index % 2 else
+                                                     "DLSTATUS_DOWNLOADING") for index in xrange(20)])
+        self.assertEqual(filter_model.rowCount(), 20)
+
+        filter_model.set_status_filter(DOWNLOADS_FILTER_INACTIVE)
+        self.assertEqual(filter_model.rowCount(), 10)
+        filter_model.set_filter_text("Download 1")
+        self.assertEqual(sorted(filter_model.get_download(filter_model.index(row, 0))["name"]
+                                for row in xrange(filter_model.rowCount())),
+                         ["download 1", "download 11", "download 13", "download 15", "download 17", "download 19"])
+
+        # Downloads that change their status move between the filters
+        filter_model.set_filter_text("")
+        filter_model.set_status_filter(DOWNLOADS_FILTER_DOWNLOADING)
+        self.model.update_downloads([create_download(index) for index in xrange(20)])
+        self.assertEqual(filter_model.rowCount(), 20)
+
+        filter_model.sort(COLUMN_SIZE, Qt.DescendingOrder)
+        self.assertEqual(filter_model.get_download(filter_model.index(0, 0))["name"], "download 19")
+
+    def test_many_downloads(self):
+        filter_model = DownloadsFilterModel()
+        filter_model.setSourceModel(self.model)
+        filter_model.sort(COLUMN_SIZE, Qt.AscendingOrder)
+        self.model.update_downloads([create_download(index) for index in xrange(5000)])
+        self.model.update_downloads([create_download(index, speed_down=1000 + index) for index in xrange(5000)])
+        self.assertEqual(self.changed_rows, [(0, 4999)])
+        self.assertEqual(filter_model.rowCount(), 5000)
+        self.assertEqual(filter_model.get_download(filter_model.index(0, 0))["name"], "download 0")
+
+    def test_paint_progress(self):
+        view = QTreeView()
+        view.setModel(self.model)
+        view.setItemDelegateForColumn(COLUMN_PROGRESS, DownloadProgressDelegate(view))
+        self.model.update_downloads([create_download(index) for index in xrange(100)])
+        view.resize(800, 300)
+        self.assertFalse(view.grab().isNull())
+
+
+class TestLazyLoadList(unittest.TestCase):
+
+    class TextItem(QLabel):
+
+        def __init__(self, parent, data):
+            QLabel.__init__(self, data, parent)
+
+    def test_insert_items_at_top(self):
+        """
+        Testing whether inserting many items at the top of the list does not create a widget for every item
+        """
+        lazy_list = LazyLoadList(None)
+        for index in xrange(500):
+            lazy_list.insert_item(0, (TestLazyLoadList.TextItem, "item %d" % index))
+
+        self.assertEqual(len(lazy_list.data_items), 500)
+        self.assertEqual(lazy_list.count(), ITEM_LOAD_BATCH)
+        self.assertEqual(lazy_list.itemWidget(lazy_list.item(0)).text(), "item 499")
+        self.assertEqual(lazy_list.itemWidget(lazy_list.item(ITEM_LOAD_BATCH - 1)).text(),
+                         "item %d" % (500 - ITEM_LOAD_BATCH))
+
+        lazy_list.load_next_items()
+        self.assertEqual(lazy_list.count(), 2 * ITEM_LOAD_BATCH)
+        self.assertEqual(lazy_list.itemWidget(lazy_list.item(2 * ITEM_LOAD_BATCH - 1)).text(),
+                         "item %d" % (500 - 2 * ITEM_LOAD_BATCH))
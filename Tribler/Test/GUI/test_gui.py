@@ -293,7 +293,7 @@ class TriblerGUITest(AbstractTriblerGUITest):
 
     def test_download_start_stop_remove_recheck(self):
         self.go_to_and_wait_for_downloads()
-        QTest.mouseClick(window.downloads_list.topLevelItem(0).progress_slider, Qt.LeftButton)
+        window.downloads_list.setCurrentIndex(window.downloads_list.model().index(0, 0))
         QTest.mouseClick(window.stop_download_button, Qt.LeftButton)
         QTest.mouseClick(window.start_download_button, Qt.LeftButton)
         QTest.mouseClick(window.remove_download_button, Qt.LeftButton)
@@ -302,7 +302,7 @@ class TriblerGUITest(AbstractTriblerGUITest):
 
     def test_download_details(self):
         self.go_to_and_wait_for_downloads()
-        QTest.mouseClick(window.downloads_list.topLevelItem(0).progress_slider, Qt.LeftButton)
+        window.downloads_list.setCurrentIndex(window.downloads_list.model().index(0, 0))
         QTest.qWait(500)  # Wait until the details pane shows
         window.download_details_widget.setCurrentIndex(0)
         self.screenshot(window, name="download_detail")
@@ -409,7 +409,7 @@ class TriblerGUITest(AbstractTriblerGUITest):
     def test_add_download_url(self):
         window.on_add_torrent_from_url()
         self.go_to_and_wait_for_downloads()
-        old_count = window.downloads_list.topLevelItemCount()
+        old_count = window.downloads_list.model().rowCount()
         self.screenshot(window, name="add_torrent_url_dialog")
         window.dialog.dialog_widget.dialog_input.setText("http://test.url/test.torrent")
         QTest.mouseClick(window.dialog.buttons[0], Qt.LeftButton)
@@ -419,7 +419,7 @@ class TriblerGUITest(AbstractTriblerGUITest):
         QTest.mouseClick(window.dialog.dialog_widget.download_button, Qt.LeftButton)
         self.wait_for_signal(window.downloads_page.received_downloads)
         self.wait_for_signal(window.downloads_page.received_downloads)
-        self.assertEqual(window.downloads_list.topLevelItemCount(), old_count + 1)
+        self.assertEqual(window.downloads_list.model().rowCount(), old_count + 1)
 
     def test_video_player_page(self):
         QTest.mouseClick(window.left_menu_button_video_player, Qt.LeftButton)
@@ -392,14 +392,20 @@ class ChannelCommunity(Community):
 
     def _disp_on_torrent(self, messages):
         if self.integrate_with_tribler:
+            # Look up the peer ids of all authors of the batch at once
+            public_keys = list(set(message.authentication.member.public_key for message in messages
+                                   if message.authentication.member != self._my_member))
+            peer_ids = dict(zip(public_keys, self._peer_db.addOrGetPeerIDS(public_keys))) if public_keys else {}
+
             torrentlist = []
+            discovered_torrents = []
             for message in messages:
                 dispersy_id = message.packet_id
                 authentication_member = message.authentication.member
                 if authentication_member == self._my_member:
                     peer_id = None
                 else:
-                    peer_id = self._peer_db.addOrGetPeerID(authentication_member.public_key)
+                    peer_id = peer_ids[authentication_member.public_key]
 
                 # sha_other_peer = (sha1(str(message.candidate.sock_addr) + self.my_member.mid))
                 torrentlist.append(
@@ -413,15 +419,17 @@ class ChannelCommunity(Community):
                      message.payload.trackers))
                 self._logger.debug("torrent received: %s on channel: %s", hexlify(message.payload.infohash), self._master_member)
 
-                self.tribler_session.notifier.notify(NTFY_TORRENT, NTFY_DISCOVERED, None,
-                                                     {"infohash": hexlify(message.payload.infohash),
-                                                      "timestamp": message.payload.timestamp,
-                                                      "name": message.payload.name,
-                                                      "files": message.payload.files,
-                                                      "trackers": message.payload.trackers,
-                                                      "dispersy_cid": self._cid.encode("hex")})
+                discovered_torrents.append({"infohash": hexlify(message.payload.infohash),
+                                            "timestamp": message.payload.timestamp,
+                                            "name": message.payload.name,
+                                            "files": message.payload.files,
+                                            "trackers": message.payload.trackers,
+                                            "dispersy_cid": self._cid.encode("hex")})
 
             self._channelcast_db.on_torrents_from_dispersy(torrentlist)
+
+            # One notification for the whole batch, with a dictionary per discovered torrent
+            self.tribler_session.notifier.notify(NTFY_TORRENT, NTFY_DISCOVERED, None, *discovered_torrents)
         else:
             for message in messages:
                 self._channelcast_db.newTorrent(message)
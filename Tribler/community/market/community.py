@@ -15,6 +15,7 @@ from Tribler.community.market.core.message_repository import MemoryMessageReposi
 from Tribler.community.market.core.order import OrderId, Order
 from Tribler.community.market.core.order_manager import OrderManager
 from Tribler.community.market.core.order_repository import DatabaseOrderRepository, MemoryOrderRepository
+from Tribler.community.market.core.relay_cache import RelayCache
 from Tribler.community.market.core.orderbook import DatabaseOrderBook
 from Tribler.community.market.core.payment import Payment
 from Tribler.community.market.core.payment_id import PaymentId
@@ -34,7 +35,7 @@ from Tribler.community.market.database import MarketDB
 from Tribler.community.market.payload import OfferPayload, TradePayload, DeclinedTradePayload,\
     StartTransactionPayload, TransactionPayload, WalletInfoPayload, MarketIntroPayload, OfferSyncPayload,\
     PaymentPayload, CancelOrderPayload
-from Tribler.community.market.reputation.pagerank_manager import PagerankReputationManager
+from Tribler.community.market.reputation.incremental_pagerank_manager import IncrementalPagerankReputationManager
 from Tribler.community.market.wallet.tc_wallet import TrustchainWallet
 from Tribler.dispersy.authentication import MemberAuthentication
 from Tribler.dispersy.bloomfilter import BloomFilter
@@ -101,7 +102,7 @@ class MarketCommunity(Community):
         super(MarketCommunity, self).__init__(*args, **kwargs)
         self.mid = None
         self.mid_register = {}
-        self.relayed_ticks = {}  # Dictionary of OrderId -> Timestamp
+        self.relayed_ticks = RelayCache()
         self.relayed_cancels = []
         self.order_manager = None
         self.order_book = None
@@ -112,6 +113,8 @@ class MarketCommunity(Community):
         self.wallets = None
         self.transaction_manager = None
         self.reputation_dict = {}
+        self.reputation_manager = IncrementalPagerankReputationManager()
+        self.reputation_block_row_id = 0  # The row id of the last TradeChain block added to the reputation manager
         self.use_local_address = False
         self.matching_enabled = True
         self.use_incremental_payments = True
@@ -535,10 +538,11 @@ class MarketCommunity(Community):
                     subject = NTFY_MARKET_ON_ASK if isinstance(tick, Ask) else NTFY_MARKET_ON_BID
                     self.tribler_session.notifier.notify(subject, NTFY_UPDATE, None, tick.to_dictionary())
 
-                # Check for new matches against the orders of this node
-                for order in self.order_manager.order_repository.find_all():
-                    if order.is_ask() and order.is_valid():
-                        self.match(order)
+                # Check for new matches against the asks of this node that are crossed by this bid
+                if isinstance(tick, Bid):
+                    for order in self.order_manager.order_repository.find_crossing_orders(tick):
+                        if order.is_valid():
+                            self.match(order)
             elif self.order_book.tick_exists(tick.order_id) and \
                     self.order_book.get_tick(tick.order_id).tick.timestamp < tick.timestamp:
                 # Update the tick with a newer one
@@ -548,8 +552,7 @@ class MarketCommunity(Community):
                                        tick, tick.order_id, tick.price, tick.quantity)
                     insert_method(tick).addCallback(timeout_method)
 
-            if tick.order_id not in self.relayed_ticks or self.relayed_ticks[tick.order_id] < tick.timestamp:
-                self.relayed_ticks[tick.order_id] = tick.timestamp
+            if self.relayed_ticks.should_relay(tick.order_id, tick.timestamp):
                 self.relay_message(message)
 
     def relay_message(self, message):
@@ -1247,5 +1250,10 @@ class MarketCommunity(Community):
         Compute the reputation of peers in the community
         """
         if self.tradechain_community:
-            rep_manager = PagerankReputationManager(self.tradechain_community.persistence.get_all_blocks())
-            self.reputation_dict = rep_manager.compute(self.my_member.public_key)
+            # Only the blocks that were added since the last computation are added to the interaction graph
+            persistence = self.tradechain_community.persistence
+            blocks, self.reputation_block_row_id = persistence.get_blocks_after(self.reputation_block_row_id)
+            while blocks:
+                self.reputation_manager.add_blocks(blocks)
+                blocks, self.reputation_block_row_id = persistence.get_blocks_after(self.reputation_block_row_id)
+            self.reputation_dict = self.reputation_manager.compute(self.my_member.public_key)
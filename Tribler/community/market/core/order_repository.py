@@ -1,5 +1,6 @@
 import logging
 from abc import ABCMeta, abstractmethod
+from bisect import bisect_left, bisect_right, insort
 
 from Tribler.community.market.core.message import TraderId
 from Tribler.community.market.core.order import OrderNumber, OrderId, Order
@@ -18,6 +19,10 @@ class OrderRepository(object):
         super(OrderRepository, self).__init__()
         self._logger = logging.getLogger(self.__class__.__name__)
 
+        # Sorted (price, order number, order id) entries per (is_ask, price wallet id, quantity wallet id)
+        self._price_index = {}
+        self._price_index_entries = {}  # Dictionary of OrderId -> (index key, entry)
+
     @abstractmethod
     def find_all(self):
         return
@@ -42,6 +47,48 @@ class OrderRepository(object):
     def next_identity(self):
         return
 
+    def find_crossing_orders(self, tick):
+        """
+        Find the orders in this repository on the other side of a tick, that have a price crossing the price of the
+        tick. These are the only orders of which the matching can be affected by this tick.
+
+        :param tick: The tick to search crossing orders for
+        :type tick: Tick
+        :return: The crossing orders, the best priced order first
+        :rtype: [Order]
+        """
+        entries = self._price_index.get((not tick.is_ask(), tick.price.wallet_id, tick.quantity.wallet_id), [])
+        price = float(tick.price)
+        if tick.is_ask():
+            # Bids with a price higher than or equal to the ask price
+            crossing_entries = reversed(entries[bisect_left(entries, (price,)):])
+        else:
+            # Asks with a price lower than or equal to the bid price
+            crossing_entries = entries[:bisect_right(entries, (price, float('inf')))]
+        return [self.find_by_id(order_id) for _, _, order_id in crossing_entries]
+
+    def _index_order(self, order):
+        """
+        Add an order to the price index, replacing the entry of an older version of this order
+        """
+        self._unindex_order(order.order_id)
+        key = (order.is_ask(), order.price.wallet_id, order.total_quantity.wallet_id)
+        entry = (float(order.price), int(order.order_id.order_number), order.order_id)
+        insort(self._price_index.setdefault(key, []), entry)
+        self._price_index_entries[order.order_id] = (key, entry)
+
+    def _unindex_order(self, order_id):
+        """
+        Remove an order from the price index
+        """
+        if order_id not in self._price_index_entries:
+            return
+        key, entry = self._price_index_entries.pop(order_id)
+        entries = self._price_index[key]
+        del entries[bisect_left(entries, entry)]
+        if not entries:
+            del self._price_index[key]
+
 
 class MemoryOrderRepository(OrderRepository):
     """A repository for orders in the order manager stored in memory"""
@@ -93,6 +140,7 @@ class MemoryOrderRepository(OrderRepository):
         self._logger.debug("Order with the id: " + str(order.order_id) + " was added to the order repository")
 
         self._orders[order.order_id] = order
+        self._index_order(order)
 
     def update(self, order):
         """
@@ -103,6 +151,7 @@ class MemoryOrderRepository(OrderRepository):
         self._logger.debug("Order with the id: " + str(order.order_id) + " was updated to the order repository")
 
         self._orders[order.order_id] = order
+        self._index_order(order)
 
     def delete_by_id(self, order_id):
         """
@@ -113,6 +162,7 @@ class MemoryOrderRepository(OrderRepository):
         self._logger.debug("Order with the id: " + str(order_id) + " was deleted from the order repository")
 
         del self._orders[order_id]
+        self._unindex_order(order_id)
 
     def next_identity(self):
         """
@@ -123,7 +173,14 @@ class MemoryOrderRepository(OrderRepository):
 
 
 class DatabaseOrderRepository(OrderRepository):
-    """A repository that stores orders in the database"""
+    """
+    A repository that stores orders in the database. All orders are cached in memory when the repository is created,
+    so lookups do not query the database. Every change is written through to the database.
+
+    The orders returned by find_by_id and find_all are the cached objects themselves. A caller that modifies such an
+    order must call update with it afterwards, otherwise the change is visible in the cache but not in the database
+    and the price index.
+    """
 
     def __init__(self, mid, persistence):
         """
@@ -142,24 +199,33 @@ class DatabaseOrderRepository(OrderRepository):
         self._mid = mid
         self.persistence = persistence
 
+        self._orders = {}
+        for order in self.persistence.get_all_orders():
+            self._cache_order(order)
+
+    def _cache_order(self, order):
+        self._orders[order.order_id] = order
+        self._index_order(order)
+
     def find_all(self):
         """
+        :return: The cached orders, call update after modifying any of them
         :rtype: [Order]
         """
-        return self.persistence.get_all_orders()
+        return self._orders.values()
 
     def find_by_id(self, order_id):
         """
         :param order_id: The order id to look for
         :type order_id: OrderId
-        :return: The order or null if it cannot be found
+        :return: The cached order or null if it cannot be found, call update after modifying it
         :rtype: Order
         """
         assert isinstance(order_id, OrderId), type(order_id)
 
         self._logger.debug("Order with the id: " + str(order_id) + " was searched for in the order repository")
 
-        return self.persistence.get_order(order_id)
+        return self._orders.get(order_id)
 
     def add(self, order):
         """
@@ -167,20 +233,24 @@ class DatabaseOrderRepository(OrderRepository):
         :type order: Order
         """
         self.persistence.add_order(order)
+        self._cache_order(order)
 
     def update(self, order):
         """
         :param order: The order to update
         :type order: Order
         """
-        self.delete_by_id(order.order_id)
-        self.add(order)
+        self.persistence.delete_order(order.order_id)
+        self.persistence.add_order(order)
+        self._cache_order(order)
 
     def delete_by_id(self, order_id):
         """
         :param order_id: The id of the order to remove
         """
         self.persistence.delete_order(order_id)
+        self._orders.pop(order_id, None)
+        self._unindex_order(order_id)
 
     def next_identity(self):
         """
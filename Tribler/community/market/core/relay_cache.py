@@ -0,0 +1,70 @@
+import time
+from collections import OrderedDict
+
+DEFAULT_RELAY_CACHE_SIZE = 10000  # The maximum number of ticks we remember having relayed
+DEFAULT_RELAY_CACHE_TTL = 3600  # The number of seconds we remember having relayed a tick
+
+
+class RelayCache(object):
+    """
+    Bounded and expiring record of the ticks that have been relayed, used to relay every tick (version) only once.
+
+    Entries are kept in the order they have been relayed in. When the cache is full, the oldest entry is dropped and
+    entries that are older than the time to live are dropped when the cache is accessed.
+    """
+
+    def __init__(self, max_size=DEFAULT_RELAY_CACHE_SIZE, ttl=DEFAULT_RELAY_CACHE_TTL):
+        """
+        :param max_size: The maximum number of entries in the cache
+        :param ttl: The number of seconds after which an entry expires
+        :type max_size: int
+        :type ttl: float
+        """
+        super(RelayCache, self).__init__()
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # Dictionary of OrderId -> (Timestamp, relay time)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, order_id):
+        self.expire()
+        return order_id in self._entries
+
+    def should_relay(self, order_id, timestamp):
+        """
+        Check whether a tick should be relayed, which is the case when we did not relay this tick or an equal or more
+        recent version of it. If so, the tick is recorded as relayed.
+
+        :param order_id: The order id of the tick
+        :param timestamp: The timestamp of the tick
+        :type order_id: OrderId
+        :type timestamp: Timestamp
+        :return: True if the tick should be relayed, False otherwise
+        :rtype: bool
+        """
+        self.expire()
+
+        entry = self._entries.get(order_id)
+        if entry and not entry[0] < timestamp:
+            return False
+
+        # Re-insert the entry so the entries stay ordered by relay time
+        self._entries.pop(order_id, None)
+        self._entries[order_id] = (timestamp, time.time())
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return True
+
+    def expire(self):
+        """
+        Drop all entries that are older than the time to live.
+        """
+        expire_time = time.time() - self.ttl
+        while self._entries:
+            order_id, (_, relay_time) = next(self._entries.iteritems())
+            if relay_time > expire_time:
+                break
+            del self._entries[order_id]
@@ -0,0 +1,163 @@
+from collections import deque
+
+from Tribler.community.market.reputation.reputation_manager import ReputationManager
+
+DEFAULT_ALPHA = 0.85  # The probability that a random walk follows an edge instead of returning to our own node
+DEFAULT_EPSILON = 1e-6  # The largest residual that is not pushed
+
+
+class IncrementalPagerankReputationManager(ReputationManager):
+    """
+    Keeps the interaction graph of PagerankReputationManager and the PageRank personalised to our own node up to date
+    while new blocks arrive, so the reputations are the same as those of PagerankReputationManager.
+
+    Like there, the graph is undirected and weighted: every block sets the weight of the edge between its public key
+    and its link public key to the amount of its first asset, and then to the amount of its second asset, replacing the
+    weight of earlier blocks between these nodes. The reputations are approximated with forward push, which maintains
+    a score and a residual for every node, such that the exact PageRank is the sum of the scores and the PageRank of
+    the residuals. Residuals are pushed until none is larger than epsilon, so the error of a reputation is at most
+    epsilon times the sum of the PageRanks of that node personalised to every node.
+
+    When a block changes the edges of a node, only the residuals of the neighbours of that node are corrected, so the
+    next computation only pushes from the nodes around the change instead of starting from scratch.
+    """
+
+    def __init__(self, blocks=None, alpha=DEFAULT_ALPHA, epsilon=DEFAULT_EPSILON):
+        # The blocks themselves are not kept, only the interaction graph that they make up
+        super(IncrementalPagerankReputationManager, self).__init__([])
+        self.alpha = alpha
+        self.epsilon = epsilon
+
+        self.out_edges = {}  # Dictionary of node -> (dictionary of neighbour -> weight), with every edge in both nodes
+        self.out_weights = {}  # Dictionary of node -> sum of the weights of its edges
+
+        self.own_public_key = None
+        self.scores = {}
+        self.residuals = {}
+        self.pending = set()  # The nodes with a residual that is larger than epsilon
+        self.reputation = {}
+
+        self.add_blocks(blocks or [])
+
+    def add_blocks(self, blocks):
+        """
+        Add the interactions of new blocks to the graph. The reputations are updated by the next call to compute.
+        """
+        for block in blocks:
+            self.add_interaction(block.public_key, block.link_public_key, block.transaction["asset1_amount"])
+            self.add_interaction(block.link_public_key, block.public_key, block.transaction["asset2_amount"])
+
+    def add_interaction(self, source, target, weight):
+        """
+        Set the weight of the edge between source and target, replacing an earlier weight.
+        """
+        self.set_edge_weight(source, target, weight)
+        if target != source:
+            self.set_edge_weight(target, source, weight)
+
+    def set_edge_weight(self, source, target, weight):
+        """
+        Set the weight of the edge from source to target.
+        """
+        edges = self.out_edges.setdefault(source, {})
+        old_total = self.out_weights.get(source, 0)
+        new_total = old_total - edges.get(target, 0) + weight
+
+        score = self.scores.get(source, 0)
+        if score:
+            # The transition probabilities of the source change, so the score that the source passed on to its
+            # neighbours is corrected in their residuals, which keeps the invariant of the forward push.
+            factor = self.alpha * score / (1 - self.alpha)
+            old_transitions = self.get_transitions(edges, old_total)
+            edges[target] = weight
+            new_transitions = self.get_transitions(edges, new_total)
+
+            residuals = self.residuals
+            for node in set(old_transitions) | set(new_transitions):
+                correction = factor * (new_transitions.get(node, 0) - old_transitions.get(node, 0))
+                if correction:
+                    residual = residuals.get(node, 0) + correction
+                    residuals[node] = residual
+                    if abs(residual) > self.epsilon:
+                        self.pending.add(node)
+        else:
+            edges[target] = weight
+
+        self.out_weights[source] = new_total
+        self.out_edges.setdefault(target, {})
+        self.out_weights.setdefault(target, 0)
+
+    def get_transitions(self, edges, total):
+        """
+        Return a dictionary of node -> the probability that a random walk continues from a node with these edges to
+        that node. A node without edge weights passes everything on to our own node.
+        """
+        if not total:
+            return {self.own_public_key: 1}
+        return {neighbour: float(weight) / total for neighbour, weight in edges.iteritems()}
+
+    def personalise(self, own_public_key):
+        """
+        Start the computation over for a different own node.
+        """
+        self.own_public_key = own_public_key
+        self.scores = {}
+        self.residuals = {own_public_key: 1.0}
+        self.pending = {own_public_key}
+
+    def push(self):
+        """
+        Push the residuals that are larger than epsilon to the scores. Returns whether any residual has been pushed.
+        """
+        if not self.pending:
+            return False
+
+        alpha = self.alpha
+        epsilon = self.epsilon
+        scores = self.scores
+        residuals = self.residuals
+        out_edges = self.out_edges
+        out_weights = self.out_weights
+        own_public_key = self.own_public_key
+
+        queue = deque(self.pending)
+        queued = self.pending
+        while queue:
+            node = queue.popleft()
+            queued.discard(node)
+            residual = residuals.pop(node, 0)
+            if abs(residual) <= epsilon:
+                if residual:
+                    residuals[node] = residual
+                continue
+            scores[node] = scores.get(node, 0) + (1 - alpha) * residual
+
+            total = out_weights.get(node)
+            if total:
+                share = alpha * residual / total
+                targets = out_edges[node].iteritems()
+            else:
+                share = alpha * residual
+                targets = ((own_public_key, 1),)
+
+            for neighbour, weight in targets:
+                neighbour_residual = residuals.get(neighbour, 0) + share * weight
+                residuals[neighbour] = neighbour_residual
+                if abs(neighbour_residual) > epsilon and neighbour not in queued:
+                    queue.append(neighbour)
+                    queued.add(neighbour)
+        return True
+
+    def compute(self, own_public_key):
+        """
+        Compute the reputation of the nodes in the graph using the PageRank algorithm, personalised to our own node.
+        """
+        if not self.out_edges:
+            return {}
+
+        if own_public_key != self.own_public_key:
+            self.personalise(own_public_key)
+        if self.push() or len(self.reputation) != len(self.out_edges):
+            scores = self.scores
+            self.reputation = {node: scores.get(node, 0) for node in self.out_edges}
+        return self.reputation
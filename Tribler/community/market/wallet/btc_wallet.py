@@ -4,12 +4,13 @@ from threading import Thread
 
 import imp
 import keyring
-from twisted.internet.defer import Deferred, succeed, fail, inlineCallbacks
-from twisted.internet.task import LoopingCall
+from twisted.internet.defer import succeed, fail
+from twisted.internet.threads import deferToThread
 
 import Tribler
 
 # Make sure we can find the electrum wallet
+from Tribler.community.market.wallet.transaction_watcher import TransactionWatcher
 from Tribler.community.market.wallet.wallet import InsufficientFunds, Wallet
 
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(Tribler.__file__)), '..', 'electrum'))
@@ -46,6 +47,7 @@ class BitcoinWallet(Wallet):
         self.storage = None
         self.wallet = None
         self.testnet = testnet
+        self.transaction_watcher = TransactionWatcher(self)
         self.load_wallet(self.wallet_dir, self.wallet_file)
 
     def load_wallet(self, wallet_dir, wallet_file):
@@ -198,22 +200,7 @@ class BitcoinWallet(Wallet):
         """
         Monitor a given transaction ID. Returns a Deferred that fires when the transaction is present.
         """
-        monitor_deferred = Deferred()
-
-        @inlineCallbacks
-        def monitor_loop():
-            transactions = yield self.get_transactions()
-            for transaction in transactions:
-                if transaction['id'] == txid:
-                    self._logger.debug("Found transaction with id %s", txid)
-                    monitor_deferred.callback(None)
-                    monitor_lc.stop()
-
-        self._logger.debug("Start polling for transaction %s", txid)
-        monitor_lc = LoopingCall(monitor_loop)
-        monitor_lc.start(1)
-
-        return monitor_deferred
+        return self.transaction_watcher.watch(txid)
 
     def get_address(self):
         if not self.created:
@@ -221,6 +208,13 @@ class BitcoinWallet(Wallet):
         return str(self.wallet.get_receiving_address())
 
     def get_transactions(self):
+        """
+        Return a Deferred that fires with the transaction history. The history is fetched from the electrum daemon
+        on the thread pool.
+        """
+        return deferToThread(self.get_transactions_blocking)
+
+    def get_transactions_blocking(self):
         options = {'nolnet': False, 'password': None, 'verbose': False, 'cmd': 'history',
                    'wallet_path': self.wallet_file, 'testnet': self.testnet, 'segwit': False, 'cwd': self.wallet_dir,
                    'portable': False}
@@ -248,10 +242,11 @@ class BitcoinWallet(Wallet):
                 'fee_amount': 0.0,
                 'currency': 'BTC',
                 'timestamp': str(transaction['timestamp']),
-                'description': ''
+                'description': '',
+                'confirmations': transaction.get('confirmations', 0)
             })
 
-        return succeed(transactions)
+        return transactions
 
     def min_unit(self):
         return 0.0001  # This is the minimum amount of BTC we can transfer in this market
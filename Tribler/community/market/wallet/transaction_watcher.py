@@ -0,0 +1,81 @@
+import logging
+
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred
+
+DEFAULT_POLL_INTERVAL = 1  # The number of seconds between two polls of the transaction history
+
+
+class TransactionWatcher(object):
+    """
+    Watches the transaction history of a wallet for a set of transaction ids.
+
+    The history is fetched once per poll for all watched transactions. The history is polled at a fixed interval
+    while any transaction is pending, also when a poll fails or does not resolve anything, since a payment should be
+    noticed as soon as possible. Polling stops when no transaction is watched anymore.
+    """
+
+    def __init__(self, wallet, interval=DEFAULT_POLL_INTERVAL):
+        """
+        :param wallet: The wallet of which the transaction history is watched. Its get_transactions method should
+        return a Deferred that fires with the history, and its pending tasks are used to schedule the polls.
+        :param interval: The number of seconds between two polls
+        """
+        super(TransactionWatcher, self).__init__()
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+        self.wallet = wallet
+        self.interval = interval
+        self.pending_transactions = {}  # Dictionary of transaction id -> [Deferred]
+        self.polling = False
+        self.num_polls = 0
+
+    def watch(self, txid):
+        """
+        Watch a transaction id.
+        :return: A Deferred that fires when the transaction is in the history, with enough confirmations.
+        """
+        watch_deferred = Deferred()
+        self.pending_transactions.setdefault(txid, []).append(watch_deferred)
+        self._logger.debug("Start watching transaction %s (%d pending)", txid, len(self.pending_transactions))
+
+        # A poll in progress schedules the next one when it is done
+        if not self.polling and not self.wallet.is_pending_task_active("transaction_watcher_poll"):
+            self.schedule_poll()
+
+        return watch_deferred
+
+    def schedule_poll(self):
+        self.wallet.register_task("transaction_watcher_poll",
+                                  reactor.callLater(self.interval, self.poll))
+
+    def poll(self):
+        """
+        Fetch the transaction history and fire the Deferreds of the watched transactions that are in the history.
+        """
+        self.wallet.cancel_pending_task("transaction_watcher_poll")
+        self.polling = True
+        self.num_polls += 1
+        return self.wallet.get_transactions().addCallbacks(self.on_transactions, self.on_transactions_error)\
+            .addBoth(self.on_poll_done)
+
+    def on_transactions(self, transactions):
+        min_confirmations = getattr(self.wallet, 'min_confirmations', 0)
+        resolved = []
+        for transaction in transactions:
+            if transaction['id'] in self.pending_transactions \
+                    and transaction.get('confirmations', 0) >= min_confirmations:
+                resolved.append(transaction['id'])
+
+        for txid in resolved:
+            self._logger.debug("Found transaction with id %s", txid)
+            for watch_deferred in self.pending_transactions.pop(txid, []):
+                watch_deferred.callback(None)
+
+    def on_transactions_error(self, failure):
+        self._logger.warning("Failed to fetch the transaction history: %s", failure.getErrorMessage())
+
+    def on_poll_done(self, _):
+        self.polling = False
+        if self.pending_transactions:
+            self.schedule_poll()
@@ -13,6 +13,19 @@ class TradeChainDB(TrustChainDB):
         """
         return self._getall(u"", ())
 
+    def get_blocks_after(self, row_id, limit=1000):
+        """
+        Return the blocks that were added after the block with the given row id, in the order in which they were added.
+        :param row_id: the row id of the last block that is already known, or 0 to start with the first block
+        :param limit: the maximum number of blocks to return
+        :return: a tuple of the blocks and the row id of the last one
+        """
+        last_row_id = self.execute(u"SELECT MAX(rowid) FROM (SELECT rowid FROM %s WHERE rowid > ? ORDER BY rowid "
+                                   u"LIMIT ?)" % self.db_name, (row_id, limit)).fetchone()[0]
+        if last_row_id is None:
+            return [], row_id
+        return self._getall(u"WHERE rowid > ? AND rowid <= ? ORDER BY rowid", (row_id, last_row_id)), last_row_id
+
     def get_upgrade_script(self, current_version):
         """
         Return the upgrade script for a specific version.
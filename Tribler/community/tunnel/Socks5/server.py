@@ -100,7 +100,8 @@ class Socks5Connection(Protocol):
         self.state = ConnectionState.BEFORE_METHOD_REQUEST
         self.buffer = ''
 
-        self.destinations = {}
+        self.destinations = {}  # Dictionary of destination -> circuit
+        self.circuit_destinations = {}  # Dictionary of circuit -> set of destinations
 
     def dataReceived(self, data):
         self.buffer = self.buffer + data
@@ -240,7 +241,7 @@ class Socks5Connection(Protocol):
             if not selected_circuit:
                 return None
 
-            self.destinations[destination] = selected_circuit
+            self.set_destination(destination, selected_circuit)
             self._logger.info("SELECT circuit {0} for {1}".format(self.destinations[destination].circuit_id,
                                                                   destination))
         return self.destinations[destination]
@@ -253,22 +254,40 @@ class Socks5Connection(Protocol):
         @param Circuit broken_circuit: the circuit that has been broken
         @return Set with destinations using this circuit
         """
-        affected_destinations = set(
-            destination for destination, tunnel_circuit in self.destinations.iteritems() if tunnel_circuit == broken_circuit)
-        counter = 0
+        affected_destinations = self.circuit_destinations.pop(broken_circuit, set())
         for destination in affected_destinations:
-            if destination in self.destinations:
-                del self.destinations[destination]
-                counter += 1
+            del self.destinations[destination]
 
-        if counter > 0:
-            self._logger.debug("Deleted %d peers from destination list", counter)
+        if affected_destinations:
+            self._logger.debug("Deleted %d peers from destination list", len(affected_destinations))
+            self.socksserver.on_circuit_released(self, broken_circuit)
 
         return affected_destinations
 
+    def set_destination(self, destination, circuit):
+        """
+        Route a destination over a circuit, keeping the reverse index from circuits to destinations up to date
+        """
+        old_circuit = self.destinations.get(destination)
+        if old_circuit is circuit:
+            return
+
+        if old_circuit is not None:
+            old_destinations = self.circuit_destinations[old_circuit]
+            old_destinations.discard(destination)
+            if not old_destinations:
+                del self.circuit_destinations[old_circuit]
+                self.socksserver.on_circuit_released(self, old_circuit)
+
+        self.destinations[destination] = circuit
+        if circuit not in self.circuit_destinations:
+            self.circuit_destinations[circuit] = set()
+            self.socksserver.on_circuit_used(self, circuit)
+        self.circuit_destinations[circuit].add(destination)
+
     def on_incoming_from_tunnel(self, community, circuit, origin, data, force=False):
-        if circuit in self.destinations.values() or force:
-            self.destinations[origin] = circuit
+        if circuit in self.circuit_destinations or force:
+            self.set_destination(origin, circuit)
 
             if self._udp_socket:
                 socks5_data = conversion.encode_udp_packet(
@@ -300,6 +319,7 @@ class Socks5Server(object):
         self.socks5_ports = socks5_ports
         self.twisted_ports = []
         self.sessions = []
+        self.circuit_sessions = {}  # Dictionary of circuit -> list of sessions with destinations on that circuit
 
     def start(self):
         for i, port in enumerate(self.socks5_ports):
@@ -314,6 +334,7 @@ class Socks5Server(object):
             for session in self.sessions:
                 deferred_list.append(maybeDeferred(session.close, 'stopping'))
             self.sessions = []
+            self.circuit_sessions = {}
 
             for twisted_port in self.twisted_ports:
                 deferred_list.append(maybeDeferred(twisted_port.stopListening))
@@ -330,12 +351,30 @@ class Socks5Server(object):
         self._logger.debug("SOCKS5 TCP connection lost")
         if socks5connection in self.sessions:
             self.sessions.remove(socks5connection)
+        for circuit in socks5connection.circuit_destinations.keys():
+            self.on_circuit_released(socks5connection, circuit)
 
         socks5connection.close()
 
+    def on_circuit_used(self, session, circuit):
+        """
+        Called by a session when it routes its first destination over a circuit
+        """
+        self.circuit_sessions.setdefault(circuit, []).append(session)
+
+    def on_circuit_released(self, session, circuit):
+        """
+        Called by a session when it no longer routes any destination over a circuit
+        """
+        sessions = self.circuit_sessions.get(circuit, [])
+        if session in sessions:
+            sessions.remove(session)
+            if not sessions:
+                del self.circuit_sessions[circuit]
+
     def circuit_dead(self, circuit):
         affected_destinations = set()
-        for session in self.sessions:
+        for session in list(self.circuit_sessions.get(circuit, [])):
             affected_destinations.update(session.circuit_dead(circuit))
 
         return affected_destinations
@@ -345,6 +384,9 @@ class Socks5Server(object):
             origin = (community.circuit_id_to_ip(circuit.circuit_id), CIRCUIT_ID_PORT)
         session_hops = circuit.goal_hops if circuit.ctype != CIRCUIT_TYPE_RENDEZVOUS else circuit.goal_hops - 1
 
+        # Unless the data is forced upon all sessions, only the sessions that route destinations over this circuit
+        # accept it, and those are found through the reverse index.
+        sessions = self.sessions if force else list(self.circuit_sessions.get(circuit, []))
         if not any([session.on_incoming_from_tunnel(community, circuit, origin, data, force)
-                    for session in self.sessions if session.hops == session_hops]):
+                    for session in sessions if session.hops == session_hops]):
             self._logger.warning("No session accepted this data from %s:%d", *origin)
@@ -0,0 +1,178 @@
+"""
+Exit selection and circuit demand for the data circuits of the tunnel community.
+
+The exit selector keeps statistics of the exit nodes of our data circuits (the round trip time of the pings, the
+download speed and the number of circuits that never became ready) and spreads new data circuits over the exits. The
+circuit demand remembers how many data circuits were needed recently, so a pool of ready circuits can be kept for new
+anonymous downloads.
+"""
+import random
+import time
+
+DEFAULT_EXIT_RTT = 1.0  # The round trip time in seconds that is assumed as long as no exit has been measured
+MEASUREMENT_WEIGHT = 0.3  # The weight of a new measurement in the moving averages of the exit statistics
+MIN_THROUGHPUT_BYTES = 1024 * 1024  # Circuits that downloaded less than this do not tell much about the throughput
+MIN_RTT = 0.001  # Round trip times are at least this many seconds, to avoid dividing by zero
+DEMAND_HALF_LIFE = 30 * 60  # The number of seconds after which half of the demand for circuits is forgotten
+
+
+def moving_average(average, value):
+    return value if average is None else (1 - MEASUREMENT_WEIGHT) * average + MEASUREMENT_WEIGHT * value
+
+
+def median(values):
+    if not values:
+        return None
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.0
+
+
+class ExitStatistics(object):
+    """
+    The measurements of our data circuits through a single exit node.
+    """
+
+    def __init__(self):
+        self.rtt = None  # The moving average of the round trip time of the pings through the exit, in seconds
+        self.throughput = None  # The moving average of the download speed of the circuits, in bytes per second
+        self.successes = 0
+        self.failures = 0
+        self.num_circuits = 0  # The number of our current circuits through the exit
+
+    @property
+    def success_rate(self):
+        # An exit that we have not used yet gets the benefit of the doubt
+        return (self.successes + 1.0) / (self.successes + self.failures + 1.0)
+
+
+class ExitSelector(object):
+    """
+    Selects the exit nodes of new data circuits.
+
+    Every exit gets a weight of success_rate * throughput / rtt, divided by one plus the number of our circuits that
+    already go through it. Exits that have not been measured yet are assumed to be as good as the median of the exits
+    that have been measured. Selecting the exit with the highest weight spreads the circuits over the exits roughly in
+    proportion to their quality, while no single exit gets all circuits.
+    """
+
+    def __init__(self):
+        self.statistics = {}  # Dictionary of public key -> ExitStatistics
+        self.circuit_exits = {}  # Dictionary of circuit id -> the public key of the exit of the circuit
+
+    def get_statistics(self, public_key):
+        statistics = self.statistics.get(public_key)
+        if statistics is None:
+            statistics = self.statistics[public_key] = ExitStatistics()
+        return statistics
+
+    def get_weights(self, public_keys):
+        """
+        Return a dictionary of public key -> the weight of the exit, for the given public keys.
+        """
+        default_rtt = median([statistics.rtt for statistics in self.statistics.itervalues()
+                              if statistics.rtt is not None]) or DEFAULT_EXIT_RTT
+        default_throughput = median([statistics.throughput for statistics in self.statistics.itervalues()
+                                     if statistics.throughput is not None]) or 1.0
+
+        weights = {}
+        for public_key in public_keys:
+            statistics = self.statistics.get(public_key) or ExitStatistics()
+            rtt = max(MIN_RTT, default_rtt if statistics.rtt is None else statistics.rtt)
+            throughput = default_throughput if statistics.throughput is None else statistics.throughput
+            weights[public_key] = statistics.success_rate * throughput / (rtt * (1 + statistics.num_circuits))
+        return weights
+
+    def select(self, exit_candidates):
+        """
+        Select the exit of a new data circuit.
+        :param exit_candidates: a dictionary of public key -> candidate of the available exit nodes
+        :return: the candidate of the selected exit, or None if there are no exits
+        """
+        if not exit_candidates:
+            return None
+
+        weights = self.get_weights(exit_candidates)
+        best_weight = max(weights.itervalues())
+        best_public_keys = [public_key for public_key, weight in weights.iteritems() if weight >= best_weight]
+        return exit_candidates[random.choice(best_public_keys)]
+
+    def add_circuit(self, circuit_id, public_key):
+        self.circuit_exits[circuit_id] = public_key
+        self.get_statistics(public_key).num_circuits += 1
+
+    def circuit_ready(self, circuit_id):
+        public_key = self.circuit_exits.get(circuit_id)
+        if public_key is not None:
+            self.get_statistics(public_key).successes += 1
+
+    def circuit_failed(self, circuit_id):
+        public_key = self.circuit_exits.get(circuit_id)
+        if public_key is not None:
+            self.get_statistics(public_key).failures += 1
+
+    def add_rtt(self, circuit_id, rtt):
+        public_key = self.circuit_exits.get(circuit_id)
+        if public_key is not None:
+            statistics = self.get_statistics(public_key)
+            statistics.rtt = moving_average(statistics.rtt, rtt)
+
+    def remove_circuit(self, circuit):
+        """
+        Forget about a circuit that has been removed, and measure the throughput of the exit if the circuit has
+        downloaded enough.
+        """
+        public_key = self.circuit_exits.pop(circuit.circuit_id, None)
+        if public_key is None:
+            return
+
+        statistics = self.get_statistics(public_key)
+        statistics.num_circuits -= 1
+        duration = time.time() - circuit.creation_time
+        if circuit.bytes_down >= MIN_THROUGHPUT_BYTES and duration > 0:
+            statistics.throughput = moving_average(statistics.throughput, circuit.bytes_down / duration)
+
+    def prune(self, exit_public_keys):
+        """
+        Drop the statistics of the exits that are no longer available and that none of our circuits go through.
+        """
+        for public_key, statistics in self.statistics.items():
+            if public_key not in exit_public_keys and not statistics.num_circuits:
+                del self.statistics[public_key]
+
+
+class CircuitDemand(object):
+    """
+    The recent peak of the number of data circuits needed, for every number of hops.
+
+    The peaks decay exponentially, so a pool of ready circuits is kept for a while after the downloads that needed
+    them are gone, and is no longer kept for a number of hops that has not been used for a long time.
+    """
+
+    def __init__(self, half_life=DEMAND_HALF_LIFE):
+        self.half_life = half_life
+        self.peaks = {}  # Dictionary of hops -> (the peak number of circuits, the time of the peak)
+
+    def get_demand(self, hops, now=None):
+        now = time.time() if now is None else now
+        peak, peak_time = self.peaks.get(hops, (0, now))
+        return peak * 0.5 ** ((now - peak_time) / float(self.half_life))
+
+    def update(self, hops, num_circuits, now=None):
+        now = time.time() if now is None else now
+        if num_circuits and num_circuits >= self.get_demand(hops, now):
+            self.peaks[hops] = (num_circuits, now)
+
+    def get_pool_sizes(self, max_pool_size, now=None):
+        """
+        Return a dictionary of hops -> the number of ready circuits to keep, which is the recent demand, but at most
+        max_pool_size.
+        """
+        pool_sizes = {}
+        for hops in self.peaks.keys():
+            pool_size = min(max_pool_size, int(round(self.get_demand(hops, now))))
+            if pool_size > 0:
+                pool_sizes[hops] = pool_size
+            else:
+                del self.peaks[hops]
+        return pool_sizes
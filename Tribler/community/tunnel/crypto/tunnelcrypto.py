@@ -1,26 +1,126 @@
+import logging
 import struct
+from collections import deque
+
+from twisted.internet import reactor
+from twisted.internet.threads import deferToThread
 
 from Tribler.dispersy.crypto import ECCrypto, LibNaCLPK
 from Tribler.community.tunnel.crypto.cryptowrapper import crypto_box_beforenm, crypto_auth, crypto_auth_verify, Cipher,\
     algorithms, modes, HKDFExpand, hashes, default_backend
 
 
+DH_POOL_SIZE = 64  # The maximum number of pre-generated Diffie-Hellman keys
+DH_POOL_LOW_WATERMARK = 16  # Below this number of keys, the pool is topped up right away
+DH_POOL_REFILL_DELAY = 0.05  # Otherwise, the pool is topped up once no keys have been taken for this many seconds
+
+
 class CryptoException(Exception):
     pass
 
 
+class DHKeyPool(object):
+    """
+    A bounded pool of pre-generated curve25519 keys for the Diffie-Hellman handshakes of the circuits.
+
+    Generating a key is the most expensive part of creating or extending a circuit, so the keys are generated on a
+    worker thread. The pool is topped up when no keys have been taken for a while, so the worker thread does not
+    compete with the reactor thread during a burst of circuit creations, or right away when it runs low. When the pool
+    is empty, a key is generated synchronously, which is counted as a miss.
+    """
+
+    def __init__(self, crypto, size=DH_POOL_SIZE, low_watermark=DH_POOL_LOW_WATERMARK):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.crypto = crypto
+        self.size = size
+        self.low_watermark = low_watermark
+        self.keys = deque()
+        self.running = False
+        self.refilling = False
+        self.refill_call = None
+        self.num_hits = 0
+        self.num_misses = 0
+        self.num_generated = 0
+
+    def start(self):
+        self.running = True
+        self.refill()
+
+    def stop(self):
+        self.running = False
+        self.keys.clear()
+        if self.refill_call and self.refill_call.active():
+            self.refill_call.cancel()
+
+    def get_key(self):
+        """
+        Take a key from the pool, or generate one when the pool is empty.
+        """
+        if self.keys:
+            self.num_hits += 1
+            key = self.keys.popleft()
+        else:
+            self.num_misses += 1
+            key = self.crypto.generate_key(u"curve25519")
+
+        if len(self.keys) < self.low_watermark:
+            self.refill()
+        elif self.refill_call and self.refill_call.active():
+            self.refill_call.reset(DH_POOL_REFILL_DELAY)
+        elif self.running and not self.refilling:
+            self.refill_call = reactor.callLater(DH_POOL_REFILL_DELAY, self.refill)
+        return key
+
+    def _fill(self):
+        # This runs on a worker thread. Appending to and popping from a deque are thread-safe, so the reactor thread
+        # can take the keys while the pool is being filled.
+        num_generated = 0
+        while self.running and len(self.keys) < self.size:
+            self.keys.append(self.crypto.generate_key(u"curve25519"))
+            num_generated += 1
+        return num_generated
+
+    def refill(self):
+        if not self.running or self.refilling or len(self.keys) >= self.size:
+            return
+
+        self.refilling = True
+        deferToThread(self._fill).addCallbacks(self.on_filled, self.on_error)
+
+    def on_filled(self, num_generated):
+        self.refilling = False
+        self.num_generated += num_generated
+        if not self.running:
+            self.keys.clear()
+
+    def on_error(self, failure):
+        self.refilling = False
+        self._logger.error("Failed to generate Diffie-Hellman keys: %s", failure.getErrorMessage())
+
+    def get_statistics(self):
+        return {'dh_pool_keys': len(self.keys),
+                'dh_pool_hits': self.num_hits,
+                'dh_pool_misses': self.num_misses,
+                'dh_pool_generated': self.num_generated}
+
+
 class TunnelCrypto(ECCrypto):
 
+    def __init__(self):
+        super(TunnelCrypto, self).__init__()
+        self.key_pool = DHKeyPool(self)
+
     def initialize(self, community):
         self.community = community
         self.key = self.community.my_member._ec
         assert isinstance(self.key, LibNaCLPK), type(self.key)
+        self.key_pool.start()
 
     def is_key_compatible(self, key):
         return isinstance(key, LibNaCLPK)
 
     def generate_diffie_secret(self):
-        tmp_key = self.generate_key(u"curve25519")
+        tmp_key = self.key_pool.get_key()
         X = tmp_key.key.pk
 
         return tmp_key, X
@@ -29,7 +129,7 @@ class TunnelCrypto(ECCrypto):
         if key == None:
             key = self.key
 
-        tmp_key = self.generate_key(u"curve25519")
+        tmp_key = self.key_pool.get_key()
         y = tmp_key.key.sk
         Y = tmp_key.key.pk
         shared_secret = crypto_box_beforenm(dh_received, y) + crypto_box_beforenm(dh_received, key.key.sk)
@@ -11,6 +11,8 @@ import struct
 import time
 from collections import defaultdict
 
+from twisted.internet.task import LoopingCall
+
 from Tribler.Core.DecentralizedTracking.pymdht.core.identifier import Id
 from Tribler.Core.Utilities.encoding import encode, decode
 from Tribler.Core.simpledefs import DLSTATUS_SEEDING, DLSTATUS_STOPPED, \
@@ -25,6 +27,7 @@ from Tribler.community.tunnel.payload import (EstablishIntroPayload, IntroEstabl
                                               CreatedE2EPayload, LinkE2EPayload, LinkedE2EPayload,
                                               DHTRequestPayload, DHTResponsePayload)
 from Tribler.community.tunnel.routing import RelayRoute, RendezvousPoint, Hop
+from Tribler.community.tunnel.timer_wheel import TimerWheel
 from Tribler.community.tunnel.tunnel_community import TunnelCommunity
 from Tribler.dispersy.authentication import NoAuthentication
 from Tribler.dispersy.candidate import Candidate
@@ -36,6 +39,9 @@ from Tribler.dispersy.requestcache import RandomNumberCache
 from Tribler.dispersy.resolution import PublicResolution
 from Tribler.dispersy.util import call_on_reactor_thread
 
+INTRO_POINT_TIMEOUT = 30  # Introducing circuits that are not an introduction point after this many seconds are rebuilt
+DHT_LOOKUP_RETRY_INTERVAL = 5  # The number of seconds after which a DHT lookup without an available circuit is retried
+
 
 class IPRequestCache(RandomNumberCache):
 
@@ -139,9 +145,13 @@ class HiddenTunnelCommunity(TunnelCommunity):
 
         self.session_keys = {}
         self.download_states = {}
+        self.hidden_downloads = {}  # Dictionary of lookup info hash -> download, of the anonymous downloads
+        self.lookup_info_hashes = {}  # Dictionary of info hash -> lookup info hash, of the anonymous downloads
 
         self.my_intro_points = defaultdict(list)
         self.my_download_points = {}
+        self.infohash_intro_points = defaultdict(set)  # Reverse index of my_intro_points
+        self.infohash_download_points = defaultdict(set)  # Reverse index of my_download_points
 
         self.intro_point_for = {}
         self.rendezvous_point_for = {}
@@ -149,6 +159,9 @@ class HiddenTunnelCommunity(TunnelCommunity):
         self.infohash_ip_circuits = defaultdict(list)
         self.infohash_pex = defaultdict(set)
 
+        # The timers that rebuild introducing circuits and repeat the DHT lookups of the anonymous downloads
+        self.timer_wheel = TimerWheel()
+
         self.dht_blacklist = defaultdict(list)
         self.last_dht_lookup = {}
 
@@ -156,6 +169,11 @@ class HiddenTunnelCommunity(TunnelCommunity):
 
         self.hops = {}
 
+    def initialize(self, tribler_session=None, settings=None):
+        super(HiddenTunnelCommunity, self).initialize(tribler_session=tribler_session, settings=settings)
+        self.register_task("timer_wheel", LoopingCall(self.timer_wheel.tick)).start(self.timer_wheel.tick_interval,
+                                                                                    now=False)
+
     def initiate_meta_messages(self):
         return super(HiddenTunnelCommunity, self).initiate_meta_messages() + \
             [Message(self, u"dht-request", NoAuthentication(), PublicResolution(), DirectDistribution(),
@@ -196,19 +214,37 @@ class HiddenTunnelCommunity(TunnelCommunity):
                      self.on_rendezvous_established)]
 
     def remove_circuit(self, circuit_id, additional_info='', destroy=False):
+        circuit = self.circuits.get(circuit_id)
         super(HiddenTunnelCommunity, self).remove_circuit(circuit_id, additional_info, destroy)
 
         if circuit_id in self.my_intro_points:
             if self.notifier:
                 self.notifier.notify(NTFY_TUNNEL, NTFY_IP_REMOVED, circuit_id)
             self.tunnel_logger.info("removed introduction point %d" % circuit_id)
-            self.my_intro_points.pop(circuit_id)
+            for info_hash in self.my_intro_points.pop(circuit_id):
+                self._remove_from_index(self.infohash_intro_points, info_hash, circuit_id)
 
         if circuit_id in self.my_download_points:
             if self.notifier:
                 self.notifier.notify(NTFY_TUNNEL, NTFY_RP_REMOVED, circuit_id)
             self.tunnel_logger.info("removed rendezvous point %d" % circuit_id)
-            self.my_download_points.pop(circuit_id)
+            info_hash = self.my_download_points.pop(circuit_id)[0]
+            self._remove_from_index(self.infohash_download_points, info_hash, circuit_id)
+
+        # An introducing circuit of a download that we are still seeding is rebuilt once it has had its chance
+        if circuit and circuit.ctype == CIRCUIT_TYPE_IP:
+            for ip_circuit_id, time_created in self.infohash_ip_circuits.get(circuit.info_hash, []):
+                if ip_circuit_id == circuit_id:
+                    self.schedule_intro_check(circuit.info_hash, circuit_id, time_created,
+                                              time_created + INTRO_POINT_TIMEOUT - time.time())
+
+    @staticmethod
+    def _remove_from_index(index, info_hash, circuit_id):
+        circuit_ids = index.get(info_hash)
+        if circuit_ids is not None:
+            circuit_ids.discard(circuit_id)
+            if not circuit_ids:
+                del index[info_hash]
 
     def ip_to_circuit_id(self, ip_str):
         return struct.unpack("!I", socket.inet_aton(ip_str))[0]
@@ -218,67 +254,100 @@ class HiddenTunnelCommunity(TunnelCommunity):
 
     @call_on_reactor_thread
     def monitor_downloads(self, dslist):
-        # Monitor downloads with anonymous flag set, and build rendezvous/introduction points when needed.
+        """
+        Monitor the downloads with the anonymous flag set, and update the hidden services of the downloads of which the
+        status has changed. The introduction points and DHT lookups of downloads that did not change are maintained by
+        the timer wheel, so nothing is done for them here.
+        """
         new_states = {}
-        hops = {}
-
+        hidden_downloads = {}
         for ds in dslist:
             download = ds.get_download()
-            if download.get_hops() > 0:
+            hops = download.get_hops()
+            if hops > 0:
                 # Convert the real infohash to the infohash used for looking up introduction points
                 real_info_hash = download.get_def().get_infohash()
-                info_hash = self.get_lookup_info_hash(real_info_hash)
-                hops[info_hash] = download.get_hops()
+                info_hash = self.lookup_info_hashes.get(real_info_hash)
+                if info_hash is None:
+                    info_hash = self.lookup_info_hashes[real_info_hash] = self.get_lookup_info_hash(real_info_hash)
+                self.hops[info_hash] = hops
+                hidden_downloads[info_hash] = download
                 new_states[info_hash] = ds.get_status()
 
-        self.hops = hops
-
-        for info_hash in set(new_states.keys() + self.download_states.keys()):
-            new_state = new_states.get(info_hash, None)
-            old_state = self.download_states.get(info_hash, None)
-            state_changed = new_state != old_state
-
-            # Stop creating introduction points if the download doesn't exist anymore
-            if info_hash in self.infohash_ip_circuits and new_state is None:
-                del self.infohash_ip_circuits[info_hash]
-
-            # If the introducing circuit does not exist anymore or timed out: Build a new circuit
-            if info_hash in self.infohash_ip_circuits:
-                for (circuit_id, time_created) in self.infohash_ip_circuits[info_hash]:
-                    if circuit_id not in self.my_intro_points and time_created < time.time() - 30:
-                        self.infohash_ip_circuits[info_hash].remove((circuit_id, time_created))
-                        if self.notifier:
-                            self.notifier.notify(NTFY_TUNNEL, NTFY_IP_RECREATE, circuit_id, info_hash.encode('hex')[:6])
-                        self.tunnel_logger.info('Recreate the introducing circuit for %s' % info_hash.encode('hex'))
-                        self.create_introduction_point(info_hash)
-
-            time_elapsed = (time.time() - self.last_dht_lookup.get(info_hash, 0))
-            force_dht_lookup = time_elapsed >= self.settings.dht_lookup_interval
-            if (state_changed or force_dht_lookup) and \
-               (new_state == DLSTATUS_SEEDING or new_state == DLSTATUS_DOWNLOADING):
-                self.tunnel_logger.info('Do dht lookup to find hidden services peers for %s' % info_hash.encode('hex'))
-                self.do_dht_lookup(info_hash)
-
-            if state_changed and new_state == DLSTATUS_SEEDING:
-                self.create_introduction_point(info_hash)
-
-            elif state_changed and new_state in [DLSTATUS_STOPPED, None]:
-                if info_hash in self.infohash_pex:
-                    self.infohash_pex.pop(info_hash)
-
-                for cid, info_hash_hops in self.my_download_points.items():
-                    if info_hash_hops[0] == info_hash:
-                        self.remove_circuit(cid, 'download stopped', destroy=True)
-
-                for cid, info_hash_list in self.my_intro_points.items():
-                    for i in xrange(len(info_hash_list) - 1, -1, -1):
-                        if info_hash_list[i] == info_hash:
-                            info_hash_list.pop(i)
-
-                    if len(info_hash_list) == 0:
-                        self.remove_circuit(cid, 'all downloads stopped', destroy=True)
-
+        old_states = self.download_states
         self.download_states = new_states
+        self.hidden_downloads = hidden_downloads
+
+        for info_hash, new_state in new_states.iteritems():
+            old_state = old_states.get(info_hash)
+            if new_state != old_state:
+                self.on_download_state_changed(info_hash, old_state, new_state)
+
+        removed_info_hashes = [info_hash for info_hash in old_states if info_hash not in new_states]
+        for info_hash in removed_info_hashes:
+            self.on_download_state_changed(info_hash, old_states[info_hash], None)
+            self.hops.pop(info_hash, None)
+        if removed_info_hashes:
+            self.lookup_info_hashes = {real_info_hash: info_hash for real_info_hash, info_hash
+                                       in self.lookup_info_hashes.iteritems() if info_hash in new_states}
+
+    def on_download_state_changed(self, info_hash, old_state, new_state):
+        """
+        Start or stop the hidden services of an anonymous download after its status changed from old_state to
+        new_state. A new_state of None means that the download has been removed.
+        """
+        if new_state in (DLSTATUS_SEEDING, DLSTATUS_DOWNLOADING):
+            self.tunnel_logger.info('Do dht lookup to find hidden services peers for %s' % info_hash.encode('hex'))
+            self.periodic_dht_lookup(info_hash)
+
+        if new_state == DLSTATUS_SEEDING:
+            self.create_introduction_point(info_hash)
+
+        elif new_state in (DLSTATUS_STOPPED, None):
+            self.timer_wheel.cancel(("dht", info_hash))
+            self.infohash_pex.pop(info_hash, None)
+
+            # Stop creating introduction points for the download
+            for circuit_id, time_created in self.infohash_ip_circuits.pop(info_hash, []):
+                self.timer_wheel.cancel(("intro", info_hash, circuit_id, time_created))
+
+            for circuit_id in list(self.infohash_download_points.get(info_hash, [])):
+                self.remove_circuit(circuit_id, 'download stopped', destroy=True)
+
+            for circuit_id in list(self.infohash_intro_points.pop(info_hash, [])):
+                info_hash_list = self.my_intro_points[circuit_id]
+                info_hash_list[:] = [intro_info_hash for intro_info_hash in info_hash_list
+                                     if intro_info_hash != info_hash]
+                if not info_hash_list:
+                    self.remove_circuit(circuit_id, 'all downloads stopped', destroy=True)
+
+    def periodic_dht_lookup(self, info_hash):
+        """
+        Look up the hidden services peers of a download that is seeding or downloading, and schedule the next lookup.
+        """
+        if self.download_states.get(info_hash) not in (DLSTATUS_SEEDING, DLSTATUS_DOWNLOADING):
+            return
+
+        delay = self.settings.dht_lookup_interval if self.do_dht_lookup(info_hash) else DHT_LOOKUP_RETRY_INTERVAL
+        self.timer_wheel.schedule(("dht", info_hash), delay, lambda: self.periodic_dht_lookup(info_hash))
+
+    def schedule_intro_check(self, info_hash, circuit_id, time_created, delay):
+        self.timer_wheel.schedule(("intro", info_hash, circuit_id, time_created), delay,
+                                  lambda: self.check_introducing_circuit(info_hash, circuit_id, time_created))
+
+    def check_introducing_circuit(self, info_hash, circuit_id, time_created):
+        """
+        Rebuild an introducing circuit that did not become an introduction point in time, or that has been removed.
+        """
+        ip_circuits = self.infohash_ip_circuits.get(info_hash)
+        if circuit_id in self.my_intro_points or not ip_circuits or (circuit_id, time_created) not in ip_circuits:
+            return
+
+        ip_circuits.remove((circuit_id, time_created))
+        if self.notifier:
+            self.notifier.notify(NTFY_TUNNEL, NTFY_IP_RECREATE, circuit_id, info_hash.encode('hex')[:6])
+        self.tunnel_logger.info('Recreate the introducing circuit for %s' % info_hash.encode('hex'))
+        self.create_introduction_point(info_hash)
 
     def do_dht_lookup(self, info_hash):
         # Select a circuit from the pool of exit circuits
@@ -295,6 +364,7 @@ class HiddenTunnelCommunity(TunnelCommunity):
         self.send_cell([Candidate(circuit.first_hop, False)],
                        u"dht-request",
                        (circuit.circuit_id, cache.number, info_hash))
+        return True
 
     def on_dht_request(self, messages):
         for message in messages:
@@ -551,6 +621,7 @@ class HiddenTunnelCommunity(TunnelCommunity):
 
     def create_link_e2e(self, circuit, cookie, session_keys, info_hash, sock_addr):
         self.my_download_points[circuit.circuit_id] = (info_hash, circuit.goal_hops, sock_addr)
+        self.infohash_download_points[info_hash].add(circuit.circuit_id)
         circuit.hs_session_keys = session_keys
 
         cache = self.request_cache.add(LinkRequestCache(self, circuit, info_hash))
@@ -616,6 +687,11 @@ class HiddenTunnelCommunity(TunnelCommunity):
                 self.tunnel_logger.error('On linked e2e: could not find download!')
 
     def find_download(self, lookup_info_hash):
+        download = self.hidden_downloads.get(lookup_info_hash)
+        if download:
+            return download
+
+        # The download may have been started after the last time the downloads were monitored
         for download in self.tribler_session.get_downloads():
             if lookup_info_hash == self.get_lookup_info_hash(download.get_def().get_infohash()):
                 return download
@@ -636,6 +712,7 @@ class HiddenTunnelCommunity(TunnelCommunity):
             # We got a circuit, now let's create an introduction point
             circuit_id = circuit.circuit_id
             self.my_intro_points[circuit_id].append((info_hash))
+            self.infohash_intro_points[info_hash].add(circuit_id)
 
             cache = self.request_cache.add(IPRequestCache(self, circuit))
             self.send_cell([Candidate(circuit.first_hop, False)],
@@ -651,7 +728,9 @@ class HiddenTunnelCommunity(TunnelCommunity):
                                              CIRCUIT_TYPE_IP,
                                              callback,
                                              info_hash=info_hash)
-            self.infohash_ip_circuits[info_hash].append((circuit_id, time.time()))
+            time_created = time.time()
+            self.infohash_ip_circuits[info_hash].append((circuit_id, time_created))
+            self.schedule_intro_check(info_hash, circuit_id, time_created, INTRO_POINT_TIMEOUT)
 
     def check_establish_intro(self, messages):
         for message in messages:
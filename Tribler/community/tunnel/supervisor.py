@@ -0,0 +1,227 @@
+"""
+Supervisor for running a tunnel exit node as multiple worker processes.
+
+A single tunnel helper is bound to one core. The supervisor starts a number of worker processes, each with its own
+state directory (and therefore its own keys) and its own ports, restarts the workers that die and rolls up the
+statistics that the workers report over a pipe.
+"""
+import json
+import logging
+import os
+import signal
+import time
+from collections import deque
+
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, DeferredList, succeed
+from twisted.internet.protocol import ProcessProtocol
+from twisted.internet.task import LoopingCall
+
+from Tribler.dispersy.taskmanager import TaskManager
+
+STATUS_FD = 3  # The file descriptor of the worker processes over which they report their status
+STATUS_INTERVAL = 5  # The number of seconds between two status reports of a worker
+RESTART_DELAY = 1  # The number of seconds before a dead worker is restarted
+MAX_RESTART_DELAY = 60  # The maximum number of seconds before a dead worker is restarted
+MIN_UPTIME = 30  # Workers that die within this number of seconds after being started are restarted with a back-off
+STOP_TIMEOUT = 30  # The number of seconds we wait for a worker to stop before it is killed
+REAP_INTERVAL = 1  # The number of seconds between two checks for ended workers
+
+
+class WorkerStatusReporter(object):
+    """
+    Periodically writes the status of a worker as a line of JSON to the status file descriptor of the worker.
+    """
+
+    def __init__(self, get_status, fd=STATUS_FD, interval=STATUS_INTERVAL):
+        """
+        :param get_status: function that returns the status of this worker as a dictionary
+        :param fd: the file descriptor to write the status to
+        :param interval: the number of seconds between two status reports
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.get_status = get_status
+        self.fd = fd
+        self.interval = interval
+        self.report_lc = LoopingCall(self.report)
+
+    def start(self):
+        self.report_lc.start(self.interval, now=True)
+
+    def stop(self):
+        if self.report_lc.running:
+            self.report_lc.stop()
+
+    def report(self):
+        try:
+            os.write(self.fd, json.dumps(self.get_status()) + "\n")
+        except OSError as error:
+            # The supervisor is gone, there is nobody to report to anymore
+            self._logger.error("Could not report the worker status: %s", error)
+            self.stop()
+
+
+class TunnelWorkerProtocol(ProcessProtocol):
+    """
+    Process protocol of a single worker, which keeps the last status reported by the worker.
+    """
+
+    def __init__(self, supervisor, index):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.supervisor = supervisor
+        self.index = index
+        self.buffer = ''
+        self.status = {}
+        self.start_time = time.time()
+        self.ended_deferred = Deferred()
+
+    @property
+    def pid(self):
+        return self.transport.pid if self.transport else None
+
+    def childDataReceived(self, child_fd, data):
+        if child_fd != STATUS_FD:
+            return
+
+        self.buffer += data
+        lines = self.buffer.split("\n")
+        self.buffer = lines.pop()
+        for line in lines:
+            try:
+                self.status = json.loads(line)
+            except ValueError:
+                self._logger.warning("Worker %d reported an invalid status: %r", self.index, line)
+
+    def processEnded(self, reason):
+        self._logger.info("Worker %d ended: %s", self.index, reason.getErrorMessage())
+        self.supervisor.on_worker_ended(self)
+        self.ended_deferred.callback(None)
+
+
+class TunnelSupervisor(TaskManager):
+    """
+    Starts and restarts a number of tunnel worker processes and rolls up their statistics.
+    """
+
+    def __init__(self, num_workers, get_worker_args, restart_delay=RESTART_DELAY,
+                 max_restart_delay=MAX_RESTART_DELAY, min_uptime=MIN_UPTIME):
+        """
+        :param num_workers: the number of worker processes
+        :param get_worker_args: function that returns the command line (a list, starting with the executable) of the
+        worker with the given index. The worker should report its status with a WorkerStatusReporter.
+        :param restart_delay: the number of seconds before a dead worker is restarted
+        :param max_restart_delay: the maximum number of seconds before a dead worker is restarted
+        :param min_uptime: workers that die within this number of seconds are restarted with a back-off
+        """
+        super(TunnelSupervisor, self).__init__()
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+        self.num_workers = num_workers
+        self.get_worker_args = get_worker_args
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.min_uptime = min_uptime
+        self.workers = [None] * num_workers
+        self.restarts = [0] * num_workers
+        self.restart_delays = [restart_delay] * num_workers
+        self.history_stats = deque(maxlen=180)
+        self.running = False
+
+    def start(self):
+        self.running = True
+        for index in xrange(self.num_workers):
+            self.start_worker(index)
+        self.register_task("build history", LoopingCall(self.build_history)).start(60, now=False)
+        self.register_task("reap workers", LoopingCall(self.reap_workers)).start(REAP_INTERVAL, now=False)
+
+    def reap_workers(self):
+        # The reactor only reaps ended processes by itself when it runs with signal handlers
+        from twisted.internet.process import reapAllProcesses
+        reapAllProcesses()
+
+    def start_worker(self, index):
+        args = self.get_worker_args(index)
+        self._logger.info("Starting worker %d: %s", index, " ".join(args))
+        worker = TunnelWorkerProtocol(self, index)
+        self.spawn_worker(worker, args)
+        self.workers[index] = worker
+        return worker
+
+    def spawn_worker(self, worker, args):
+        # The output of the workers is passed through, the status is reported over a separate pipe
+        reactor.spawnProcess(worker, args[0], args, env=os.environ, childFDs={0: 'w', 1: 1, 2: 2, STATUS_FD: 'r'})
+
+    def on_worker_ended(self, worker):
+        if self.workers[worker.index] is not worker:
+            return
+        self.workers[worker.index] = None
+
+        if not self.running:
+            self.cancel_pending_task("kill worker %d" % worker.index)
+            return
+
+        # Back off when a worker keeps dying right after being started
+        delay = self.restart_delays[worker.index]
+        if time.time() - worker.start_time < self.min_uptime:
+            self.restart_delays[worker.index] = min(delay * 2, self.max_restart_delay)
+        else:
+            self.restart_delays[worker.index] = delay = self.restart_delay
+
+        self._logger.warning("Worker %d died, restarting it in %d seconds", worker.index, delay)
+        self.restarts[worker.index] += 1
+        self.register_task("restart worker %d" % worker.index,
+                           reactor.callLater(delay, self.start_worker, worker.index))
+
+    def stop(self):
+        """
+        Stop all workers, and kill the ones that do not stop within STOP_TIMEOUT seconds.
+        :return: a Deferred that fires when all workers have ended
+        """
+        self.running = False
+        self.cancel_all_pending_tasks()
+
+        ended_deferreds = []
+        for worker in self.workers:
+            if worker and worker.pid:
+                worker.transport.signalProcess(signal.SIGTERM)
+                self.register_task("kill worker %d" % worker.index,
+                                   reactor.callLater(STOP_TIMEOUT, self.kill_worker, worker))
+                ended_deferreds.append(worker.ended_deferred)
+
+        if not ended_deferreds:
+            return succeed(None)
+
+        self.register_task("reap workers", LoopingCall(self.reap_workers)).start(REAP_INTERVAL, now=False)
+        return DeferredList(ended_deferreds).addCallback(lambda _: self.cancel_pending_task("reap workers"))
+
+    def kill_worker(self, worker):
+        if worker.pid:
+            self._logger.warning("Worker %d did not stop in time, killing it", worker.index)
+            worker.transport.signalProcess(signal.SIGKILL)
+
+    def get_worker_stats(self):
+        """
+        Return the last reported status of every worker, together with its pid and number of restarts.
+        """
+        worker_stats = []
+        for index, worker in enumerate(self.workers):
+            worker_stats.append({'index': index,
+                                 'pid': worker.pid if worker else None,
+                                 'restarts': self.restarts[index],
+                                 'status': worker.status if worker else {}})
+        return worker_stats
+
+    def get_stats(self):
+        """
+        Return the sum of the numeric statistics reported by the workers.
+        """
+        total_stats = {'workers': sum(1 for worker in self.workers if worker and worker.pid)}
+        for worker in self.workers:
+            if worker:
+                for key, value in worker.status.iteritems():
+                    if isinstance(value, (int, long, float)) and key != 'workers':
+                        total_stats[key] = total_stats.get(key, 0) + value
+        return total_stats
+
+    def build_history(self):
+        self.history_stats.append(self.get_stats())
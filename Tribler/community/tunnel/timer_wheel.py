@@ -0,0 +1,60 @@
+"""
+A timer wheel for scheduling many coarse timers, such as the periodic maintenance of the hidden services.
+"""
+import logging
+
+
+class TimerWheel(object):
+    """
+    Schedules callbacks by key with a resolution of one tick.
+
+    The timers are kept in a fixed number of slots, indexed by the tick in which they are due modulo the number of
+    slots. Scheduling and cancelling a timer take constant time, and a tick only looks at the timers in one slot, so
+    keeping a timer for each of many downloads costs next to nothing while the timers are not due. The owner is
+    responsible for calling tick every tick_interval seconds.
+    """
+
+    def __init__(self, tick_interval=1.0, num_slots=64):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.tick_interval = tick_interval
+        self.num_slots = num_slots
+        self.current_tick = 0
+        self.slots = [{} for _ in xrange(num_slots)]  # Every slot is a dictionary of key -> (due tick, callback)
+        self.timers = {}  # Dictionary of key -> the slot of the timer
+
+    def __len__(self):
+        return len(self.timers)
+
+    def __contains__(self, key):
+        return key in self.timers
+
+    def schedule(self, key, delay, callback):
+        """
+        Call callback after delay seconds, rounded up to whole ticks but at least one tick. A timer that was scheduled
+        before with the same key is replaced.
+        """
+        self.cancel(key)
+        due_tick = self.current_tick + max(1, int(-(-delay // self.tick_interval)))
+        slot = due_tick % self.num_slots
+        self.slots[slot][key] = (due_tick, callback)
+        self.timers[key] = slot
+
+    def cancel(self, key):
+        slot = self.timers.pop(key, None)
+        if slot is not None:
+            del self.slots[slot][key]
+
+    def tick(self):
+        self.current_tick += 1
+        slot = self.slots[self.current_tick % self.num_slots]
+        due_keys = [key for key, (due_tick, _) in slot.iteritems() if due_tick <= self.current_tick]
+        for key in due_keys:
+            # An earlier callback may have cancelled or rescheduled this timer
+            if key not in slot or slot[key][0] > self.current_tick:
+                continue
+            _, callback = slot.pop(key)
+            del self.timers[key]
+            try:
+                callback()
+            except Exception:
+                self._logger.exception("Timer %r failed", key)
@@ -7,6 +7,7 @@ import logging
 import random
 import socket
 import time
+from bisect import bisect_left
 from collections import defaultdict
 from itertools import chain
 
@@ -23,6 +24,7 @@ from Tribler.community.tunnel import (CIRCUIT_ID_PORT, CIRCUIT_STATE_EXTENDING,
                                       CIRCUIT_TYPE_RENDEZVOUS, CIRCUIT_TYPE_RP, EXIT_NODE, EXIT_NODE_SALT, ORIGINATOR,
                                       ORIGINATOR_SALT, PING_INTERVAL)
 from Tribler.community.tunnel.Socks5.server import Socks5Server
+from Tribler.community.tunnel.circuit_pool import CircuitDemand, ExitSelector
 from Tribler.community.tunnel.conversion import TunnelConversion
 from Tribler.community.tunnel.crypto.tunnelcrypto import CryptoException, TunnelCrypto
 from Tribler.community.tunnel.payload import (CellPayload, CreatePayload, CreatedPayload, DestroyPayload, ExtendPayload,
@@ -92,6 +94,7 @@ class PingRequestCache(RandomNumberCache):
         self.tunnel_logger = logging.getLogger('TunnelLogger')
         self.circuit = circuit
         self.community = community
+        self.send_time = time.time()
 
     @property
     def timeout_delay(self):
@@ -101,6 +104,7 @@ class PingRequestCache(RandomNumberCache):
         if self.circuit.last_incoming < time.time() - self.timeout_delay:
             self.tunnel_logger.info("PingRequestCache: no response on ping, circuit %d timed out",
                                     self.circuit.circuit_id)
+            self.community.exit_selector.circuit_failed(self.circuit.circuit_id)
             self.community.remove_circuit(self.circuit.circuit_id, 'ping timeout')
 
 
@@ -221,6 +225,8 @@ class TunnelSettings(object):
 
         self.min_circuits = 4
         self.max_circuits = 8
+        # Maximum number of ready data circuits per number of hops that are kept for new downloads
+        self.circuit_pool_size = 4
         self.max_relays_or_exits = 100
 
         # Maximum number of seconds that a circuit should exist
@@ -243,13 +249,43 @@ class TunnelSettings(object):
 
 
 class RoundRobin(object):
+    """
+    Selects the active data circuits in turn.
+
+    The circuit ids are indexed by their number of hops when a data circuit becomes ready, and dropped when it is
+    removed, so selecting a circuit for a SOCKS5 destination does not scan and sort all circuits.
+    """
 
     def __init__(self, community):
         self.community = community
         self.index = -1
+        self.circuit_ids = defaultdict(list)  # Dictionary of hops -> sorted list of circuit ids
+
+    def add_circuit(self, circuit):
+        circuit_ids = self.circuit_ids[len(circuit.hops)]
+        position = bisect_left(circuit_ids, circuit.circuit_id)
+        if position == len(circuit_ids) or circuit_ids[position] != circuit.circuit_id:
+            circuit_ids.insert(position, circuit.circuit_id)
+
+    def remove_circuit(self, circuit_id):
+        # There are only a few different numbers of hops, so we look for the circuit id in each of them
+        for circuit_ids in self.circuit_ids.itervalues():
+            position = bisect_left(circuit_ids, circuit_id)
+            if position < len(circuit_ids) and circuit_ids[position] == circuit_id:
+                del circuit_ids[position]
+
+    def get_circuit_ids(self, hops):
+        if hops is not None:
+            return self.circuit_ids.get(hops, [])
+        return sorted(chain.from_iterable(self.circuit_ids.itervalues()))
+
+    def get_active_circuit(self, circuit_id):
+        circuit = self.community.circuits.get(circuit_id, None)
+        if circuit and circuit.state == CIRCUIT_STATE_READY and circuit.ctype == CIRCUIT_TYPE_DATA:
+            return circuit
 
     def has_options(self, hops):
-        return len(self.community.active_data_circuits(hops)) > 0
+        return len(self.get_circuit_ids(hops)) > 0
 
     def select(self, destination, hops):
         if destination and destination[1] == CIRCUIT_ID_PORT:
@@ -260,14 +296,18 @@ class RoundRobin(object):
                circuit.ctype == CIRCUIT_TYPE_RENDEZVOUS:
                 return circuit
 
-        circuit_ids = sorted(self.community.active_data_circuits(hops).keys())
+        circuit_ids = self.get_circuit_ids(hops)
+        while circuit_ids:
+            self.index = (self.index + 1) % len(circuit_ids)
+            circuit = self.get_active_circuit(circuit_ids[self.index])
+            if circuit:
+                return circuit
 
-        if not circuit_ids:
-            return None
+            # The circuit has been removed or broke without us being told, forget about it
+            self.remove_circuit(circuit_ids[self.index])
+            circuit_ids = self.get_circuit_ids(hops)
 
-        self.index = (self.index + 1) % len(circuit_ids)
-        circuit_id = circuit_ids[self.index]
-        return self.community.active_data_circuits()[circuit_id]
+        return None
 
 
 class TunnelCommunity(Community):
@@ -287,6 +327,8 @@ class TunnelCommunity(Community):
         self.exit_candidates = {}  # Keeps track of the candidates that want to be an exit node
         self.notifier = None
         self.selection_strategy = RoundRobin(self)
+        self.exit_selector = ExitSelector()
+        self.circuit_demand = CircuitDemand()
         self.stats = defaultdict(int)
         self.creation_time = time.time()
         self.crawler_mids = ['5e02620cfabea2d2d3bfdc2032f6307136a35e69'.decode('hex'),
@@ -397,6 +439,7 @@ class TunnelCommunity(Community):
     @inlineCallbacks
     def unload_community(self):
         yield self.socks_server.stop()
+        self.crypto.key_pool.stop()
 
         # Remove all circuits/relays/exitsockets
         for circuit_id in self.circuits.keys():
@@ -436,7 +479,17 @@ class TunnelCommunity(Community):
 
     @call_on_reactor_thread
     def do_circuits(self):
-        for circuit_length, num_circuits in self.circuits_needed.items():
+        circuits_needed = dict(self.circuits_needed)
+        for circuit_length, num_circuits in circuits_needed.iteritems():
+            self.circuit_demand.update(circuit_length, num_circuits)
+
+        # Keep a pool of ready circuits for the numbers of hops that were needed recently, so new anonymous downloads
+        # do not have to wait for their circuits to be built
+        pool_sizes = self.circuit_demand.get_pool_sizes(self.settings.circuit_pool_size)
+        for circuit_length, pool_size in pool_sizes.iteritems():
+            circuits_needed[circuit_length] = max(circuits_needed.get(circuit_length, 0), pool_size)
+
+        for circuit_length, num_circuits in circuits_needed.items():
             num_to_build = num_circuits - len(self.data_circuits(circuit_length))
             self.tunnel_logger.info("want %d data circuits of length %d", num_to_build, circuit_length)
             for _ in range(num_to_build):
@@ -503,6 +556,7 @@ class TunnelCommunity(Community):
             if pubkey not in current_candidates:
                 self.exit_candidates.pop(pubkey)
                 self.tunnel_logger.info("Removed candidate from exit_candidates dictionary")
+        self.exit_selector.prune(self.exit_candidates)
 
     def copy_shallow_candidate(self, tunnel, sock_addr):
         """
@@ -540,7 +594,7 @@ class TunnelCommunity(Community):
         # Determine the last hop
         if not required_exit:
             if ctype == CIRCUIT_TYPE_DATA:
-                required_exit = next(self.exit_candidates.itervalues(), None)
+                required_exit = self.exit_selector.select(self.exit_candidates)
             else:
                 # For exit nodes that don't exit actual data, we prefer verified candidates,
                 # but we also consider exit candidates.
@@ -581,6 +635,8 @@ class TunnelCommunity(Community):
                            first_hop.sock_addr[0], first_hop.sock_addr[1])
 
         self.circuits[circuit_id] = circuit
+        if ctype == CIRCUIT_TYPE_DATA:
+            self.exit_selector.add_circuit(circuit_id, required_exit.get_member().public_key)
 
         self.increase_bytes_sent(circuit, self.send_cell([first_hop],
                                                          u"create", (circuit_id,
@@ -610,6 +666,10 @@ class TunnelCommunity(Community):
                 self.destroy_circuit(circuit_id)
 
             circuit = self.circuits.pop(circuit_id)
+            self.selection_strategy.remove_circuit(circuit_id)
+            if circuit.state != CIRCUIT_STATE_READY:
+                self.exit_selector.circuit_failed(circuit_id)
+            self.exit_selector.remove_circuit(circuit)
             if self.notifier:
                 peer = (circuit.first_hop[0], circuit.first_hop[1])
                 from Tribler.Core.simpledefs import NTFY_TUNNEL, NTFY_REMOVE
@@ -970,6 +1030,9 @@ class TunnelCommunity(Community):
 
         elif circuit.state == CIRCUIT_STATE_READY:
             self.request_cache.pop(u"anon-circuit", circuit.circuit_id)
+            if circuit.ctype == CIRCUIT_TYPE_DATA:
+                self.selection_strategy.add_circuit(circuit)
+                self.exit_selector.circuit_ready(circuit.circuit_id)
             # Re-add BitTorrent peers, if needed.
             self.readd_bittorrent_peers()
 
@@ -1213,7 +1276,10 @@ class TunnelCommunity(Community):
 
     def on_pong(self, messages):
         for message in messages:
-            self.request_cache.pop(u"ping", message.payload.identifier)
+            cache = self.request_cache.pop(u"ping", message.payload.identifier)
+            # A batch can contain the same pong more than once, in which case the cache is already gone
+            if cache:
+                self.exit_selector.add_rtt(cache.circuit.circuit_id, time.time() - cache.send_time)
             self.tunnel_logger.info("Got pong from %s", message.candidate)
 
     def do_ping(self):
@@ -0,0 +1,238 @@
+# coding=utf-8
+from datetime import datetime
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, QRect, QSortFilterProxyModel, Qt
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QApplication, QStyle, QStyledItemDelegate, QStyleOptionViewItem
+
+import TriblerGUI.defs
+from TriblerGUI.defs import DLSTATUS_DOWNLOADING, DLSTATUS_STRINGS, DOWNLOADS_FILTER_ALL, DOWNLOADS_FILTER_DEFINITION
+from TriblerGUI.utilities import duration_to_string, format_size, format_speed
+
+DOWNLOADS_COLUMNS = ["NAME", "SIZE", "PROGRESS", "STATUS", "SEEDS", "PEERS", u"↓ SPEED", u"↑ SPEED", "RATIO",
+                     "ANONYMOUS?", "HOPS", "ETA", "ADDED ON"]
+COLUMN_NAME, COLUMN_SIZE, COLUMN_PROGRESS, COLUMN_STATUS, COLUMN_SEEDS, COLUMN_PEERS, COLUMN_SPEED_DOWN, \
+    COLUMN_SPEED_UP, COLUMN_RATIO, COLUMN_ANONYMOUS, COLUMN_HOPS, COLUMN_ETA, COLUMN_TIME_ADDED = \
+    range(len(DOWNLOADS_COLUMNS))
+
+SORT_ROLE = Qt.UserRole  # The role of the raw values of the cells, by which the downloads are sorted
+
+
+def get_raw_download_status(download):
+    return getattr(TriblerGUI.defs, download["status"])
+
+
+class DownloadsListModel(QAbstractTableModel):
+    """
+    This model holds the downloads shown in the downloads list. When new download states arrive, only the rows that
+    have changed are signalled to the views, so the view only repaints the visible rows that changed.
+    """
+
+    def __init__(self, parent=None):
+        QAbstractTableModel.__init__(self, parent)
+        self.downloads = []
+        self.rows = {}  # Dictionary of infohash -> the row of the download
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.downloads)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(DOWNLOADS_COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return DOWNLOADS_COLUMNS[section]
+        return None
+
+    def get_download(self, row):
+        return self.downloads[row]
+
+    def get_row(self, infohash):
+        return self.rows.get(infohash)
+
+    def update_downloads(self, downloads):
+        """
+        Update the model with the current list of downloads, adding the new ones, removing the ones that are gone and
+        signalling the rows that have changed.
+        """
+        new_downloads = {download["infohash"]: download for download in downloads}
+
+        removed_rows = [row for row, download in enumerate(self.downloads) if download["infohash"] not in new_downloads]
+        for row in reversed(removed_rows):
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.downloads[row]
+            self.endRemoveRows()
+        if removed_rows:
+            self.rows = {download["infohash"]: row for row, download in enumerate(self.downloads)}
+
+        # Signal the changed rows as ranges of consecutive rows
+        changed_start = None
+        for row, download in enumerate(self.downloads):
+            new_download = new_downloads.pop(download["infohash"])
+            if new_download != download:
+                self.downloads[row] = new_download
+                if changed_start is None:
+                    changed_start = row
+            elif changed_start is not None:
+                self.emit_rows_changed(changed_start, row - 1)
+                changed_start = None
+        if changed_start is not None:
+            self.emit_rows_changed(changed_start, len(self.downloads) - 1)
+
+        # The remaining downloads are new, they are added in the order in which they were received
+        added_downloads = [download for download in downloads if download["infohash"] in new_downloads]
+        if added_downloads:
+            first_row = len(self.downloads)
+            self.beginInsertRows(QModelIndex(), first_row, first_row + len(added_downloads) - 1)
+            for row, download in enumerate(added_downloads, first_row):
+                self.downloads.append(download)
+                self.rows[download["infohash"]] = row
+            self.endInsertRows()
+
+    def update_download(self, download):
+        """
+        Update a single download, for instance after its state has been changed from the GUI.
+        """
+        row = self.rows.get(download["infohash"])
+        if row is not None:
+            self.downloads[row] = download
+            self.emit_rows_changed(row, row)
+
+    def remove_download(self, infohash):
+        row = self.rows.get(infohash)
+        if row is None:
+            return
+
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.downloads[row]
+        self.rows = {download["infohash"]: row for row, download in enumerate(self.downloads)}
+        self.endRemoveRows()
+
+    def emit_rows_changed(self, first_row, last_row):
+        self.dataChanged.emit(self.index(first_row, 0), self.index(last_row, len(DOWNLOADS_COLUMNS) - 1))
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        download = self.downloads[index.row()]
+        if role == Qt.DisplayRole:
+            return self.get_display_value(download, index.column())
+        elif role == SORT_ROLE:
+            return self.get_sort_value(download, index.column())
+        return None
+
+    @staticmethod
+    def get_display_value(download, column):
+        if column == COLUMN_NAME:
+            return download["name"]
+        elif column == COLUMN_SIZE:
+            return format_size(float(download["size"]))
+        elif column == COLUMN_PROGRESS:
+            return "%d%%" % int(download["progress"] * 100)
+        elif column == COLUMN_STATUS:
+            return "Streaming" if download["vod_mode"] else DLSTATUS_STRINGS[get_raw_download_status(download)]
+        elif column == COLUMN_SEEDS:
+            return str(download["num_seeds"])
+        elif column == COLUMN_PEERS:
+            return str(download["num_peers"])
+        elif column == COLUMN_SPEED_DOWN:
+            return format_speed(download["speed_down"])
+        elif column == COLUMN_SPEED_UP:
+            return format_speed(download["speed_up"])
+        elif column == COLUMN_RATIO:
+            return "%.3f" % float(download["ratio"])
+        elif column == COLUMN_ANONYMOUS:
+            return "yes" if download["anon_download"] else "no"
+        elif column == COLUMN_HOPS:
+            return str(download["hops"]) if download["anon_download"] else "-"
+        elif column == COLUMN_ETA:
+            if get_raw_download_status(download) == DLSTATUS_DOWNLOADING:
+                return duration_to_string(download["eta"])
+            return "-"
+        elif column == COLUMN_TIME_ADDED:
+            return datetime.fromtimestamp(int(download["time_added"])).strftime('%Y-%m-%d %H:%M')
+        return None
+
+    @staticmethod
+    def get_sort_value(download, column):
+        if column == COLUMN_NAME:
+            return download["name"].lower()
+        elif column == COLUMN_SIZE:
+            return float(download["size"])
+        elif column == COLUMN_PROGRESS:
+            return int(download["progress"] * 100)
+        elif column == COLUMN_SEEDS:
+            return download["num_seeds"]
+        elif column == COLUMN_PEERS:
+            return download["num_peers"]
+        elif column == COLUMN_SPEED_DOWN:
+            return float(download["speed_down"])
+        elif column == COLUMN_SPEED_UP:
+            return float(download["speed_up"])
+        elif column == COLUMN_RATIO:
+            return float(download["ratio"])
+        elif column == COLUMN_ETA:
+            # Put finished downloads with an ETA of 0 after all other downloads
+            return float(download["eta"]) or float('inf')
+        elif column == COLUMN_TIME_ADDED:
+            return int(download["time_added"])
+        return DownloadsListModel.get_display_value(download, column)
+
+
+class DownloadsFilterModel(QSortFilterProxyModel):
+    """
+    This proxy model sorts the downloads and only shows the downloads that match the selected status filter and the
+    filter text. Because the filtering and sorting are dynamic, only the rows that change are filtered and sorted again.
+    """
+
+    def __init__(self, parent=None):
+        QSortFilterProxyModel.__init__(self, parent)
+        self.status_filter = DOWNLOADS_FILTER_DEFINITION[DOWNLOADS_FILTER_ALL]
+        self.filter_text = ""
+        self.setSortRole(SORT_ROLE)
+        self.setDynamicSortFilter(True)
+
+    def set_status_filter(self, downloads_filter):
+        self.status_filter = DOWNLOADS_FILTER_DEFINITION[downloads_filter]
+        self.invalidateFilter()
+
+    def set_filter_text(self, text):
+        self.filter_text = text.lower()
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        download = self.sourceModel().get_download(source_row)
+        return get_raw_download_status(download) in self.status_filter and \
+            self.filter_text in download["name"].lower()
+
+    def get_download(self, index):
+        return self.sourceModel().get_download(self.mapToSource(index).row())
+
+
+class DownloadProgressDelegate(QStyledItemDelegate):
+    """
+    This delegate paints the progress bars in the downloads list, so no progress bar widget is needed for every row.
+    """
+
+    def paint(self, painter, option, index):
+        # Paint the background of the cell, for instance when it is selected, without the text
+        background_option = QStyleOptionViewItem(option)
+        self.initStyleOption(background_option, index)
+        background_option.text = ""
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.CE_ItemViewItem, background_option, painter, option.widget)
+
+        rect = option.rect.adjusted(4, 4, -8, -4)
+        progress = index.data(SORT_ROLE) or 0
+
+        painter.save()
+        painter.fillRect(rect, QColor("white"))
+        painter.fillRect(QRect(rect.left(), rect.top(), rect.width() * progress // 100, rect.height()),
+                         QColor("#e67300"))
+        font = painter.font()
+        font.setPixelSize(12)
+        painter.setFont(font)
+        painter.setPen(QColor("black"))
+        painter.drawText(rect, Qt.AlignCenter, index.data(Qt.DisplayRole))
+        painter.restore()
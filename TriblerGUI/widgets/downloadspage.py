@@ -6,11 +6,11 @@ from PyQt5.QtWidgets import QWidget, QAction, QFileDialog, QSystemTrayIcon
 
 from TriblerGUI.tribler_action_menu import TriblerActionMenu
 from TriblerGUI.defs import DOWNLOADS_FILTER_ALL, DOWNLOADS_FILTER_DOWNLOADING, DOWNLOADS_FILTER_COMPLETED, \
-    DOWNLOADS_FILTER_ACTIVE, DOWNLOADS_FILTER_INACTIVE, DOWNLOADS_FILTER_DEFINITION, DLSTATUS_STOPPED, \
-    DLSTATUS_STOPPED_ON_ERROR, BUTTON_TYPE_NORMAL, BUTTON_TYPE_CONFIRM, DLSTATUS_METADATA, DLSTATUS_HASHCHECKING, \
-    DLSTATUS_WAITING4HASHCHECK
+    DOWNLOADS_FILTER_ACTIVE, DOWNLOADS_FILTER_INACTIVE, DLSTATUS_STOPPED, DLSTATUS_STOPPED_ON_ERROR, \
+    BUTTON_TYPE_NORMAL, BUTTON_TYPE_CONFIRM, DLSTATUS_METADATA, DLSTATUS_HASHCHECKING, DLSTATUS_WAITING4HASHCHECK
 from TriblerGUI.dialogs.confirmationdialog import ConfirmationDialog
-from TriblerGUI.widgets.downloadwidgetitem import DownloadWidgetItem
+from TriblerGUI.widgets.downloadslistmodel import COLUMN_PROGRESS, COLUMN_TIME_ADDED, DownloadProgressDelegate, \
+    DownloadsFilterModel, DownloadsListModel, get_raw_download_status
 from TriblerGUI.tribler_request_manager import TriblerRequestManager
 from TriblerGUI.utilities import format_speed
 
@@ -19,6 +19,9 @@ class DownloadsPage(QWidget):
     """
     This class is responsible for managing all items on the downloads page.
     The downloads page shows all downloads and specific details about a download.
+
+    The downloads are kept in a DownloadsListModel, which is filtered and sorted by a DownloadsFilterModel, so the
+    downloads list only paints the visible rows and only the rows that changed are filtered and sorted again.
     """
     received_downloads = pyqtSignal(object)
 
@@ -26,11 +29,14 @@ class DownloadsPage(QWidget):
         QWidget.__init__(self)
         self.export_dir = None
         self.filter = DOWNLOADS_FILTER_ALL
-        self.download_widgets = {}  # key: infohash, value: QTreeWidgetItem
+        self.downloads_model = DownloadsListModel(self)
+        self.downloads_filter_model = DownloadsFilterModel(self)
+        self.downloads_filter_model.setSourceModel(self.downloads_model)
+        self.progress_delegate = DownloadProgressDelegate(self)
         self.downloads = None
         self.downloads_timer = QTimer()
         self.downloads_timeout_timer = QTimer()
-        self.selected_item = None
+        self.selected_download = None
         self.dialog = None
         self.downloads_request_mgr = TriblerRequestManager()
         self.request_mgr = None
@@ -44,7 +50,9 @@ class DownloadsPage(QWidget):
         self.window().remove_download_button.clicked.connect(self.on_remove_download_clicked)
         self.window().play_download_button.clicked.connect(self.on_play_download_clicked)
 
-        self.window().downloads_list.itemSelectionChanged.connect(self.on_download_item_clicked)
+        self.window().downloads_list.setModel(self.downloads_filter_model)
+        self.window().downloads_list.setItemDelegateForColumn(COLUMN_PROGRESS, self.progress_delegate)
+        self.window().downloads_list.selectionModel().selectionChanged.connect(self.on_download_item_clicked)
 
         self.window().downloads_list.customContextMenuRequested.connect(self.on_right_click_item)
 
@@ -53,7 +61,7 @@ class DownloadsPage(QWidget):
 
         self.window().downloads_filter_input.textChanged.connect(self.on_filter_text_changed)
 
-        self.window().downloads_list.header().resizeSection(12, 146)
+        self.window().downloads_list.header().resizeSection(COLUMN_TIME_ADDED, 146)
 
         if not self.window().vlc_available:
             self.window().play_download_button.setHidden(True)
@@ -61,7 +69,7 @@ class DownloadsPage(QWidget):
     def on_filter_text_changed(self, text):
         self.window().downloads_list.clearSelection()
         self.window().download_details_widget.hide()
-        self.update_download_visibility()
+        self.downloads_filter_model.set_filter_text(text)
 
     def start_loading_downloads(self):
         self.schedule_downloads_timer(now=True)
@@ -102,16 +110,9 @@ class DownloadsPage(QWidget):
         self.received_downloads.emit(downloads)
         self.downloads = downloads
 
-        download_infohashes = set()
-        for download in downloads["downloads"]:
-            if download["infohash"] in self.download_widgets:
-                item = self.download_widgets[download["infohash"]]
-            else:
-                item = DownloadWidgetItem(self.window().downloads_list)
-                self.download_widgets[download["infohash"]] = item
-
-            item.update_with_download(download)
+        self.downloads_model.update_downloads(downloads["downloads"])
 
+        for download in downloads["downloads"]:
             # Update video player with download info
             video_infohash = self.window().video_player_page.active_infohash
             if video_infohash != "" and download["infohash"] == video_infohash:
@@ -120,40 +121,25 @@ class DownloadsPage(QWidget):
             total_download += download["speed_down"]
             total_upload += download["speed_up"]
 
-            download_infohashes.add(download["infohash"])
-
             if self.window().download_details_widget.current_download is not None and \
                     self.window().download_details_widget.current_download["infohash"] == download["infohash"]:
                 self.window().download_details_widget.current_download = download
                 self.window().download_details_widget.update_pages()
 
-        # Check whether there are download that should be removed
-        toremove = set()
-        for infohash, item in self.download_widgets.iteritems():
-            if infohash not in download_infohashes:
-                index = self.window().downloads_list.indexOfTopLevelItem(item)
-                toremove.add((infohash, index))
-
-        for infohash, index in toremove:
-            self.window().downloads_list.takeTopLevelItem(index)
-            del self.download_widgets[infohash]
-
         if QSystemTrayIcon.isSystemTrayAvailable():
             self.window().tray_icon.setToolTip(
                 "Down: %s, Up: %s" % (format_speed(total_download), format_speed(total_upload)))
-        self.update_download_visibility()
         self.schedule_downloads_timer()
 
         # Update the top download management button if we have a row selected
-        if len(self.window().downloads_list.selectedItems()) > 0:
+        if self.get_selected_download():
             self.on_download_item_clicked()
 
-    def update_download_visibility(self):
-        for i in range(self.window().downloads_list.topLevelItemCount()):
-            item = self.window().downloads_list.topLevelItem(i)
-            filter_match = self.window().downloads_filter_input.text().lower() in item.download_info["name"].lower()
-            item.setHidden(
-                not item.get_raw_download_status() in DOWNLOADS_FILTER_DEFINITION[self.filter] or not filter_match)
+    def get_selected_download(self):
+        selected_rows = self.window().downloads_list.selectionModel().selectedRows()
+        if not selected_rows:
+            return None
+        return self.downloads_filter_model.get_download(selected_rows[0])
 
     def on_downloads_tab_button_clicked(self, button_name):
         if button_name == "downloads_all_button":
@@ -169,66 +155,67 @@ class DownloadsPage(QWidget):
 
         self.window().downloads_list.clearSelection()
         self.window().download_details_widget.hide()
-        self.update_download_visibility()
+        self.downloads_filter_model.set_status_filter(self.filter)
 
     @staticmethod
-    def start_download_enabled(download_widget):
-        return download_widget.get_raw_download_status() == DLSTATUS_STOPPED
+    def start_download_enabled(download):
+        return get_raw_download_status(download) == DLSTATUS_STOPPED
 
     @staticmethod
-    def stop_download_enabled(download_widget):
-        status = download_widget.get_raw_download_status()
+    def stop_download_enabled(download):
+        status = get_raw_download_status(download)
         return status != DLSTATUS_STOPPED and status != DLSTATUS_STOPPED_ON_ERROR
 
     @staticmethod
-    def force_recheck_download_enabled(download_widget):
-        status = download_widget.get_raw_download_status()
+    def force_recheck_download_enabled(download):
+        status = get_raw_download_status(download)
         return status != DLSTATUS_METADATA and status != DLSTATUS_HASHCHECKING and status != DLSTATUS_WAITING4HASHCHECK
 
     def on_download_item_clicked(self):
         self.window().download_details_widget.show()
-        if len(self.window().downloads_list.selectedItems()) == 0:
+        selected_download = self.get_selected_download()
+        if not selected_download:
             self.window().play_download_button.setEnabled(False)
             self.window().remove_download_button.setEnabled(False)
             self.window().start_download_button.setEnabled(False)
             self.window().stop_download_button.setEnabled(False)
             return
 
-        self.selected_item = self.window().downloads_list.selectedItems()[0]
+        self.selected_download = selected_download
         self.window().play_download_button.setEnabled(True)
         self.window().remove_download_button.setEnabled(True)
-        self.window().start_download_button.setEnabled(DownloadsPage.start_download_enabled(self.selected_item))
-        self.window().stop_download_button.setEnabled(DownloadsPage.stop_download_enabled(self.selected_item))
+        self.window().start_download_button.setEnabled(DownloadsPage.start_download_enabled(self.selected_download))
+        self.window().stop_download_button.setEnabled(DownloadsPage.stop_download_enabled(self.selected_download))
 
-        self.window().download_details_widget.update_with_download(self.selected_item.download_info)
+        self.window().download_details_widget.update_with_download(self.selected_download)
 
     def on_start_download_clicked(self):
-        infohash = self.selected_item.download_info["infohash"]
+        infohash = self.selected_download["infohash"]
         self.request_mgr = TriblerRequestManager()
         self.request_mgr.perform_request("downloads/%s" % infohash, self.on_download_resumed,
                                          method='PATCH', data="state=resume")
 
     def on_download_resumed(self, json_result):
         if json_result["modified"]:
-            self.selected_item.download_info['status'] = "DLSTATUS_DOWNLOADING"
-            self.selected_item.update_item()
+            self.selected_download['status'] = "DLSTATUS_DOWNLOADING"
+            self.downloads_model.update_download(self.selected_download)
             self.on_download_item_clicked()
 
     def on_stop_download_clicked(self):
-        infohash = self.selected_item.download_info["infohash"]
+        infohash = self.selected_download["infohash"]
         self.request_mgr = TriblerRequestManager()
         self.request_mgr.perform_request("downloads/%s" % infohash, self.on_download_stopped,
                                          method='PATCH', data="state=stop")
 
     def on_play_download_clicked(self):
         self.window().left_menu_button_video_player.click()
-        self.window().video_player_page.set_torrent_infohash(self.selected_item.download_info["infohash"])
+        self.window().video_player_page.set_torrent_infohash(self.selected_download["infohash"])
         self.window().left_menu_playlist.set_loading()
 
     def on_download_stopped(self, json_result):
         if json_result["modified"]:
-            self.selected_item.download_info['status'] = "DLSTATUS_STOPPED"
-            self.selected_item.update_item()
+            self.selected_download['status'] = "DLSTATUS_STOPPED"
+            self.downloads_model.update_download(self.selected_download)
             self.on_download_item_clicked()
 
     def on_remove_download_clicked(self):
@@ -241,7 +228,7 @@ class DownloadsPage(QWidget):
 
     def on_remove_download_dialog(self, action):
         if action != 2:
-            infohash = self.selected_item.download_info["infohash"]
+            infohash = self.selected_download["infohash"]
 
             # Reset video player if necessary before doing the actual request
             if self.window().video_player_page.active_infohash == infohash:
@@ -256,33 +243,30 @@ class DownloadsPage(QWidget):
 
     def on_download_removed(self, json_result):
         if json_result["removed"]:
-            infohash = self.selected_item.download_info["infohash"]
-            index = self.window().downloads_list.indexOfTopLevelItem(self.selected_item)
-            self.window().downloads_list.takeTopLevelItem(index)
-            if infohash in self.download_widgets:  # Could have been removed already through API
-                del self.download_widgets[infohash]
+            # The download could have been removed already through the API
+            self.downloads_model.remove_download(self.selected_download["infohash"])
             self.window().download_details_widget.hide()
 
     def on_force_recheck_download(self):
-        infohash = self.selected_item.download_info["infohash"]
+        infohash = self.selected_download["infohash"]
         self.request_mgr = TriblerRequestManager()
         self.request_mgr.perform_request("downloads/%s" % infohash, self.on_forced_recheck,
                                          method='PATCH', data='state=recheck')
 
     def on_forced_recheck(self, result):
         if result['modified']:
-            self.selected_item.download_info['status'] = "DLSTATUS_HASHCHECKING"
-            self.selected_item.update_item()
+            self.selected_download['status'] = "DLSTATUS_HASHCHECKING"
+            self.downloads_model.update_download(self.selected_download)
             self.on_download_item_clicked()
 
     def change_anonymity(self, hops):
-        infohash = self.selected_item.download_info["infohash"]
+        infohash = self.selected_download["infohash"]
         self.request_mgr = TriblerRequestManager()
         self.request_mgr.perform_request("downloads/%s" % infohash, lambda _: None,
                                          method='PATCH', data='anon_hops=%d' % hops)
 
     def on_explore_files(self):
-        QDesktopServices.openUrl(QUrl.fromLocalFile(self.selected_item.download_info["destination"]))
+        QDesktopServices.openUrl(QUrl.fromLocalFile(self.selected_download["destination"]))
 
     def on_export_download(self):
         self.export_dir = QFileDialog.getExistingDirectory(self, "Please select the destination directory", "",
@@ -290,7 +274,7 @@ class DownloadsPage(QWidget):
 
         if len(self.export_dir) > 0:
             # Show confirmation dialog where we specify the name of the file
-            infohash = self.selected_item.download_info['infohash']
+            infohash = self.selected_download['infohash']
             self.dialog = ConfirmationDialog(self, "Export torrent file",
                                              "Please enter the name of the torrent file:",
                                              [('SAVE', BUTTON_TYPE_NORMAL), ('CANCEL', BUTTON_TYPE_CONFIRM)],
@@ -305,7 +289,7 @@ class DownloadsPage(QWidget):
         if action == 0:
             filename = self.dialog.dialog_widget.dialog_input.text()
             self.request_mgr = TriblerRequestManager()
-            self.request_mgr.download_file("downloads/%s/torrent" % self.selected_item.download_info['infohash'],
+            self.request_mgr.download_file("downloads/%s/torrent" % self.selected_download['infohash'],
                                            lambda data: self.on_export_download_request_done(filename, data))
 
         self.dialog.setParent(None)
@@ -326,11 +310,11 @@ class DownloadsPage(QWidget):
                 self.window().tray_icon.showMessage("Torrent file exported", "Torrent file exported to %s" % dest_path)
 
     def on_right_click_item(self, pos):
-        item_clicked = self.window().downloads_list.itemAt(pos)
-        if not item_clicked:
+        index_clicked = self.window().downloads_list.indexAt(pos)
+        if not index_clicked.isValid():
             return
 
-        self.selected_item = item_clicked
+        self.selected_download = self.downloads_filter_model.get_download(index_clicked)
 
         menu = TriblerActionMenu(self)
 
@@ -347,12 +331,12 @@ class DownloadsPage(QWidget):
         three_hop_anon_action = QAction('Three hops', self)
 
         start_action.triggered.connect(self.on_start_download_clicked)
-        start_action.setEnabled(DownloadsPage.start_download_enabled(self.selected_item))
+        start_action.setEnabled(DownloadsPage.start_download_enabled(self.selected_download))
         stop_action.triggered.connect(self.on_stop_download_clicked)
-        stop_action.setEnabled(DownloadsPage.stop_download_enabled(self.selected_item))
+        stop_action.setEnabled(DownloadsPage.stop_download_enabled(self.selected_download))
         remove_download_action.triggered.connect(self.on_remove_download_clicked)
         force_recheck_action.triggered.connect(self.on_force_recheck_download)
-        force_recheck_action.setEnabled(DownloadsPage.force_recheck_download_enabled(self.selected_item))
+        force_recheck_action.setEnabled(DownloadsPage.force_recheck_download_enabled(self.selected_download))
         export_download_action.triggered.connect(self.on_export_download)
         explore_files_action.triggered.connect(self.on_explore_files)
 
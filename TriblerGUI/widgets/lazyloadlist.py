@@ -9,7 +9,9 @@ ITEM_LOAD_BATCH = 30
 class LazyLoadList(QListWidget):
     """
     This class implements a list where widget items are lazy-loaded. When the user has reached the end of the list
-    when scrolling, the next items are created and displayed.
+    when scrolling, the next items are created and displayed. Items that are inserted above the loaded items push the
+    last loaded item out, so the number of widgets does not grow with the number of items, for instance when many
+    search results come in.
     """
 
     def __init__(self, parent):
@@ -18,10 +20,12 @@ class LazyLoadList(QListWidget):
         self.itemSelectionChanged.connect(self.on_item_clicked)
         self.data_items = []  # Tuple of (ListWidgetClass, json data)
         self.items_loaded = 0
+        self.max_items_loaded = ITEM_LOAD_BATCH
 
     def load_next_items(self):
         for i in range(self.items_loaded, min(self.items_loaded + ITEM_LOAD_BATCH, len(self.data_items))):
             self.load_item(i)
+        self.max_items_loaded = max(self.max_items_loaded, self.items_loaded)
 
     def load_item(self, index):
         item = QListWidgetItem()
@@ -36,14 +40,21 @@ class LazyLoadList(QListWidget):
         self.setItemWidget(item, widget_item)
         self.items_loaded += 1
 
+    def unload_last_item(self):
+        self.takeItem(self.items_loaded - 1)
+        self.items_loaded -= 1
+
     def insert_item(self, index, item):
         self.data_items.insert(index, item)
-        if index < ITEM_LOAD_BATCH:
+        if index < self.items_loaded or index == self.items_loaded < self.max_items_loaded:
             self.load_item(index)
+            if self.items_loaded > self.max_items_loaded:
+                self.unload_last_item()
 
     def set_data_items(self, items):
         self.clear()
         self.items_loaded = 0
+        self.max_items_loaded = ITEM_LOAD_BATCH
         self.data_items = items
         self.load_next_items()
 
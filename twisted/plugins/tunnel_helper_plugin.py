@@ -6,6 +6,7 @@ import logging.config
 import os
 import random
 import signal
+import sys
 import threading
 import time
 from collections import defaultdict, deque
@@ -24,6 +25,7 @@ from twisted.python.log import msg
 from zope.interface import implements
 
 from Tribler.community.tunnel.hidden_community import HiddenTunnelCommunity
+from Tribler.community.tunnel.supervisor import STATUS_FD, TunnelSupervisor, WorkerStatusReporter
 from Tribler.community.tunnel.tunnel_community import TunnelSettings
 from Tribler.Core.Config.tribler_config import TriblerConfig
 from Tribler.Core.DownloadConfig import DefaultDownloadStartupConfig
@@ -79,6 +81,14 @@ def check_json_port(val):
 check_json_port.coerceDoc = "Json API port must be greater than 0."
 
 
+def check_workers(val):
+    workers = int(val)
+    if workers <= 0:
+        raise ValueError("Invalid number of workers")
+    return workers
+check_workers.coerceDoc = "The number of workers must be greater than 0."
+
+
 class Options(usage.Options):
     optFlags = [
         ["exit", "x", "Allow being an exit-node"],
@@ -92,6 +102,10 @@ class Options(usage.Options):
         ["dispersy", "d", -1, 'Dispersy port', check_dispersy_port],
         ["crawl", "c", None, 'Enable crawler and use the keypair specified in the given filename', check_crawler_keypair],
         ["tunnelapi", "j", 0, 'Enable JSON api, which will run on the provided port number', check_json_port],
+        ["workers", "w", 1, 'Run the tunnel in the given number of worker processes, each with its own keys and ports',
+         check_workers],
+        ["statusfd", None, None, 'Report the status of this worker to the given file descriptor (used by workers)',
+         int],
     ]
 
 
@@ -114,6 +128,8 @@ class TunnelRootEndpoint(resource.Resource):
         self.tunnel = tunnel
         self.putChild("history", TunnelHistoryEndpoint(self.tunnel))
         self.putChild("stats", TunnelStatsEndpoint(self.tunnel))
+        if isinstance(self.tunnel, TunnelSupervisor):
+            self.putChild("workers", TunnelWorkersEndpoint(self.tunnel))
 
 
 class TunnelStatsEndpoint(resource.Resource):
@@ -140,6 +156,18 @@ class TunnelHistoryEndpoint(resource.Resource):
         return json.dumps(list(self.tunnel.history_stats))
 
 
+class TunnelWorkersEndpoint(resource.Resource):
+    """
+    This endpoint is responsible for handling requests for the stats of the workers of a supervised tunnel.
+    """
+    def __init__(self, supervisor):
+        resource.Resource.__init__(self)
+        self.supervisor = supervisor
+
+    def render_GET(self, request):
+        return json.dumps(self.supervisor.get_worker_stats())
+
+
 class TunnelCommunityCrawler(HiddenTunnelCommunity):
     def on_introduction_response(self, messages):
         super(TunnelCommunityCrawler, self).on_introduction_response(messages)
@@ -294,6 +322,20 @@ class Tunnel(object):
     def get_stats(self):
         return [round(f, 2) for f in self.current_stats]
 
+    def get_status(self):
+        """
+        Return the circuit and bandwidth statistics of this tunnel, which are reported to the supervisor.
+        """
+        if not self.community:
+            return {}
+
+        status = {'circuits': len(self.community.circuits),
+                  'relays': len(self.community.relay_from_to),
+                  'exit_sockets': len(self.community.exit_sockets)}
+        status.update(self.community.stats)
+        status.update(self.community.crypto.key_pool.get_statistics())
+        return status
+
 
 class LineHandler(LineReceiver):
     delimiter = os.linesep
@@ -407,6 +449,55 @@ class TunnelHelperServiceMaker(object):
         """
         self._stopping = False
         self.tunnel_site = None
+        self.status_reporter = None
+
+    def get_worker_args(self, options, socks5_port, index):
+        """
+        Return the command line of a worker of a supervised tunnel helper. Every worker gets its own range of socks5
+        ports, and therefore its own state directory and keys, and its own Dispersy port.
+        """
+        args = [sys.executable, sys.argv[0], "--nodaemon", "--pidfile=", self.tapname,
+                "--socks5=%d" % (socks5_port + index * 5), "--statusfd=%d" % STATUS_FD]
+        if options["dispersy"] > 0:
+            args.append("--dispersy=%d" % (options["dispersy"] + index))
+        if options["introduce"]:
+            args.append("--introduce=%d" % options["introduce"])
+        if options["exit"]:
+            args.append("--exit")
+        if options["trustchain"]:
+            args.append("--trustchain")
+        return args
+
+    def start_supervisor(self, options):
+        """
+        Start a supervisor that runs the tunnel helper in multiple worker processes.
+        """
+        # The ports of the workers should not change when they are restarted, since they determine their keys
+        socks5_port = options["socks5"] or random.randint(1000, 65535 - options["workers"] * 5)
+        supervisor = TunnelSupervisor(options["workers"],
+                                      lambda index: self.get_worker_args(options, socks5_port, index))
+
+        def stop_tunnel_api():
+            if self.tunnel_site:
+                return maybeDeferred(self.tunnel_site.stopListening)
+            return succeed(None)
+
+        def signal_handler(sig, _):
+            msg("Received shut down signal %s" % sig)
+            if not self._stopping:
+                self._stopping = True
+                supervisor.stop().addCallback(lambda _: stop_tunnel_api().addCallback(lambda _: reactor.stop()))
+
+        signal.signal(signal.SIGINT, signal_handler)
+        signal.signal(signal.SIGTERM, signal_handler)
+
+        supervisor.start()
+        supervisor.register_task("log stats", LoopingCall(
+            lambda: logger.info("Tunnel workers: %s", json.dumps(supervisor.get_stats())))).start(60, now=False)
+
+        if options["tunnelapi"] > 0:
+            self.tunnel_site = reactor.listenTCP(options["tunnelapi"],
+                                                 server.Site(resource=TunnelRootEndpoint(supervisor)))
 
     def start_tunnel(self, options):
         """
@@ -455,6 +546,8 @@ class TunnelHelperServiceMaker(object):
                 self._stopping = True
                 msg("Setting the tunnel should_run variable to False")
                 tunnel.should_run = False
+                if self.status_reporter:
+                    self.status_reporter.stop()
                 tunnel.stop().addCallback(lambda _: stop_tunnel_api().addCallback(lambda _: reactor.stop()))
 
         signal.signal(signal.SIGINT, signal_handler)
@@ -462,6 +555,10 @@ class TunnelHelperServiceMaker(object):
 
         tunnel.start(introduce_port)
 
+        if options["statusfd"] is not None:
+            self.status_reporter = WorkerStatusReporter(tunnel.get_status, options["statusfd"])
+            self.status_reporter.start()
+
         if options["tunnelapi"] > 0:
             self.tunnel_site = self.site = reactor.listenTCP(options["tunnelapi"],
                                                              server.Site(resource=TunnelRootEndpoint(tunnel)))
@@ -485,7 +582,10 @@ class TunnelHelperServiceMaker(object):
             })
             tunnel_helper_service.addService(manhole)
 
-        reactor.callWhenRunning(self.start_tunnel, options)
+        if options["workers"] > 1:
+            reactor.callWhenRunning(self.start_supervisor, options)
+        else:
+            reactor.callWhenRunning(self.start_tunnel, options)
 
         return tunnel_helper_service
 